@@ -0,0 +1,247 @@
+"""Batched user-activity ingestion and a per-user recent-activity cache.
+
+`POST /api/profile/activity` used to insert one `user_activity` row per
+event, and every profile view sorted the user's rows by `createdAt` again.
+Here an event is appended to a bounded in-memory queue and written by a
+background flusher in multi-row inserts of up to `batch_size`, as soon as a
+batch fills or every `interval` otherwise. A failed insert goes back to the
+front of the queue and is retried.
+
+Each recently active user also has a ring of their last `per_user` events.
+A ring is seeded from the table the first time the user's feed is read,
+merged with anything already queued, and re-seeded after `seed_ttl` so
+activity written elsewhere (other Next.js routes) still shows up. Rings are
+evicted least recently used beyond `max_users`.
+
+Under serve.py each worker has its own rings, and an event posted through
+one worker is only in that worker's queue and rings. After every flush that
+wrote rows, the worker bumps a tag generation in the shared-memory arena;
+the other workers re-seed a ring whose seed predates the bump on its next
+read, so the event shows up everywhere within about one `interval`.
+
+The queue is in memory: events accepted in the last `interval` are lost if
+the process dies, which is acceptable for a profile feed.
+"""
+
+import asyncio
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from event_log import log
+from supabase_rest import SupabaseError
+
+# Shared-memory tag bumped after each flush that wrote rows
+SHARED_TAG = "activity"
+
+# The CHECK constraint on user_activity."activityType"
+ACTIVITY_TYPES = ("vote", "server_add", "profile_update", "ticket", "login", "server_delete")
+MAX_DESCRIPTION = 500
+
+
+class UserRing:
+    __slots__ = ("events", "seeded_at", "generation")
+
+    def __init__(self, size: int):
+        self.events: Deque[Dict] = deque(maxlen=size)
+        self.seeded_at: Optional[float] = None
+        # Shared generation the seed is current with
+        self.generation: Optional[int] = None
+
+
+def new_activity(user_id: str, activity_type: str, description: str) -> Dict:
+    return {
+        "id": f"activity_{int(time.time() * 1000)}_{uuid.uuid4().hex[:9]}",
+        "userId": user_id,
+        "activityType": activity_type,
+        "description": description,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class ActivityLog:
+    def __init__(self, db=None, batch_size: int = 500, interval: float = 1.0, max_queue: int = 50_000,
+                 per_user: int = 20, max_users: int = 10_000, seed_ttl: float = 300.0, shared=None):
+        self.db = db
+        self.shared = shared
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.max_users = max_users
+        self.seed_ttl = seed_ttl
+        self.queue: Deque[Dict] = deque()
+        self.in_flight: List[Dict] = []
+        self.rings: "OrderedDict[str, UserRing]" = OrderedDict()
+        self.accepted = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.seeds = 0
+        self.remote_reseeds = 0
+        self._wakeup = asyncio.Event()
+
+    # Ingest
+
+    def record(self, user_id: str, activity_type: str, description: str) -> Optional[Dict]:
+        """Queue an event; None when the queue is full and it was dropped."""
+        if len(self.queue) >= self.max_queue:
+            self.dropped += 1
+            return None
+        event = new_activity(user_id, activity_type, description)
+        self.queue.append(event)
+        self.accepted += 1
+        ring = self.rings.get(user_id)
+        if ring is not None:
+            ring.events.appendleft(event)
+        if len(self.queue) >= self.batch_size:
+            self._wakeup.set()
+        return event
+
+    async def _insert_each(self, batch: List[Dict]):
+        """Insert rows one at a time, dropping those the database rejects (deleted user, duplicate id).
+
+        Rows are taken off the front of `batch` as they are settled, so after a failure it holds
+        only the rows still to be written.
+        """
+        while batch:
+            try:
+                await self.db.insert("user_activity", [batch[0]])
+                self.written += 1
+            except SupabaseError as e:
+                if not 400 <= e.status_code < 500:
+                    raise
+                self.dropped += 1
+            batch.pop(0)
+
+    async def flush(self, limit: Optional[int] = None):
+        """Insert queued events in batches; stops at the first failure."""
+        remaining = len(self.queue) if limit is None else min(limit, len(self.queue))
+        written = self.written
+        try:
+            await self._flush(remaining)
+        finally:
+            if self.written != written:
+                self._announce()
+
+    async def _flush(self, remaining: int):
+        while remaining > 0 and self.db is not None and self.db.configured:
+            size = min(self.batch_size, remaining)
+            batch = [self.queue.popleft() for _ in range(size)]
+            self.in_flight = batch
+            try:
+                try:
+                    await self.db.insert("user_activity", batch)
+                    self.written += size
+                except SupabaseError as e:
+                    # One bad row fails the whole statement; isolate it rather than retry forever
+                    if not 400 <= e.status_code < 500:
+                        raise
+                    await self._insert_each(batch)
+            except Exception as e:
+                log.error("activity_flush_error", str(e), rows=len(batch))
+                self.write_errors += 1
+                # Only what was not written yet
+                self.queue.extendleft(reversed(batch))
+                return
+            finally:
+                self.in_flight = []
+            self.batches += 1
+            remaining -= size
+
+    def _announce(self):
+        """Tell the other workers their rings may be missing rows this worker just wrote."""
+        if self.shared is None:
+            return
+        before = self.shared.generation(SHARED_TAG)
+        self.shared.invalidate(SHARED_TAG)
+        after = self.shared.generation(SHARED_TAG)
+        if after == before + 1:
+            # Only our own bump: rings current before it already hold our events
+            for ring in self.rings.values():
+                if ring.generation == before:
+                    ring.generation = after
+
+    async def run_flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Only what is queued now, so a failing database is retried next round, not in a loop
+            await self.flush(len(self.queue))
+
+    # Feed
+
+    async def _seed(self, user_id: str, ring: UserRing):
+        # Read before the select, so a bump during it leaves the ring stale
+        generation = self.shared.generation(SHARED_TAG) if self.shared is not None else None
+        rows = await self.db.select("user_activity", {
+            "userId": f"eq.{user_id}",
+            "order": "createdAt.desc",
+            "limit": str(self.per_user),
+        })
+        merged = {row["id"]: row for row in rows}
+        # Queued and in-flight events are not in the table yet
+        merged.update((event["id"], event) for event in ring.events)
+        for event in itertools.chain(self.in_flight, self.queue):
+            if event["userId"] == user_id:
+                merged[event["id"]] = event
+        newest = sorted(merged.values(), key=lambda row: row.get("createdAt") or "", reverse=True)
+        ring.events.clear()
+        ring.events.extend(newest[:self.per_user])
+        ring.seeded_at = time.monotonic()
+        ring.generation = generation
+        self.seeds += 1
+
+    async def recent(self, user_id: str, limit: int) -> Optional[List[Dict]]:
+        """The user's last `limit` events, newest first; None when they cannot be served from the ring."""
+        if limit > self.per_user or self.db is None or not self.db.configured:
+            return None
+        ring = self.rings.get(user_id)
+        if ring is None:
+            ring = self.rings[user_id] = UserRing(self.per_user)
+            while len(self.rings) > self.max_users:
+                self.rings.popitem(last=False)
+        else:
+            self.rings.move_to_end(user_id)
+        stale = ring.seeded_at is None or time.monotonic() - ring.seeded_at > self.seed_ttl
+        if not stale and self.shared is not None and self.shared.generation(SHARED_TAG) != ring.generation:
+            # Another worker wrote activity since the seed
+            stale = True
+            self.remote_reseeds += 1
+        if stale:
+            try:
+                await self._seed(user_id, ring)
+            except Exception as e:
+                log.error("activity_seed_error", str(e), user=user_id)
+                return None
+        return list(ring.events)[:limit]
+
+    async def run_maintenance(self, retain_months: int, interval: float = 6 * 3600.0):
+        """Create upcoming monthly partitions and drop expired ones (supabase_user_activity_partitions.sql)."""
+        while True:
+            if self.db is not None and self.db.configured:
+                try:
+                    await self.db.rpc("maintain_user_activity_partitions", {"retain_months": retain_months})
+                except Exception as e:
+                    log.error("activity_maintenance_error", str(e))
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict:
+        return {
+            "queued": len(self.queue),
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "writeErrors": self.write_errors,
+            "users": len(self.rings),
+            "seeds": self.seeds,
+            "remoteReseeds": self.remote_reseeds,
+        }
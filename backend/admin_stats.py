@@ -0,0 +1,185 @@
+"""Admin dashboard counters kept in the backend.
+
+`GET /api/admin/stats` in Next.js runs an exact COUNT(*) over every table
+on each dashboard load, and when `users` is unavailable it falls back to
+listing every auth user. Here each entity keeps a live total and counts of
+new rows per hour (last `HOURS`) and per day (last `DAYS`), bumped by the
+create/delete writes passing through the proxy. A scheduled `reconcile()`
+recounts the totals (`count=exact`) and rebuilds the series from one row per
+entity and hour returned by the `admin_created_counts()` GROUP BY
+(supabase_stats_backend.sql), so anything
+that bypassed the proxy (bulk actions, cascades, direct SQL) is settled
+within one interval. Serving the dashboard is then a fixed amount of work
+however large the tables grow.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from event_log import log
+
+# Dashboard key -> table; every one has a "createdAt" column
+ENTITIES = {
+    "servers": "servers",
+    "users": "users",
+    "tickets": "tickets",
+    "posts": "blog_posts",
+    "votes": "votes",
+}
+HOURS = 48
+DAYS = 30
+
+
+def parse_time(timestamp: Optional[str]) -> datetime:
+    """UTC datetime of an ISO timestamp; now when it is missing or malformed."""
+    if timestamp:
+        try:
+            moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            pass
+        else:
+            if moment.tzinfo is None:
+                return moment.replace(tzinfo=timezone.utc)
+            return moment.astimezone(timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def hour_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:00Z")
+
+
+def day_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d")
+
+
+class EntityCounters:
+    def __init__(self):
+        self.total = 0
+        self.hourly: Dict[str, int] = {}
+        self.daily: Dict[str, int] = {}
+
+    def created(self, moment: datetime, count_total: bool = True, count: int = 1):
+        if count_total:
+            self.total += count
+        hour, day = hour_key(moment), day_key(moment)
+        self.hourly[hour] = self.hourly.get(hour, 0) + count
+        self.daily[day] = self.daily.get(day, 0) + count
+
+    def prune(self, now: datetime):
+        oldest_hour = hour_key(now - timedelta(hours=HOURS - 1))
+        oldest_day = day_key(now - timedelta(days=DAYS - 1))
+        for key in [key for key in self.hourly if key < oldest_hour]:
+            del self.hourly[key]
+        for key in [key for key in self.daily if key < oldest_day]:
+            del self.daily[key]
+
+
+def series(buckets: Dict[str, int], keys: List[str]) -> List[Dict]:
+    return [{"t": key, "count": buckets.get(key, 0)} for key in keys]
+
+
+class AdminStats:
+    def __init__(self, db=None, interval: float = 600.0):
+        self.db = db
+        self.interval = interval
+        self.entities: Dict[str, EntityCounters] = {name: EntityCounters() for name in ENTITIES}
+        self.loaded = False
+        self.reconciled_at: Optional[str] = None
+        self.reconciles = 0
+        self.last_drift: Dict[str, int] = {}
+        self._load_lock = asyncio.Lock()
+        # Events seen while a reconcile is counting, replayed onto its result
+        self._pending: Optional[List[Tuple[str, int, Optional[str]]]] = None
+
+    async def ensure_loaded(self) -> bool:
+        if self.loaded:
+            return True
+        if self.db is None or not self.db.configured:
+            return False
+        async with self._load_lock:
+            if not self.loaded:
+                await self._reconcile()
+        return self.loaded
+
+    async def _count(self, since: datetime) -> Dict[str, EntityCounters]:
+        fresh = {name: EntityCounters() for name in ENTITIES}
+        for name, table in ENTITIES.items():
+            fresh[name].total = await self.db.count(table)
+        for row in await self.db.rpc("admin_created_counts", {"since": since.isoformat()}) or []:
+            counters = fresh.get(row.get("entity"))
+            if counters is not None:
+                counters.created(parse_time(row.get("hour")), count_total=False, count=int(row.get("count") or 0))
+        return fresh
+
+    async def reconcile(self):
+        async with self._load_lock:
+            await self._reconcile()
+
+    async def _reconcile(self):
+        """Recount totals and rebuild the series from the tables, then swap them in."""
+        now = datetime.now(timezone.utc)
+        since = min(now - timedelta(hours=HOURS), now - timedelta(days=DAYS - 1)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self._pending = []
+        try:
+            fresh = await self._count(since)
+        except Exception as e:
+            log.error("admin_stats_reconcile_error", str(e))
+            return
+        finally:
+            pending, self._pending = self._pending, None
+        for name, delta, timestamp in pending:
+            self._apply(fresh[name], delta, timestamp)
+        if self.loaded:
+            self.last_drift = {name: fresh[name].total - self.entities[name].total for name in ENTITIES}
+        for counters in fresh.values():
+            counters.prune(now)
+        self.entities = fresh
+        self.loaded = True
+        self.reconciled_at = now.isoformat()
+        self.reconciles += 1
+
+    async def run_reconciler(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.loaded:
+                await self.reconcile()
+
+    # Write events
+
+    @staticmethod
+    def _apply(counters: EntityCounters, delta: int, timestamp: Optional[str]):
+        if delta > 0:
+            counters.created(parse_time(timestamp))
+        else:
+            counters.total = max(0, counters.total + delta)
+
+    def record(self, name: str, delta: int = 1, timestamp: Optional[str] = None):
+        """A row of entity `name` was created (delta 1, at `timestamp`) or deleted (delta -1)."""
+        if self._pending is not None:
+            self._pending.append((name, delta, timestamp))
+        if self.loaded:
+            self._apply(self.entities[name], delta, timestamp)
+
+    # Reads
+
+    def snapshot(self) -> Dict:
+        now = datetime.now(timezone.utc)
+        hours = [hour_key(now - timedelta(hours=offset)) for offset in range(HOURS - 1, -1, -1)]
+        days = [day_key(now - timedelta(days=offset)) for offset in range(DAYS - 1, -1, -1)]
+        result = {name: counters.total for name, counters in self.entities.items()}
+        result["series"] = {
+            "hourly": {name: series(counters.hourly, hours) for name, counters in self.entities.items()},
+            "daily": {name: series(counters.daily, days) for name, counters in self.entities.items()},
+        }
+        result["reconciledAt"] = self.reconciled_at
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "reconciles": self.reconciles,
+            "reconciledAt": self.reconciled_at,
+            "lastDrift": self.last_drift,
+        }
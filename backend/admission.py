@@ -0,0 +1,231 @@
+"""Admission control and priority scheduling for /api requests.
+
+A worker admits at most `limit` requests at a time. Anything beyond that
+waits in a bounded queue for its priority class, and a freed slot always
+goes to the highest class with a waiter:
+
+    critical       writes (votes, reviews, admin actions): anything not GET/HEAD/OPTIONS,
+                   except the view/click beacons, which are classed like reads
+    authenticated  reads carrying a session cookie, or the admin token
+    anonymous      other reads
+    bot            crawlers and scripted clients, by User-Agent
+
+Headers are not trusted for their mere presence: an `x-admin-token` or
+`Authorization` header only counts when it holds the admin token, compared in
+constant time, since anyone can send one to jump the queue.
+
+Queues drop by deadline, CoDel-style: a queue that has drained within the
+last `interval` lets a waiter stay up to `max_wait`. A queue that has stayed
+non-empty longer than that is standing, so new waiters only get `target`
+before they are shed. A queue that is full sheds at once. Shed requests get
+a 503 with Retry-After straight away, without touching the upstream, so
+anonymous floods cost little and writes keep their latency.
+
+BACKEND_ADMISSION_LIMIT sets the in-flight limit per worker (0 disables);
+the admin token is BACKEND_ADMIN_TOKEN, as for the admin routes.
+"""
+
+import asyncio
+import hmac
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+BOT_AGENTS = re.compile(rb"bot|crawl|spider|slurp|scrap|wget|curl|headless|facebookexternalhit", re.I)
+SESSION_COOKIE = re.compile(rb"(^|;\s*)sb-[^=]*-auth-token")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+# Anonymous POSTs fired on every page view (counter_buffer.py)
+BEACON_PATHS = ("/api/counters", "/api/banners/active/track")
+
+
+@dataclass
+class PriorityClass:
+    name: str
+    max_queue: int
+    target: float  # seconds a waiter may queue while the queue is standing
+    max_wait: float  # seconds a waiter may queue otherwise
+    retry_after: int
+    interval: float = 0.1
+
+
+CLASSES = (
+    PriorityClass("critical", max_queue=512, target=0.25, max_wait=5.0, retry_after=1, interval=0.5),
+    PriorityClass("authenticated", max_queue=256, target=0.05, max_wait=1.0, retry_after=2),
+    PriorityClass("anonymous", max_queue=256, target=0.02, max_wait=0.5, retry_after=5),
+    PriorityClass("bot", max_queue=32, target=0.005, max_wait=0.1, retry_after=30),
+)
+
+
+def is_admin(headers: Dict[bytes, bytes], admin_token: Optional[bytes]) -> bool:
+    if not admin_token:
+        return False
+    supplied = headers.get(b"x-admin-token") or headers.get(b"authorization", b"").removeprefix(b"Bearer ")
+    return hmac.compare_digest(supplied, admin_token)
+
+
+def classify(scope, admin_token: Optional[bytes] = None) -> int:
+    """Index into CLASSES for an ASGI http scope."""
+    if scope["method"] not in READ_METHODS and scope["path"] not in BEACON_PATHS:
+        return 0
+    headers = dict(scope["headers"])
+    if SESSION_COOKIE.search(headers.get(b"cookie", b"")) or is_admin(headers, admin_token):
+        return 1
+    agent = headers.get(b"user-agent", b"")
+    if not agent or BOT_AGENTS.search(agent):
+        return 3
+    return 2
+
+
+class ClassQueue:
+    def __init__(self, spec: PriorityClass):
+        self.spec = spec
+        self.waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.last_empty = time.monotonic()
+        self.admitted = 0
+        self.queued = 0
+        self.shed_full = 0
+        self.shed_timeout = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def timeout(self, now: float) -> float:
+        if not self.waiters:
+            self.last_empty = now
+            return self.spec.max_wait
+        if now - self.last_empty > self.spec.interval:
+            return self.spec.target
+        return self.spec.max_wait
+
+    def pop(self, now: float) -> Optional[asyncio.Future]:
+        while self.waiters:
+            future, enqueued = self.waiters.popleft()
+            if not self.waiters:
+                self.last_empty = now
+            if future.done():
+                continue
+            waited = now - enqueued
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            return future
+        return None
+
+    def discard(self, future: asyncio.Future, enqueued: float):
+        try:
+            self.waiters.remove((future, enqueued))
+        except ValueError:
+            return
+        if not self.waiters:
+            self.last_empty = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "queueLength": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shedFull": self.shed_full,
+            "shedTimeout": self.shed_timeout,
+            "avgQueueMs": self.wait_total / self.queued * 1000 if self.queued else 0.0,
+            "maxQueueMs": self.wait_max * 1000,
+        }
+
+
+class AdmissionController:
+    def __init__(self, limit: int = 128, classes=CLASSES, admin_token: Optional[str] = None):
+        self.limit = limit
+        self.admin_token = admin_token.encode() if admin_token else None
+        self.in_flight = 0
+        self.queues: List[ClassQueue] = [ClassQueue(spec) for spec in classes]
+
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        limit = int(os.environ.get("BACKEND_ADMISSION_LIMIT", "128"))
+        return cls(limit, admin_token=os.environ.get("BACKEND_ADMIN_TOKEN")) if limit > 0 else None
+
+    def _waiting(self) -> bool:
+        return any(queue.waiters for queue in self.queues)
+
+    async def acquire(self, index: int) -> bool:
+        """Take a slot for a request of class `index`; False when it is shed."""
+        queue = self.queues[index]
+        if self.in_flight < self.limit and not self._waiting():
+            self.in_flight += 1
+            queue.admitted += 1
+            return True
+        if len(queue.waiters) >= queue.spec.max_queue:
+            queue.shed_full += 1
+            return False
+        now = time.monotonic()
+        timeout = queue.timeout(now)
+        future = asyncio.get_running_loop().create_future()
+        queue.waiters.append((future, now))
+        queue.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            queue.discard(future, now)
+            queue.shed_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away; hand the slot on if it was granted meanwhile
+            if future.done() and not future.cancelled():
+                self.release()
+            queue.discard(future, now)
+            raise
+        queue.admitted += 1
+        return True
+
+    def release(self):
+        """Hand the slot straight to the highest-priority waiter, if any."""
+        now = time.monotonic()
+        for queue in self.queues:
+            future = queue.pop(now)
+            if future is not None:
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "inFlight": self.in_flight,
+            "classes": {queue.spec.name: queue.stats() for queue in self.queues},
+        }
+
+
+class AdmissionMiddleware:
+    """Plain ASGI middleware gating /api/* requests through the controller."""
+
+    def __init__(self, app, controller: AdmissionController, on_shed=None):
+        self.app = app
+        self.controller = controller
+        self.on_shed = on_shed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+        index = classify(scope, self.controller.admin_token)
+        if not await self.controller.acquire(index):
+            if self.on_shed is not None:
+                self.on_shed(index)
+            return await self.shed(send, self.controller.queues[index].spec)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    async def shed(send, spec: PriorityClass):
+        body = b'{"error": "Server is overloaded, please retry later"}'
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(spec.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,471 @@
+"""Pre-validation of servers waiting for approval.
+
+New servers are created with `approvalStatus = 'pending'` and admins used
+to check each one by hand: is it up, does the Votifier port answer, is the
+banner an image, was it listed before under another name. Here every
+pending server goes through a queue served by a pool of `workers`, which
+runs the checks in `mc_probe` concurrently (Server List Ping on the listed
+port, the Votifier greeting, the banner download) and keeps the report.
+
+Duplicates are found with a hashed index over every server: one digest of
+the normalized `host:port` and one of the normalized name, each mapping to
+the servers that share it. They are looked up when the queue is read, so a
+server listed later still shows up as a duplicate of an earlier one.
+
+`queue()` returns the pending servers with their report and a 0-100 score
+(`SCORE_WEIGHTS`), best first, so moderation starts with the servers most
+likely to be approved and the flags say what to look at for the rest.
+Servers created or moved back to pending through the proxy are queued
+immediately; a rescan every `rescan_interval` picks up the rest and
+re-checks reports older than `max_age`.
+
+With an `icon_store.IconStore`, the favicon from the ping is stored once
+and the report (and the server row) carry only its `iconHash`.
+
+Under serve.py only the `owner` worker rescans and probes, so outbound
+traffic does not grow with the worker count. It publishes every report to
+the shared-memory arena, keyed by server and stamped with the checked
+columns, and the other workers read them from there: they load the pending
+list on demand (again once it is older than `rescan_interval`), and a
+pending server written through them bumps a shared generation that makes
+the owner rescan within a few seconds.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import unicodedata
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from event_log import log
+from mc_probe import DEFAULT_PORT, ProbeError, inspect_banner, slp_status, votifier_greeting, votifier_key_valid
+
+SCORE_WEIGHTS = {
+    "online": 35,       # answers Server List Ping on the listed port
+    "votifier": 15,     # Votifier greeting received (and a plausible key for v1)
+    "banner": 10,       # banner is a readable image; +5 more at 468x60
+    "bannerSize": 5,
+    "unique": 25,       # no other server on the same address or with the same name
+    "details": 10,      # description of 20+ characters, website or Discord link
+}
+# "unique" points left when only the name is shared with another server
+SHARED_NAME_POINTS = 10
+# Columns whose change makes an existing report stale
+CHECKED_COLUMNS = ("name", "ip", "port", "bannerUrl", "votifierIp", "votifierPort", "votifierPublicKey")
+# Shared-memory tag the other workers bump to ask the owner for a rescan
+SHARED_TAG = "approval-pipeline"
+# Seconds between the owner's looks at that tag
+SHARED_POLL_SECONDS = 5.0
+
+
+def split_address(ip: Optional[str], port) -> Tuple[str, int]:
+    """Host and port of a listing; a `:port` inside `ip` wins over the port column."""
+    host = (ip or "").strip().lower().rstrip(".")
+    if host.count(":") == 1:
+        host, _, embedded = host.partition(":")
+        if embedded.isdigit():
+            port = int(embedded)
+    try:
+        port = int(port) if port else DEFAULT_PORT
+    except (TypeError, ValueError):
+        port = DEFAULT_PORT
+    return host, port
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Name without accents, case, spaces or punctuation ("Craft-Land TR" == "craftland tr")."""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    return "".join(char for char in decomposed.casefold() if char.isalnum())
+
+
+def digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+class DuplicateIndex:
+    """Servers sharing an address or a name, by digest."""
+
+    def __init__(self):
+        self.by_address: Dict[bytes, Set[str]] = {}
+        self.by_name: Dict[bytes, Set[str]] = {}
+        # server id -> (address digest, name digest, name, approvalStatus)
+        self.servers: Dict[str, Tuple[Optional[bytes], Optional[bytes], str, Optional[str]]] = {}
+
+    def put(self, server: Dict):
+        self.remove(server["id"])
+        host, port = split_address(server.get("ip"), server.get("port"))
+        name = normalize_name(server.get("name"))
+        address_key = digest(f"{host}:{port}") if host else None
+        name_key = digest(name) if name else None
+        self.servers[server["id"]] = (address_key, name_key, server.get("name") or "", server.get("approvalStatus"))
+        if address_key is not None:
+            self.by_address.setdefault(address_key, set()).add(server["id"])
+        if name_key is not None:
+            self.by_name.setdefault(name_key, set()).add(server["id"])
+
+    def remove(self, server_id: str):
+        entry = self.servers.pop(server_id, None)
+        if entry is None:
+            return
+        for buckets, key in ((self.by_address, entry[0]), (self.by_name, entry[1])):
+            if key is None:
+                continue
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(server_id)
+                if not bucket:
+                    del buckets[key]
+
+    def _others(self, buckets: Dict[bytes, Set[str]], key: Optional[bytes], server_id: str) -> List[Dict]:
+        if key is None:
+            return []
+        return [
+            {"id": other, "name": self.servers[other][2], "approvalStatus": self.servers[other][3]}
+            for other in sorted(buckets.get(key, ())) if other != server_id
+        ]
+
+    def matches(self, server_id: str) -> Dict[str, List[Dict]]:
+        entry = self.servers.get(server_id)
+        if entry is None:
+            return {"address": [], "name": []}
+        return {
+            "address": self._others(self.by_address, entry[0], server_id),
+            "name": self._others(self.by_name, entry[1], server_id),
+        }
+
+
+def score(server: Dict, report: Optional[Dict], duplicates: Dict[str, List[Dict]]) -> Tuple[int, List[str]]:
+    """Score and flags of a pending server; network checks count only once reported."""
+    points, flags = 0, []
+    if duplicates["address"]:
+        flags.append("duplicate_address")
+    elif duplicates["name"]:
+        flags.append("duplicate_name")
+        points += SHARED_NAME_POINTS
+    else:
+        points += SCORE_WEIGHTS["unique"]
+    description = (server.get("shortDescription") or "").strip()
+    if len(description) >= 20:
+        points += SCORE_WEIGHTS["details"] // 2
+    else:
+        flags.append("short_description")
+    if server.get("website") or server.get("discord"):
+        points += SCORE_WEIGHTS["details"] // 2
+    if report is None:
+        return points, flags
+    if report["ping"].get("online"):
+        points += SCORE_WEIGHTS["online"]
+    else:
+        flags.append("offline")
+    votifier = report["votifier"]
+    if votifier.get("reachable") and (votifier.get("v2") or votifier.get("keyValid")):
+        points += SCORE_WEIGHTS["votifier"]
+    elif votifier.get("configured"):
+        flags.append("votifier_unreachable" if not votifier.get("reachable") else "votifier_key_invalid")
+    banner = report["banner"]
+    if banner.get("ok"):
+        points += SCORE_WEIGHTS["banner"]
+        if banner.get("standardSize"):
+            points += SCORE_WEIGHTS["bannerSize"]
+        else:
+            flags.append("banner_size")
+    elif server.get("bannerUrl"):
+        flags.append("banner_invalid")
+    return points, flags
+
+
+class ApprovalPipeline:
+    def __init__(self, db=None, workers: int = 4, timeout: float = 5.0, rescan_interval: float = 300.0,
+                 max_age: float = 3600.0, allow_private: bool = False, resolver=None, icons=None,
+                 shared=None, owner: bool = True):
+        self.db = db
+        self.workers = workers
+        self.timeout = timeout
+        self.rescan_interval = rescan_interval
+        self.max_age = max_age
+        self.allow_private = allow_private
+        # dns_cache.DnsCache shared with the rest of the backend; None = getaddrinfo
+        self.resolver = resolver
+        self.icons = icons
+        # shm_cache.SharedCache under serve.py; only the owner worker probes
+        self.shared = shared
+        self.owner = owner
+        self.index = DuplicateIndex()
+        self.pending: Dict[str, Dict] = {}
+        # server id -> (monotonic time checked, report)
+        self.reports: Dict[str, Tuple[float, Dict]] = {}
+        self.queued: Set[str] = set()
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.validated = 0
+        self.errors = 0
+        self.shared_reads = 0
+        self._generation = shared.generation(SHARED_TAG) if shared is not None else None
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._load_lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _fresh(self) -> bool:
+        # The owner keeps itself current; the others reload when they are next asked
+        return self.loaded and (self.owner or time.monotonic() - self.loaded_at < self.rescan_interval)
+
+    async def ensure_loaded(self) -> bool:
+        if self._fresh():
+            return True
+        if self.db is None or not self.db.configured:
+            return self.loaded
+        async with self._load_lock:
+            if not self._fresh():
+                await self._rescan()
+        return self.loaded
+
+    async def _rescan(self):
+        try:
+            index = DuplicateIndex()
+            pending = {}
+            async for row in self.db.iter_rows("servers", page_size=5000):
+                index.put(row)
+                if row.get("approvalStatus") == "pending":
+                    pending[row["id"]] = row
+        except Exception as e:
+            log.error("approval_rescan_error", str(e))
+            return
+        previous, self.index, self.pending = self.pending, index, pending
+        for server_id in list(self.reports):
+            if server_id not in pending:
+                del self.reports[server_id]
+        now = time.monotonic()
+        self.loaded = True
+        self.loaded_at = now
+        if not self.owner:
+            return
+        for server_id, server in pending.items():
+            checked = self.reports.get(server_id)
+            before = previous.get(server_id, server)
+            if (checked is None or now - checked[0] > self.max_age
+                    or any(before.get(column) != server.get(column) for column in CHECKED_COLUMNS)):
+                self.enqueue(server_id)
+
+    async def rescan(self):
+        """Reload the servers table and queue what is new, changed or stale."""
+        if not self.owner:
+            self._notify_owner()
+        async with self._load_lock:
+            await self._rescan()
+
+    def _notify_owner(self):
+        if self.shared is not None:
+            self.shared.invalidate(SHARED_TAG)
+
+    def _owner_asked(self) -> bool:
+        if self.shared is None:
+            return False
+        generation = self.shared.generation(SHARED_TAG)
+        if generation == self._generation:
+            return False
+        self._generation = generation
+        return True
+
+    async def run_rescanner(self):
+        """Owner only: load at startup, then pick up servers that did not come through this worker."""
+        while True:
+            if self.loaded:
+                await self.rescan()
+            else:
+                await self.ensure_loaded()
+            waited = 0.0
+            while waited < self.rescan_interval and not self._owner_asked():
+                step = min(SHARED_POLL_SECONDS, self.rescan_interval - waited)
+                await asyncio.sleep(step)
+                waited += step
+
+    async def run_workers(self):
+        await asyncio.gather(*(self._work() for _ in range(self.workers)))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # Server writes
+
+    def enqueue(self, server_id: str):
+        if not self.owner:
+            self._notify_owner()
+            return
+        if server_id not in self.queued:
+            self.queued.add(server_id)
+            self._queue.put_nowait(server_id)
+
+    def apply_server(self, server: Dict):
+        """Apply a created or updated server row."""
+        if not self.loaded or not server.get("id"):
+            return
+        server_id = server["id"]
+        previous = self.pending.get(server_id)
+        merged = {**(previous or {}), **server}
+        self.index.put(merged)
+        if merged.get("approvalStatus") != "pending":
+            self.pending.pop(server_id, None)
+            self.reports.pop(server_id, None)
+            return
+        self.pending[server_id] = merged
+        if previous is None or any(previous.get(column) != merged.get(column) for column in CHECKED_COLUMNS):
+            self.enqueue(server_id)
+
+    def delete_server(self, server_id: str):
+        self.index.remove(server_id)
+        self.pending.pop(server_id, None)
+        self.reports.pop(server_id, None)
+
+    # Validation
+
+    async def _work(self):
+        while True:
+            server_id = await self._queue.get()
+            self.queued.discard(server_id)
+            server = self.pending.get(server_id)
+            if server is None:
+                continue
+            try:
+                await self.validate(server)
+            except Exception as e:
+                self.errors += 1
+                log.error("approval_validate_error", str(e), server=server_id)
+
+    async def _check(self, check) -> Dict:
+        try:
+            return await check
+        except ProbeError as e:
+            return {"error": str(e)}
+
+    async def _ping(self, host: str, port: int) -> Dict:
+        result = await self._check(slp_status(host, port, self.timeout, self.allow_private,
+                                                  resolver=self.resolver))
+        if "error" in result:
+            return {"online": False, **result}
+        favicon = result.pop("favicon", None)
+        if self.icons is not None:
+            result["iconHash"] = await self.icons.put(favicon)
+        return result
+
+    async def _votifier(self, server: Dict, host: str) -> Dict:
+        key = server.get("votifierPublicKey")
+        votifier_host = (server.get("votifierIp") or "").strip() or host
+        configured = bool(server.get("votifierIp") or key)
+        if not configured:
+            return {"configured": False}
+        result = await self._check(
+            votifier_greeting(votifier_host, int(server.get("votifierPort") or 8192), self.timeout,
+                              self.allow_private, self.resolver)
+        )
+        return {"configured": True, "reachable": False, "keyValid": votifier_key_valid(key), **result}
+
+    async def _banner(self, server: Dict) -> Dict:
+        if not server.get("bannerUrl"):
+            return {"ok": False}
+        if self._client is None:
+            self._client = httpx.AsyncClient(headers={"User-Agent": "MinecraftServerList-Validator"})
+        result = await self._check(inspect_banner(self._client, server["bannerUrl"], self.timeout,
+                                                  self.allow_private, self.resolver))
+        return result if "error" not in result else {"ok": False, **result}
+
+    async def validate(self, server: Dict) -> Dict:
+        """Run the network checks of one server and keep the report."""
+        started = time.monotonic()
+        host, port = split_address(server.get("ip"), server.get("port"))
+        if not host:
+            ping = {"online": False, "error": "no address"}
+            votifier, banner = await asyncio.gather(self._votifier(server, host), self._banner(server))
+        else:
+            ping, votifier, banner = await asyncio.gather(
+                self._ping(host, port), self._votifier(server, host), self._banner(server)
+            )
+        report = {
+            "checkedAt": datetime.now(timezone.utc).isoformat(),
+            "elapsedMs": round((time.monotonic() - started) * 1000, 1),
+            "ping": ping,
+            "votifier": votifier,
+            "banner": banner,
+        }
+        # Only keep it if the server is still pending and unchanged since the checks started
+        current = self.pending.get(server["id"])
+        if current is not None and all(current.get(column) == server.get(column) for column in CHECKED_COLUMNS):
+            self.reports[server["id"]] = (time.monotonic(), report)
+            self._publish(server, report)
+            if self.icons is not None and ping.get("online"):
+                await self.icons.assign(server["id"], ping.get("iconHash"), server.get("iconHash"))
+        self.validated += 1
+        return report
+
+    def _publish(self, server: Dict, report: Dict):
+        if self.shared is None:
+            return
+        value = json.dumps({"columns": [server.get(column) for column in CHECKED_COLUMNS], "report": report},
+                           separators=(",", ":")).encode("utf-8")
+        self.shared.put(("approval-report", server["id"]), value, self.max_age * 2)
+
+    def _shared_report(self, server: Dict) -> Optional[Dict]:
+        value = self.shared.get(("approval-report", server["id"]))
+        if value is None:
+            return None
+        try:
+            entry = json.loads(value)
+        except ValueError:
+            return None
+        # A report of the row before an edit is stale
+        if entry.get("columns") != [server.get(column) for column in CHECKED_COLUMNS]:
+            return None
+        self.shared_reads += 1
+        return entry.get("report")
+
+    # Reads
+
+    def report(self, server: Dict) -> Optional[Dict]:
+        report = None
+        if not self.owner and self.shared is not None:
+            report = self._shared_report(server)
+        if report is None:
+            checked = self.reports.get(server["id"])
+            report = checked[1] if checked is not None else None
+        return report
+
+    def enrich(self, server: Dict) -> Dict:
+        report = self.report(server)
+        duplicates = self.index.matches(server["id"])
+        points, flags = score(server, report, duplicates)
+        return {
+            **server,
+            "validation": {
+                "status": "checked" if report is not None else "queued",
+                "score": points,
+                "flags": flags,
+                "duplicates": duplicates,
+                **(report or {}),
+            },
+        }
+
+    def queue(self, order: str = "score") -> List[Dict]:
+        """Pending servers with their reports; checked ones by score, then newest first."""
+        rows = sorted((self.enrich(server) for server in self.pending.values()),
+                      key=lambda row: row.get("createdAt") or "", reverse=True)
+        if order == "score":
+            rows.sort(key=lambda row: (row["validation"]["status"] != "checked", -row["validation"]["score"]))
+        return rows
+
+    def stats(self) -> Dict:
+        return {
+            "owner": self.owner,
+            "loaded": self.loaded,
+            "pending": len(self.pending),
+            "checked": len(self.reports),
+            "queued": len(self.queued),
+            "indexed": len(self.index.servers),
+            "validated": self.validated,
+            "errors": self.errors,
+            "sharedReads": self.shared_reads,
+        }
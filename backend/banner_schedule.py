@@ -0,0 +1,184 @@
+"""Banner campaigns indexed by schedule, served from memory.
+
+`/api/banners/active` filters `banners` by `isActive`, `startDate <= today
+<= endDate` and position on every page render, although the answer only
+changes when a campaign starts or ends or an admin edits one. Here every
+position (and "all") gets an interval index: the sorted boundary dates
+(each start date, and the day after each end date) cut time into segments,
+and each segment holds its active banners, newest first like the upstream
+query. The active set for a day is one bisect away.
+
+The current segment per position is kept as an encoded snapshot together
+with the boundary where it ends; the first request on or after that date
+swaps in the next segment, so a campaign appears or disappears exactly on
+its date. Days are UTC dates, as in the Next.js route.
+
+With `rotate`, the active banners are returned in weighted random order
+(Efraimidis-Spirakis keys, weight from the `weight` column, default 1), so
+the first banner of each position, the one the home page shows, rotates
+between impressions without a database read.
+"""
+
+import asyncio
+import bisect
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from event_log import log
+
+ALL = "*"
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def day_after(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+class IntervalIndex:
+    """Active banners per segment between sorted boundary dates."""
+
+    def __init__(self, banners: List[Dict]):
+        boundaries = set()
+        for banner in banners:
+            boundaries.add(banner["startDate"])
+            boundaries.add(day_after(banner["endDate"]))
+        self.boundaries: List[str] = sorted(boundaries)
+        # segments[i] covers [boundaries[i - 1], boundaries[i]); segments[0] is before the first one
+        self.segments: List[List[Dict]] = [[] for _ in range(len(self.boundaries) + 1)]
+        for banner in banners:
+            first = bisect.bisect_right(self.boundaries, banner["startDate"])
+            last = bisect.bisect_right(self.boundaries, banner["endDate"])
+            for index in range(first, last + 1):
+                self.segments[index].append(banner)
+
+    def lookup(self, day: str) -> Tuple[List[Dict], Optional[str]]:
+        """Banners active on `day` and the date the answer next changes (None: never)."""
+        index = bisect.bisect_right(self.boundaries, day)
+        following = self.boundaries[index] if index < len(self.boundaries) else None
+        return self.segments[index], following
+
+
+def _schedulable(banner: Dict) -> bool:
+    if not banner.get("isActive", True):
+        return False
+    try:
+        return date.fromisoformat(banner["startDate"][:10]) <= date.fromisoformat(banner["endDate"][:10])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def weighted_order(banners: List[Dict], rng=random) -> List[Dict]:
+    """Random order where a banner comes first with probability weight / total weight."""
+    keyed = []
+    for banner in banners:
+        weight = banner.get("weight") or 1
+        keyed.append((rng.random() ** (1.0 / max(float(weight), 1e-6)), banner))
+    keyed.sort(key=lambda item: item[0], reverse=True)
+    return [banner for _, banner in keyed]
+
+
+class BannerSchedule:
+    def __init__(self, db=None, refresh_interval: float = 300.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.banners: Dict[str, Dict] = {}
+        self.indexes: Dict[str, IntervalIndex] = {}
+        # position -> (day it was built for, next boundary, banners, encoded body)
+        self.current: Dict[str, Tuple[str, Optional[str], List[Dict], bytes]] = {}
+        self.loaded = False
+        self.swaps = 0
+        self._load_lock = asyncio.Lock()
+
+    async def ensure_loaded(self) -> bool:
+        if self.loaded:
+            return True
+        if self.db is None or not self.db.configured:
+            return False
+        async with self._load_lock:
+            if not self.loaded:
+                await self.reload()
+        return self.loaded
+
+    async def reload(self):
+        try:
+            banners = {}
+            async for row in self.db.iter_rows("banners"):
+                banners[row["id"]] = row
+        except Exception as e:
+            log.error("banner_schedule_load_error", str(e))
+            return
+        self.banners = banners
+        self._rebuild()
+        self.loaded = True
+
+    async def run_refresher(self):
+        """Pick up edits that bypassed the proxy."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if self.loaded:
+                await self.reload()
+
+    def _rebuild(self):
+        ordered = sorted(
+            (
+                {**banner, "startDate": banner["startDate"][:10], "endDate": banner["endDate"][:10]}
+                for banner in self.banners.values() if _schedulable(banner)
+            ),
+            key=lambda banner: banner.get("createdAt") or "",
+            reverse=True,
+        )
+        by_position: Dict[str, List[Dict]] = {ALL: ordered}
+        for banner in ordered:
+            by_position.setdefault(banner.get("position"), []).append(banner)
+        self.indexes = {position: IntervalIndex(banners) for position, banners in by_position.items()}
+        self.current = {}
+
+    # Admin writes
+
+    def apply_banner(self, banner: Dict):
+        if not self.loaded or not banner.get("id"):
+            return
+        self.banners[banner["id"]] = {**self.banners.get(banner["id"], {}), **banner}
+        self._rebuild()
+
+    def delete_banner(self, banner_id: str):
+        if not self.loaded:
+            return
+        if self.banners.pop(banner_id, None) is not None:
+            self._rebuild()
+
+    # Reads
+
+    def _snapshot(self, position: str) -> Tuple[List[Dict], bytes]:
+        day = today()
+        current = self.current.get(position)
+        if current is not None and current[0] <= day and (current[1] is None or day < current[1]):
+            return current[2], current[3]
+        index = self.indexes.get(position)
+        if index is None:
+            return [], b"[]"
+        banners, following = index.lookup(day)
+        body = json.dumps(banners, ensure_ascii=False).encode("utf-8")
+        self.current[position] = (day, following, banners, body)
+        self.swaps += 1
+        return banners, body
+
+    def active(self, position: Optional[str] = None, rotate: bool = False) -> bytes:
+        banners, body = self._snapshot(position or ALL)
+        if rotate and len(banners) > 1:
+            return json.dumps(weighted_order(banners), ensure_ascii=False).encode("utf-8")
+        return body
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "banners": len(self.banners),
+            "positions": len(self.indexes) - 1 if self.indexes else 0,
+            "swaps": self.swaps,
+            "nextBoundary": {position: current[1] for position, current in self.current.items()},
+        }
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Proxy throughput benchmark across worker counts.
+
+    python bench_proxy.py --workers 1 2 4 --duration 10
+
+Starts a stub upstream in place of Next.js, then for each worker count runs
+serve.py and drives it from several client processes, reporting req/s and
+latency percentiles for the pass-through proxy path and the cached list path.
+`--upstream fake` uses fake_upstream.py (real route logic, optional injected
+latency) for both Next.js and Supabase instead of the bare stub.
+
+Each run also reports memory per request from the workers' published gauges
+(see memory_debug.py): live blocks retained, RSS growth and gen-0 gc
+collections. `--max-blocks-per-request` turns retained blocks into a CI gate
+that exits non-zero when exceeded.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STUB_SERVERS = json.dumps([
+    {
+        "id": f"server_{i}",
+        "name": f"Server {i}",
+        "ip": f"play{i}.example.com",
+        "port": 25565,
+        "shortDescription": "Survival, skyblock and more",
+        "longDescription": "Lorem ipsum dolor sit amet. " * 40,
+        "votifierPublicKey": "MIIBIjANBgkqhkiG9w0BAQEFAAOCAQ8AMIIBCgKCAQEA" * 8,
+        "voteCount": 1000 - i,
+        "status": "online",
+    }
+    for i in range(50)
+]).encode()
+
+
+async def stub_app(scope, receive, send):
+    """Bare ASGI upstream: /api/servers returns a listing, everything else a small JSON body"""
+    if scope["type"] != "http":
+        return
+    body = STUB_SERVERS if scope["path"] == "/api/servers" else b'{"ok":true}'
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_gauges(port: int) -> dict:
+    """Worker gauges summed from the SharedCache counter rows, via /stats"""
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=10) as response:
+        counters = json.load(response).get("counters", {})
+    return {name: counters.get(name, 0) for name in ("allocated_blocks", "rss_bytes", "gc_collections")}
+
+
+def memory_per_request(before: dict, after: dict, requests: int) -> dict:
+    requests = max(1, requests)
+    return {
+        "blocks_per_req": (after["allocated_blocks"] - before["allocated_blocks"]) / requests,
+        "rss_growth_kb": (after["rss_bytes"] - before["rss_bytes"]) / 1024,
+        "gc_per_1k_req": (after["gc_collections"] - before["gc_collections"]) * 1000 / requests,
+    }
+
+
+def wait_for(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on {port}")
+
+
+async def drive(url: str, duration: float, concurrency: int):
+    import httpx
+
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def loop(client):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        await asyncio.gather(*(loop(client) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(args):
+    url, duration, concurrency = args
+    return asyncio.run(drive(url, duration, concurrency))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_load(url: str, duration: float, clients: int, concurrency: int):
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        results = pool.map(client_process, [(url, duration, concurrency)] * clients)
+    latencies = [latency for result, _ in results for latency in result]
+    errors = sum(error for _, error in results)
+    return {
+        "requests": len(latencies) + errors,
+        "rps": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 2) // 2),
+                        help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client")
+    parser.add_argument("--stub-workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--upstream", choices=("stub", "fake"), default="stub")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="injected upstream latency (fake upstream only)")
+    parser.add_argument("--warmup", type=float, default=2.0,
+                        help="seconds of unmeasured load per path first, so caches and pools are filled")
+    parser.add_argument("--max-blocks-per-request", type=float, default=None,
+                        help="fail when live blocks retained per request exceed this")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    stub_port = free_port()
+    upstream_app = "fake_upstream:app" if args.upstream == "fake" else "bench_proxy:stub_app"
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", upstream_app, "--port", str(stub_port),
+         "--workers", str(args.stub_workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT_DIR, env=dict(os.environ, FAKE_UPSTREAM_LATENCY_MS=str(args.upstream_latency_ms)),
+    )
+    results = []
+    try:
+        wait_for(stub_port)
+        for workers in args.workers:
+            port = free_port()
+            env = dict(os.environ, FRONTEND_URL=f"http://127.0.0.1:{stub_port}")
+            # Keep the access log's cost in the measurement but out of the terminal
+            env.setdefault("BACKEND_LOG_PATH", os.devnull)
+            if args.upstream == "fake":
+                env.update(SUPABASE_URL=f"http://127.0.0.1:{stub_port}", SUPABASE_SERVICE_ROLE_KEY="fake")
+            backend = subprocess.Popen(
+                [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+                 "--workers", str(workers)],
+                cwd=ROOT_DIR, env=env,
+            )
+            try:
+                wait_for(port)
+                time.sleep(1.0)
+                for name, path in (("proxy", "/api/blog/posts"), ("list", "/api/servers?fields=list")):
+                    url = f"http://127.0.0.1:{port}{path}"
+                    if args.warmup > 0:
+                        run_load(url, args.warmup, args.clients, args.concurrency)
+                        time.sleep(1.0)
+                    before = memory_gauges(port)
+                    result = run_load(url, args.duration, args.clients, args.concurrency)
+                    time.sleep(1.0)  # let every worker publish its gauges once more
+                    result.update(memory_per_request(before, memory_gauges(port), result["requests"]))
+                    result.update(workers=workers, path=name)
+                    results.append(result)
+                    if not args.json:
+                        print(f"workers={workers:<3} {name:<6} {result['rps']:>10.0f} req/s  "
+                              f"p50 {result['p50_ms']:6.1f} ms  p99 {result['p99_ms']:6.1f} ms  "
+                              f"errors {result['errors']}  "
+                              f"blocks/req {result['blocks_per_req']:7.2f}  "
+                              f"rss +{result['rss_growth_kb']:.0f} KiB  "
+                              f"gc/1k req {result['gc_per_1k_req']:.1f}")
+            finally:
+                backend.terminate()
+                backend.wait(timeout=30)
+    finally:
+        stub.terminate()
+        stub.wait(timeout=30)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name in ("proxy", "list"):
+            rows = [result for result in results if result["path"] == name]
+            if rows and rows[0]["rps"]:
+                base = rows[0]["rps"] / rows[0]["workers"]
+                scaling = ", ".join(f"{r['workers']}w: {r['rps'] / base / r['workers']:.0%}" for r in rows)
+                print(f"{name} scaling efficiency vs {rows[0]['workers']} worker(s): {scaling}")
+
+    if args.max_blocks_per_request is not None:
+        over = [r for r in results if r["blocks_per_req"] > args.max_blocks_per_request]
+        for r in over:
+            print(f"memory regression: workers={r['workers']} {r['path']} retained "
+                  f"{r['blocks_per_req']:.2f} blocks/request (limit {args.max_blocks_per_request})",
+                  file=sys.stderr)
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Blog category counters kept in the backend.
+
+`GET /api/blog/categories` in Next.js runs three queries per category (post
+count, post ids, reply count over those ids), so its cost grows with
+categories x posts. Here every category keeps its topic and reply counts and
+last activity time, plus rollups over its subcategories (`parentId`), and
+the whole index is served from one pre-encoded body.
+
+Post and category writes through the proxy are applied as deltas. Replies
+are written to Supabase directly by the pages, so they (and anything else
+that bypassed the proxy) are brought in by `reconcile()` every `interval`
+seconds: the categories plus one row of counts per category from the
+`blog_category_counts()` GROUP BY (supabase_stats_backend.sql), swapped in
+atomically. Posts are only tracked individually from their creation through
+the proxy until the next recount, so deleting an older post is settled by
+that recount rather than subtracted on the spot.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from event_log import log
+
+# Columns the Next.js route returns for each category
+CATEGORY_COLUMNS = ("id", "name", "slug", "description", "icon", "color")
+
+
+class CategoryCounters:
+    def __init__(self):
+        self.topics = 0
+        self.replies = 0
+        self.last_activity: Optional[str] = None
+
+    def touch(self, timestamp: Optional[str]):
+        if timestamp and timestamp > (self.last_activity or ""):
+            self.last_activity = timestamp
+
+
+class PostEntry:
+    __slots__ = ("category_id", "replies", "last_activity")
+
+    def __init__(self, category_id: str, replies: int = 0, last_activity: Optional[str] = None):
+        self.category_id = category_id
+        self.replies = replies
+        self.last_activity = last_activity
+
+
+class BlogStatsState:
+    """Categories, counters and posts created since the recount; rebuilt whole by a recount."""
+
+    def __init__(self):
+        self.categories: Dict[str, Dict] = {}
+        self.posts: Dict[str, PostEntry] = {}
+        self.counters: Dict[str, CategoryCounters] = {}
+
+    def counter(self, category_id: str) -> CategoryCounters:
+        counters = self.counters.get(category_id)
+        if counters is None:
+            counters = self.counters[category_id] = CategoryCounters()
+        return counters
+
+    def add_post(self, post: Dict):
+        if post["id"] in self.posts:
+            return
+        entry = PostEntry(post["categoryId"], int(post.get("replyCount") or 0),
+                          post.get("lastReplyAt") or post.get("createdAt"))
+        self.posts[post["id"]] = entry
+        counters = self.counter(entry.category_id)
+        counters.topics += 1
+        counters.replies += entry.replies
+        counters.touch(entry.last_activity)
+
+    def remove_post(self, post_id: str):
+        entry = self.posts.pop(post_id, None)
+        if entry is None:
+            return
+        counters = self.counter(entry.category_id)
+        counters.topics -= 1
+        counters.replies -= entry.replies
+        # last_activity only moves forward here; the next recount settles it
+
+    def add_counts(self, row: Dict):
+        """Apply one row of `blog_category_counts()`."""
+        counters = self.counter(row["categoryId"])
+        counters.topics += int(row.get("topics") or 0)
+        counters.replies += int(row.get("replies") or 0)
+        counters.touch(row.get("lastActivityAt"))
+
+    def remove_category(self, category_id: str):
+        self.categories.pop(category_id, None)
+        self.counters.pop(category_id, None)
+        # The route deletes the category's posts (and the database their replies)
+        for post_id in [post_id for post_id, entry in self.posts.items() if entry.category_id == category_id]:
+            del self.posts[post_id]
+
+    def rollups(self) -> Dict[str, Tuple[int, int, Optional[str]]]:
+        """(topics, replies, last activity) of each category including all its descendants."""
+        totals = {}
+        for category_id in self.categories:
+            counters = self.counters.get(category_id)
+            totals[category_id] = [counters.topics, counters.replies, counters.last_activity] if counters \
+                else [0, 0, None]
+        for category_id, category in self.categories.items():
+            own = self.counters.get(category_id)
+            if own is None:
+                continue
+            seen = {category_id}
+            parent_id = category.get("parentId")
+            # Walk up the ancestors; `seen` stops a cycle in bad data
+            while parent_id in self.categories and parent_id not in seen:
+                seen.add(parent_id)
+                total = totals[parent_id]
+                total[0] += own.topics
+                total[1] += own.replies
+                if own.last_activity and own.last_activity > (total[2] or ""):
+                    total[2] = own.last_activity
+                parent_id = self.categories[parent_id].get("parentId")
+        return {category_id: tuple(total) for category_id, total in totals.items()}
+
+
+def drift(old: BlogStatsState, new: BlogStatsState) -> int:
+    """How far the incrementally kept counts had strayed from a recount."""
+    total = 0
+    for category_id in old.counters.keys() | new.counters.keys():
+        before = old.counters.get(category_id) or CategoryCounters()
+        after = new.counters.get(category_id) or CategoryCounters()
+        total += abs(before.topics - after.topics) + abs(before.replies - after.replies)
+    return total
+
+
+class BlogCategoryStats:
+    def __init__(self, db=None, interval: float = 60.0):
+        self.db = db
+        self.interval = interval
+        self.state = BlogStatsState()
+        self.loaded = False
+        self.reconciles = 0
+        self.last_drift = 0
+        self._load_lock = asyncio.Lock()
+        self._body: Optional[bytes] = None
+        # Writes seen while a recount is scanning, replayed onto its result
+        self._pending: Optional[List[Tuple[str, object]]] = None
+
+    async def ensure_loaded(self) -> bool:
+        if self.loaded:
+            return True
+        if self.db is None or not self.db.configured:
+            return False
+        async with self._load_lock:
+            if not self.loaded:
+                await self._reconcile()
+        return self.loaded
+
+    async def _count(self) -> BlogStatsState:
+        state = BlogStatsState()
+        async for row in self.db.iter_rows("blog_categories"):
+            state.categories[row["id"]] = row
+        for row in await self.db.rpc("blog_category_counts") or []:
+            if row.get("categoryId"):
+                state.add_counts(row)
+        return state
+
+    async def reconcile(self):
+        """Recount everything from the tables and swap the result in."""
+        async with self._load_lock:
+            await self._reconcile()
+
+    async def _reconcile(self):
+        self._pending = []
+        try:
+            state = await self._count()
+        except Exception as e:
+            log.error("blog_stats_reconcile_error", str(e))
+            return
+        finally:
+            pending, self._pending = self._pending, None
+        for operation, argument in pending:
+            self._apply(state, operation, argument)
+        if self.loaded:
+            self.last_drift = drift(self.state, state)
+        self.state = state
+        self._body = None
+        self.loaded = True
+        self.reconciles += 1
+
+    async def run_reconciler(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.loaded:
+                await self.reconcile()
+
+    # Deltas
+
+    @staticmethod
+    def _apply(state: BlogStatsState, operation: str, argument):
+        if operation == "post":
+            state.add_post(argument)
+        elif operation == "delete_post":
+            state.remove_post(argument)
+        elif operation == "category":
+            state.categories[argument["id"]] = {**state.categories.get(argument["id"], {}), **argument}
+        elif operation == "delete_category":
+            state.remove_category(argument)
+
+    def _record(self, operation: str, argument):
+        if self._pending is not None:
+            self._pending.append((operation, argument))
+        if self.loaded:
+            self._apply(self.state, operation, argument)
+            self._body = None
+
+    def apply_post(self, post: Dict):
+        """Apply a created post row."""
+        if post.get("id") and post.get("categoryId"):
+            self._record("post", {"createdAt": datetime.now(timezone.utc).isoformat(), **post})
+
+    def delete_post(self, post_id: str):
+        self._record("delete_post", post_id)
+
+    def apply_category(self, category: Dict):
+        if category.get("id"):
+            self._record("category", category)
+
+    def delete_category(self, category_id: str):
+        self._record("delete_category", category_id)
+
+    # Reads
+
+    def categories(self) -> List[Dict]:
+        state = self.state
+        rollups = state.rollups()
+        results = []
+        for category in sorted(state.categories.values(), key=lambda row: row.get("name") or ""):
+            counters = state.counters.get(category["id"]) or CategoryCounters()
+            total_topics, total_replies, total_activity = rollups[category["id"]]
+            results.append({
+                **{column: category.get(column) for column in CATEGORY_COLUMNS},
+                "parentId": category.get("parentId"),
+                "topicCount": counters.topics,
+                "postCount": counters.replies,
+                "lastActivityAt": counters.last_activity,
+                "totalTopicCount": total_topics,
+                "totalPostCount": total_replies,
+                "totalLastActivityAt": total_activity,
+            })
+        return results
+
+    def body(self) -> bytes:
+        """The encoded category index, rebuilt only after a change."""
+        if self._body is None:
+            self._body = json.dumps(self.categories(), ensure_ascii=False).encode("utf-8")
+        return self._body
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "categories": len(self.state.categories),
+            "posts": len(self.state.posts),
+            "reconciles": self.reconciles,
+            "lastDrift": self.last_drift,
+        }
@@ -0,0 +1,186 @@
+"""Bulk moderation for servers, tickets and users.
+
+The per-item admin routes in Next.js cost a proxy hop, a route handler and
+a Supabase round trip per id. Here a request carries lists of ids per
+action. Each list is cut into chunks that run as a single set-based
+statement (`id=in.(...)`) against PostgREST, a few chunks at a time, and
+per-item results are streamed back as NDJSON as soon as each chunk
+returns. Chunks stay small because the ids travel in the query string:
+50 quoted ids keep the URL well under PostgREST and proxy length limits.
+
+Body, either one operation or several applied in order:
+
+    {"action": "approve", "ids": ["server_1", "server_2"]}
+    {"operations": [{"action": "feature", "ids": [...], "days": 7},
+                    {"action": "delete", "ids": [...]}]}
+
+Every id gets one line, `{"id", "action", "status"}`, where status is `ok`,
+`not_found` or `error`. The stream ends with a summary line.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from event_log import log
+from supabase_rest import quote_value
+
+MAX_IDS = 10_000
+CHUNK_SIZE = 50
+CONCURRENCY = 4
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass(frozen=True)
+class Action:
+    """Columns to set on the matched rows, or a delete (children first)."""
+    values: Optional[Callable[[Dict], Dict]] = None
+    children: Tuple[Tuple[str, str], ...] = ()
+    options: Tuple[str, ...] = ()
+
+
+def _featured(options: Dict) -> Dict:
+    until = datetime.now(timezone.utc) + timedelta(days=int(options["days"]))
+    return {"isfeatured": True, "featureduntil": until.isoformat()}
+
+
+# Same column writes as the single-item routes in app/api/[[...path]]/route.js
+ACTIONS: Dict[str, Dict[str, Action]] = {
+    "servers": {
+        "approve": Action(lambda options: {"approvalStatus": "approved", "updatedAt": now_iso()}),
+        "reject": Action(lambda options: {"approvalStatus": "rejected", "updatedAt": now_iso()}),
+        "pending": Action(lambda options: {"approvalStatus": "pending", "updatedAt": now_iso()}),
+        "feature": Action(_featured, options=("days",)),
+        "unfeature": Action(lambda options: {"isfeatured": False, "featureduntil": None}),
+        "delete": Action(children=(("votes", "serverId"),)),
+    },
+    "tickets": {
+        "close": Action(lambda options: {"status": "closed", "updatedAt": now_iso()}),
+        "delete": Action(children=(("ticket_replies", "ticketId"),)),
+    },
+    "users": {
+        "role": Action(lambda options: {"role": options["role"]}, options=("role",)),
+    },
+}
+
+
+class BulkError(ValueError):
+    """Malformed bulk request, answered with a 400."""
+
+
+@dataclass
+class Operation:
+    action: str
+    ids: List[str]
+    options: Dict = field(default_factory=dict)
+
+
+def validate_option(name: str, value) -> Optional[str]:
+    if name == "days" and not (isinstance(value, int) and value >= 1):
+        return "Invalid days value"
+    if name == "role" and value not in ("user", "admin"):
+        return "Invalid role"
+    return None
+
+
+def parse_operations(entity: str, body) -> List[Operation]:
+    actions = ACTIONS.get(entity)
+    if actions is None:
+        raise BulkError(f"Unknown entity {entity!r}")
+    if not isinstance(body, dict):
+        raise BulkError("Body must be a JSON object")
+    raw = body.get("operations", [body])
+    if not isinstance(raw, list) or not raw:
+        raise BulkError("operations must be a non-empty list")
+    operations = []
+    total = 0
+    for item in raw:
+        action = item.get("action") if isinstance(item, dict) else None
+        if action not in actions:
+            raise BulkError(f"action must be one of {', '.join(actions)}")
+        ids = item.get("ids")
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, str) and i for i in ids):
+            raise BulkError("ids must be a non-empty list of strings")
+        options = {}
+        for name in actions[action].options:
+            error = validate_option(name, item.get(name))
+            if error:
+                raise BulkError(error)
+            options[name] = item[name]
+        ids = list(dict.fromkeys(ids))
+        total += len(ids)
+        if total > MAX_IDS:
+            raise BulkError(f"At most {MAX_IDS} ids per request")
+        operations.append(Operation(action, ids, options))
+    return operations
+
+
+async def apply_chunk(db, entity: str, operation: Operation, ids: List[str]) -> set:
+    """Run one chunk as set-based statements; returns the ids that matched."""
+    action = ACTIONS[entity][operation.action]
+    id_list = f"in.({','.join(quote_value(i) for i in ids)})"
+    if action.values is not None:
+        rows = await db.update(entity, {"id": id_list, "select": "id"}, action.values(operation.options),
+                               returning=True)
+    else:
+        for table, column in action.children:
+            await db.delete(table, {column: id_list})
+        rows = await db.delete(entity, {"id": id_list, "select": "id"}, returning=True)
+    return {row["id"] for row in rows}
+
+
+async def run_bulk(db, entity: str, operations: List[Operation], chunk_size: int = CHUNK_SIZE,
+                   concurrency: int = CONCURRENCY) -> AsyncIterator[List[Dict]]:
+    """Yield the per-id results of each chunk as it finishes, then `[summary]`.
+
+    Operations run in order; the chunks of one operation run concurrently.
+    If the consumer goes away, chunks already sent to the database finish
+    but no new ones start.
+    """
+    started = time.monotonic()
+    totals = {"ok": 0, "not_found": 0, "error": 0}
+    gate = asyncio.Semaphore(concurrency)
+    stopped = False
+
+    async def run_chunk(operation: Operation, ids: List[str]) -> List[Dict]:
+        async with gate:
+            if stopped:
+                return []
+            try:
+                matched = await apply_chunk(db, entity, operation, ids)
+            except Exception as e:
+                log.error("bulk_error", str(e), entity=entity, action=operation.action)
+                return [{"id": i, "action": operation.action, "status": "error"} for i in ids]
+        return [{"id": i, "action": operation.action, "status": "ok" if i in matched else "not_found"}
+                for i in ids]
+
+    try:
+        for operation in operations:
+            tasks = [
+                asyncio.create_task(run_chunk(operation, operation.ids[start:start + chunk_size]))
+                for start in range(0, len(operation.ids), chunk_size)
+            ]
+            for next_done in asyncio.as_completed(tasks):
+                results = await next_done
+                for result in results:
+                    totals[result["status"]] += 1
+                yield results
+    finally:
+        stopped = True
+    yield [{"done": True, **totals, "elapsedMs": round((time.monotonic() - started) * 1000, 1)}]
+
+
+async def ndjson_lines(chunks: AsyncIterator[List[Dict]], on_done: Callable[[], None]) -> AsyncIterator[bytes]:
+    """NDJSON body, one write per chunk; `on_done` runs even if the client disconnects."""
+    try:
+        async for results in chunks:
+            if results:
+                yield "".join(json.dumps(result) + "\n" for result in results).encode()
+    finally:
+        on_done()
@@ -0,0 +1,146 @@
+"""Buffered view and click counters.
+
+Reading a blog post used to write `viewCount + 1` back to its row: a write
+on every read, and a read-modify-write that loses increments when two reads
+race. Banner clicks were not recorded at all for the same cost reason.
+
+Here increments only touch an in-memory dict of `(counter, id) -> delta`.
+Every `interval` the dict is swapped out and its summed deltas are sent as
+one atomic `col = col + delta` statement per table, through the functions in
+supabase_counters_backend.sql. Each worker buffers its own deltas; the
+database adds them up. A failed flush puts its deltas back for the next
+round, and the number of distinct pending keys is capped so a flood of
+unknown ids cannot grow the buffer without bound.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from event_log import log
+
+# counter -> (table, column) it increments
+COUNTERS = {
+    "post_view": ("blog_posts", "viewCount"),
+    "banner_view": ("banners", "viewCount"),
+    "banner_click": ("banners", "clickCount"),
+}
+
+# RPC function -> {argument: counter}; one call per table per flush
+FLUSHES = (
+    ("increment_blog_post_views", {"deltas": "post_view"}),
+    ("increment_banner_counters", {"views": "banner_view", "clicks": "banner_click"}),
+)
+
+MAX_EVENTS = 500
+
+
+class CounterError(ValueError):
+    """Malformed counter events, answered with a 400."""
+
+
+def parse_events(body) -> List[Tuple[str, str]]:
+    """`{"events": [{"counter": "banner_view", "id": "..."}]}` -> [(counter, id)]"""
+    events = body.get("events") if isinstance(body, dict) else None
+    if not isinstance(events, list) or not events:
+        raise CounterError("events must be a non-empty list")
+    if len(events) > MAX_EVENTS:
+        raise CounterError(f"At most {MAX_EVENTS} events per request")
+    parsed = []
+    for event in events:
+        counter = event.get("counter") if isinstance(event, dict) else None
+        if counter not in COUNTERS:
+            raise CounterError(f"counter must be one of {', '.join(COUNTERS)}")
+        item_id = event.get("id")
+        if not isinstance(item_id, str) or not item_id or len(item_id) > 128:
+            raise CounterError("id must be a non-empty string")
+        parsed.append((counter, item_id))
+    return parsed
+
+
+class CounterBuffer:
+    def __init__(self, db=None, interval: float = 5.0, max_keys: int = 100_000):
+        self.db = db
+        self.interval = interval
+        self.max_keys = max_keys
+        self.pending: Dict[Tuple[str, str], int] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+        self.accepted = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def add(self, counter: str, item_id: str, amount: int = 1):
+        key = (counter, item_id)
+        if key not in self.pending and len(self.pending) >= self.max_keys:
+            self.dropped += amount
+            return
+        self.pending[key] = self.pending.get(key, 0) + amount
+        self.accepted += amount
+
+    def unflushed(self, counter: str, item_id: str) -> int:
+        """Increments of this worker not yet visible in the table."""
+        key = (counter, item_id)
+        return self.pending.get(key, 0) + self.in_flight.get(key, 0)
+
+    async def flush(self):
+        if not self.pending or self.db is None or not self.db.configured:
+            return
+        batch, self.pending = self.pending, {}
+        self.in_flight = batch
+        by_counter: Dict[str, Dict[str, int]] = {}
+        for (counter, item_id), delta in batch.items():
+            by_counter.setdefault(counter, {})[item_id] = delta
+        try:
+            for function, arguments in FLUSHES:
+                args = {name: by_counter.get(counter, {}) for name, counter in arguments.items()}
+                if not any(args.values()):
+                    continue
+                try:
+                    await self.db.rpc(function, args)
+                except Exception as e:
+                    log.error("counter_flush_error", str(e), function=function)
+                    self.flush_errors += 1
+                    # Retry these next round; the statement is atomic, so nothing was applied
+                    for name, counter in arguments.items():
+                        for item_id, delta in args[name].items():
+                            key = (counter, item_id)
+                            self.pending[key] = self.pending.get(key, 0) + self.in_flight.pop(key, delta)
+                    continue
+                self.flushed += sum(sum(deltas.values()) for deltas in args.values())
+            self.flushes += 1
+        finally:
+            self.in_flight = {}
+
+    async def run_flusher(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "pendingKeys": len(self.pending),
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "flushErrors": self.flush_errors,
+        }
+
+
+def click_through(banner: Dict, buffer: Optional[CounterBuffer] = None) -> Dict:
+    """Views, clicks and CTR of a banner row, counting this worker's unflushed increments."""
+    views = int(banner.get("viewCount") or 0)
+    clicks = int(banner.get("clickCount") or 0)
+    if buffer is not None:
+        views += buffer.unflushed("banner_view", banner["id"])
+        clicks += buffer.unflushed("banner_click", banner["id"])
+    return {
+        "id": banner["id"],
+        "serverName": banner.get("serverName"),
+        "position": banner.get("position"),
+        "isActive": banner.get("isActive"),
+        "views": views,
+        "clicks": clicks,
+        "ctr": round(clicks / views, 4) if views else 0.0,
+    }
@@ -0,0 +1,202 @@
+"""Persistent second-tier response cache in an embedded SQLite file.
+
+Sits under the in-memory (and shared-memory) list caches so a restarted
+backend can answer from disk instead of sending its first wave of traffic to
+Next.js and Supabase. Entries keep absolute expiry times, so TTLs still hold
+across restarts, and carry a checksum verified on every read. The file is
+bounded in size with least-recently-used eviction and is compacted in the
+background. Several workers may open the same file (WAL mode).
+
+All SQLite work runs on one dedicated thread so the event loop never blocks
+on disk.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Hashable, Optional
+
+from event_log import log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tag TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    checksum BLOB NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+CREATE INDEX IF NOT EXISTS idx_entries_tag ON entries(tag);
+CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries(expires_at);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT PRIMARY KEY,
+    invalidated_at REAL NOT NULL
+);
+"""
+
+# Refresh last_access at most this often per entry, to keep reads read-only
+ACCESS_RESOLUTION = 60.0
+
+
+def disk_key(key: Hashable) -> str:
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def checksum(value: bytes) -> bytes:
+    return hashlib.blake2b(value, digest_size=16).digest()
+
+
+class DiskCache:
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._db: Optional[sqlite3.Connection] = None
+
+    # Runs on the cache thread
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    def _get(self, key: Hashable) -> Optional[bytes]:
+        db = self._conn()
+        hashed = disk_key(key)
+        row = db.execute(
+            "SELECT e.value, e.checksum, e.created_at, e.expires_at, e.last_access, t.invalidated_at "
+            "FROM entries e LEFT JOIN tags t ON t.tag = e.tag WHERE e.key = ?",
+            (hashed,),
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self.misses += 1
+            return None
+        value, digest, created_at, expires_at, last_access, invalidated_at = row
+        if checksum(value) != digest:
+            self.corrupt += 1
+            self.misses += 1
+            db.execute("DELETE FROM entries WHERE key = ?", (hashed,))
+            return None
+        if expires_at <= now or (invalidated_at is not None and created_at <= invalidated_at):
+            self.misses += 1
+            return None
+        if now - last_access > ACCESS_RESOLUTION:
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, hashed))
+        self.hits += 1
+        return value
+
+    def _put(self, key: Hashable, value: bytes, ttl: float, tag: str, created_at: float):
+        db = self._conn()
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO entries "
+            "(key, tag, created_at, expires_at, last_access, size, checksum, value) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (disk_key(key), tag, created_at, now + ttl, now, len(value), checksum(value), value),
+        )
+
+    def _invalidate(self, tag: str):
+        db = self._conn()
+        now = time.time()
+        db.execute(
+            "INSERT INTO tags (tag, invalidated_at) VALUES (?, ?) "
+            "ON CONFLICT(tag) DO UPDATE SET invalidated_at = excluded.invalidated_at",
+            (tag, now),
+        )
+        db.execute("DELETE FROM entries WHERE tag = ? AND created_at <= ?", (tag, now))
+
+    def _compact(self):
+        db = self._conn()
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Evict least recently used entries down to 90% of the budget.
+            target = total - int(self.max_bytes * 0.9)
+            freed = 0
+            doomed = []
+            for hashed, size in db.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                doomed.append((hashed,))
+                freed += size
+                if freed >= target:
+                    break
+            db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        db.execute("PRAGMA incremental_vacuum")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _stats(self) -> dict:
+        db = self._conn()
+        entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "fileBytes": os.path.getsize(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "corrupt": self.corrupt,
+        }
+
+    # Event loop side
+
+    def _submit(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def get(self, key: Hashable) -> Optional[bytes]:
+        try:
+            return await self._submit(self._get, key)
+        except sqlite3.Error as e:
+            log.error("disk_cache_read_error", str(e))
+            return None
+
+    def put(self, key: Hashable, value: bytes, ttl: float, tag: str = "",
+            created_at: Optional[float] = None):
+        """Queue a write; `created_at` is when the value was fetched, for invalidation races."""
+        self._submit(self._put, key, value, ttl, tag, created_at or time.time()).add_done_callback(_log_error)
+
+    def invalidate(self, tag: str):
+        self._submit(self._invalidate, tag).add_done_callback(_log_error)
+
+    async def compact(self):
+        await self._submit(self._compact)
+
+    async def stats(self) -> dict:
+        return await self._submit(self._stats)
+
+    async def run_compactor(self, interval: float = 300.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.compact()
+            except sqlite3.Error as e:
+                log.error("disk_cache_compaction_error", str(e))
+
+    def close(self):
+        def _close():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        self._executor.submit(_close).result()
+        self._executor.shutdown()
+
+
+def _log_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        log.error("disk_cache_write_error", str(future.exception()))
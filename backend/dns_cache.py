@@ -0,0 +1,427 @@
+"""Async DNS resolution with a TTL-respecting cache, SRV included.
+
+Server listings are hostnames, and Minecraft clients look up the
+`_minecraft._tcp.<host>` SRV record before connecting; `getaddrinfo` knows
+nothing about SRV, blocks a thread per lookup and caches nothing. This
+module is a small stub resolver speaking DNS over UDP (TCP when the answer
+is truncated) to the configured nameservers, with:
+
+* a cache keyed by (name, type) that keeps answers for their TTL (clamped
+  to [`min_ttl`, `max_ttl`]) and bounded to `max_entries`, least recently
+  used first;
+* negative caching: NXDOMAIN and empty answers for the SOA minimum of the
+  zone (RFC 2308), failures for `error_ttl`, so a dead name is not asked
+  again on every poll;
+* in-flight deduplication: concurrent lookups of one key share a query;
+* prefetch: a hit in the last `prefetch_fraction` of a TTL refreshes the
+  entry in the background, so hot names never expire under load.
+
+Nameservers come from BACKEND_DNS_SERVERS (`host[:port]`, comma
+separated) or /etc/resolv.conf; pointing it at `fake_dns.running()` tests
+it against a local stub.
+"""
+
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from event_log import log
+
+A = 1
+CNAME = 5
+SOA = 6
+AAAA = 28
+SRV = 33
+TYPE_NAMES = {A: "A", AAAA: "AAAA", SRV: "SRV", CNAME: "CNAME", SOA: "SOA"}
+
+NOERROR = 0
+NXDOMAIN = 3
+MINECRAFT_PORT = 25565
+
+
+class DnsError(Exception):
+    """The name could not be resolved (timeout, SERVFAIL, malformed answer)."""
+
+
+def parse_servers(value: Optional[str]) -> List[Tuple[str, int]]:
+    """`host[:port]` list (IPv6 as `[addr]:port`), comma or space separated."""
+    servers = []
+    for item in (value or "").replace(",", " ").split():
+        if item.startswith("["):
+            host, _, port = item[1:].partition("]:")
+            host = host.rstrip("]")
+        elif item.count(":") == 1:
+            host, _, port = item.partition(":")
+        else:
+            host, port = item, ""
+        servers.append((host, int(port) if port else 53))
+    return servers
+
+
+def system_servers(path: str = "/etc/resolv.conf") -> List[Tuple[str, int]]:
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        lines = []
+    servers = [(line.split()[1], 53) for line in lines
+               if line.startswith("nameserver") and len(line.split()) > 1]
+    return servers or [("127.0.0.1", 53)]
+
+
+def normalize(name: str) -> str:
+    return name.strip().rstrip(".").lower()
+
+
+def is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+# Wire format
+
+def encode_name(name: str) -> bytes:
+    out = bytearray()
+    for label in normalize(name).split(".") if name.strip(".") else []:
+        try:
+            encoded = label.encode("idna") if not label.isascii() else label.encode("ascii")
+        except UnicodeError as e:
+            raise DnsError(f"invalid name {name!r}: {e}")
+        if not 0 < len(encoded) < 64:
+            raise DnsError(f"invalid name {name!r}")
+        out += bytes([len(encoded)]) + encoded
+    return bytes(out) + b"\x00"
+
+
+def build_query(query_id: int, name: str, qtype: int) -> bytes:
+    # Recursion desired, one question, class IN
+    return struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0) + encode_name(name) + struct.pack(">HH", qtype, 1)
+
+
+def read_name(message: bytes, offset: int) -> Tuple[str, int]:
+    """Name at `offset` (following compression pointers) and the offset after it."""
+    labels, end, jumps = [], None, 0
+    while True:
+        if offset >= len(message):
+            raise DnsError("truncated name")
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(message) or jumps > 32:
+                raise DnsError("bad compression pointer")
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | message[offset + 1]
+            jumps += 1
+            continue
+        if length == 0:
+            return ".".join(labels).lower(), end if end is not None else offset + 1
+        labels.append(message[offset + 1:offset + 1 + length].decode("ascii", "replace"))
+        offset += 1 + length
+
+
+def parse_response(message: bytes) -> Dict:
+    """Header fields, answers as (name, type, ttl, value) and the negative TTL from an SOA."""
+    try:
+        return _parse_response(message)
+    except (struct.error, IndexError, ValueError) as e:
+        raise DnsError(f"malformed response: {e}")
+
+
+def _parse_response(message: bytes) -> Dict:
+    if len(message) < 12:
+        raise DnsError("short response")
+    query_id, flags, questions, answers, authority, _ = struct.unpack(">HHHHHH", message[:12])
+    offset = 12
+    question = None
+    for _ in range(questions):
+        qname, offset = read_name(message, offset)
+        question = (qname, struct.unpack(">H", message[offset:offset + 2])[0])
+        offset += 4
+    records, negative_ttl = [], None
+    for index in range(answers + authority):
+        name, offset = read_name(message, offset)
+        if offset + 10 > len(message):
+            raise DnsError("truncated record")
+        rtype, _, ttl, length = struct.unpack(">HHIH", message[offset:offset + 10])
+        offset += 10
+        rdata = message[offset:offset + length]
+        if len(rdata) < length:
+            raise DnsError("truncated record")
+        if rtype == A and length == 4:
+            value = socket.inet_ntop(socket.AF_INET, rdata)
+        elif rtype == AAAA and length == 16:
+            value = socket.inet_ntop(socket.AF_INET6, rdata)
+        elif rtype == SRV and length >= 7:
+            priority, weight, port = struct.unpack(">HHH", rdata[:6])
+            value = (priority, weight, port, read_name(message, offset + 6)[0])
+        elif rtype == CNAME:
+            value = read_name(message, offset)[0]
+        elif rtype == SOA and index >= answers:
+            after = read_name(message, read_name(message, offset)[1])[1]
+            minimum = struct.unpack(">I", message[after + 16:after + 20])[0]
+            negative_ttl = min(ttl, minimum)
+            value = None
+        else:
+            value = None
+        if index < answers and value is not None:
+            records.append((name, rtype, ttl, value))
+        offset += length
+    return {
+        "id": query_id,
+        "response": bool(flags & 0x8000),
+        "truncated": bool(flags & 0x0200),
+        "rcode": flags & 0x000F,
+        "question": question,
+        "answers": records,
+        "negativeTtl": negative_ttl,
+    }
+
+
+class _UdpExchange(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.answer: "asyncio.Future[bytes]" = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if not self.answer.done():
+            self.answer.set_result(data)
+
+    def error_received(self, exc):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+
+class CacheEntry:
+    __slots__ = ("records", "ttl", "expires", "negative", "error")
+
+    def __init__(self, records: List, ttl: float, negative: bool = False, error: Optional[str] = None):
+        self.records = records
+        self.ttl = ttl
+        self.expires = time.monotonic() + ttl
+        self.negative = negative
+        self.error = error
+
+
+class DnsCache:
+    def __init__(self, servers: Optional[List[Tuple[str, int]]] = None, timeout: float = 2.0, attempts: int = 2,
+                 min_ttl: float = 5.0, max_ttl: float = 3600.0, negative_ttl: float = 60.0,
+                 error_ttl: float = 5.0, prefetch_fraction: float = 0.1, max_entries: int = 50_000):
+        self.servers = servers or system_servers()
+        self.timeout = timeout
+        self.attempts = attempts
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.prefetch_fraction = prefetch_fraction
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[Tuple[str, int], CacheEntry]" = OrderedDict()
+        self.in_flight: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._prefetching: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.prefetches = 0
+        self.queries = 0
+        self.errors = 0
+
+    # Transport
+
+    async def _udp(self, server: Tuple[str, int], packet: bytes) -> bytes:
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(_UdpExchange, remote_addr=server)
+        try:
+            transport.sendto(packet)
+            return await asyncio.wait_for(protocol.answer, self.timeout)
+        finally:
+            transport.close()
+
+    async def _tcp(self, server: Tuple[str, int], packet: bytes) -> bytes:
+        async def exchange() -> bytes:
+            reader, writer = await asyncio.open_connection(*server)
+            try:
+                writer.write(struct.pack(">H", len(packet)) + packet)
+                await writer.drain()
+                length = struct.unpack(">H", await reader.readexactly(2))[0]
+                return await reader.readexactly(length)
+            finally:
+                writer.close()
+        return await asyncio.wait_for(exchange(), self.timeout)
+
+    async def query(self, name: str, qtype: int) -> Dict:
+        """Ask the nameservers in turn until one gives a usable answer."""
+        last_error = "no nameservers"
+        expected = (read_name(encode_name(name), 0)[0], qtype)
+        for _ in range(self.attempts):
+            for server in self.servers:
+                query_id = random.getrandbits(16)
+                packet = build_query(query_id, name, qtype)
+                self.queries += 1
+                try:
+                    response = parse_response(await self._udp(server, packet))
+                    if response["truncated"]:
+                        response = parse_response(await self._tcp(server, packet))
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, DnsError) as e:
+                    last_error = f"{server[0]}:{server[1]}: {e or 'timed out'}"
+                    continue
+                if (response["id"] != query_id or not response["response"]
+                        or response["question"] != expected):
+                    last_error = f"{server[0]}:{server[1]}: mismatched response"
+                    continue
+                if response["rcode"] not in (NOERROR, NXDOMAIN):
+                    last_error = f"{server[0]}:{server[1]}: rcode {response['rcode']}"
+                    continue
+                return response
+        raise DnsError(f"{name} {TYPE_NAMES.get(qtype, qtype)}: {last_error}")
+
+    # Cache
+
+    def _store(self, key: Tuple[str, int], entry: CacheEntry):
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    async def _fetch(self, key: Tuple[str, int]) -> List:
+        name, qtype = key
+        try:
+            response = await self.query(name, qtype)
+        except DnsError as e:
+            self.errors += 1
+            self._store(key, CacheEntry([], self.error_ttl, negative=True, error=str(e)))
+            raise
+        records = [record for record in response["answers"] if record[1] == qtype]
+        if response["rcode"] == NXDOMAIN or not records:
+            ttl = response["negativeTtl"] if response["negativeTtl"] is not None else self.negative_ttl
+            self._store(key, CacheEntry([], min(max(ttl, self.min_ttl), self.max_ttl), negative=True))
+            return []
+        ttl = min(max(min(record[2] for record in records), self.min_ttl), self.max_ttl)
+        values = [record[3] for record in records]
+        self._store(key, CacheEntry(values, ttl))
+        return values
+
+    def _start(self, key: Tuple[str, int]) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._fetch(key))
+        self.in_flight[key] = task
+        task.add_done_callback(self._finished(key))
+        return task
+
+    def _finished(self, key: Tuple[str, int]):
+        def done(task: asyncio.Task):
+            self.in_flight.pop(key, None)
+            # Failures are cached; retrieve them so callers that gave up leave no warning behind
+            if not task.cancelled():
+                task.exception()
+        return done
+
+    def _prefetch(self, key: Tuple[str, int]):
+        self.prefetches += 1
+        task = self._start(key)
+        self._prefetching.add(task)
+
+        def done(finished: asyncio.Task):
+            self._prefetching.discard(finished)
+            if not finished.cancelled() and finished.exception() is not None:
+                log.error("dns_prefetch_error", str(finished.exception()), name=key[0])
+        task.add_done_callback(done)
+
+    async def lookup(self, name: str, qtype: int = A) -> List:
+        """Records of one type: addresses for A/AAAA, (priority, weight, port, target) for SRV.
+
+        An empty list means the name (or the record type) does not exist.
+        """
+        key = (normalize(name), qtype)
+        entry = self.cache.get(key)
+        now = time.monotonic()
+        if entry is not None and entry.expires > now:
+            self.cache.move_to_end(key)
+            if entry.negative:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+                if key not in self.in_flight and entry.expires - now < entry.ttl * self.prefetch_fraction:
+                    self._prefetch(key)
+            if entry.error is not None:
+                raise DnsError(entry.error)
+            return entry.records
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.joined += 1
+        else:
+            self.misses += 1
+            task = self._start(key)
+        # A caller giving up must not cancel the query others are waiting on
+        return await asyncio.shield(task)
+
+    async def resolve_host(self, host: str) -> List[str]:
+        """IPv4 then IPv6 addresses of a host name (an IP literal resolves to itself)."""
+        host = normalize(host)
+        if is_ip(host):
+            return [host]
+        if host == "localhost":
+            return ["127.0.0.1"]
+        results = await asyncio.gather(self.lookup(host, A), self.lookup(host, AAAA), return_exceptions=True)
+        addresses = [address for result in results if isinstance(result, list) for address in result]
+        if addresses:
+            return addresses
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        raise DnsError(f"{host} has no address")
+
+    async def resolve_minecraft(self, host: str, port: Optional[int] = None) -> Tuple[str, int, List[str]]:
+        """Target host, port and addresses a Minecraft client would connect to.
+
+        The `_minecraft._tcp` SRV record is used when no port other than the
+        default was given, as the vanilla client does.
+        """
+        host = normalize(host)
+        if not is_ip(host) and port in (None, MINECRAFT_PORT):
+            try:
+                records = await self.lookup(f"_minecraft._tcp.{host}", SRV)
+            except DnsError:
+                records = []
+            chosen = choose_srv(records)
+            if chosen is not None:
+                return chosen[3], chosen[2], await self.resolve_host(chosen[3])
+        return host, port or MINECRAFT_PORT, await self.resolve_host(host)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self.cache),
+            "inFlight": len(self.in_flight),
+            "hits": self.hits,
+            "negativeHits": self.negative_hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "prefetches": self.prefetches,
+            "queries": self.queries,
+            "errors": self.errors,
+            "servers": [f"{host}:{port}" for host, port in self.servers],
+        }
+
+
+def choose_srv(records: List[Tuple[int, int, int, str]], rng=random) -> Optional[Tuple[int, int, int, str]]:
+    """RFC 2782 pick: lowest priority, then weighted by weight; None when the service is absent."""
+    usable = [record for record in records if record[3] not in ("", ".")]
+    if not usable:
+        return None
+    best = min(record[0] for record in usable)
+    candidates = [record for record in usable if record[0] == best]
+    total = sum(record[1] for record in candidates)
+    if total == 0:
+        return rng.choice(candidates)
+    point = rng.uniform(0, total)
+    for record in candidates:
+        point -= record[1]
+        if point <= 0:
+            return record
+    return candidates[-1]
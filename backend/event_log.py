@@ -0,0 +1,232 @@
+"""Structured access and error logging that never blocks the event loop.
+
+The request path only appends a dict to a bounded in-memory ring. A
+background task drains the ring every `interval` and hands the batch to a
+worker thread, which encodes it as JSON lines and appends it to the log
+file, rotating it by size. When the ring is full, new records are dropped
+and counted rather than applying backpressure to requests.
+
+Access records are sampled: errors (status >= 400) and slow requests are
+always kept, other requests with probability BACKEND_LOG_SAMPLE. Each kept
+record carries its sampling rate in `w` so counts can be re-weighted.
+
+Keys are short to keep lines compact:
+
+    t     unix time          lvl   info / warning / error
+    ev    event name         msg   message
+    m     method             p     path
+    s     status             ms    total latency (ms)
+    up    upstream ms        b     response bytes
+    ip    client address     w     sampling rate of the record
+
+Configuration: BACKEND_LOG_PATH (default: stderr, no rotation),
+BACKEND_LOG_SAMPLE (default 0.1), BACKEND_LOG_SLOW_MS (default 1000),
+BACKEND_LOG_MAX_BYTES / BACKEND_LOG_BACKUPS for rotation. Under serve.py
+each worker writes `<path>.<worker id>`.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def encode_line(record: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, default=str) + b"\n"
+    return (json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+class EventLog:
+    def __init__(self, path: Optional[str] = None, capacity: int = 65536, sample_rate: float = 0.1,
+                 slow_ms: float = 1000.0, max_bytes: int = 64 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.ring: Deque[Dict] = deque()
+        self.running = False
+        self.accepted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        self.rotations = 0
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "EventLog":
+        path = os.environ.get("BACKEND_LOG_PATH") or None
+        if path and path != os.devnull and os.environ.get("BACKEND_WORKER_ID"):
+            path = f"{path}.{os.environ['BACKEND_WORKER_ID']}"
+        return cls(
+            path,
+            sample_rate=float(os.environ.get("BACKEND_LOG_SAMPLE", "0.1")),
+            slow_ms=float(os.environ.get("BACKEND_LOG_SLOW_MS", "1000")),
+            max_bytes=int(os.environ.get("BACKEND_LOG_MAX_BYTES", str(64 * 1024 * 1024))),
+            backups=int(os.environ.get("BACKEND_LOG_BACKUPS", "5")),
+        )
+
+    # Producers (event loop, or any thread)
+
+    def emit(self, record: Dict):
+        if not self.running:
+            # No writer yet (startup, or a script importing a module): write through
+            self.write([record])
+            return
+        if len(self.ring) >= self.capacity:
+            self.dropped += 1
+            return
+        self.ring.append(record)
+        self.accepted += 1
+
+    def log(self, level: str, event: str, message: str = "", **fields):
+        record = {"t": round(time.time(), 3), "lvl": level, "ev": event}
+        if message:
+            record["msg"] = message
+        record.update(fields)
+        self.emit(record)
+
+    def info(self, event: str, message: str = "", **fields):
+        self.log("info", event, message, **fields)
+
+    def warning(self, event: str, message: str = "", **fields):
+        self.log("warning", event, message, **fields)
+
+    def error(self, event: str, message: str = "", **fields):
+        self.log("error", event, message, **fields)
+
+    def access(self, method: str, path: str, status: int, duration: float, response_bytes: int,
+               client: Optional[str] = None, upstream: Optional[float] = None):
+        ms = duration * 1000
+        if status >= 400 or ms >= self.slow_ms:
+            weight = 1.0
+        elif self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+            weight = self.sample_rate
+        else:
+            self.sampled_out += 1
+            return
+        record = {"t": round(time.time(), 3), "lvl": "error" if status >= 500 else "info", "ev": "access",
+                  "m": method, "p": path, "s": status, "ms": round(ms, 2), "b": response_bytes}
+        if upstream:
+            record["up"] = round(upstream * 1000, 2)
+        if client:
+            record["ip"] = client
+        if weight != 1.0:
+            record["w"] = weight
+        self.emit(record)
+
+    # Writer
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def write(self, records):
+        data = b"".join(encode_line(record) for record in records)
+        with self._write_lock:
+            try:
+                if self.path is None:
+                    sys.stderr.buffer.write(data)
+                    sys.stderr.flush()
+                else:
+                    with open(self.path, "ab") as f:
+                        f.write(data)
+                        size = f.tell()
+                    if size >= self.max_bytes:
+                        self._rotate()
+                self.written += len(records)
+            except (OSError, ValueError) as e:
+                self.write_errors += 1
+                sys.stderr.write(f"Event log write error: {e}\n")
+
+    def flush(self):
+        """Drain what is in the ring now; records appended meanwhile wait for the next round."""
+        records = []
+        for _ in range(len(self.ring)):
+            try:
+                records.append(self.ring.popleft())
+            except IndexError:  # drained concurrently by the shutdown flush
+                break
+        if records:
+            self.write(records)
+
+    async def run_writer(self, interval: float = 0.25):
+        self.running = True
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.flush)
+        finally:
+            self.running = False
+            self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "buffered": len(self.ring),
+            "capacity": self.capacity,
+            "accepted": self.accepted,
+            "sampledOut": self.sampled_out,
+            "dropped": self.dropped,
+            "written": self.written,
+            "writeErrors": self.write_errors,
+            "rotations": self.rotations,
+        }
+
+
+class AccessLogMiddleware:
+    """Plain ASGI middleware timing each /api request and logging it on completion."""
+
+    def __init__(self, app, log: EventLog, upstream_time=None):
+        self.app = app
+        self.log = log
+        self.upstream_time = upstream_time
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+        started = time.monotonic()
+        status = 500
+        sent = 0
+        timing = [0.0]
+        token = self.upstream_time.set(timing) if self.upstream_time is not None else None
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                self.upstream_time.reset(token)
+            client = scope.get("client")
+            self.log.access(scope["method"], scope["path"], status, time.monotonic() - started, sent,
+                            client[0] if client else None, timing[0])
+
+
+log = EventLog.from_env()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Stub authoritative DNS server for exercising dns_cache.DnsCache.
+
+    python fake_dns.py --port 5353 --record play.example.com A 127.0.0.1 \\
+        --record _minecraft._tcp.example.com SRV "0 5 25570 play.example.com"
+
+Answers A, AAAA, CNAME and SRV from an in-memory zone over UDP and TCP,
+NXDOMAIN / NODATA with an SOA carrying `negative_ttl`, and SERVFAIL for
+names in `failing`. Every query is counted per (name, type) and a `delay`
+can be injected, so cache hits, negative caching and in-flight
+deduplication are observable. Answers larger than `udp_limit` are sent
+truncated over UDP to force the TCP retry. `running()` serves on a
+background thread for in-process use, like fake_upstream.running().
+"""
+
+import argparse
+import asyncio
+import contextlib
+import socket
+import struct
+import threading
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from dns_cache import A, AAAA, CNAME, SOA, SRV, encode_name, normalize, read_name
+
+TYPES = {"A": A, "AAAA": AAAA, "CNAME": CNAME, "SRV": SRV}
+
+
+class Zone:
+    def __init__(self, ttl: int = 300, negative_ttl: int = 30, delay: float = 0.0, udp_limit: int = 512):
+        # (name, type) -> [(ttl, value)]
+        self.records: Dict[Tuple[str, int], List[Tuple[int, object]]] = {}
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.delay = delay
+        self.udp_limit = udp_limit
+        self.failing: Set[str] = set()
+        self.queries: Counter = Counter()
+
+    def add(self, name: str, rtype: str, value, ttl: Optional[int] = None):
+        """`value`: address for A/AAAA, name for CNAME, (priority, weight, port, target) for SRV."""
+        if rtype == "SRV" and isinstance(value, str):
+            priority, weight, port, target = value.split()
+            value = (int(priority), int(weight), int(port), target)
+        self.records.setdefault((normalize(name), TYPES[rtype]), []).append(
+            (self.ttl if ttl is None else ttl, value))
+
+    def _rdata(self, rtype: int, value) -> bytes:
+        if rtype == A:
+            return socket.inet_pton(socket.AF_INET, value)
+        if rtype == AAAA:
+            return socket.inet_pton(socket.AF_INET6, value)
+        if rtype == CNAME:
+            return encode_name(value)
+        priority, weight, port, target = value
+        return struct.pack(">HHH", priority, weight, port) + encode_name(target)
+
+    def answer(self, query: bytes, udp: bool) -> bytes:
+        query_id, flags = struct.unpack(">HH", query[:4])
+        name, offset = read_name(query, 12)
+        qtype = struct.unpack(">H", query[offset:offset + 2])[0]
+        question = query[12:offset + 4]
+        self.queries[(name, qtype)] += 1
+        rcode, answers, authority = 0, [], []
+        if name in self.failing:
+            rcode = 2
+        else:
+            owner = name
+            for _ in range(8):
+                cname = self.records.get((owner, CNAME))
+                if cname is None or qtype == CNAME:
+                    break
+                answers.append((owner, CNAME, *cname[0]))
+                owner = normalize(cname[0][1])
+            answers += [(owner, qtype, ttl, value) for ttl, value in self.records.get((owner, qtype), [])]
+            if not answers:
+                exists = any(key[0] == owner for key in self.records)
+                rcode = 0 if exists else 3
+                zone = owner.split(".", 1)[-1] or owner
+                soa = encode_name(f"ns.{zone}") + encode_name(f"hostmaster.{zone}") + struct.pack(
+                    ">IIIII", 1, 3600, 600, 86400, self.negative_ttl)
+                authority.append(encode_name(zone) + struct.pack(">HHIH", SOA, 1, self.negative_ttl, len(soa)) + soa)
+        body = b"".join(
+            encode_name(owner) + struct.pack(">HHIH", rtype, 1, ttl, len(rdata)) + rdata
+            for owner, rtype, ttl, value in answers for rdata in [self._rdata(rtype, value)]
+        ) + b"".join(authority)
+        flags = 0x8000 | 0x0400 | (flags & 0x0100) | 0x0080 | rcode
+        header = struct.pack(">HHHHHH", query_id, flags, 1, len(answers), len(authority), 0)
+        message = header + question + body
+        if udp and len(message) > self.udp_limit:
+            # Truncated: header and question only, TC set
+            return struct.pack(">HHHHHH", query_id, flags | 0x0200, 1, 0, 0, 0) + question
+        return message
+
+
+class _UdpServer(asyncio.DatagramProtocol):
+    def __init__(self, zone: Zone):
+        self.zone = zone
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        async def reply():
+            if self.zone.delay:
+                await asyncio.sleep(self.zone.delay)
+            self.transport.sendto(self.zone.answer(data, udp=True), addr)
+        asyncio.ensure_future(reply())
+
+
+async def serve(zone: Zone, host: str = "127.0.0.1", port: int = 0) -> Tuple[int, asyncio.AbstractServer]:
+    """Start UDP and TCP listeners on one port; returns the port and the TCP server."""
+    loop = asyncio.get_running_loop()
+
+    async def handle_tcp(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            length = struct.unpack(">H", await reader.readexactly(2))[0]
+            message = zone.answer(await reader.readexactly(length), udp=False)
+            writer.write(struct.pack(">H", len(message)) + message)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    tcp = await asyncio.start_server(handle_tcp, host, port)
+    port = tcp.sockets[0].getsockname()[1]
+    await loop.create_datagram_endpoint(lambda: _UdpServer(zone), local_addr=(host, port))
+    return port, tcp
+
+
+@contextlib.contextmanager
+def running(zone: Zone, port: int = 0) -> Iterator[Tuple[str, int]]:
+    """Serve `zone` on a background thread; yields the (host, port) to use as nameserver."""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    bound: List[int] = []
+
+    def run():
+        asyncio.set_event_loop(loop)
+        bound.append(loop.run_until_complete(serve(zone, port=port))[0])
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, name="fake-dns", daemon=True)
+    thread.start()
+    if not started.wait(10):
+        raise RuntimeError("fake DNS failed to start")
+    try:
+        yield "127.0.0.1", bound[0]
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5353)
+    parser.add_argument("--ttl", type=int, default=300)
+    parser.add_argument("--record", nargs=3, action="append", default=[], metavar=("NAME", "TYPE", "VALUE"))
+    args = parser.parse_args(argv)
+
+    zone = Zone(ttl=args.ttl)
+    for name, rtype, value in args.record:
+        zone.add(name, rtype.upper(), value)
+
+    async def forever():
+        port, _ = await serve(zone, args.host, args.port)
+        print(f"Fake DNS on {args.host}:{port} ({len(zone.records)} record sets)")
+        while True:
+            await asyncio.sleep(3600)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1115 @@
+#!/usr/bin/env python3
+"""In-memory stand-in for the Next.js API and the Supabase project behind it.
+
+    python fake_upstream.py --port 3000 --latency-ms 20 --error-rate 0.01
+
+One ASGI app serves both halves from a shared in-memory store whose tables
+mirror the supabase_*.sql schemas:
+
+* `/api/...` implements the Next.js routes the proxy forwards to and the
+  root test scripts call (servers, votes, tickets, admin, blog, hostings,
+  settings and pages), with the same status codes and response shapes;
+* `/rest/v1/...` is enough of PostgREST (eq/neq/gt/gte/lt/lte/in/is
+  filters, `or=`, order, limit/offset, `Prefer: count=exact`,
+  return=representation, upserts, the vote count trigger and the backend's
+  RPCs) for `supabase_rest.SupabaseRest`;
+* `/auth/v1/user` accepts a `users` id as the bearer token.
+
+Point the backend at it with FRONTEND_URL, SUPABASE_URL and any
+SUPABASE_SERVICE_ROLE_KEY. Latency and failures are injected per request
+from a FaultProfile (FAKE_UPSTREAM_* env vars, or PUT /__fake/profile at
+runtime); POST /__fake/reset restores the seeded fixture. `running()` starts
+the app on a background thread for in-process use.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import itertools
+import json
+import math
+import os
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# 1x1 PNG sent as every online server's favicon by the fake status route
+FAKE_ICON = ("data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk"
+             "+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+
+
+def new_id(prefix: str) -> str:
+    return f"{prefix}_{int(time.time() * 1000)}_{uuid.uuid4().hex[:9]}"
+
+
+# Column defaults per table, as declared in the supabase_*.sql files.
+# Callables are evaluated per insert.
+SCHEMA: Dict[str, Dict[str, Any]] = {
+    "users": {
+        "email": None, "passwordHash": None, "role": "user", "isActive": True,
+        "minecraftUsername": None, "avatarUrl": None, "lastLogin": None, "createdAt": now_iso,
+    },
+    "servers": {
+        "port": 25565, "website": None, "discord": None, "bannerUrl": None,
+        "shortDescription": None, "longDescription": None, "version": None, "category": None,
+        "status": "offline", "onlinePlayers": 0, "maxPlayers": 0, "voteCount": 0, "ownerId": None,
+        "votifierIp": None, "votifierPort": None, "votifierPublicKey": None,
+        "approvalStatus": "approved", "isFeatured": False, "featuredUntil": None, "iconHash": None,
+        "createdAt": now_iso, "updatedAt": now_iso,
+    },
+    "votes": {"ipAddress": None, "votifierSent": False, "votifierResponse": None, "createdAt": now_iso},
+    "tickets": {
+        "serverId": None, "category": "general", "status": "open", "priority": "normal",
+        "createdAt": now_iso, "updatedAt": now_iso,
+    },
+    "ticket_replies": {"isAdmin": False, "createdAt": now_iso},
+    "banners": {
+        "linkUrl": None, "serverId": None, "position": 0, "isActive": True, "startDate": None,
+        "endDate": None, "clickCount": 0, "viewCount": 0, "weight": 1, "createdAt": now_iso, "updatedAt": now_iso,
+    },
+    "blog_categories": {
+        "description": None, "icon": "📁", "color": "#22c55e", "parentId": None, "position": 0,
+        "isActive": True, "createdAt": now_iso, "updatedAt": now_iso,
+    },
+    "blog_posts": {
+        "excerpt": None, "tags": None, "status": "published", "isPinned": False, "isLocked": False,
+        "viewCount": 0, "replyCount": 0, "lastReplyAt": None, "lastReplyUserId": None,
+        "createdAt": now_iso, "updatedAt": now_iso,
+    },
+    "blog_replies": {"createdAt": now_iso, "updatedAt": now_iso},
+    "hostings": {
+        "logo_url": None, "website": None, "description": None, "short_description": None,
+        "features": list, "min_price": None, "max_price": None, "currency": "TRY",
+        "avg_performance": 0, "avg_support": 0, "avg_price_value": 0, "avg_overall": 0,
+        "review_count": 0, "sum_performance": 0, "sum_support": 0, "sum_price_value": 0, "is_featured": False, "is_active": True,
+        "created_at": now_iso, "updated_at": now_iso,
+    },
+    "hosting_reviews": {
+        "user_email": None, "title": None, "helpful_count": 0, "is_verified": False,
+        "is_approved": True, "created_at": now_iso, "updated_at": now_iso,
+    },
+    "site_settings": {
+        "googleanalyticsid": "", "googleadsclientid": "", "analyticsenabled": False,
+        "adsenabled": False, "adslots": dict, "sitename": "Minecraft Server List",
+        "sitetagline": "En İyi Minecraft Sunucuları", "createdat": now_iso, "updatedat": now_iso,
+    },
+    "custom_pages": {
+        "metadescription": "", "ispublished": True, "showinfooter": True, "footerorder": 0,
+        "createdat": now_iso, "updatedat": now_iso,
+    },
+    "user_activity": {"createdAt": now_iso},
+}
+
+UNIQUE = {
+    "users": ("email",),
+    "blog_categories": ("slug",),
+    "blog_posts": ("slug",),
+    "custom_pages": ("slug",),
+}
+
+# ON DELETE CASCADE edges: parent table -> [(child table, foreign key)]
+CASCADES = {
+    "servers": [("votes", "serverId")],
+    "tickets": [("ticket_replies", "ticketId")],
+    "blog_categories": [("blog_posts", "categoryId")],
+    "blog_posts": [("blog_replies", "postId")],
+    "hostings": [("hosting_reviews", "hosting_id")],
+}
+
+
+class StoreError(Exception):
+    """A constraint violation, reported like PostgREST would."""
+
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+Predicate = Callable[[Dict], bool]
+
+
+class FakeStore:
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Dict]] = {name: {} for name in SCHEMA}
+        # (table, column) -> {value: row id} for the UNIQUE columns
+        self.unique: Dict[tuple, Dict[Any, str]] = {
+            (table, column): {} for table, columns in UNIQUE.items() for column in columns
+        }
+        self.lock = threading.Lock()
+
+    def table(self, table: str) -> Dict[str, Dict]:
+        if table not in self.tables:
+            raise StoreError(404, "PGRST205", f"Could not find the table 'public.{table}'")
+        return self.tables[table]
+
+    def rows(self, table: str) -> List[Dict]:
+        return list(self.table(table).values())
+
+    def find(self, table: str, predicate: Optional[Predicate] = None) -> List[Dict]:
+        return [row for row in self.table(table).values() if predicate is None or predicate(row)]
+
+    def get(self, table: str, row_id: str) -> Optional[Dict]:
+        return self.table(table).get(row_id)
+
+    def insert(self, table: str, row: Dict, upsert: bool = False) -> Dict:
+        rows = self.table(table)
+        with self.lock:
+            existing = rows.get(row.get("id"))
+            if existing is not None:
+                if not upsert:
+                    raise StoreError(409, "23505", f"duplicate key value violates unique constraint \"{table}_pkey\"")
+                self._check_unique(table, row, exclude=existing["id"])
+                self._index(table, existing, remove=True)
+                existing.update(row)
+                self._index(table, existing)
+                return existing
+            full = {}
+            for column, default in SCHEMA[table].items():
+                full[column] = default() if callable(default) else copy.deepcopy(default)
+            full.update(row)
+            full.setdefault("id", new_id(table.rstrip("s")))
+            self._check_unique(table, full)
+            rows[full["id"]] = full
+            self._index(table, full)
+            return full
+
+    def update(self, table: str, predicate: Predicate, values: Dict) -> List[Dict]:
+        with self.lock:
+            matched = self.find(table, predicate)
+            for row in matched:
+                self._check_unique(table, {**row, **values}, exclude=row["id"])
+            for row in matched:
+                self._index(table, row, remove=True)
+                row.update(values)
+                self._index(table, row)
+            return matched
+
+    def delete(self, table: str, predicate: Predicate) -> List[Dict]:
+        with self.lock:
+            removed = self.find(table, predicate)
+            for row in removed:
+                self._delete_row(table, row)
+            return removed
+
+    def _delete_row(self, table: str, row: Dict):
+        self.tables[table].pop(row["id"], None)
+        self._index(table, row, remove=True)
+        for child, key in CASCADES.get(table, ()):
+            for dependent in [r for r in self.tables[child].values() if r.get(key) == row["id"]]:
+                self._delete_row(child, dependent)
+
+    def _index(self, table: str, row: Dict, remove: bool = False):
+        for column in UNIQUE.get(table, ()):
+            value = row.get(column)
+            if value is None:
+                continue
+            index = self.unique[(table, column)]
+            if not remove:
+                index[value] = row["id"]
+            elif index.get(value) == row["id"]:
+                del index[value]
+
+    def _check_unique(self, table: str, row: Dict, exclude: Optional[str] = None):
+        for column in UNIQUE.get(table, ()):
+            value = row.get(column)
+            owner = self.unique[(table, column)].get(value) if value is not None else None
+            if owner is not None and owner != exclude:
+                raise StoreError(409, "23505",
+                                 f"duplicate key value violates unique constraint \"{table}_{column}_key\"")
+
+    def reset(self, seed: int = 0):
+        with self.lock:
+            for rows in itertools.chain(self.tables.values(), self.unique.values()):
+                rows.clear()
+        load_fixture(self, seed)
+
+
+def load_fixture(store: FakeStore, seed: int = 0):
+    """A small deterministic dataset covering what the root test scripts expect."""
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    store.insert("users", {"id": "user_admin", "email": "admin@example.com", "role": "admin",
+                           "createdAt": base.isoformat()})
+    for i in range(1, 6):
+        store.insert("users", {"id": f"user_{i}", "email": f"player{i}@example.com",
+                               "createdAt": (base + timedelta(days=i)).isoformat()})
+    for i in range(1, 11):
+        store.insert("servers", {
+            "id": f"server_{i}",
+            "name": f"Test Server {i}",
+            "ip": f"play{i}.example.com",
+            "bannerUrl": f"https://example.com/banners/{i}.png",
+            "shortDescription": "Survival, skyblock and more",
+            "longDescription": "A friendly community server. " * 10,
+            "version": "1.20.4",
+            "category": rng.choice(["survival", "skyblock", "pvp", "creative"]),
+            "status": "online" if i % 3 else "offline",
+            "onlinePlayers": rng.randint(0, 200),
+            "maxPlayers": 500,
+            "voteCount": rng.randint(0, 5000),
+            "ownerId": f"user_{1 + i % 5}",
+            "approvalStatus": "pending" if i > 8 else "approved",
+            "createdAt": (base + timedelta(hours=i)).isoformat(),
+        })
+    for i in range(1, 4):
+        store.insert("tickets", {
+            "id": f"ticket_{i}", "userId": f"user_{i}", "serverId": f"server_{i}",
+            "subject": f"Issue {i}", "message": "My server does not show up in the list.",
+            "createdAt": (base + timedelta(days=10 + i)).isoformat(),
+        })
+    categories = [
+        ("cat_updates", "Güncellemeler", "guncellemeler", "🆕", "#3b82f6"),
+        ("cat_news", "Haberler", "haberler", "📰", "#22c55e"),
+        ("cat_guides", "Rehberler", "rehberler", "📚", "#f59e0b"),
+        ("cat_server_support", "Sunucu Destek", "sunucu-destek", "🛠️", "#ef4444"),
+        ("cat_community", "Topluluk", "topluluk", "👥", "#8b5cf6"),
+    ]
+    for position, (cat_id, name, slug, icon, color) in enumerate(categories, 1):
+        store.insert("blog_categories", {"id": cat_id, "name": name, "slug": slug, "icon": icon,
+                                         "color": color, "position": position})
+    store.insert("blog_posts", {
+        "id": "post_welcome", "categoryId": "cat_news", "userId": "user_admin",
+        "title": "Welcome", "slug": "welcome", "content": "Welcome to the server list.",
+        "excerpt": "Welcome to the server list.", "createdAt": base.isoformat(),
+    })
+    for i in range(1, 4):
+        store.insert("hostings", {
+            "id": f"hosting_{i}", "name": f"Host {i}", "website": f"https://host{i}.example.com",
+            "short_description": "Minecraft hosting", "min_price": 50 * i, "is_featured": i == 1,
+        })
+    for i, position in enumerate(("top", "bottom"), 1):
+        store.insert("banners", {
+            "id": f"banner_{position}_1", "serverName": f"Test Server {i}", "serverId": f"server_{i}",
+            "imageUrl": f"https://example.com/ads/{i}.png", "position": position,
+            "startDate": "2025-01-01", "endDate": "2099-12-31",
+        })
+    store.insert("site_settings", {"id": "main"})
+    store.insert("custom_pages", {"id": "page_privacy", "slug": "privacy-policy",
+                                  "title": "Gizlilik Politikası", "content": "# Gizlilik Politikası",
+                                  "footerorder": 1})
+
+
+# PostgREST query language
+
+OPERATORS = {
+    "eq": lambda cell, value: cell == value,
+    "neq": lambda cell, value: cell != value,
+    "gt": lambda cell, value: cell is not None and cell > value,
+    "gte": lambda cell, value: cell is not None and cell >= value,
+    "lt": lambda cell, value: cell is not None and cell < value,
+    "lte": lambda cell, value: cell is not None and cell <= value,
+}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "on_conflict", "columns"}
+LIST_ITEM = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,]+)')
+
+
+def coerce(cell: Any, text: str) -> Any:
+    """Interpret a filter value against the type of the stored cell."""
+    if isinstance(cell, bool):
+        return text == "true"
+    if isinstance(cell, (int, float)):
+        try:
+            return float(text)
+        except ValueError:
+            return text
+    return text
+
+
+def parse_list(text: str) -> List[str]:
+    inner = text[1:-1] if text.startswith("(") and text.endswith(")") else text
+    return [re.sub(r"\\(.)", r"\1", quoted) if quoted else bare.strip()
+            for quoted, bare in LIST_ITEM.findall(inner)]
+
+
+def condition(column: str, expression: str) -> Predicate:
+    """One `column=op.value` filter as a row predicate."""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition(".")
+    if op == "in":
+        items = parse_list(value)
+        strings = set(items)
+        # Text columns (ids) hit the set directly; other types coerce per item
+        test = lambda row: row.get(column) in strings if isinstance(row.get(column), str) else \
+            row.get(column) is not None and any(row.get(column) == coerce(row.get(column), item) for item in items)
+    elif op == "is":
+        expected = {"null": None, "true": True, "false": False}.get(value)
+        test = lambda row: row.get(column) is expected
+    elif op in OPERATORS:
+        compare = OPERATORS[op]
+        test = lambda row: compare(row.get(column), coerce(row.get(column), value))
+    else:
+        raise StoreError(400, "PGRST100", f"unknown operator {op!r}")
+    return (lambda row: not test(row)) if negate else test
+
+
+def or_condition(expression: str) -> Predicate:
+    """`(a.eq.1,b.is.null)` -> any of the inner conditions."""
+    parts = []
+    for item in re.split(r",(?![^(]*\))", expression.strip("()")):
+        column, _, rest = item.partition(".")
+        parts.append(condition(column, rest))
+    return lambda row: any(part(row) for part in parts)
+
+
+def query_predicate(params) -> Predicate:
+    conditions = [condition(column, value) for column, value in params.multi_items()
+                  if column not in RESERVED_PARAMS]
+    if "or" in params:
+        conditions.append(or_condition(params["or"]))
+    return lambda row: all(test(row) for test in conditions)
+
+
+def order_rows(rows: List[Dict], order: Optional[str]) -> List[Dict]:
+    if not order:
+        return rows
+    # Stable sorts applied from the least significant key up
+    for term in reversed(order.split(",")):
+        column, *modifiers = term.split(".")
+        descending = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or ("nullslast" not in modifiers and descending)
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def project_columns(rows: List[Dict], select: Optional[str]) -> List[Dict]:
+    if not select or select.strip() == "*":
+        return rows
+    columns = [column.strip() for column in select.split(",")]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+@dataclass
+class FaultProfile:
+    """Injected latency and failures for every request to the stand-in."""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    slow_rate: float = 0.0
+    slow_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    paths: Optional[str] = None
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._paths = re.compile(self.paths) if self.paths else None
+
+    @classmethod
+    def from_env(cls) -> "FaultProfile":
+        env = os.environ.get
+        return cls(
+            latency_ms=float(env("FAKE_UPSTREAM_LATENCY_MS", "0")),
+            jitter_ms=float(env("FAKE_UPSTREAM_JITTER_MS", "0")),
+            slow_rate=float(env("FAKE_UPSTREAM_SLOW_RATE", "0")),
+            slow_ms=float(env("FAKE_UPSTREAM_SLOW_MS", "0")),
+            error_rate=float(env("FAKE_UPSTREAM_ERROR_RATE", "0")),
+            error_status=int(env("FAKE_UPSTREAM_ERROR_STATUS", "503")),
+            paths=env("FAKE_UPSTREAM_FAULT_PATHS") or None,
+            seed=int(env("FAKE_UPSTREAM_SEED")) if env("FAKE_UPSTREAM_SEED") else None,
+        )
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def applies(self, path: str) -> bool:
+        return self._paths is None or bool(self._paths.search(path))
+
+    def delay(self) -> float:
+        delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            delay += self.slow_ms
+        return delay / 1000
+
+    def fails(self) -> bool:
+        return bool(self.error_rate) and self._rng.random() < self.error_rate
+
+
+def error(message: str, status_code: int, **extra) -> JSONResponse:
+    return JSONResponse({"error": message, **extra}, status_code=status_code)
+
+
+def create_app(store: Optional[FakeStore] = None, profile: Optional[FaultProfile] = None,
+               seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Fake upstream")
+    if store is None:
+        store = FakeStore()
+        load_fixture(store, seed)
+    app.state.store = store
+    app.state.profile = profile or FaultProfile.from_env()
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        profile: FaultProfile = app.state.profile
+        path = request.url.path
+        if path.startswith("/__fake") or not profile.applies(path):
+            return await call_next(request)
+        delay = profile.delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if profile.fails():
+            if path.startswith("/rest/v1"):
+                return JSONResponse({"code": "FAKE", "message": "Injected fault"},
+                                    status_code=profile.error_status)
+            return error("Injected fault", profile.error_status)
+        return await call_next(request)
+
+    @app.exception_handler(StoreError)
+    async def store_error(request: Request, exc: StoreError):
+        if request.url.path.startswith("/rest/v1"):
+            return JSONResponse({"code": exc.code, "message": exc.message, "details": None, "hint": None},
+                                status_code=exc.status_code)
+        return error("Database error", 500, details=exc.message, code=exc.code)
+
+    # Control
+
+    @app.get("/__fake/profile")
+    async def get_profile():
+        return app.state.profile.to_dict()
+
+    @app.put("/__fake/profile")
+    async def put_profile(request: Request):
+        app.state.profile = FaultProfile(**await request.json())
+        return app.state.profile.to_dict()
+
+    @app.post("/__fake/reset")
+    async def reset(seed: int = 0):
+        store.reset(seed)
+        return {name: len(rows) for name, rows in store.tables.items()}
+
+    # PostgREST
+
+    def single_or_list(request: Request, rows: List[Dict], status_code: int = 200,
+                       headers: Optional[Dict] = None):
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned",
+                                     "details": f"The result contains {len(rows)} rows", "hint": None},
+                                    status_code=406)
+            return JSONResponse(rows[0], status_code=status_code, headers=headers)
+        return JSONResponse(rows, status_code=status_code, headers=headers)
+
+    def prefers(request: Request, value: str) -> bool:
+        return value in request.headers.get("prefer", "")
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "HEAD"])
+    async def rest_select(table: str, request: Request):
+        params = request.query_params
+        rows = order_rows(store.find(table, query_predicate(params)), params.get("order"))
+        total = len(rows)
+        offset = int(params.get("offset", 0))
+        limit = int(params["limit"]) if "limit" in params else None
+        rows = rows[offset:offset + limit if limit is not None else None]
+        end = offset + len(rows) - 1
+        content_range = f"{offset}-{end}" if rows else "*"
+        content_range += f"/{total}" if prefers(request, "count=exact") else "/*"
+        headers = {"Content-Range": content_range}
+        if request.method == "HEAD":
+            return Response(status_code=200, headers=headers)
+        return single_or_list(request, project_columns(rows, params.get("select")), headers=headers)
+
+    def after_insert(table: str, row: Dict):
+        # trigger_increment_vote_count (AFTER INSERT; an upsert that updates does not fire it)
+        if table == "votes":
+            with store.lock:
+                server = store.get("servers", row["serverId"])
+                if server is not None:
+                    server["voteCount"] = (server["voteCount"] or 0) + 1
+
+    @app.post("/rest/v1/{table}")
+    async def rest_insert(table: str, request: Request):
+        payload = await request.json()
+        upsert = prefers(request, "resolution=merge-duplicates")
+        rows = []
+        for row in payload if isinstance(payload, list) else [payload]:
+            existing = store.get(table, row["id"]) if "id" in row else None
+            rows.append(store.insert(table, row, upsert=upsert))
+            if existing is None:
+                after_insert(table, rows[-1])
+        if prefers(request, "return=representation"):
+            return single_or_list(request, project_columns(rows, request.query_params.get("select")), 201)
+        return Response(status_code=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def rest_update(table: str, request: Request):
+        rows = store.update(table, query_predicate(request.query_params), await request.json())
+        if prefers(request, "return=representation"):
+            return single_or_list(request, project_columns(rows, request.query_params.get("select")))
+        return Response(status_code=204)
+
+    @app.delete("/rest/v1/{table}")
+    async def rest_delete(table: str, request: Request):
+        rows = store.delete(table, query_predicate(request.query_params))
+        if prefers(request, "return=representation"):
+            return single_or_list(request, project_columns(rows, request.query_params.get("select")))
+        return Response(status_code=204)
+
+    # The functions in supabase_counters_backend.sql: id -> delta increments
+    counter_functions = {
+        "increment_blog_post_views": ("blog_posts", {"deltas": "viewCount"}),
+        "increment_banner_counters": ("banners", {"views": "viewCount", "clicks": "clickCount"}),
+    }
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rest_rpc(function: str, request: Request):
+        if function in counter_functions:
+            table, columns = counter_functions[function]
+            args = await request.json()
+            with store.lock:
+                for name, column in columns.items():
+                    for row_id, delta in (args.get(name) or {}).items():
+                        row = store.get(table, row_id)
+                        if row is not None:
+                            row[column] = (row.get(column) or 0) + int(delta)
+            return Response(status_code=204)
+        if function == "maintain_user_activity_partitions":
+            return Response(status_code=204)
+        if function == "recount_server_votes":
+            with store.lock:
+                counts = {}
+                for vote in store.rows("votes"):
+                    counts[vote["serverId"]] = counts.get(vote["serverId"], 0) + 1
+                changed = 0
+                for server in store.rows("servers"):
+                    if server["voteCount"] != counts.get(server["id"], 0):
+                        server["voteCount"] = counts.get(server["id"], 0)
+                        changed += 1
+            return changed
+        if function == "recount_hosting_ratings":
+            columns = {"performance": "performance_rating", "support": "support_rating",
+                       "price_value": "price_value_rating"}
+            with store.lock:
+                reviews = [row for row in store.rows("hosting_reviews") if row["is_approved"]]
+                hostings = store.rows("hostings")
+                for hosting in hostings:
+                    mine = [row for row in reviews if row["hosting_id"] == hosting["id"]]
+                    count = len(mine)
+                    sums = {name: sum(row[column] for row in mine) for name, column in columns.items()}
+                    hosting.update({f"sum_{name}": total for name, total in sums.items()})
+                    hosting.update({f"avg_{name}": round(total / count, 2) if count else 0
+                                    for name, total in sums.items()})
+                    hosting.update(avg_overall=round(sum(sums.values()) / (3 * count), 2) if count else 0,
+                                   review_count=count)
+            return len(hostings)
+        if function == "blog_category_counts":
+            counts = {}
+            with store.lock:
+                posts = {row["id"]: row for row in store.rows("blog_posts")}
+                replies = store.rows("blog_replies")
+            for post in posts.values():
+                entry = counts.setdefault(post["categoryId"], {"categoryId": post["categoryId"], "topics": 0,
+                                                               "replies": 0, "lastActivityAt": None})
+                entry["topics"] += 1
+                entry["lastActivityAt"] = max(entry["lastActivityAt"] or "", post.get("createdAt") or "") or None
+            for reply in replies:
+                post = posts.get(reply.get("postId"))
+                if post is not None:
+                    entry = counts[post["categoryId"]]
+                    entry["replies"] += 1
+                    entry["lastActivityAt"] = max(entry["lastActivityAt"] or "", reply.get("createdAt") or "") or None
+            return list(counts.values())
+        if function == "admin_created_counts":
+            since = datetime.fromisoformat((await request.json())["since"])
+            tables = {"servers": "servers", "users": "users", "tickets": "tickets", "posts": "blog_posts",
+                      "votes": "votes"}
+            buckets = {}
+            with store.lock:
+                for entity, table in tables.items():
+                    for row in store.rows(table):
+                        created = datetime.fromisoformat(row.get("createdAt") or now_iso())
+                        if created >= since:
+                            hour = created.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+                            buckets[entity, hour] = buckets.get((entity, hour), 0) + 1
+            return [{"entity": entity, "hour": hour.isoformat(), "count": count}
+                    for (entity, hour), count in buckets.items()]
+        if function == "server_voter_counts":
+            args = await request.json()
+            month_start = datetime.fromisoformat(args["month_start"])
+            before = datetime.fromisoformat(args["before"])
+            counts = {}
+            with store.lock:
+                for vote in store.find("votes", lambda row: row["serverId"] == args["server"]):
+                    created = datetime.fromisoformat(vote.get("createdAt") or now_iso())
+                    if not vote.get("minecraftUsername") or created >= before:
+                        continue
+                    entry = counts.setdefault(vote["minecraftUsername"], {
+                        "minecraftUsername": vote["minecraftUsername"], "allTime": 0, "monthly": 0,
+                        "lastVoteAt": None})
+                    entry["allTime"] += 1
+                    if created >= month_start:
+                        entry["monthly"] += 1
+                        entry["lastVoteAt"] = max(entry["lastVoteAt"] or "", vote["createdAt"])
+            limit = args["row_limit"]
+            by_all_time = sorted(counts.values(), key=lambda entry: entry["allTime"], reverse=True)[:limit]
+            by_month = sorted((entry for entry in counts.values() if entry["monthly"]),
+                              key=lambda entry: entry["monthly"], reverse=True)[:limit]
+            return list({entry["minecraftUsername"]: entry for entry in by_all_time + by_month}.values())
+        return JSONResponse({"code": "PGRST202", "message": f"Could not find the function public.{function}"},
+                            status_code=404)
+
+    @app.get("/auth/v1/user")
+    async def auth_user(request: Request):
+        token = request.headers.get("authorization", "")[7:]
+        user = store.get("users", token)
+        if user is None:
+            return JSONResponse({"code": 401, "msg": "invalid JWT"}, status_code=401)
+        return {"id": user["id"], "email": user.get("email"), "aud": "authenticated", "role": "authenticated"}
+
+    # Next.js routes: servers and votes
+
+    @app.get("/api/servers")
+    async def list_servers():
+        rows = store.find("servers", lambda row: row.get("approvalStatus") in ("approved", None))
+        return order_rows(rows, "voteCount.desc")
+
+    @app.post("/api/servers")
+    async def create_server(request: Request):
+        body = await request.json()
+        required = ("name", "ip", "bannerUrl", "shortDescription", "longDescription")
+        if not all(body.get(key) for key in required):
+            return error("Missing required fields", 400)
+        server = store.insert("servers", {
+            **{key: body.get(key) for key in SCHEMA["servers"] if key in body},
+            "id": new_id("server"), "name": body["name"], "ip": body["ip"],
+            "approvalStatus": "pending", "voteCount": 0,
+        })
+        return JSONResponse(server, status_code=201)
+
+    @app.get("/api/admin/servers/pending")
+    async def pending_servers():
+        return order_rows(store.find("servers", lambda row: row.get("approvalStatus") == "pending"),
+                          "createdAt.desc")
+
+    @app.get("/api/admin/servers/all")
+    async def all_servers():
+        return order_rows(store.rows("servers"), "createdAt.desc")
+
+    @app.get("/api/servers/{server_id}")
+    async def get_server(server_id: str):
+        server = store.get("servers", server_id)
+        return server if server else error("Server not found", 404)
+
+    @app.get("/api/servers/{server_id}/status")
+    async def server_status(server_id: str):
+        server = store.get("servers", server_id)
+        if not server:
+            return error("Server not found", 404)
+        online = server["status"] == "online"
+        # Shape of lib/mcstatus.js getServerStatus()
+        return {
+            "online": online,
+            "players": {"online": server["onlinePlayers"], "max": server["maxPlayers"]},
+            "version": server["version"] or "Unknown",
+            "motd": server["shortDescription"] or "",
+            "icon": FAKE_ICON if online else None,
+        }
+
+    @app.post("/api/servers/{server_id}/vote")
+    async def vote(server_id: str, request: Request):
+        # app/api/servers/[id]/vote/route.js
+        body = await request.json()
+        username = (body.get("minecraftUsername") or "").strip()
+        if not username:
+            return error("Minecraft username is required", 400)
+        ip = request.headers.get("x-forwarded-for") or request.headers.get("x-real-ip") or "unknown"
+        previous = order_rows(store.find("votes", lambda row: row["serverId"] == server_id
+                                         and row["ipAddress"] == ip), "createdAt.desc")
+        if previous:
+            hours = (datetime.now(timezone.utc) - datetime.fromisoformat(previous[0]["createdAt"])) \
+                .total_seconds() / 3600
+            if hours < 24:
+                return error(f"You can vote again in {math.ceil(24 - hours)} hours", 429)
+        server = store.get("servers", server_id)
+        if not server:
+            # votes.serverId references servers
+            return error("Failed to record vote", 500)
+        vote = store.insert("votes", {"id": new_id("vote"), "serverId": server_id, "minecraftUsername": username,
+                                      "ipAddress": ip, "votifierSent": False})
+        after_insert("votes", vote)
+        return JSONResponse({"success": True, "message": "Vote recorded successfully!", "vote": vote},
+                            status_code=201)
+
+    @app.patch("/api/admin/servers/{server_id}/{action}")
+    async def moderate_server(server_id: str, action: str):
+        statuses = {"approve": "approved", "reject": "rejected", "pending": "pending"}
+        if action not in statuses:
+            return error("Not found", 404)
+        rows = store.update("servers", lambda row: row["id"] == server_id,
+                            {"approvalStatus": statuses[action], "updatedAt": now_iso()})
+        if not rows:
+            return error(f"Failed to {action} server", 500)
+        return rows[0]
+
+    @app.delete("/api/admin/servers/{server_id}")
+    async def delete_server(server_id: str):
+        store.delete("servers", lambda row: row["id"] == server_id)
+        return {"success": True, "message": "Server deleted successfully"}
+
+    # Users and tickets
+
+    @app.get("/api/admin/users")
+    async def list_users():
+        users = [{
+            "id": row["id"],
+            "email": row["email"],
+            "role": row.get("role") or "user",
+            "isActive": row.get("isActive") is not False,
+            "createdAt": row["createdAt"],
+            "lastSignIn": row.get("lastLogin"),
+        } for row in store.rows("users")]
+        return order_rows(users, "createdAt.desc")
+
+    @app.patch("/api/admin/users/{user_id}/role")
+    async def set_role(user_id: str, request: Request):
+        role = (await request.json()).get("role")
+        if role not in ("user", "admin"):
+            return error("Invalid role", 400)
+        rows = store.update("users", lambda row: row["id"] == user_id, {"role": role})
+        return rows[0] if rows else {"id": user_id, "role": role}
+
+    @app.get("/api/admin/tickets")
+    async def list_tickets():
+        return order_rows(store.rows("tickets"), "createdAt.desc")
+
+    @app.get("/api/tickets")
+    async def user_tickets(userId: Optional[str] = None):
+        if not userId:
+            return error("User ID required", 400)
+        return order_rows(store.find("tickets", lambda row: row["userId"] == userId), "createdAt.desc")
+
+    @app.post("/api/tickets")
+    async def create_ticket(request: Request):
+        body = await request.json()
+        if not (body.get("userId") and body.get("subject") and body.get("message")):
+            return error("Missing required fields", 400)
+        ticket = store.insert("tickets", {
+            "id": new_id("ticket"), "userId": body["userId"], "serverId": body.get("serverId"),
+            "subject": body["subject"], "message": body["message"],
+            "category": body.get("category") or "general", "priority": body.get("priority") or "normal",
+        })
+        return JSONResponse(ticket, status_code=201)
+
+    @app.get("/api/tickets/{ticket_id}")
+    async def get_ticket(ticket_id: str):
+        ticket = store.get("tickets", ticket_id)
+        if not ticket:
+            return error("Ticket not found", 404)
+        replies = store.find("ticket_replies", lambda row: row["ticketId"] == ticket_id)
+        return {**ticket, "replies": order_rows(replies, "createdAt.asc")}
+
+    @app.post("/api/tickets/{ticket_id}/reply")
+    async def reply_ticket(ticket_id: str, request: Request):
+        body = await request.json()
+        if not (body.get("userId") and body.get("message")):
+            return error("Missing required fields", 400)
+        reply = store.insert("ticket_replies", {
+            "id": new_id("reply"), "ticketId": ticket_id, "userId": body["userId"],
+            "message": body["message"], "isAdmin": bool(body.get("isAdmin")),
+        })
+        store.update("tickets", lambda row: row["id"] == ticket_id, {"updatedAt": now_iso()})
+        return JSONResponse(reply, status_code=201)
+
+    @app.patch("/api/admin/tickets/{ticket_id}/close")
+    async def close_ticket(ticket_id: str):
+        rows = store.update("tickets", lambda row: row["id"] == ticket_id,
+                            {"status": "closed", "updatedAt": now_iso()})
+        return rows[0] if rows else error("Failed to close ticket", 500)
+
+    @app.delete("/api/admin/tickets/{ticket_id}")
+    async def delete_ticket(ticket_id: str):
+        store.delete("tickets", lambda row: row["id"] == ticket_id)
+        return {"success": True, "message": "Ticket deleted successfully"}
+
+    # Blog
+
+    @app.get("/api/blog/categories")
+    async def list_categories():
+        categories = []
+        for category in order_rows(store.rows("blog_categories"), "name.asc"):
+            post_ids = {row["id"] for row in store.find("blog_posts", lambda row: row["categoryId"] == category["id"])}
+            replies = store.find("blog_replies", lambda row: row["postId"] in post_ids)
+            categories.append({
+                **{key: category.get(key) for key in ("id", "name", "slug", "description", "icon", "color")},
+                "topicCount": len(post_ids),
+                "postCount": len(replies),
+            })
+        return categories
+
+    @app.post("/api/blog/categories")
+    async def create_category(request: Request):
+        body = await request.json()
+        if not (body.get("name") and body.get("slug")):
+            return error("Missing required fields: name and slug are required", 400)
+        slug = body["slug"].lower().strip()
+        if store.find("blog_categories", lambda row: row["slug"] == slug):
+            return error("Category with this slug already exists", 409, details="Please choose a different slug")
+        category = store.insert("blog_categories", {
+            "id": new_id("cat"), "name": body["name"], "slug": slug,
+            "description": body.get("description"), "icon": body.get("icon") or "📁",
+            "color": body.get("color") or "#22c55e",
+        })
+        return JSONResponse({key: category[key] for key in ("id", "name", "slug", "description", "icon", "color")},
+                            status_code=201)
+
+    @app.delete("/api/blog/categories")
+    async def delete_category(id: Optional[str] = None):
+        if not id:
+            return error("Category ID is required", 400)
+        store.delete("blog_categories", lambda row: row["id"] == id)
+        return {"success": True, "message": "Category deleted successfully"}
+
+    @app.get("/api/blog/posts")
+    async def list_posts(categoryId: Optional[str] = None, categorySlug: Optional[str] = None,
+                         slug: Optional[str] = None):
+        if slug:
+            matches = store.find("blog_posts", lambda row: row["slug"] == slug)
+            if not matches:
+                return error("Post not found", 404)
+            post = matches[0]
+            replies = store.find("blog_replies", lambda row: row["postId"] == post["id"])
+            return {**post, "replies": order_rows(replies, "createdAt.asc")}
+        if not categoryId and categorySlug:
+            categories = store.find("blog_categories", lambda row: row["slug"] == categorySlug)
+            if not categories:
+                return error("Category not found", 404, details="JSON object requested, multiple (or no) rows returned")
+            categoryId = categories[0]["id"]
+        rows = store.find("blog_posts", lambda row: categoryId is None or row["categoryId"] == categoryId)
+        return order_rows(rows, "isPinned.desc,createdAt.desc,id.desc")
+
+    @app.post("/api/blog/posts")
+    async def create_post(request: Request):
+        body = await request.json()
+        if not all(body.get(key) for key in ("categoryId", "userId", "title", "content")):
+            return error("Missing required fields", 400)
+        row = {
+            "id": new_id("post"), "categoryId": body["categoryId"], "userId": body["userId"],
+            "title": body["title"], "content": body["content"],
+            "slug": body.get("slug") or re.sub(r"[^a-z0-9]+", "-", body["title"].lower()),
+            "excerpt": body.get("excerpt") or body["content"][:200],
+        }
+        if isinstance(body.get("tags"), list) and body["tags"]:
+            row["tags"] = body["tags"]
+        try:
+            post = store.insert("blog_posts", row)
+        except StoreError as e:
+            return error("Failed to create post", 500, details=e.message, hint=None, code=e.code)
+        return JSONResponse({key: post.get(key) for key in
+                             ("id", "categoryId", "userId", "title", "slug", "content", "excerpt", "tags")},
+                            status_code=201)
+
+    @app.delete("/api/blog/posts")
+    async def delete_post(id: Optional[str] = None):
+        if not id:
+            return error("Post ID is required", 400)
+        store.delete("blog_posts", lambda row: row["id"] == id)
+        return {"success": True, "message": "Post deleted successfully"}
+
+    # Banners
+
+    @app.get("/api/banners/active")
+    async def active_banners(position: Optional[str] = None):
+        today = datetime.now(timezone.utc).date().isoformat()
+        rows = store.find("banners", lambda row: row["isActive"] and (row["startDate"] or "") <= today
+                          <= (row["endDate"] or "") and (position is None or row["position"] == position))
+        return order_rows(rows, "createdAt.desc")
+
+    @app.post("/api/banners")
+    async def create_banner(request: Request):
+        body = await request.json()
+        if not all(body.get(key) for key in ("serverName", "imageUrl", "position", "startDate", "endDate")):
+            return error("Missing required fields", 400)
+        columns = ("serverName", "imageUrl", "linkUrl", "position", "startDate", "endDate", "isActive", "weight")
+        banner = store.insert("banners", {"id": new_id("banner"),
+                                          **{key: body[key] for key in columns if key in body}})
+        return JSONResponse(banner, status_code=201)
+
+    @app.patch("/api/banners")
+    async def update_banner(request: Request, id: Optional[str] = None):
+        if not id:
+            return error("Banner ID required", 400)
+        body = await request.json()
+        columns = ("serverName", "imageUrl", "linkUrl", "position", "startDate", "endDate", "isActive", "weight")
+        rows = store.update("banners", lambda row: row["id"] == id,
+                            {key: body[key] for key in columns if key in body})
+        return rows[0] if rows else error("Failed to update banner", 500)
+
+    @app.delete("/api/banners")
+    async def delete_banner(id: Optional[str] = None):
+        if not id:
+            return error("Banner ID required", 400)
+        store.delete("banners", lambda row: row["id"] == id)
+        return {"success": True, "message": "Banner deleted successfully"}
+
+    @app.post("/api/banners/active")
+    async def track_banner(request: Request):
+        body = await request.json()
+        if not body.get("bannerId"):
+            return error("Banner ID required", 400)
+        return {"success": True}
+
+    # Hostings
+
+    @app.get("/api/hostings")
+    async def list_hostings(featured: Optional[str] = None, sortBy: str = "avg_overall"):
+        rows = store.find("hostings", lambda row: row["is_active"] and (featured != "true" or row["is_featured"]))
+        return order_rows(rows, f"{sortBy}.desc")
+
+    @app.post("/api/hostings")
+    async def create_hosting(request: Request):
+        body = await request.json()
+        if not body.get("name"):
+            return error("Name is required", 400)
+        hosting = store.insert("hostings", {
+            **{key: body[key] for key in SCHEMA["hostings"] if key in body},
+            "id": new_id("hosting"), "name": body["name"],
+        })
+        return JSONResponse(hosting, status_code=201)
+
+    @app.get("/api/hostings/{hosting_id}")
+    async def get_hosting(hosting_id: str):
+        hosting = store.get("hostings", hosting_id)
+        if not hosting:
+            return error("Hosting not found", 404)
+        reviews = store.find("hosting_reviews", lambda row: row["hosting_id"] == hosting_id and row["is_approved"])
+        return {**hosting, "reviews": order_rows(reviews, "created_at.desc")}
+
+    @app.patch("/api/hostings/{hosting_id}")
+    async def update_hosting(hosting_id: str, request: Request):
+        body = await request.json()
+        values = {key: body[key] for key in SCHEMA["hostings"] if key in body and key != "created_at"}
+        values.update({key: body[key] for key in ("name",) if key in body}, updated_at=now_iso())
+        rows = store.update("hostings", lambda row: row["id"] == hosting_id, values)
+        return rows[0] if rows else error("Failed to update hosting", 500)
+
+    @app.delete("/api/hostings/{hosting_id}")
+    async def delete_hosting(hosting_id: str):
+        store.delete("hostings", lambda row: row["id"] == hosting_id)
+        return {"success": True}
+
+    @app.get("/api/hostings/{hosting_id}/reviews")
+    async def list_reviews(hosting_id: str, limit: int = 50, offset: int = 0):
+        rows = store.find("hosting_reviews", lambda row: row["hosting_id"] == hosting_id and row["is_approved"])
+        return order_rows(rows, "created_at.desc")[offset:offset + limit]
+
+    @app.post("/api/hostings/{hosting_id}/reviews")
+    async def create_review(hosting_id: str, request: Request):
+        body = await request.json()
+        if not (body.get("user_id") and body.get("comment")):
+            return error("User ID and comment are required", 400)
+        ratings = [body.get(key) for key in ("performance_rating", "support_rating", "price_value_rating")]
+        if not all(ratings):
+            return error("All ratings are required", 400)
+        if any(rating < 1 or rating > 5 for rating in ratings):
+            return error("Ratings must be between 1 and 5", 400)
+        if store.find("hosting_reviews", lambda row: row["hosting_id"] == hosting_id
+                      and row["user_id"] == body["user_id"]):
+            return error("You have already reviewed this hosting", 400)
+        review = store.insert("hosting_reviews", {
+            "id": new_id("review"), "hosting_id": hosting_id, "user_id": body["user_id"],
+            "user_email": body.get("user_email"), "title": body.get("title"), "comment": body["comment"],
+            "performance_rating": ratings[0], "support_rating": ratings[1], "price_value_rating": ratings[2],
+        })
+        return JSONResponse(review, status_code=201)
+
+    # Settings and pages
+
+    @app.get("/api/settings/public")
+    @app.get("/api/admin/settings")
+    async def get_settings():
+        rows = store.rows("site_settings")
+        return rows[0] if rows else {}
+
+    @app.put("/api/admin/settings")
+    async def put_settings(request: Request):
+        body = await request.json()
+        return store.insert("site_settings", {**body, "id": "main", "updatedat": now_iso()}, upsert=True)
+
+    @app.get("/api/pages")
+    async def list_pages(footer: Optional[str] = None):
+        rows = store.find("custom_pages", lambda row: row["ispublished"] and (footer != "true" or row["showinfooter"]))
+        columns = "id,slug,title,metadescription,showinfooter,footerorder"
+        return project_columns(order_rows(rows, "footerorder.asc"), columns)
+
+    @app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def not_found(path: str):
+        return error("Not found", 404)
+
+    return app
+
+
+app = create_app()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running(port: int = 0, profile: Optional[FaultProfile] = None, seed: int = 0) -> Iterator[str]:
+    """Serve a fresh stand-in on a background thread; yields its base URL."""
+    import uvicorn
+
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(profile=profile, seed=seed), host="127.0.0.1",
+                                           port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, name="fake-upstream", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("fake upstream failed to start")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--seed", type=int, default=0, help="fixture and fault seed")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    profile = FaultProfile.from_env()
+    overrides = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate}
+    profile = FaultProfile(**{**profile.to_dict(), "seed": args.seed,
+                              **{key: value for key, value in overrides.items() if value is not None}})
+    print(f"Fake upstream on http://{args.host}:{args.port} ({json.dumps(profile.to_dict())})")
+    uvicorn.run(create_app(profile=profile, seed=args.seed), host=args.host, port=args.port,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Hosting rating aggregates kept incrementally in the backend.
+
+The hostings list and review pages used to recompute averages from the
+reviews on every request. Here every hosting keeps running sums and 1-5
+star histograms per rating dimension, a review insert, edit or delete
+passing through the backend is applied as a constant-time delta, and the
+pages are served from that state.
+
+The stored `hostings` averages stay owned by the `update_hosting_ratings()`
+trigger (which keeps the same running sums per hosting, see
+supabase_hosting_ratings_backend.sql), so reviews written without the
+backend and several workers never fight over them. Each worker rebuilds its
+state from the tables every `interval` seconds, with the writes seen during
+the scan replayed on the result, which brings in anything that bypassed it.
+"""
+
+import asyncio
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from event_log import log
+
+DIMENSIONS = {
+    "performance": "performance_rating",
+    "support": "support_rating",
+    "price_value": "price_value_rating",
+}
+SORT_COLUMNS = {"avg_overall", "avg_performance", "avg_support", "avg_price_value",
+                "review_count", "min_price", "max_price", "created_at", "name"}
+
+
+class RatingStats:
+    """Counts and per-star histograms for one hosting's approved reviews."""
+
+    def __init__(self):
+        self.count = 0
+        self.sums = {name: 0 for name in DIMENSIONS}
+        self.histograms = {name: [0] * 5 for name in DIMENSIONS}
+
+    def apply(self, review: Dict, sign: int):
+        self.count += sign
+        for name, column in DIMENSIONS.items():
+            stars = int(review[column])
+            self.sums[name] += sign * stars
+            self.histograms[name][stars - 1] += sign
+
+    def averages(self) -> Dict[str, float]:
+        if not self.count:
+            result = {f"avg_{name}": 0 for name in DIMENSIONS}
+            result.update(avg_overall=0, review_count=0)
+            return result
+        result = {f"avg_{name}": round(total / self.count, 2) for name, total in self.sums.items()}
+        result["avg_overall"] = round(sum(self.sums.values()) / (3 * self.count), 2)
+        result["review_count"] = self.count
+        return result
+
+    def distribution(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {str(stars + 1): total for stars, total in enumerate(histogram)}
+            for name, histogram in self.histograms.items()
+        }
+
+
+def _counts(review: Optional[Dict]) -> bool:
+    return bool(review) and review.get("is_approved", True) is not False
+
+
+def _review_key(review: Dict) -> Tuple[str, str]:
+    return (review.get("created_at") or "", review["id"])
+
+
+class RatingsState:
+    """Hostings, their approved reviews and rating stats; rebuilt whole by a reconcile."""
+
+    def __init__(self):
+        self.hostings: Dict[str, Dict] = {}
+        self.stats: Dict[str, RatingStats] = {}
+        # Approved reviews per hosting, ascending by (created_at, id)
+        self.reviews: Dict[str, List[Tuple[Tuple[str, str], Dict]]] = {}
+        self.review_index: Dict[str, Dict] = {}
+
+    def add_hosting(self, hosting: Dict):
+        self.hostings[hosting["id"]] = hosting
+        self.stats.setdefault(hosting["id"], RatingStats())
+        self.refresh(hosting["id"])
+
+    def insert(self, review: Dict):
+        self.review_index[review["id"]] = review
+        if not _counts(review):
+            return
+        hosting_id = review["hosting_id"]
+        self.stats.setdefault(hosting_id, RatingStats()).apply(review, 1)
+        entries = self.reviews.setdefault(hosting_id, [])
+        key = _review_key(review)
+        if not entries or entries[-1][0] < key:
+            entries.append((key, review))
+        else:
+            entries.insert(bisect.bisect_left(entries, (key,)), (key, review))
+
+    def remove(self, review: Dict):
+        self.review_index.pop(review["id"], None)
+        if not _counts(review):
+            return
+        hosting_id = review["hosting_id"]
+        self.stats[hosting_id].apply(review, -1)
+        entries = self.reviews.get(hosting_id, [])
+        index = bisect.bisect_left(entries, (_review_key(review),))
+        if index < len(entries) and entries[index][1]["id"] == review["id"]:
+            del entries[index]
+
+    def refresh(self, hosting_id: str):
+        """Put the in-memory averages on the hosting row we serve."""
+        hosting = self.hostings.get(hosting_id)
+        if hosting is not None:
+            stats = self.stats.setdefault(hosting_id, RatingStats())
+            hosting.update(stats.averages())
+            hosting.update({f"sum_{name}": total for name, total in stats.sums.items()})
+
+    def apply_review(self, review: Dict):
+        previous = self.review_index.get(review["id"])
+        if previous is not None:
+            self.remove(previous)
+        self.insert(review)
+        self.refresh(review["hosting_id"])
+        if previous is not None and previous["hosting_id"] != review["hosting_id"]:
+            self.refresh(previous["hosting_id"])
+
+    def delete_review(self, review_id: str):
+        previous = self.review_index.get(review_id)
+        if previous is not None:
+            self.remove(previous)
+            self.refresh(previous["hosting_id"])
+
+    def delete_hosting(self, hosting_id: str):
+        self.hostings.pop(hosting_id, None)
+        self.stats.pop(hosting_id, None)
+        for _, review in self.reviews.pop(hosting_id, []):
+            self.review_index.pop(review["id"], None)
+
+
+class HostingRatings:
+    def __init__(self, db=None, interval: float = 300.0):
+        self.db = db
+        self.interval = interval
+        self.state = RatingsState()
+        self.loaded = False
+        self.reconciles = 0
+        self._load_lock = asyncio.Lock()
+        self._rankings: Dict[Tuple[str, bool], List[str]] = {}
+        # Writes seen while a reconcile is scanning, replayed onto its result
+        self._pending: Optional[List[Tuple[str, object]]] = None
+
+    async def ensure_loaded(self) -> bool:
+        if self.loaded:
+            return True
+        if self.db is None or not self.db.configured:
+            return False
+        async with self._load_lock:
+            if not self.loaded:
+                await self._reconcile()
+        return self.loaded
+
+    async def _scan(self) -> RatingsState:
+        state = RatingsState()
+        async for row in self.db.iter_rows("hostings"):
+            state.hostings[row["id"]] = row
+            state.stats[row["id"]] = RatingStats()
+        async for review in self.db.iter_rows("hosting_reviews"):
+            state.insert(review)
+        for hosting_id in state.hostings:
+            state.refresh(hosting_id)
+        return state
+
+    async def reconcile(self):
+        """Rebuild everything from the tables and swap the result in."""
+        async with self._load_lock:
+            await self._reconcile()
+
+    async def _reconcile(self):
+        self._pending = []
+        try:
+            state = await self._scan()
+        except Exception as e:
+            log.error("hosting_ratings_load_error", str(e))
+            return
+        finally:
+            pending, self._pending = self._pending, None
+        for operation, argument in pending:
+            self._apply(state, operation, argument)
+        self.state = state
+        self._rankings = {}
+        self.loaded = True
+        self.reconciles += 1
+
+    async def run_reconciler(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.loaded:
+                await self.reconcile()
+
+    # Deltas
+
+    @staticmethod
+    def _apply(state: RatingsState, operation: str, argument):
+        if operation == "review":
+            state.apply_review(argument)
+        elif operation == "delete_review":
+            state.delete_review(argument)
+        elif operation == "hosting":
+            # Rating columns stay ours
+            state.add_hosting(argument)
+        elif operation == "delete_hosting":
+            state.delete_hosting(argument)
+
+    def _record(self, operation: str, argument):
+        if self._pending is not None:
+            self._pending.append((operation, argument))
+        if self.loaded:
+            self._apply(self.state, operation, argument)
+            self._rankings = {}
+
+    def apply_review(self, review: Dict):
+        """Apply an inserted or edited review row."""
+        if review.get("id") and review.get("hosting_id"):
+            self._record("review", review)
+
+    def delete_review(self, review_id: str):
+        self._record("delete_review", review_id)
+
+    def apply_hosting(self, hosting: Dict):
+        """Apply a created or edited hosting row."""
+        if hosting.get("id"):
+            self._record("hosting", hosting)
+
+    def delete_hosting(self, hosting_id: str):
+        self._record("delete_hosting", hosting_id)
+
+    # Reads
+
+    @property
+    def hostings(self) -> Dict[str, Dict]:
+        return self.state.hostings
+
+    def list_hostings(self, sort_by: str = "avg_overall", featured: bool = False) -> List[Dict]:
+        if sort_by not in SORT_COLUMNS:
+            sort_by = "avg_overall"
+        hostings = self.state.hostings
+        cache_key = (sort_by, featured)
+        order = self._rankings.get(cache_key)
+        if order is None:
+            rows = [
+                hosting for hosting in hostings.values()
+                if hosting.get("is_active", True) and (not featured or hosting.get("is_featured"))
+            ]
+            # Descending like the upstream route; Postgres puts NULLs first in DESC order
+            rows.sort(key=lambda hosting: (hosting.get(sort_by) is None,
+                                           0 if hosting.get(sort_by) is None else hosting.get(sort_by)),
+                      reverse=True)
+            order = [hosting["id"] for hosting in rows]
+            self._rankings[cache_key] = order
+        return [hostings[hosting_id] for hosting_id in order]
+
+    def list_reviews(self, hosting_id: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        entries = self.state.reviews.get(hosting_id, [])
+        end = len(entries) - offset
+        start = max(0, end - limit)
+        return [review for _, review in reversed(entries[start:max(end, 0)])]
+
+    def review_count(self, hosting_id: str) -> int:
+        return len(self.state.reviews.get(hosting_id, []))
+
+    def distribution(self, hosting_id: str) -> Optional[Dict]:
+        if hosting_id not in self.state.hostings:
+            return None
+        stats = self.state.stats.get(hosting_id, RatingStats())
+        return {"hosting_id": hosting_id, **stats.averages(), "distribution": stats.distribution()}
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "hostings": len(self.state.hostings),
+            "reviews": len(self.state.review_index),
+            "reconciles": self.reconciles,
+        }
@@ -0,0 +1,210 @@
+"""Content-addressed storage for Minecraft server icons (favicons).
+
+Status pings carry the server icon as a base64 `data:image/png` URL of a few
+kilobytes, and it almost never changes. Instead of passing it inline, each
+icon is decoded once, hashed, and written to `<dir>/<hash[:2]>/<hash>.png`
+when that file does not exist yet, so identical icons (networks running many
+servers, default icons) are stored once. Rows carry only the short hash, and
+`/api/icons/<hash>` serves the bytes with immutable caching: a hash never
+changes content. `assign()` records a server's hash in `servers."iconHash"`,
+writing only when it differs from the row: the row's value is taken from the
+caller when it has it, else read once, then remembered in a bounded LRU
+that is re-checked against the row after `assigned_ttl` seconds (another
+worker may have written it meanwhile).
+
+Files are written to a temporary name and renamed into place, so a crash
+never leaves a partial icon behind. Recently served icons are kept in a small
+byte-bounded LRU so hot icons are not re-read from disk.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from event_log import log
+from supabase_rest import SupabaseError
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Vanilla icons are 64x64 PNGs, usually under 10 KB
+MAX_ICON_BYTES = 64 * 1024
+HASH_LENGTH = 32
+HASH_PATTERN = re.compile(rf"^[0-9a-f]{{{HASH_LENGTH}}}$")
+DATA_URL_PREFIX = "data:image/png;base64,"
+_UNKNOWN = object()
+
+
+def decode_icon(data_url: Optional[str]) -> Optional[bytes]:
+    """PNG bytes of a favicon data URL, or None when it is missing or not a sane PNG."""
+    if not isinstance(data_url, str) or not data_url.startswith(DATA_URL_PREFIX):
+        return None
+    encoded = data_url[len(DATA_URL_PREFIX):]
+    # base64 inflates by 4/3; refuse oversized payloads before decoding them
+    if len(encoded) > MAX_ICON_BYTES * 4 // 3 + 4:
+        return None
+    try:
+        # Some servers wrap the base64 text in newlines
+        data = base64.b64decode("".join(encoded.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if not data.startswith(PNG_SIGNATURE) or len(data) > MAX_ICON_BYTES:
+        return None
+    return data
+
+
+def icon_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def icon_url(hash_: str) -> str:
+    return f"/api/icons/{hash_}"
+
+
+class IconStore:
+    def __init__(self, directory, db=None, max_memory_bytes: int = 4 * 1024 * 1024,
+                 max_assigned: int = 10_000, assigned_ttl: float = 600.0):
+        self.directory = Path(directory)
+        self.db = db
+        self.max_memory_bytes = max_memory_bytes
+        self.max_assigned = max_assigned
+        self.assigned_ttl = assigned_ttl
+        # Hashes known to be on disk
+        self.known: Set[str] = set()
+        # hash -> bytes, least recently served first
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+        self.stored = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.hits = 0
+        self.misses = 0
+        # server id -> (hash in its row, when that was known), least recently used first
+        self.assigned: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self.row_reads = 0
+        self.row_writes = 0
+
+    def path(self, hash_: str) -> Path:
+        return self.directory / hash_[:2] / f"{hash_}.png"
+
+    def _write(self, hash_: str, data: bytes) -> bool:
+        """Store `data` unless the file exists; True when it was written."""
+        path = self.path(hash_)
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{hash_}.{os.getpid()}.tmp")
+        with open(temp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+        return True
+
+    def _read(self, hash_: str) -> Optional[bytes]:
+        try:
+            return self.path(hash_).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _remember(self, hash_: str, data: bytes):
+        if hash_ in self.memory or len(data) > self.max_memory_bytes:
+            return
+        self.memory[hash_] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    async def put(self, data_url: Optional[str]) -> Optional[str]:
+        """Store a favicon data URL; returns its hash, or None if there is no valid icon."""
+        if not data_url:
+            return None
+        data = decode_icon(data_url)
+        if data is None:
+            self.rejected += 1
+            return None
+        hash_ = icon_hash(data)
+        if hash_ in self.known:
+            self.deduplicated += 1
+            return hash_
+        try:
+            written = await asyncio.to_thread(self._write, hash_, data)
+        except OSError as e:
+            log.error("icon_store_error", str(e), hash=hash_)
+            return None
+        self.known.add(hash_)
+        if written:
+            self.stored += 1
+        else:
+            self.deduplicated += 1
+        return hash_
+
+    async def get(self, hash_: str) -> Optional[bytes]:
+        """PNG bytes for a hash, or None when it is malformed or not stored."""
+        if not HASH_PATTERN.match(hash_):
+            return None
+        data = self.memory.get(hash_)
+        if data is not None:
+            self.memory.move_to_end(hash_)
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = await asyncio.to_thread(self._read, hash_)
+        if data is not None:
+            self.known.add(hash_)
+            self._remember(hash_, data)
+        return data
+
+    def _known_assignment(self, server_id: str, current):
+        entry = self.assigned.get(server_id)
+        if entry is not None and time.monotonic() - entry[1] < self.assigned_ttl:
+            self.assigned.move_to_end(server_id)
+            return entry[0]
+        return current
+
+    def _remember_assignment(self, server_id: str, hash_: Optional[str]):
+        self.assigned[server_id] = (hash_, time.monotonic())
+        self.assigned.move_to_end(server_id)
+        while len(self.assigned) > self.max_assigned:
+            self.assigned.popitem(last=False)
+
+    async def assign(self, server_id: str, hash_: Optional[str], current=_UNKNOWN):
+        """Point `servers."iconHash"` of a server at `hash_`; `current` is the row's value if known."""
+        if self.db is None or not self.db.configured:
+            return
+        previous = self._known_assignment(server_id, current)
+        try:
+            if previous is _UNKNOWN:
+                rows = await self.db.select("servers", {"id": f"eq.{server_id}", "select": "iconHash"})
+                self.row_reads += 1
+                if not rows:
+                    return
+                previous = rows[0].get("iconHash")
+            if previous != hash_:
+                await self.db.update("servers", {"id": f"eq.{server_id}"}, {"iconHash": hash_})
+                self.row_writes += 1
+        except SupabaseError as e:
+            log.error("icon_assign_error", str(e), server=server_id)
+            return
+        self._remember_assignment(server_id, hash_)
+
+    def stats(self) -> Dict:
+        return {
+            "known": len(self.known),
+            "assigned": len(self.assigned),
+            "rowReads": self.row_reads,
+            "rowWrites": self.row_writes,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "memoryEntries": len(self.memory),
+            "memoryBytes": self.memory_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
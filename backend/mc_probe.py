@@ -0,0 +1,333 @@
+"""Network checks for a listed Minecraft server.
+
+* `slp_status()` speaks the Server List Ping protocol (1.7+): handshake,
+  status request, then a ping for the round trip; it answers with what the
+  server list shows (version, players, MOTD) and the latency.
+* `votifier_greeting()` connects to the Votifier port and reads the
+  greeting line every Votifier/NuVotifier listener sends on connect.
+* `inspect_banner()` downloads a banner (bounded size, redirects followed
+  by hand) and reads format and dimensions from the image header.
+
+Hosts come from user submissions, so every connection goes to an address
+resolved here and checked with `guard_address()`: loopback, private and
+other non-global addresses are refused unless `allow_private` is set. The
+banner download is pinned to that address too (Host header and SNI carry
+the name), so a name cannot rebind to another address between the check
+and the connection.
+Given a `dns_cache.DnsCache`, names are resolved through it (and the ping
+follows `_minecraft._tcp` SRV records); otherwise with getaddrinfo.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import ipaddress
+import json
+import socket
+import struct
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from dns_cache import DnsCache, DnsError
+
+DEFAULT_PORT = 25565
+MAX_STATUS_BYTES = 1 << 20
+MAX_BANNER_BYTES = 2 << 20
+MAX_REDIRECTS = 3
+# The size most server lists ask banners to be
+STANDARD_BANNER = (468, 60)
+
+
+class ProbeError(Exception):
+    """A check could not be completed; the message is shown to moderators."""
+
+
+# Addresses
+
+async def resolve(host: str, port: int, allow_private: bool = False, resolver: Optional[DnsCache] = None) -> str:
+    """First address `host` resolves to, refused when it is not a public one."""
+    if resolver is not None:
+        try:
+            address = (await resolver.resolve_host(host))[0]
+        except DnsError as e:
+            raise ProbeError(f"cannot resolve {host}: {e}")
+        guard_address(address, allow_private)
+        return address
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ProbeError(f"cannot resolve {host}: {e}")
+    if not infos:
+        raise ProbeError(f"cannot resolve {host}")
+    address = infos[0][4][0]
+    guard_address(address, allow_private)
+    return address
+
+
+def guard_address(address: str, allow_private: bool = False):
+    if allow_private:
+        return
+    if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+        raise ProbeError(f"{address} is not a public address")
+
+
+# Server List Ping
+
+def _varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ProbeError("malformed varint")
+
+
+def _packet(packet_id: int, payload: bytes = b"") -> bytes:
+    body = _varint(packet_id) + payload
+    return _varint(len(body)) + body
+
+
+def _string(text: str) -> bytes:
+    encoded = text.encode("utf-8")
+    return _varint(len(encoded)) + encoded
+
+
+def chat_text(component) -> str:
+    """Plain text of a chat component (string, {"text", "extra"} or list)."""
+    if isinstance(component, str):
+        return component
+    if isinstance(component, list):
+        return "".join(chat_text(part) for part in component)
+    if isinstance(component, dict):
+        return str(component.get("text", "")) + "".join(chat_text(part) for part in component.get("extra") or [])
+    return ""
+
+
+async def slp_status(host: str, port: int = DEFAULT_PORT, timeout: float = 5.0, allow_private: bool = False,
+                     address: Optional[str] = None, resolver: Optional[DnsCache] = None) -> Dict:
+    """Status of a Java server over Server List Ping; raises ProbeError when it does not answer."""
+    target = host
+    if address is None and resolver is not None:
+        try:
+            target, port, addresses = await resolver.resolve_minecraft(host, port)
+        except DnsError as e:
+            raise ProbeError(f"cannot resolve {host}: {e}")
+        address = addresses[0]
+        guard_address(address, allow_private)
+    elif address is None:
+        address = await resolve(host, port, allow_private)
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise ProbeError(f"port {port} does not accept connections: {e or 'timed out'}")
+    try:
+        async def exchange() -> Tuple[Dict, float]:
+            # Protocol version -1: "whatever you speak", accepted by every status handler
+            handshake = _varint(-1) + _string(host) + struct.pack(">H", port) + _varint(1)
+            writer.write(_packet(0x00, handshake) + _packet(0x00))
+            await writer.drain()
+            length = await _read_varint(reader)
+            if not 0 < length <= MAX_STATUS_BYTES:
+                raise ProbeError("status response too large")
+            if await _read_varint(reader) != 0x00:
+                raise ProbeError("unexpected status packet")
+            size = await _read_varint(reader)
+            if size > MAX_STATUS_BYTES:
+                raise ProbeError("status response too large")
+            status = json.loads((await reader.readexactly(size)).decode("utf-8"))
+            sent = time.monotonic()
+            writer.write(_packet(0x01, struct.pack(">q", int(sent * 1000))))
+            await writer.drain()
+            try:
+                await _read_varint(reader)
+                await reader.readexactly(9)
+                latency = time.monotonic() - sent
+            except (asyncio.IncompleteReadError, OSError):
+                # Some proxies close instead of answering the ping
+                latency = sent - started
+            return status, latency
+
+        status, latency = await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        raise ProbeError("status request timed out")
+    except (asyncio.IncompleteReadError, OSError, ValueError) as e:
+        raise ProbeError(f"not a Minecraft status response: {e}")
+    finally:
+        writer.close()
+    if not isinstance(status, dict):
+        raise ProbeError("not a Minecraft status response")
+    version = status.get("version") if isinstance(status.get("version"), dict) else {}
+    players = status.get("players") if isinstance(status.get("players"), dict) else {}
+    return {
+        "online": True,
+        "address": address,
+        "port": port,
+        "srvTarget": target if target != host else None,
+        "latencyMs": round(latency * 1000, 1),
+        "version": version.get("name"),
+        "protocol": version.get("protocol"),
+        "onlinePlayers": players.get("online"),
+        "maxPlayers": players.get("max"),
+        "motd": chat_text(status.get("description"))[:300],
+        "hasIcon": bool(status.get("favicon")),
+        # Data URL; callers store it (icon_store) rather than passing it on
+        "favicon": status.get("favicon") if isinstance(status.get("favicon"), str) else None,
+    }
+
+
+# Votifier
+
+def votifier_key_valid(key: Optional[str]) -> bool:
+    """Whether a Votifier public key looks like a base64 RSA key (PEM armour allowed)."""
+    if not key:
+        return False
+    body = "".join(line for line in key.strip().splitlines() if not line.startswith("-----"))
+    try:
+        der = base64.b64decode("".join(body.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return False
+    # A SubjectPublicKeyInfo SEQUENCE of at least a 1024-bit key
+    return len(der) >= 128 and der[0] == 0x30
+
+
+async def votifier_greeting(host: str, port: int, timeout: float = 5.0, allow_private: bool = False,
+                            resolver: Optional[DnsCache] = None) -> Dict:
+    """Connect to a Votifier listener and read its `VOTIFIER <version> [challenge]` greeting."""
+    address = await resolve(host, port, allow_private, resolver)
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise ProbeError(f"Votifier port {port} does not accept connections: {e or 'timed out'}")
+    try:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        raise ProbeError("Votifier sent no greeting")
+    finally:
+        writer.close()
+    parts = line.decode("utf-8", "replace").split()
+    if len(parts) < 2 or parts[0] != "VOTIFIER":
+        raise ProbeError("not a Votifier listener")
+    return {"reachable": True, "version": parts[1], "v2": parts[1].startswith("2")}
+
+
+# Banners
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """http(s) URL with lower-cased scheme and host and no fragment; None when unusable."""
+    if not url or not isinstance(url, str):
+        return None
+    parts = urlsplit(url.strip())
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower() + (f":{parts.port}" if parts.port else "")
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or "/", parts.query, ""))
+
+
+def image_size(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """(format, width, height) from a PNG, GIF, JPEG or WebP header."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return "png", width, height
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        width, height = struct.unpack("<HH", data[6:10])
+        return "gif", width, height
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return "webp", width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return "webp", int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    if data.startswith(b"\xff\xd8"):
+        index = 2
+        while index + 9 < len(data):
+            if data[index] != 0xFF:
+                index += 1
+                continue
+            marker = data[index + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                index += 1 if marker == 0xFF else 2
+                continue
+            length = struct.unpack(">H", data[index + 2:index + 4])[0]
+            # SOF0..SOF15 except DHT, JPG and DAC carry the frame size
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[index + 5:index + 9])
+                return "jpeg", width, height
+            index += 2 + length
+    return None
+
+
+async def inspect_banner(client: httpx.AsyncClient, url: Optional[str], timeout: float = 5.0,
+                         allow_private: bool = False, resolver: Optional[DnsCache] = None) -> Dict:
+    """Download a banner and describe it; raises ProbeError when it is not a usable image."""
+    target = normalize_url(url)
+    if target is None:
+        raise ProbeError("banner URL is not an http(s) URL")
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(target)
+        address = await resolve(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                                allow_private, resolver)
+        # Connect to the address that was checked, not whatever the name resolves to next (DNS
+        # rebinding); the name still goes out as Host and as TLS SNI, and the certificate is
+        # verified against it. No keep-alive: a pooled connection is keyed by address only.
+        pinned = httpx.URL(target).copy_with(host=address)
+        try:
+            async with client.stream(
+                "GET", pinned, timeout=timeout, follow_redirects=False,
+                headers={"Host": parts.netloc, "Connection": "close"},
+                extensions={"sni_hostname": parts.hostname},
+            ) as response:
+                if response.is_redirect and response.headers.get("location"):
+                    target = normalize_url(urljoin(target, response.headers["location"]))
+                    if target is None:
+                        raise ProbeError("banner redirects to a non-http(s) URL")
+                    continue
+                if response.status_code != 200:
+                    raise ProbeError(f"banner answered {response.status_code}")
+                data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    data += chunk
+                    if len(data) > MAX_BANNER_BYTES:
+                        raise ProbeError(f"banner is larger than {MAX_BANNER_BYTES >> 20} MB")
+                content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        except httpx.HTTPError as e:
+            raise ProbeError(f"banner download failed: {e}")
+        size = image_size(bytes(data))
+        if size is None:
+            raise ProbeError(f"banner is not a PNG, GIF, JPEG or WebP image ({content_type or 'no type'})")
+        image_format, width, height = size
+        return {
+            "ok": True,
+            "url": target,
+            "format": image_format,
+            "contentType": content_type,
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "standardSize": (width, height) == STANDARD_BANNER,
+        }
+    raise ProbeError("banner redirects too many times")
@@ -0,0 +1,231 @@
+"""Memory accounting and leak hunting for the proxy process.
+
+Three views, served by the admin endpoints in server.py:
+
+* process totals: RSS and its high-water mark from /proc, live pymalloc
+  blocks (`sys.getallocatedblocks()`) and gc collection counts;
+* per-subsystem byte accounting: every cache or buffer registers a callable
+  returning its size, so growth can be pinned on a component without
+  tracing;
+* tracemalloc snapshots, kept in a small ring and diffed on demand. Tracing
+  costs CPU and memory, so it is off until started through the endpoint (or
+  at boot with BACKEND_TRACEMALLOC=<frames>, to catch import-time state).
+
+CPython has no cheap running count of allocations, so "allocations per
+request" is measured as net retained blocks and gen-0 collections per
+request: `publish()` writes the process totals into this worker's
+SharedCache counter row, and bench_proxy.py diffs the summed rows around
+each load run.
+"""
+
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+from collections import deque
+from types import ModuleType
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+MAX_SNAPSHOTS = 8
+MAX_FRAMES = 64
+MAX_SIZEOF_OBJECTS = 200_000
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+GROUPINGS = ("lineno", "filename", "traceback")
+
+
+def proc_status() -> Dict[str, int]:
+    """VmRSS / VmHWM / VmSize in bytes (empty off Linux)."""
+    values = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("VmRSS", "VmHWM", "VmSize"):
+                    values[name] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+def deep_sizeof(root, limit: int = MAX_SIZEOF_OBJECTS) -> Tuple[int, bool]:
+    """Shallow sizes summed over everything reachable through containers.
+
+    Walks dicts, lists, tuples, sets and instance `__dict__`/`__slots__`
+    only, never into classes, modules or callables, and counts each object
+    once. Returns (bytes, truncated), truncated when more than `limit`
+    objects were reachable.
+    """
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        if len(seen) >= limit:
+            return total, True
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None), type, ModuleType)) \
+                or callable(obj):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for name in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return total, False
+
+
+def _where(traceback):
+    # Grouping by filename leaves lineno at 0
+    frames = [f"{frame.filename}:{frame.lineno}" if frame.lineno else frame.filename for frame in traceback]
+    return frames[0] if len(frames) == 1 else frames
+
+
+def _stat_dict(stat) -> Dict:
+    return {"where": _where(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+
+
+def _diff_dict(stat) -> Dict:
+    return {
+        "where": _where(stat.traceback),
+        "bytes": stat.size,
+        "bytesDiff": stat.size_diff,
+        "blocks": stat.count,
+        "blocksDiff": stat.count_diff,
+    }
+
+
+class MemoryTracker:
+    def __init__(self, shared=None):
+        self.shared = shared
+        self.subsystems: Dict[str, Callable[[], Dict]] = {}
+        self.snapshots: Deque[Tuple[str, float, tracemalloc.Snapshot]] = deque(maxlen=MAX_SNAPSHOTS)
+        self._taken = 0
+
+    # Subsystem accounting
+
+    def register(self, name: str, report: Callable[[], Dict]):
+        """`report()` returns a dict with at least "bytes"; it runs on the event loop."""
+        self.subsystems[name] = report
+
+    def subsystem_report(self) -> Dict[str, Dict]:
+        results = {}
+        for name, report in self.subsystems.items():
+            try:
+                results[name] = report()
+            except Exception as e:
+                results[name] = {"error": str(e)}
+        return results
+
+    # Process totals
+
+    def totals(self) -> Dict:
+        status = proc_status()
+        result = {
+            "rssBytes": status.get("VmRSS"),
+            "rssPeakBytes": status.get("VmHWM"),
+            "virtualBytes": status.get("VmSize"),
+            "allocatedBlocks": sys.getallocatedblocks(),
+            "gcCollections": [generation["collections"] for generation in gc.get_stats()],
+            "gcObjects": gc.get_count(),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            result["tracemalloc"] = {
+                "frames": tracemalloc.get_traceback_limit(),
+                "tracedBytes": current,
+                "tracedPeakBytes": peak,
+                "overheadBytes": tracemalloc.get_tracemalloc_memory(),
+            }
+        return result
+
+    def publish(self):
+        """Write this worker's totals into its SharedCache counter row."""
+        if self.shared is None:
+            return
+        self.shared.set("allocated_blocks", sys.getallocatedblocks())
+        self.shared.set("rss_bytes", proc_status().get("VmRSS", 0))
+        self.shared.set("gc_collections", gc.get_stats()[0]["collections"])
+
+    async def run_publisher(self, interval: float = 0.5):
+        while True:
+            self.publish()
+            await asyncio.sleep(interval)
+
+    def report(self) -> Dict:
+        return {
+            **self.totals(),
+            "subsystems": self.subsystem_report(),
+            "snapshots": self.snapshot_list(),
+        }
+
+    # tracemalloc
+
+    def start_tracing(self, frames: int = 1):
+        frames = max(1, min(MAX_FRAMES, frames))
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+            # Tracebacks of different depths can not be compared
+            self.stop_tracing()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_tracing(self):
+        tracemalloc.stop()
+        self.snapshots.clear()
+
+    def snapshot_list(self) -> List[Dict]:
+        return [{"label": label, "takenAt": taken_at} for label, taken_at, _ in self.snapshots]
+
+    def take_snapshot(self, label: Optional[str] = None) -> Tuple[str, tracemalloc.Snapshot]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        self._taken += 1
+        label = label or f"s{self._taken}"
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        self.snapshots = deque(
+            (entry for entry in self.snapshots if entry[0] != label), maxlen=MAX_SNAPSHOTS
+        )
+        self.snapshots.append((label, time.time(), snapshot))
+        return label, snapshot
+
+    def get_snapshot(self, label: str) -> Optional[tracemalloc.Snapshot]:
+        for name, _, snapshot in self.snapshots:
+            if name == label:
+                return snapshot
+        return None
+
+    @staticmethod
+    def top(snapshot: tracemalloc.Snapshot, group: str = "lineno", limit: int = 25) -> Dict:
+        stats = snapshot.statistics(group)
+        return {
+            "group": group,
+            "totalBytes": sum(stat.size for stat in stats),
+            "totalBlocks": sum(stat.count for stat in stats),
+            "top": [_stat_dict(stat) for stat in stats[:limit]],
+        }
+
+    @staticmethod
+    def diff(base: tracemalloc.Snapshot, target: tracemalloc.Snapshot, group: str = "lineno",
+             limit: int = 25) -> Dict:
+        """Entries ordered by the size of their change, growth or shrinkage."""
+        stats = target.compare_to(base, group)
+        return {
+            "group": group,
+            "bytesDiff": sum(stat.size_diff for stat in stats),
+            "blocksDiff": sum(stat.count_diff for stat in stats),
+            "top": [_diff_dict(stat) for stat in stats[:limit]],
+        }
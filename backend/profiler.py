@@ -0,0 +1,249 @@
+"""On-demand statistical profiler for live /api requests.
+
+Started through the admin endpoint in server.py, a session profiles a sample
+of the following requests: a background thread snapshots the event-loop
+thread's Python stack every `interval` and charges each sample to whichever
+profiled request's task is running at that moment (child tasks a request
+spawns are followed through a temporary task factory). The result is
+flamegraph-ready collapsed stacks rooted at the route, plus per-route wall
+time vs estimated on-CPU time, so time spent awaiting upstream is visible
+next to time spent in Python.
+
+When no session is active the middleware is a single attribute check. A
+session is bounded by request count, duration, sampling interval and the
+number of distinct stacks kept.
+"""
+
+import asyncio
+import contextvars
+import random
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Dict, List, Optional
+
+from replay import route_shape
+
+MAX_DEPTH = 128
+MAX_STACKS = 10_000
+MIN_INTERVAL = 0.001
+MAX_DURATION = 300.0
+MAX_REQUESTS = 1000
+# Top frames of an event loop with no task running and nothing to do
+IDLE_FUNCTIONS = {"select", "poll", "control", "run_forever", "run_until_complete", "run"}
+
+current_request = contextvars.ContextVar("profiled_request", default=None)
+
+
+class RequestTimes:
+    __slots__ = ("route", "samples")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.samples = 0
+
+
+def frame_label(code) -> str:
+    filename = code.co_filename.rsplit("/", 1)[-1]
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_requests: int = 50, duration: float = 30.0,
+                 interval: float = 0.005, sample_rate: float = 1.0, path_prefix: str = "/api/"):
+        self.loop = loop
+        self.max_requests = max(1, min(MAX_REQUESTS, max_requests))
+        self.duration = max(0.1, min(MAX_DURATION, duration))
+        self.interval = max(MIN_INTERVAL, interval)
+        self.sample_rate = sample_rate
+        self.path_prefix = path_prefix
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + self.duration
+        self.admitted = 0
+        self.completed = 0
+        self.samples = 0
+        self.idle_samples = 0
+        self.truncated = 0
+        self.stacks: Counter = Counter()
+        self.routes: Dict[str, Dict] = {}
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self.stopped_at: Optional[float] = None
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.Task, RequestTimes]" = weakref.WeakKeyDictionary()
+        self._thread_id = threading.get_ident()
+        self._previous_factory = None
+
+    # Event loop side
+
+    def install(self):
+        self._previous_factory = self.loop.get_task_factory()
+        self.loop.set_task_factory(self._task_factory)
+        threading.Thread(target=self._sample, name="request-profiler", daemon=True).start()
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        times = context.get(current_request) if context is not None else current_request.get()
+        if times is not None:
+            self._tasks[task] = times
+        return task
+
+    def admit(self, path: str) -> Optional[RequestTimes]:
+        if self.finished.is_set() or not path.startswith(self.path_prefix):
+            return None
+        if self.admitted >= self.max_requests or time.monotonic() > self.deadline:
+            return None
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        self.admitted += 1
+        times = RequestTimes(route_shape(path))
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks[task] = times
+        return times
+
+    def complete(self, times: RequestTimes, wall: float):
+        route = self.routes.setdefault(times.route, {"requests": 0, "wall": 0.0, "cpu": 0.0, "maxWall": 0.0})
+        route["requests"] += 1
+        route["wall"] += wall
+        route["cpu"] += min(wall, times.samples * self.interval)
+        route["maxWall"] = max(route["maxWall"], wall)
+        self.completed += 1
+        if self.completed >= self.max_requests:
+            self.stop()
+
+    def stop(self):
+        if self.finished.is_set():
+            return
+        self.finished.set()
+        self.stopped_at = time.time()
+        try:
+            if asyncio.get_running_loop() is self.loop:
+                self._restore()
+                return
+        except RuntimeError:
+            pass
+        self.loop.call_soon_threadsafe(self._restore)
+
+    def _restore(self):
+        if self.loop.get_task_factory() == self._task_factory:
+            self.loop.set_task_factory(self._previous_factory)
+
+    # Sampler thread
+
+    def _sample(self):
+        current_tasks = asyncio.tasks._current_tasks
+        while not self.finished.wait(self.interval):
+            if time.monotonic() > self.deadline:
+                self.stop()
+                return
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            task = current_tasks.get(self.loop)
+            times = self._tasks.get(task) if task is not None else None
+            if task is None and frame.f_code.co_name in IDLE_FUNCTIONS:
+                self.idle_samples += 1
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_DEPTH:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if times is not None:
+                labels.append(times.route)
+                times.samples += 1
+            else:
+                labels.append("[other task]" if task is not None else "[event loop]")
+            key = ";".join(reversed(labels))
+            with self._lock:
+                if key in self.stacks or len(self.stacks) < MAX_STACKS:
+                    self.stacks[key] += 1
+                else:
+                    self.truncated += 1
+
+    # Results
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def report(self) -> Dict:
+        routes: List[Dict] = []
+        for name, route in sorted(self.routes.items(), key=lambda item: -item[1]["wall"]):
+            requests = route["requests"]
+            routes.append({
+                "route": name,
+                "requests": requests,
+                "avgWallMs": route["wall"] / requests * 1000,
+                "avgCpuMs": route["cpu"] / requests * 1000,
+                "avgWaitMs": (route["wall"] - route["cpu"]) / requests * 1000,
+                "maxWallMs": route["maxWall"] * 1000,
+            })
+        return {
+            "running": not self.finished.is_set(),
+            "startedAt": self.started_at,
+            "stoppedAt": self.stopped_at,
+            "intervalMs": self.interval * 1000,
+            "maxRequests": self.max_requests,
+            "durationSeconds": self.duration,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "samples": self.samples,
+            "idleSamples": self.idle_samples,
+            "distinctStacks": len(self.stacks),
+            "truncatedSamples": self.truncated,
+            "routes": routes,
+        }
+
+
+class RequestProfiler:
+    """Holds the current (or last finished) session for this process."""
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+
+    @property
+    def active(self) -> bool:
+        return self.session is not None and not self.session.finished.is_set()
+
+    def start(self, **options) -> ProfileSession:
+        if self.active:
+            raise RuntimeError("a profiling session is already running")
+        self.session = ProfileSession(asyncio.get_running_loop(), **options)
+        self.session.install()
+        return self.session
+
+    def stop(self) -> Optional[ProfileSession]:
+        if self.session is not None:
+            self.session.stop()
+        return self.session
+
+
+class ProfilingMiddleware:
+    """Plain ASGI middleware, so the request runs in the task that was tagged."""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        session = self.profiler.session
+        if session is None or scope["type"] != "http" or session.finished.is_set():
+            return await self.app(scope, receive, send)
+        times = session.admit(scope["path"])
+        if times is None:
+            return await self.app(scope, receive, send)
+        token = current_request.set(times)
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
+            session.complete(times, time.monotonic() - started)
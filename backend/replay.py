@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Replay a traffic capture against a target and report latency deltas.
+
+    python replay.py capture.bin --target http://localhost:8001 --rate 2
+
+Requests are re-issued at their recorded arrival times, with the gaps
+divided by --rate (open loop, so a slow target does not slow the schedule
+down). Writes
+are skipped unless --include-writes is given, since their bodies are not
+captured; they are then sent with a zero-filled body of the recorded size.
+Several capture files (one per worker) are merged on their wall-clock
+arrival times, so requests that overlapped across workers overlap again. The
+report groups routes by shape (ids collapsed) and compares replayed latency
+with the end-to-end latency recorded at capture time, alongside the recorded
+upstream share.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import httpx
+
+from traffic_capture import CapturedRequest, read_log
+
+ID_SEGMENT = re.compile(r"^(?:\d+|[0-9a-f-]{32,36}|[a-z]+_\d{10,}_[a-z0-9]+)$")
+
+
+def route_shape(path: str) -> str:
+    """`/api/servers/server_1700000000000_ab12cd/vote` -> `/api/servers/:id/vote`."""
+    return "/".join(":id" if ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+def merged_schedule(paths: Iterable[str]) -> List[Tuple[float, CapturedRequest]]:
+    """(offset seconds from the first arrival, request) from one or more logs, ordered by arrival."""
+    # Records are written as responses finish, so even one log is not in arrival order
+    merged = sorted(itertools.chain.from_iterable(read_log(path) for path in paths),
+                    key=lambda captured: captured.arrival)
+    if not merged:
+        return []
+    start = merged[0].arrival
+    return [(captured.arrival - start, captured) for captured in merged]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def replay(schedule, target: str, rate: float, include_writes: bool, concurrency: int):
+    results: Dict[str, Dict[str, List]] = defaultdict(
+        lambda: {"replayed": [], "recorded": [], "upstream": [], "errors": []}
+    )
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(client, captured: CapturedRequest):
+        shape = route_shape(captured.path)
+        body = bytes(captured.request_bytes) if captured.method not in ("GET", "HEAD", "OPTIONS") else None
+        url = captured.path + (f"?{captured.query}" if captured.query else "")
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(captured.method, url, content=body)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                results[shape]["errors"].append(str(e))
+                return
+            elapsed = time.perf_counter() - started
+        entry = results[shape]
+        entry["replayed"].append(elapsed)
+        entry["recorded"].append(captured.latency)
+        entry["upstream"].append(captured.upstream_latency)
+        if status >= 500:
+            entry["errors"].append(status)
+
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=30.0) as client:
+        start = time.monotonic()
+        tasks = []
+        for offset, captured in schedule:
+            if captured.method not in ("GET", "HEAD") and not include_writes:
+                continue
+            delay = start + offset / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, captured)))
+        await asyncio.gather(*tasks)
+        duration = time.monotonic() - start
+    return results, duration
+
+
+def report(results, duration: float) -> List[Dict]:
+    rows = []
+    for shape, entry in sorted(results.items(), key=lambda item: -len(item[1]["replayed"])):
+        replayed, recorded = entry["replayed"], entry["recorded"]
+        rows.append({
+            "route": shape,
+            "requests": len(replayed),
+            "errors": len(entry["errors"]),
+            "recorded_upstream_p50_ms": percentile(entry["upstream"], 0.5) * 1000,
+            "recorded_p50_ms": percentile(recorded, 0.5) * 1000,
+            "replayed_p50_ms": percentile(replayed, 0.5) * 1000,
+            "delta_p50_ms": (percentile(replayed, 0.5) - percentile(recorded, 0.5)) * 1000,
+            "recorded_p99_ms": percentile(recorded, 0.99) * 1000,
+            "replayed_p99_ms": percentile(replayed, 0.99) * 1000,
+            "delta_p99_ms": (percentile(replayed, 0.99) - percentile(recorded, 0.99)) * 1000,
+        })
+    total = sum(row["requests"] for row in rows)
+    print(f"Replayed {total} requests in {duration:.1f}s ({total / duration if duration else 0:.0f} req/s)",
+          file=sys.stderr)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="+", help="capture file(s) written by the backend")
+    parser.add_argument("--target", default="http://localhost:8001")
+    parser.add_argument("--rate", type=float, default=1.0, help="speed-up factor for the schedule")
+    parser.add_argument("--include-writes", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    schedule = merged_schedule(args.logs)
+    results, duration = asyncio.run(
+        replay(schedule, args.target, args.rate, args.include_writes, args.concurrency)
+    )
+    rows = report(results, duration)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'route':<45} {'n':>7} {'err':>5} {'up p50':>8} {'p50 rec':>9} {'p50 now':>9} {'Δp50':>8} "
+          f"{'p99 rec':>9} {'p99 now':>9} {'Δp99':>8}")
+    for row in rows:
+        print(f"{row['route'][:45]:<45} {row['requests']:>7} {row['errors']:>5} "
+              f"{row['recorded_upstream_p50_ms']:>8.1f} "
+              f"{row['recorded_p50_ms']:>9.1f} {row['replayed_p50_ms']:>9.1f} {row['delta_p50_ms']:>+8.1f} "
+              f"{row['recorded_p99_ms']:>9.1f} {row['replayed_p99_ms']:>9.1f} {row['delta_p99_ms']:>+8.1f}")
+
+
+if __name__ == "__main__":
+    main()
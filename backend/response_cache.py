@@ -0,0 +1,70 @@
+"""In-process response cache with TTLs, LRU eviction and tag invalidation."""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    size: int
+    expires_at: float
+    tags: Set[str] = field(default_factory=set)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.by_tag: Dict[str, Set[Hashable]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: Hashable, value: Any, ttl: float, size: int = 0, tags: Iterable[str] = ()):
+        if key in self.entries:
+            self._drop(key)
+        entry = CacheEntry(value, size, time.monotonic() + ttl, set(tags))
+        self.entries[key] = entry
+        self.bytes += size
+        for tag in entry.tags:
+            self.by_tag.setdefault(tag, set()).add(key)
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._drop(next(iter(self.entries)))
+
+    def invalidate(self, tag: str):
+        for key in self.by_tag.pop(tag, set()):
+            self._drop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_tag.clear()
+        self.bytes = 0
+
+    def _drop(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self.by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_tag[tag]
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""Synthetic dataset generator for scale testing.
+
+    python seed_dataset.py --servers 100000 --votes 20000000 --out seed.sql.gz
+    gunzip -c seed.sql.gz | psql "$DATABASE_URL"
+
+    python seed_dataset.py --servers 2000 --votes 200000 --target http://127.0.0.1:3000
+
+Generates users, servers, votes, blog posts, hostings with reviews and user
+activity shaped like production traffic rather than like test fixtures:
+
+* votes follow a Zipf distribution over servers (a few servers take most of
+  them), and within each month they burst right after the monthly reset and
+  tail off towards the end;
+* post views, review counts and activity are skewed the same way;
+* servers.voteCount and the hosting rating aggregates (averages and the
+  running sums behind them) agree with the rows generated for them.
+
+Output is either a psql script of COPY blocks (streamed, optionally gzipped)
+or batched upserts to a PostgREST endpoint (the Supabase project, or
+fake_upstream.py). Every table draws from its own RNG seeded from --seed, so
+the same --seed and --end produce byte-identical output.
+"""
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import math
+import random
+import sys
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, List, Sequence, Tuple
+
+Row = Tuple[Any, ...]
+
+CATEGORIES = ("survival", "skyblock", "pvp", "creative", "prison", "factions", "minigames", "towny")
+VERSIONS = ("1.8.9", "1.12.2", "1.16.5", "1.19.4", "1.20.1", "1.20.4", "1.21")
+ACTIVITY_TYPES = ("vote", "login", "profile_update", "server_add", "ticket")
+ACTIVITY_WEIGHTS = (60, 30, 5, 3, 2)
+BLOG_CATEGORIES = (
+    ("cat_updates", "Güncellemeler", "guncellemeler", "Minecraft güncellemeleri ve yenilikler", "🆕", "#3b82f6", 1),
+    ("cat_news", "Haberler", "haberler", "Minecraft dünyasından haberler", "📰", "#22c55e", 2),
+    ("cat_guides", "Rehberler", "rehberler", "Oyun rehberleri ve ipuçları", "📚", "#f59e0b", 3),
+    ("cat_server_support", "Sunucu Destek", "sunucu-destek", "Sunucu sorunları ve çözümleri", "🛠️", "#ef4444", 4),
+    ("cat_community", "Topluluk", "topluluk", "Topluluk etkinlikleri ve duyurular", "👥", "#8b5cf6", 5),
+)
+WORDS = ("block", "craft", "mine", "sky", "legend", "realm", "nova", "pixel", "empire", "dragon",
+         "frost", "ember", "stone", "cloud", "titan", "vortex", "haven", "storm", "astra", "forge")
+
+
+def voter_name(voter: int) -> str:
+    """Minecraft username (3-16 characters) of the voter with index `voter`."""
+    return f"{WORDS[voter % len(WORDS)]}_{voter}"[:16]
+
+
+@dataclass
+class Config:
+    seed: int = 1
+    end: datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    months: int = 6
+    users: int = 20_000
+    servers: int = 10_000
+    votes: int = 1_000_000
+    posts: int = 5_000
+    hostings: int = 200
+    reviews: int = 20_000
+    activity: int = 500_000
+    zipf: float = 1.1
+
+
+@dataclass
+class Table:
+    name: str
+    columns: Sequence[str]
+    rows: Iterator[Row]
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+
+
+def zipf_counts(total: int, n: int, s: float, rng: random.Random) -> List[int]:
+    """Split `total` over `n` ranks proportionally to 1/rank^s, summing exactly to `total`."""
+    cum = zipf_cum_weights(n, s)
+    norm = cum[-1]
+    counts = [int(total * (1.0 / (rank + 1) ** s) / norm) for rank in range(n)]
+    remainder = total - sum(counts)
+    for rank in rng.choices(range(n), cum_weights=cum, k=remainder):
+        counts[rank] += 1
+    return counts
+
+
+def app_id(prefix: str, epoch_ms: int, rng: random.Random) -> str:
+    """Ids in the same shape the Next.js routes mint: prefix_<ms>_<9 chars>."""
+    return f"{prefix}_{epoch_ms}_{rng.getrandbits(36):09x}"
+
+
+class Dataset:
+    def __init__(self, config: Config):
+        self.config = config
+        self.end_ts = config.end.timestamp()
+        # Month starts, oldest first; the current month is the last one
+        starts = []
+        month = datetime(config.end.year, config.end.month, 1, tzinfo=timezone.utc)
+        for _ in range(config.months):
+            starts.append(month)
+            month = (month - timedelta(days=1)).replace(day=1)
+        self.month_starts = [start.timestamp() for start in reversed(starts)]
+        self.user_ids = [self._user_id(i) for i in range(config.users)]
+        rng = self.rng("servers:ids")
+        self.server_ids = [app_id("server", self._created_ms(i, config.servers, 730), rng)
+                           for i in range(config.servers)]
+        # Popularity rank -> server index, so ids are not sorted by popularity
+        self.rank_to_server = list(range(config.servers))
+        self.rng("servers:ranks").shuffle(self.rank_to_server)
+        self.vote_counts = [0] * config.servers
+        for rank, count in enumerate(zipf_counts(config.votes, config.servers, config.zipf,
+                                                 self.rng("votes:counts"))):
+            self.vote_counts[self.rank_to_server[rank]] = count
+
+    def rng(self, name: str) -> random.Random:
+        return random.Random(f"{self.config.seed}:{name}")
+
+    def _user_id(self, i: int) -> str:
+        return f"user_{i:08d}"
+
+    def _created_ms(self, i: int, n: int, days: int) -> int:
+        """Spread creation times over the last `days`, oldest first."""
+        return int((self.end_ts - days * 86400 * (1 - i / max(1, n))) * 1000)
+
+    def iso(self, ts: float) -> str:
+        return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+    def tables(self) -> List[Table]:
+        """Tables in foreign-key order."""
+        hostings, reviews = self.hostings_and_reviews()
+        return [
+            Table("users", ("id", "email", "role", "isActive", "minecraftUsername", "createdAt"), self.users()),
+            Table("servers", ("id", "name", "ip", "port", "website", "bannerUrl", "shortDescription",
+                              "longDescription", "version", "category", "status", "onlinePlayers",
+                              "maxPlayers", "voteCount", "ownerId", "approvalStatus", "createdAt", "updatedAt"),
+                  self.servers()),
+            Table("votes", ("id", "serverId", "minecraftUsername", "ipAddress", "createdAt", "votifierSent"),
+                  self.votes()),
+            Table("blog_categories", ("id", "name", "slug", "description", "icon", "color", "position"),
+                  iter(BLOG_CATEGORIES)),
+            Table("blog_posts", ("id", "categoryId", "userId", "title", "slug", "content", "excerpt", "tags",
+                                 "status", "isPinned", "viewCount", "replyCount", "createdAt", "updatedAt"),
+                  self.posts()),
+            Table("hostings", ("id", "name", "website", "short_description", "min_price", "currency",
+                               "avg_performance", "avg_support", "avg_price_value", "avg_overall",
+                               "review_count", "sum_performance", "sum_support", "sum_price_value",
+                               "is_featured", "is_active", "created_at", "updated_at"),
+                  iter(hostings)),
+            Table("hosting_reviews", ("id", "hosting_id", "user_id", "user_email", "performance_rating",
+                                      "support_rating", "price_value_rating", "title", "comment",
+                                      "is_approved", "created_at", "updated_at"),
+                  iter(reviews)),
+            Table("user_activity", ("id", "userId", "activityType", "description", "createdAt"), self.activity()),
+        ]
+
+    def users(self) -> Iterator[Row]:
+        rng = self.rng("users")
+        n = self.config.users
+        for i, user_id in enumerate(self.user_ids):
+            name = f"{rng.choice(WORDS)}{rng.choice(WORDS).title()}{i}"
+            yield (user_id, f"{name.lower()}@example.com", "admin" if i == 0 else "user", True,
+                   name if rng.random() < 0.6 else None, self.iso(self._created_ms(i, n, 900) / 1000))
+
+    def servers(self) -> Iterator[Row]:
+        rng = self.rng("servers")
+        n = self.config.servers
+        for i, server_id in enumerate(self.server_ids):
+            name = f"{rng.choice(WORDS).title()}{rng.choice(WORDS).title()}"
+            created = self.iso(self._created_ms(i, n, 730) / 1000)
+            online = rng.random() < 0.7
+            max_players = rng.choice((100, 200, 500, 1000, 5000))
+            # Popular servers are online and busy more often
+            popularity = self.vote_counts[i] / max(1, self.config.votes) * n
+            players = int(min(max_players, max_players * rng.betavariate(1 + popularity, 4))) if online else 0
+            yield (
+                server_id, f"{name} {i}", f"play.{name.lower()}{i}.net", 25565,
+                f"https://{name.lower()}{i}.net" if rng.random() < 0.5 else None,
+                f"https://cdn.example.com/banners/{i}.gif",
+                f"{rng.choice(CATEGORIES).title()} server with custom plugins",
+                " ".join(rng.choices(WORDS, k=rng.randint(40, 200))),
+                rng.choice(VERSIONS), rng.choice(CATEGORIES), "online" if online else "offline",
+                players, max_players, self.vote_counts[i], self.user_ids[rng.randrange(self.config.users)],
+                "approved" if rng.random() < 0.95 else rng.choice(("pending", "rejected")),
+                created, created,
+            )
+
+    def vote_time(self, rng: random.Random, month_cum: List[float]) -> float:
+        month = bisect_left(month_cum, rng.random() * month_cum[-1])
+        start = self.month_starts[month]
+        end = self.month_starts[month + 1] if month + 1 < len(self.month_starts) else self.end_ts
+        # Burst after the monthly reset, then a long tail (density ~ x^-0.4)
+        return start + (end - start) * rng.random() ** 1.6
+
+    def votes(self) -> Iterator[Row]:
+        rng = self.rng("votes")
+        # Month volume grows over time with noise
+        month_cum = list(itertools.accumulate(
+            (1 + 0.15 * m) * rng.uniform(0.8, 1.2) for m in range(len(self.month_starts))
+        ))
+        voter_pool = max(1000, self.config.votes // 20)
+        voter_cum = zipf_cum_weights(min(voter_pool, 1_000_000), 0.8)
+        n = 0
+        for server_index, count in enumerate(self.vote_counts):
+            server_id = self.server_ids[server_index]
+            voters = rng.choices(range(len(voter_cum)), cum_weights=voter_cum, k=count)
+            for voter in voters:
+                ts = self.vote_time(rng, month_cum)
+                n += 1
+                # The same voter keeps one username (and address) across servers
+                yield (f"vote_{int(ts * 1000)}_{n:09d}", server_id, voter_name(voter),
+                       f"10.{voter >> 16 & 255}.{voter >> 8 & 255}.{voter & 255}", self.iso(ts), False)
+
+    def posts(self) -> Iterator[Row]:
+        rng = self.rng("posts")
+        n = self.config.posts
+        category_cum = list(itertools.accumulate((30, 25, 20, 15, 10)))
+        author_cum = zipf_cum_weights(min(self.config.users, 5000), 1.2)
+        for i in range(n):
+            created = self._created_ms(i, n, 540) / 1000
+            title = " ".join(rng.choices(WORDS, k=rng.randint(3, 8))).title()
+            content = " ".join(rng.choices(WORDS, k=rng.randint(80, 600)))
+            tags = rng.sample(WORDS, rng.randint(0, 4)) or None
+            age_days = (self.end_ts - created) / 86400
+            views = int(rng.paretovariate(1.3) * 20 * math.log1p(age_days))
+            category = BLOG_CATEGORIES[bisect_left(category_cum, rng.random() * category_cum[-1])][0]
+            author = self.user_ids[bisect_left(author_cum, rng.random() * author_cum[-1])]
+            yield (app_id("post", int(created * 1000), rng), category, author, title, f"{title.lower().replace(' ', '-')}-{i}",
+                   content, content[:200], tags, "published", rng.random() < 0.01, views,
+                   0, self.iso(created), self.iso(created))
+
+    def hostings_and_reviews(self) -> Tuple[List[Row], List[Row]]:
+        """Reviews are generated first so each hosting row carries its real aggregates."""
+        rng = self.rng("hostings")
+        n = self.config.hostings
+        counts = zipf_counts(self.config.reviews, n, 1.0, self.rng("reviews:counts")) if n else []
+        hostings, reviews = [], []
+        for h in range(n):
+            created = self._created_ms(h, n, 1000) / 1000
+            hosting_id = app_id("hosting", int(created * 1000), rng)
+            quality = rng.uniform(1.5, 4.8)
+            sums = [0, 0, 0]
+            # Distinct reviewers per hosting: walk the user list from a per-hosting offset
+            offset = rng.randrange(self.config.users)
+            count = min(counts[h], self.config.users)
+            for j in range(count):
+                ts = created + (self.end_ts - created) * rng.random()
+                ratings = [max(1, min(5, round(rng.gauss(quality, 0.9)))) for _ in range(3)]
+                for k in range(3):
+                    sums[k] += ratings[k]
+                user_index = (offset + j) % self.config.users
+                reviews.append((app_id("review", int(ts * 1000), rng), hosting_id, self.user_ids[user_index],
+                                None, *ratings, None, " ".join(rng.choices(WORDS, k=rng.randint(10, 60))),
+                                True, self.iso(ts), self.iso(ts)))
+            averages = [round(total / count, 2) if count else 0 for total in sums]
+            overall = round(sum(sums) / (3 * count), 2) if count else 0
+            hostings.append((hosting_id, f"{rng.choice(WORDS).title()}Host {h}", f"https://host{h}.example.com",
+                             "Minecraft server hosting", round(rng.uniform(30, 300), 2), "TRY",
+                             *averages, overall, count, *sums, h < 5, True, self.iso(created), self.iso(created)))
+        return hostings, reviews
+
+    def activity(self) -> Iterator[Row]:
+        rng = self.rng("activity")
+        user_cum = zipf_cum_weights(self.config.users, 1.0)
+        type_cum = list(itertools.accumulate(ACTIVITY_WEIGHTS))
+        start = self.month_starts[0]
+        for i in range(self.config.activity):
+            user = self.user_ids[bisect_left(user_cum, rng.random() * user_cum[-1])]
+            kind = ACTIVITY_TYPES[bisect_left(type_cum, rng.random() * type_cum[-1])]
+            ts = start + (self.end_ts - start) * rng.random()
+            if kind == "vote":
+                description = f"Voted for {self.server_ids[rng.randrange(self.config.servers)]}"
+            else:
+                description = kind.replace("_", " ").capitalize()
+            yield (f"activity_{int(ts * 1000)}_{i:09d}", user, kind, description, self.iso(ts))
+
+
+# Output
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_field(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, (list, tuple)):
+        items = ('"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"' for item in value)
+        return ("{" + ",".join(items) + "}").translate(COPY_ESCAPES)
+    return str(value).translate(COPY_ESCAPES)
+
+
+def write_copy(tables: List[Table], out, progress) -> int:
+    """Stream a psql script of COPY ... FROM stdin blocks; returns rows written."""
+    total = 0
+    out.write("-- Generated by backend/seed_dataset.py\nBEGIN;\n")
+    # servers.voteCount and the hosting averages already agree with the rows;
+    # keep the row triggers from counting them a second time
+    out.write("SET LOCAL session_replication_role = replica;\n")
+    for table in tables:
+        columns = ", ".join(f'"{column}"' for column in table.columns)
+        out.write(f"COPY {table.name} ({columns}) FROM stdin;\n")
+        lines = []
+        for row in table.rows:
+            lines.append("\t".join(map(copy_field, row)))
+            if len(lines) >= 10_000:
+                out.write("\n".join(lines) + "\n")
+                total += len(lines)
+                progress(table.name, total)
+                lines = []
+        if lines:
+            out.write("\n".join(lines) + "\n")
+            total += len(lines)
+        out.write("\\.\n")
+        progress(table.name, total)
+    out.write("COMMIT;\nANALYZE;\n")
+    return total
+
+
+async def load_rest(tables: List[Table], url: str, key: str, batch: int, concurrency: int,
+                    progress) -> int:
+    """Upsert every table through PostgREST in batches, `concurrency` requests in flight.
+
+    Unlike the COPY script this cannot switch the row triggers off, so once
+    the votes and reviews are in, the totals they feed are recounted from
+    them (see table_dump.RECOUNTS).
+    """
+    from supabase_rest import SupabaseRest
+    from table_dump import RECOUNTS
+
+    db = SupabaseRest(url, key, timeout=120.0)
+    total = 0
+    try:
+        for table in tables:
+            pending = set()
+            for chunk in iter(lambda: list(itertools.islice(table.rows, batch)), []):
+                rows = [dict(zip(table.columns, row)) for row in chunk]
+                pending.add(asyncio.create_task(db.insert(table.name, rows, upsert=True)))
+                total += len(rows)
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                    progress(table.name, total)
+            for task in pending:
+                await task
+            progress(table.name, total)
+        for table in tables:
+            if table.name in RECOUNTS:
+                # The row triggers stay on over REST and have added every loaded
+                # vote and review to the totals the parent rows already carried
+                await db.rpc(RECOUNTS[table.name])
+    finally:
+        await db.close()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = Config()
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--end", help="dataset end time, ISO date (default: start of today, UTC)")
+    for name in ("months", "users", "servers", "votes", "posts", "hostings", "reviews", "activity"):
+        parser.add_argument(f"--{name}", type=int, default=getattr(defaults, name))
+    parser.add_argument("--zipf", type=float, default=defaults.zipf, help="vote skew exponent")
+    parser.add_argument("--out", default="-", help="COPY script path ('-' for stdout, .gz to compress)")
+    parser.add_argument("--target", help="PostgREST base URL to load into instead of writing a script")
+    parser.add_argument("--key", default="fake", help="API key for --target")
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.end:
+        end = datetime.fromisoformat(args.end)
+        end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    else:
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    config = Config(seed=args.seed, end=end, months=args.months, users=args.users, servers=args.servers,
+                    votes=args.votes, posts=args.posts, hostings=args.hostings, reviews=args.reviews,
+                    activity=args.activity, zipf=args.zipf)
+    started = time.monotonic()
+    last_report = [started]
+
+    def progress(table: str, rows: int):
+        now = time.monotonic()
+        if now - last_report[0] >= 2:
+            last_report[0] = now
+            print(f"  {table}: {rows:,} rows, {rows / (now - started):,.0f} rows/s", file=sys.stderr)
+
+    tables = Dataset(config).tables()
+    if args.target:
+        total = asyncio.run(load_rest(tables, args.target, args.key, args.batch, args.concurrency, progress))
+    elif args.out == "-":
+        total = write_copy(tables, sys.stdout, progress)
+    else:
+        opener = gzip.open if args.out.endswith(".gz") else open
+        with opener(args.out, "wt", encoding="utf-8", newline="\n") as out:
+            total = write_copy(tables, out, progress)
+    elapsed = time.monotonic() - started
+    print(f"Generated {total:,} rows in {elapsed:.1f}s ({total / elapsed * 60:,.0f} rows/min)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Field projection and compact encodings for list endpoints.
+
+List views need a handful of columns, yet the frontend returns `select('*')`
+rows with long descriptions and Votifier keys. Clients can ask for
+`?fields=a,b,c` (or a named preset such as `fields=list`) and for
+`Accept: application/msgpack`. orjson and msgpack are used when installed;
+without them responses fall back to compact stdlib JSON.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional encoding
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Named field sets, per list endpoint (paths relative to /api)
+FIELD_PRESETS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "servers": {
+        "list": ("id", "name", "ip", "port", "bannerUrl", "shortDescription", "category",
+                 "status", "onlinePlayers", "maxPlayers", "voteCount", "version", "iconHash", "createdAt"),
+    },
+    "admin/servers/pending": {
+        "list": ("id", "name", "ip", "port", "status", "approvalStatus", "shortDescription",
+                 "onlinePlayers", "maxPlayers", "voteCount", "ownerId", "iconHash", "createdAt"),
+    },
+    "admin/servers/all": {
+        "list": ("id", "name", "ip", "port", "status", "approvalStatus", "isfeatured",
+                 "featureduntil", "shortDescription", "onlinePlayers", "maxPlayers",
+                 "voteCount", "iconHash", "createdAt"),
+    },
+    "admin/users": {
+        "list": ("id", "email", "role", "isActive", "createdAt", "lastSignIn"),
+    },
+    "admin/tickets": {
+        "list": ("id", "userId", "serverId", "subject", "category", "status", "priority",
+                 "createdAt", "updatedAt"),
+    },
+}
+
+
+def parse_fields(value: Optional[str], endpoint: str) -> Optional[Tuple[str, ...]]:
+    """Normalise a `fields=` value into a sorted tuple, or None for all fields."""
+    if not value:
+        return None
+    preset = FIELD_PRESETS.get(endpoint, {}).get(value)
+    if preset is not None:
+        return tuple(sorted(preset))
+    fields = {field.strip() for field in value.split(",") if field.strip()}
+    return tuple(sorted(fields)) or None
+
+
+def project(rows: Iterable[Dict], fields: Optional[Tuple[str, ...]]) -> List[Dict]:
+    if fields is None:
+        return list(rows)
+    return [{field: row[field] for field in fields if field in row} for row in rows]
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick `msgpack` or `json` from an Accept header."""
+    if accept and msgpack is not None:
+        for media_type in MSGPACK_MEDIA_TYPES:
+            if media_type in accept:
+                return "msgpack"
+    return "json"
+
+
+def encode(data: Any, fmt: str = "json") -> Tuple[bytes, str]:
+    """Encode data, returning the body and its media type."""
+    if fmt == "msgpack" and msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True), MSGPACK_MEDIA_TYPES[0]
+    if orjson is not None:
+        return orjson.dumps(data), JSON_MEDIA_TYPE
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), JSON_MEDIA_TYPE
+
+
+def decode_json(content: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Multi-worker launcher for the backend.
+
+    python serve.py --workers 4 --port 8001
+
+Each worker is a separate uvicorn process (uvloop/httptools are picked up
+automatically when installed). With SO_REUSEPORT every worker binds its own
+listening socket and the kernel spreads connections across them; without it
+the supervisor binds once and forks workers that inherit the socket. Workers
+share hot list responses, invalidation generations and counters through a
+SharedCache arena the supervisor creates before forking, and the supervisor
+restarts workers that die.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from shm_cache import SharedCache
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(worker_id: int, args, shm_path: str, sock):
+    import uvicorn
+
+    os.environ["BACKEND_SHM_PATH"] = shm_path
+    os.environ["BACKEND_WORKER_ID"] = str(worker_id)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if sock is None:
+        sock = bind_socket(args.host, args.port, reuse_port=True)
+    sys.path.insert(0, ROOT_DIR)
+    config = uvicorn.Config(
+        "server:app",
+        loop="auto",
+        http="auto",
+        log_level=args.log_level,
+        access_log=False,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shm-slots", type=int, default=4096)
+    parser.add_argument("--shm-slot-size", type=int, default=64 * 1024)
+    parser.add_argument("--no-reuse-port", action="store_true",
+                        help="bind once in the supervisor and share the socket")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args(argv)
+
+    shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    fd, shm_path = tempfile.mkstemp(prefix="mcbackend-", suffix=".shm", dir=shm_dir)
+    os.close(fd)
+    SharedCache.create(shm_path, args.shm_slots, args.shm_slot_size, args.workers).close()
+
+    reuse_port = hasattr(socket, "SO_REUSEPORT") and not args.no_reuse_port
+    shared_sock = None if reuse_port else bind_socket(args.host, args.port, reuse_port=False)
+    context = multiprocessing.get_context("fork")
+
+    def spawn(worker_id):
+        process = context.Process(target=run_worker, args=(worker_id, args, shm_path, shared_sock),
+                                  name=f"backend-worker-{worker_id}")
+        process.start()
+        return process
+
+    workers = {worker_id: spawn(worker_id) for worker_id in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Backend supervisor: {args.workers} workers on {args.host}:{args.port} "
+          f"({'SO_REUSEPORT' if reuse_port else 'shared socket'})")
+    try:
+        while not stopping:
+            time.sleep(0.5)
+            for worker_id, process in list(workers.items()):
+                if not process.is_alive() and not stopping:
+                    print(f"Worker {worker_id} exited with {process.exitcode}, restarting")
+                    workers[worker_id] = spawn(worker_id)
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join(timeout=10)
+        os.unlink(shm_path)
+
+
+if __name__ == "__main__":
+    main()
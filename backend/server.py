@@ -1,10 +1,53 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
+from datetime import datetime, timezone
+import asyncio
+import contextvars
+import hmac
 import httpx
+import json
 import os
+import re
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from activity_log import ACTIVITY_TYPES, MAX_DESCRIPTION, ActivityLog
+from admin_stats import AdminStats
+from approval_pipeline import ApprovalPipeline
+from admission import AdmissionController, AdmissionMiddleware
+from banner_schedule import BannerSchedule
+from blog_stats import BlogCategoryStats
+from bulk_admin import ndjson_lines, parse_operations, run_bulk
+from counter_buffer import CounterBuffer, CounterError, click_through, parse_events
+from disk_cache import DiskCache
+from dns_cache import DnsCache, parse_servers
+from event_log import AccessLogMiddleware, log
+from hosting_ratings import HostingRatings
+from icon_store import IconStore, icon_url
+from memory_debug import GROUPINGS, MemoryTracker, deep_sizeof
+from profiler import ProfilingMiddleware, RequestProfiler
+from response_cache import ResponseCache
+from serialization import decode_json, encode, negotiate, parse_fields, project
+from session_auth import SessionResolver
+from settings_file import SettingsConflict, SettingsFile
+from settings_snapshot import SettingsSnapshot
+from shm_cache import SharedCache
+from supabase_rest import SupabaseError, supabase
+from ticket_queue import ORDERS, PRIORITIES, STATES, TicketQueue
+from top_voters import TopVoterIndex
+from traffic_capture import TrafficRecorder
 
 app = FastAPI()
 
+# Priority admission for /api/* (BACKEND_ADMISSION_LIMIT in-flight per worker, 0 = off).
+# Added before CORS so shed 503s still carry CORS headers.
+admission = AdmissionController.from_env()
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission,
+                       on_shed=lambda index: count("requests_shed"))
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -14,38 +57,1062 @@ app.add_middleware(
 )
 
 # Frontend URL (Next.js server)
-FRONTEND_URL = "http://localhost:3000"
+FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3000")
+
+# Shared-memory arena when running under serve.py with several workers
+shared_cache = None
+if os.environ.get("BACKEND_SHM_PATH"):
+    shared_cache = SharedCache(
+        os.environ["BACKEND_SHM_PATH"], int(os.environ.get("BACKEND_WORKER_ID", "0"))
+    )
+shared_generations = {}
+
+# Persistent L2 cache under the in-memory tiers ("off" disables it)
+DISK_CACHE_PATH = os.environ.get(
+    "BACKEND_L2_CACHE", str(Path(__file__).parent / "cache" / "l2-cache.sqlite3")
+)
+disk_cache = DiskCache(DISK_CACHE_PATH) if DISK_CACHE_PATH != "off" else None
+
+# Pooled client for upstream requests (keeps connections to Next.js alive)
+frontend_client = None
+
+# Opt-in sampled traffic capture (BACKEND_CAPTURE_PATH), replayed by replay.py
+traffic_recorder = TrafficRecorder.from_env()
+upstream_time = contextvars.ContextVar("upstream_time", default=None)
+
+# Token for the /debug endpoints; they are disabled (404) when unset
+ADMIN_TOKEN = os.environ.get("BACKEND_ADMIN_TOKEN")
+
+# On-demand request profiler, started through /debug/profile
+request_profiler = RequestProfiler()
+
+# Memory accounting behind /debug/memory; BACKEND_TRACEMALLOC=<frames> traces from boot
+memory_tracker = MemoryTracker(shared_cache)
+if os.environ.get("BACKEND_TRACEMALLOC"):
+    memory_tracker.start_tracing(int(os.environ["BACKEND_TRACEMALLOC"]))
+
+# In-memory aggregates fed by writes passing through the proxy
+top_voters = TopVoterIndex(
+    supabase,
+    max_servers=int(os.environ.get("BACKEND_TOP_VOTERS_MAX_SERVERS", "2000")),
+    max_age=float(os.environ.get("BACKEND_TOP_VOTERS_RESEED_SECONDS", "600")),
+)
+hosting_ratings = HostingRatings(supabase, float(os.environ.get("BACKEND_HOSTINGS_RECONCILE_SECONDS", "300")))
+counter_buffer = CounterBuffer(supabase, float(os.environ.get("BACKEND_COUNTER_FLUSH_SECONDS", "5")))
+admin_stats = AdminStats(supabase, float(os.environ.get("BACKEND_ADMIN_STATS_RECONCILE_SECONDS", "600")))
+banner_schedule = BannerSchedule(supabase)
+blog_stats = BlogCategoryStats(supabase, float(os.environ.get("BACKEND_BLOG_RECONCILE_SECONDS", "60")))
+activity_log = ActivityLog(supabase, interval=float(os.environ.get("BACKEND_ACTIVITY_FLUSH_SECONDS", "1")),
+                           shared=shared_cache)
+ACTIVITY_RETAIN_MONTHS = int(os.environ.get("BACKEND_ACTIVITY_RETAIN_MONTHS", "12"))
+session_resolver = SessionResolver(supabase.url, supabase.key)
+# Shared resolver for server hostnames (A/AAAA and _minecraft._tcp SRV)
+dns_cache = DnsCache(parse_servers(os.environ.get("BACKEND_DNS_SERVERS")) or None)
+# Server favicons, stored once per distinct image and served from /api/icons/<hash>
+icon_store = IconStore(
+    os.environ.get("BACKEND_ICON_DIR", str(Path(__file__).parent / "cache" / "icons")), supabase
+)
+approval_pipeline = ApprovalPipeline(
+    supabase,
+    workers=int(os.environ.get("BACKEND_VALIDATION_WORKERS", "4")),
+    timeout=float(os.environ.get("BACKEND_VALIDATION_TIMEOUT_SECONDS", "5")),
+    # Only for development against servers on the local network
+    allow_private=os.environ.get("BACKEND_VALIDATION_ALLOW_PRIVATE", "off") == "on",
+    resolver=dns_cache,
+    icons=icon_store,
+    # Under serve.py only worker 0 rescans and probes; the others read its reports
+    shared=shared_cache,
+    owner=os.environ.get("BACKEND_WORKER_ID", "0") == "0",
+)
+ticket_queue = TicketQueue(supabase, float(os.environ.get("BACKEND_TICKETS_RECONCILE_SECONDS", "600")),
+                           float(os.environ.get("BACKEND_TICKETS_REFRESH_SECONDS", "15")))
+settings_snapshot = SettingsSnapshot(FRONTEND_URL, shared=shared_cache)
+# Theme settings file the Next.js "-file" routes used to read per request
+settings_file = SettingsFile(
+    os.environ.get("BACKEND_SETTINGS_FILE",
+                   str(Path(__file__).parent.parent / "frontend" / "data" / "settings.json")),
+    poll_interval=float(os.environ.get("BACKEND_SETTINGS_FILE_POLL_SECONDS", "30")),
+)
+response_cache = ResponseCache()
+
+# Cached list endpoints: path -> (invalidation tag, TTL seconds)
+LIST_ENDPOINTS = {
+    "servers": ("servers", 15.0),
+    "admin/servers/all": ("servers", 15.0),
+    "admin/users": ("users", 15.0),
+}
+
+# Path prefixes whose writes invalidate a list tag
+LIST_INVALIDATION = (
+    ("servers", "servers"),
+    ("admin/servers", "servers"),
+    ("admin/users", "users"),
+    ("auth/create-user", "users"),
+)
+
+background_tasks = []
+
+
+def on_vote(match, payload, params):
+    vote = payload.get("vote") if isinstance(payload, dict) else None
+    if isinstance(vote, dict):
+        top_voters.record_vote(vote)
+    if isinstance(payload, dict) and payload.get("success"):
+        admin_stats.record("votes", 1, vote.get("createdAt") if isinstance(vote, dict) else None)
+
+
+def on_review_created(match, payload, params):
+    if isinstance(payload, dict):
+        hosting_ratings.apply_review(payload)
+
+
+def on_hosting_saved(match, payload, params):
+    if isinstance(payload, dict):
+        hosting_ratings.apply_hosting(payload)
+
+
+def on_hosting_deleted(match, payload, params):
+    hosting_ratings.delete_hosting(match.group(1))
+
+
+def on_settings_changed(match, payload, params):
+    settings_snapshot.invalidate()
+
+
+def on_blog_post_created(match, payload, params):
+    if isinstance(payload, dict):
+        blog_stats.apply_post(payload)
+        admin_stats.record("posts", 1, payload.get("createdAt"))
+
+
+def on_blog_post_deleted(match, payload, params):
+    if params.get("id"):
+        blog_stats.delete_post(params["id"])
+        admin_stats.record("posts", -1)
+
+
+def on_blog_category_created(match, payload, params):
+    if isinstance(payload, dict):
+        blog_stats.apply_category(payload)
+
+
+def on_blog_category_deleted(match, payload, params):
+    if params.get("id"):
+        blog_stats.delete_category(params["id"])
+
+
+def on_server_saved(match, payload, params):
+    if isinstance(payload, dict):
+        approval_pipeline.apply_server(payload)
+
+
+def on_server_deleted(match, payload, params):
+    approval_pipeline.delete_server(match.group(1))
+
+
+def on_ticket_saved(match, payload, params):
+    if isinstance(payload, dict):
+        ticket_queue.apply_ticket(payload)
+
+
+def on_ticket_reply(match, payload, params):
+    if isinstance(payload, dict):
+        ticket_queue.apply_reply({"ticketId": match.group(1), **payload})
+
+
+def on_ticket_deleted(match, payload, params):
+    ticket_queue.delete_ticket(match.group(1))
+
+
+def on_banner_saved(match, payload, params):
+    if isinstance(payload, dict):
+        banner_schedule.apply_banner(payload)
+
+
+def on_banner_deleted(match, payload, params):
+    if params.get("id"):
+        banner_schedule.delete_banner(params["id"])
+
+
+def on_entity_created(name):
+    def handler(match, payload, params):
+        # Created rows come back with an id; "already exists" answers do not
+        if isinstance(payload, dict) and payload.get("id"):
+            admin_stats.record(name, 1, payload.get("createdAt"))
+    return handler
+
+
+def on_entity_deleted(name):
+    def handler(match, payload, params):
+        admin_stats.record(name, -1)
+    return handler
+
+
+# (method, path pattern, handler) for upstream writes we mirror in memory
+WRITE_HOOKS = [
+    ("POST", re.compile(r"^servers/([^/]+)/vote$"), on_vote),
+    ("POST", re.compile(r"^hostings/([^/]+)/reviews$"), on_review_created),
+    ("POST", re.compile(r"^hostings$"), on_hosting_saved),
+    ("PATCH", re.compile(r"^hostings/([^/]+)$"), on_hosting_saved),
+    ("DELETE", re.compile(r"^hostings/([^/]+)$"), on_hosting_deleted),
+    ("PUT", re.compile(r"^admin/settings$"), on_settings_changed),
+    ("POST", re.compile(r"^admin/pages$"), on_settings_changed),
+    ("PUT", re.compile(r"^admin/pages$"), on_settings_changed),
+    ("DELETE", re.compile(r"^admin/pages$"), on_settings_changed),
+    ("POST", re.compile(r"^blog/posts$"), on_blog_post_created),
+    ("DELETE", re.compile(r"^blog/posts$"), on_blog_post_deleted),
+    ("POST", re.compile(r"^blog/categories$"), on_blog_category_created),
+    ("DELETE", re.compile(r"^blog/categories$"), on_blog_category_deleted),
+    ("POST", re.compile(r"^servers$"), on_entity_created("servers")),
+    ("DELETE", re.compile(r"^admin/servers/([^/]+)$"), on_entity_deleted("servers")),
+    ("POST", re.compile(r"^auth/create-user$"), on_entity_created("users")),
+    ("POST", re.compile(r"^tickets$"), on_entity_created("tickets")),
+    ("DELETE", re.compile(r"^admin/tickets/([^/]+)$"), on_entity_deleted("tickets")),
+    ("POST", re.compile(r"^servers$"), on_server_saved),
+    ("PATCH", re.compile(r"^admin/servers/([^/]+)/[a-z]+$"), on_server_saved),
+    ("DELETE", re.compile(r"^admin/servers/([^/]+)$"), on_server_deleted),
+    ("DELETE", re.compile(r"^servers/my/([^/]+)$"), on_server_deleted),
+    ("POST", re.compile(r"^tickets$"), on_ticket_saved),
+    ("POST", re.compile(r"^tickets/([^/]+)/reply$"), on_ticket_reply),
+    ("PATCH", re.compile(r"^admin/tickets/([^/]+)/close$"), on_ticket_saved),
+    ("DELETE", re.compile(r"^admin/tickets/([^/]+)$"), on_ticket_deleted),
+    ("POST", re.compile(r"^banners$"), on_banner_saved),
+    ("PATCH", re.compile(r"^banners$"), on_banner_saved),
+    ("DELETE", re.compile(r"^banners$"), on_banner_deleted),
+]
+
+
+def memory_response_cache():
+    return {"entries": len(response_cache.entries), "bytes": response_cache.bytes,
+            "maxBytes": response_cache.max_bytes}
+
+
+def memory_settings_snapshot():
+    snapshot = settings_snapshot.snapshot
+    entries = snapshot.entries.values() if snapshot is not None else ()
+    return {"entries": len(entries), "bytes": sum(len(entry.body) for entry in entries)}
+
+
+def memory_settings_file():
+    snapshot = settings_file.snapshot
+    return {"bytes": len(snapshot.body) if snapshot is not None else 0}
+
+
+def memory_top_voters():
+    size, truncated = deep_sizeof(top_voters.servers)
+    return {"servers": len(top_voters.servers), "bytes": size, "truncated": truncated}
+
+
+def memory_hosting_ratings():
+    size, truncated = deep_sizeof((hosting_ratings.state, hosting_ratings._rankings))
+    return {"reviews": len(hosting_ratings.state.review_index), "bytes": size, "truncated": truncated}
+
+
+def memory_blog_stats():
+    size, truncated = deep_sizeof(blog_stats.state)
+    return {"posts": len(blog_stats.state.posts), "bytes": size, "truncated": truncated}
+
+
+def memory_counter_buffer():
+    return {"pendingKeys": len(counter_buffer.pending), "maxKeys": counter_buffer.max_keys}
+
+
+def memory_activity_log():
+    size, truncated = deep_sizeof(activity_log.rings)
+    return {"users": len(activity_log.rings), "queued": len(activity_log.queue), "bytes": size,
+            "truncated": truncated}
+
+
+def memory_approval_pipeline():
+    size, truncated = deep_sizeof((approval_pipeline.index, approval_pipeline.pending, approval_pipeline.reports))
+    return {"pending": len(approval_pipeline.pending), "indexed": len(approval_pipeline.index.servers),
+            "bytes": size, "truncated": truncated}
+
+
+def memory_dns_cache():
+    size, truncated = deep_sizeof(dns_cache.cache)
+    return {"entries": len(dns_cache.cache), "maxEntries": dns_cache.max_entries, "bytes": size,
+            "truncated": truncated}
+
+
+def memory_icon_store():
+    return {"entries": len(icon_store.memory), "bytes": icon_store.memory_bytes,
+            "maxBytes": icon_store.max_memory_bytes}
+
+
+def memory_ticket_queue():
+    size, truncated = deep_sizeof(ticket_queue.state)
+    return {"tickets": len(ticket_queue.state.tickets), "bytes": size, "truncated": truncated}
+
+
+def memory_traffic_capture():
+    return {"bytes": len(traffic_recorder.buffer), "maxBytes": traffic_recorder.max_buffer,
+            "dropped": traffic_recorder.dropped}
+
+
+def memory_shared_cache():
+    # Mapped once and shared by every worker, so not part of this worker's RSS growth
+    return {"bytes": len(shared_cache.map), "slots": shared_cache.slots, "shared": True}
+
+
+def memory_profiler():
+    session = request_profiler.session
+    size, truncated = deep_sizeof(session.stacks) if session is not None else (0, False)
+    return {"bytes": size, "truncated": truncated}
+
+
+memory_tracker.register("responseCache", memory_response_cache)
+memory_tracker.register("settingsSnapshot", memory_settings_snapshot)
+memory_tracker.register("settingsFile", memory_settings_file)
+memory_tracker.register("topVoters", memory_top_voters)
+memory_tracker.register("hostingRatings", memory_hosting_ratings)
+memory_tracker.register("blogStats", memory_blog_stats)
+memory_tracker.register("counterBuffer", memory_counter_buffer)
+memory_tracker.register("activityLog", memory_activity_log)
+memory_tracker.register("ticketQueue", memory_ticket_queue)
+memory_tracker.register("approvalPipeline", memory_approval_pipeline)
+memory_tracker.register("dnsCache", memory_dns_cache)
+memory_tracker.register("iconStore", memory_icon_store)
+memory_tracker.register("profiler", memory_profiler)
+if traffic_recorder is not None:
+    memory_tracker.register("trafficCapture", memory_traffic_capture)
+if shared_cache is not None:
+    memory_tracker.register("sharedCache", memory_shared_cache)
+
+
+def count(name: str, amount: int = 1):
+    if shared_cache is not None:
+        shared_cache.add(name, amount)
+
+
+def invalidate_tag(tag: str):
+    """Invalidate cached lists for a tag in this worker and, if shared, in all workers"""
+    response_cache.invalidate(tag)
+    if shared_cache is not None:
+        shared_cache.invalidate(tag)
+        shared_generations[tag] = shared_cache.generation(tag)
+    if disk_cache is not None:
+        disk_cache.invalidate(tag)
+
+
+def sync_shared_invalidations(tag: str):
+    """Drop local entries for a tag another worker has invalidated"""
+    if shared_cache is None:
+        return
+    generation = shared_cache.generation(tag)
+    if shared_generations.get(tag, generation) != generation:
+        response_cache.invalidate(tag)
+    shared_generations[tag] = generation
+
+
+def record_write(path: str, method: str, status_code: int, content: bytes, params=None):
+    """Feed successful upstream writes into the in-memory aggregates"""
+    if status_code >= 300:
+        return
+    if method != "GET":
+        for prefix, tag in LIST_INVALIDATION:
+            if path == prefix or path.startswith(prefix + "/"):
+                invalidate_tag(tag)
+    for hook_method, pattern, handler in WRITE_HOOKS:
+        if hook_method != method:
+            continue
+        match = pattern.match(path)
+        if not match:
+            continue
+        try:
+            payload = json.loads(content) if content else None
+        except ValueError:
+            payload = None
+        try:
+            handler(match, payload, params or {})
+        except Exception as e:
+            log.error("write_hook_error", str(e), m=method, p=path)
+
+
+if traffic_recorder is not None:
+    @app.middleware("http")
+    async def capture_traffic(request: Request, call_next):
+        """Record sampled /api requests for replay.py"""
+        if not request.url.path.startswith("/api/") or not traffic_recorder.sampled():
+            return await call_next(request)
+        arrival = time.monotonic()
+        # Shares the access log's timer when there is one
+        timing = upstream_time.get()
+        token = None
+        if timing is None:
+            timing = [0.0]
+            token = upstream_time.set(timing)
+        try:
+            response = await call_next(request)
+        finally:
+            if token is not None:
+                upstream_time.reset(token)
+        traffic_recorder.record(
+            arrival,
+            request.method,
+            request.url.path,
+            request.url.query,
+            int(request.headers.get("content-length") or 0),
+            time.monotonic() - arrival,
+            timing[0],
+            response.status_code,
+            int(response.headers.get("content-length") or 0),
+        )
+        return response
+
+
+# Access log around everything but the profiler, so shed and queued requests are timed too
+app.add_middleware(AccessLogMiddleware, log=log, upstream_time=upstream_time)
+
+# Outermost, so a profiled request's own task is the one that gets tagged
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+
+@app.on_event("startup")
+async def startup():
+    background_tasks.append(asyncio.create_task(log.run_writer()))
+    background_tasks.append(asyncio.create_task(hosting_ratings.run_reconciler()))
+    background_tasks.append(asyncio.create_task(blog_stats.run_reconciler()))
+    background_tasks.append(asyncio.create_task(admin_stats.run_reconciler()))
+    background_tasks.append(asyncio.create_task(banner_schedule.run_refresher()))
+    background_tasks.append(asyncio.create_task(ticket_queue.run_reconciler()))
+    if approval_pipeline.owner:
+        background_tasks.append(asyncio.create_task(approval_pipeline.run_rescanner()))
+        background_tasks.append(asyncio.create_task(approval_pipeline.run_workers()))
+    background_tasks.append(asyncio.create_task(counter_buffer.run_flusher()))
+    background_tasks.append(asyncio.create_task(activity_log.run_flusher()))
+    background_tasks.append(asyncio.create_task(activity_log.run_maintenance(ACTIVITY_RETAIN_MONTHS)))
+    background_tasks.append(asyncio.create_task(settings_snapshot.run_refresher()))
+    background_tasks.append(asyncio.create_task(settings_file.run_watcher()))
+    if disk_cache is not None:
+        background_tasks.append(asyncio.create_task(disk_cache.run_compactor()))
+    if traffic_recorder is not None:
+        background_tasks.append(asyncio.create_task(traffic_recorder.run_flusher()))
+    if shared_cache is not None:
+        background_tasks.append(asyncio.create_task(memory_tracker.run_publisher()))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await counter_buffer.flush()
+    await activity_log.flush()
+    await session_resolver.close()
+    await approval_pipeline.close()
+    await supabase.close()
+    if frontend_client is not None:
+        await frontend_client.aclose()
+    if disk_cache is not None:
+        disk_cache.close()
+    if traffic_recorder is not None:
+        traffic_recorder.flush()
+    log.flush()
+
+
+async def serve_snapshot(key: str, request: Request):
+    """Serve a settings snapshot entry with a strong ETag, or proxy until warm"""
+    entry = await settings_snapshot.current(key)
+    if entry is None:
+        path, _, _ = key.partition("?")
+        return await proxy_to_frontend(path, request)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+
+@app.get("/api/settings/public")
+async def get_public_settings(request: Request):
+    return await serve_snapshot("settings/public", request)
+
+
+@app.get("/api/admin/settings")
+async def get_admin_settings(request: Request):
+    return await serve_snapshot("admin/settings", request)
+
+
+def settings_file_response(snapshot, cache_control: str, status_code: int = 200) -> Response:
+    return Response(content=snapshot.body, status_code=status_code, media_type="application/json",
+                    headers={"ETag": snapshot.etag, "Cache-Control": cache_control})
+
+
+@app.get("/api/settings/public-file")
+async def get_public_settings_file():
+    """Theme settings file, served from the in-memory snapshot"""
+    snapshot = await settings_file.ensure_loaded()
+    return settings_file_response(snapshot, "no-store, no-cache, must-revalidate, max-age=0")
+
+
+@app.get("/api/admin/settings-file")
+async def get_admin_settings_file():
+    """Theme settings file with its version as ETag (send it back as If-Match)"""
+    snapshot = await settings_file.ensure_loaded()
+    return settings_file_response(snapshot, "no-store, no-cache, must-revalidate")
+
+
+@app.put("/api/admin/settings-file")
+async def put_admin_settings_file(request: Request):
+    """Atomic settings file update; 412 when If-Match names an older version"""
+    try:
+        changes = json.loads(await request.body())
+    except ValueError:
+        return JSONResponse({"error": "Invalid JSON body"}, status_code=400)
+    if not isinstance(changes, dict):
+        return JSONResponse({"error": "Invalid JSON body"}, status_code=400)
+    if_match = request.headers.get("if-match")
+    expected = None
+    if if_match and if_match.strip() != "*":
+        expected = if_match.strip().removeprefix("W/").strip('"')
+    try:
+        snapshot = await settings_file.update(changes, expected)
+    except SettingsConflict as e:
+        return JSONResponse(
+            {"error": "Ayarlar başka bir oturumda değiştirildi", "version": e.snapshot.version,
+             "settings": dict(e.snapshot.settings)},
+            status_code=412, headers={"ETag": e.snapshot.etag},
+        )
+    except OSError as e:
+        log.error("settings_file_write_error", str(e))
+        return JSONResponse({"error": "Dosya yazılamadı"}, status_code=500)
+    return settings_file_response(snapshot, "no-store")
+
+
+@app.get("/api/pages")
+async def get_published_pages(request: Request, footer: str = None):
+    return await serve_snapshot("pages?footer=true" if footer == "true" else "pages", request)
+
+
+@app.get("/api/servers/{server_id}/top-voters")
+async def get_top_voters(server_id: str, request: Request, scope: str = "month", limit: int = 10):
+    """Top voters served from the incremental index (scope=month|all)"""
+    state = await top_voters.get(server_id)
+    if state is None:
+        return await proxy_to_frontend(f"servers/{server_id}/top-voters", request)
+    limit = max(1, min(limit, 10))
+    if scope == "all":
+        return state.top_all_time(limit)
+    return state.top_monthly(limit)
+
+
+@app.get("/api/servers/{server_id}/status")
+async def get_server_status(server_id: str, request: Request):
+    """Live status with the inline favicon replaced by its content-addressed URL"""
+    response = await proxy_to_frontend(f"servers/{server_id}/status", request)
+    if response.status_code != 200:
+        return response
+    try:
+        status = json.loads(response.body)
+    except ValueError:
+        return response
+    if not isinstance(status, dict):
+        return response
+    hash_ = await icon_store.put(status.pop("icon", None))
+    status["icon"] = icon_url(hash_) if hash_ else None
+    status["iconHash"] = hash_
+    # Offline servers send no icon; keep the last known one
+    if status.get("online"):
+        await icon_store.assign(server_id, hash_)
+    return status
+
+
+@app.get("/api/icons/{icon_hash}")
+async def get_icon(icon_hash: str, request: Request):
+    """Stored server icon; the URL names the content, so it is cached forever"""
+    data = await icon_store.get(icon_hash)
+    if data is None:
+        return JSONResponse({"error": "Icon not found"}, status_code=404)
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{icon_hash}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="image/png", headers=headers)
+
+
+@app.get("/api/hostings")
+async def get_hostings(request: Request, sortBy: str = "avg_overall", featured: str = None):
+    """Hostings ranked from the in-memory rating aggregates"""
+    if not await hosting_ratings.ensure_loaded():
+        return await proxy_to_frontend("hostings", request)
+    return hosting_ratings.list_hostings(sortBy, featured == "true")
+
+
+@app.get("/api/hostings/{hosting_id}")
+async def get_hosting(hosting_id: str, request: Request):
+    """Hosting with its approved reviews, newest first"""
+    if not await hosting_ratings.ensure_loaded():
+        return await proxy_to_frontend(f"hostings/{hosting_id}", request)
+    hosting = hosting_ratings.hostings.get(hosting_id)
+    if hosting is None:
+        return JSONResponse({"error": "Hosting not found"}, status_code=404)
+    reviews = hosting_ratings.list_reviews(hosting_id, limit=hosting_ratings.review_count(hosting_id))
+    return {**hosting, "reviews": reviews}
+
+
+@app.get("/api/hostings/{hosting_id}/reviews")
+async def get_hosting_reviews(hosting_id: str, request: Request, limit: int = 50, offset: int = 0):
+    """Paginated approved reviews, newest first"""
+    if not await hosting_ratings.ensure_loaded():
+        return await proxy_to_frontend(f"hostings/{hosting_id}/reviews", request)
+    return hosting_ratings.list_reviews(hosting_id, max(1, limit), max(0, offset))
+
+
+@app.get("/api/hostings/{hosting_id}/ratings")
+async def get_hosting_ratings(hosting_id: str):
+    """Averages and per-star distribution for each rating dimension"""
+    if not await hosting_ratings.ensure_loaded():
+        return JSONResponse({"error": "Ratings unavailable"}, status_code=503)
+    distribution = hosting_ratings.distribution(hosting_id)
+    if distribution is None:
+        return JSONResponse({"error": "Hosting not found"}, status_code=404)
+    return distribution
+
+
+@app.get("/api/blog/categories")
+async def get_blog_categories(request: Request):
+    """Categories with topic/reply counts and subcategory rollups from memory"""
+    if not await blog_stats.ensure_loaded():
+        return await proxy_to_frontend("blog/categories", request)
+    return Response(content=blog_stats.body(), media_type="application/json")
+
+
+@app.get("/api/blog/posts")
+async def get_blog_posts(request: Request, slug: str = None):
+    """Blog posts; reading one by slug counts a buffered view instead of writing it"""
+    response = await proxy_to_frontend("blog/posts", request)
+    if not slug or response.status_code != 200:
+        return response
+    try:
+        post = json.loads(response.body)
+    except ValueError:
+        return response
+    if not isinstance(post, dict) or not post.get("id"):
+        return response
+    counter_buffer.add("post_view", post["id"])
+    post["viewCount"] = (post.get("viewCount") or 0) + counter_buffer.unflushed("post_view", post["id"])
+    return JSONResponse(post)
+
+
+@app.post("/api/counters")
+async def ingest_counters(request: Request):
+    """Buffer post views and banner views/clicks, flushed in batches"""
+    try:
+        events = parse_events(await request.json())
+    except ValueError as e:
+        return JSONResponse({"error": str(e) if isinstance(e, CounterError) else "Invalid JSON"},
+                            status_code=400)
+    for counter, item_id in events:
+        counter_buffer.add(counter, item_id)
+    return JSONResponse({"accepted": len(events)}, status_code=202)
+
+
+@app.get("/api/banners/active")
+async def get_active_banners(request: Request, position: str = None, rotate: str = None):
+    """Today's banners from the schedule index; rotate=1 orders them by weighted lottery"""
+    if not await banner_schedule.ensure_loaded():
+        return await proxy_to_frontend("banners/active", request)
+    body = banner_schedule.active(position, rotate in ("1", "true"))
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/api/banners/active/track")
+async def track_banner_click(request: Request):
+    """Count a banner click (buffered)"""
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    banner_id = body.get("bannerId") if isinstance(body, dict) else None
+    if not isinstance(banner_id, str) or not banner_id:
+        return JSONResponse({"error": "Banner ID required"}, status_code=400)
+    counter_buffer.add("banner_click", banner_id)
+    return {"success": True}
+
+
+@app.get("/api/profile/activity")
+async def get_profile_activity(request: Request, limit: int = 10):
+    """The signed-in user's latest activity, from their in-memory ring"""
+    if not supabase.configured:
+        return await proxy_to_frontend("profile/activity", request)
+    user = await session_resolver.user(request)
+    if user is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    events = await activity_log.recent(user["id"], max(limit, 0))
+    if events is None:
+        return await proxy_to_frontend("profile/activity", request)
+    return events
+
+
+@app.post("/api/profile/activity")
+async def create_profile_activity(request: Request):
+    """Queue an activity event for the signed-in user (written in batches)"""
+    if not supabase.configured:
+        return await proxy_to_frontend("profile/activity", request)
+    user = await session_resolver.user(request)
+    if user is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    if not isinstance(body, dict) or not body.get("activityType") or not body.get("description"):
+        return JSONResponse({"error": "Missing required fields"}, status_code=400)
+    if body["activityType"] not in ACTIVITY_TYPES:
+        return JSONResponse({"error": "Invalid activity type"}, status_code=400)
+    if not isinstance(body["description"], str) or len(body["description"]) > MAX_DESCRIPTION:
+        return JSONResponse({"error": f"Description must be text of at most {MAX_DESCRIPTION} characters"},
+                            status_code=400)
+    event = activity_log.record(user["id"], body["activityType"], body["description"])
+    if event is None:
+        return JSONResponse({"error": "Activity log is busy, try again"}, status_code=503)
+    return JSONResponse(event, status_code=201)
+
+
+@app.get("/api/admin/servers/pending")
+async def get_pending_servers(request: Request, order: str = "score"):
+    """Pending servers with validation reports, duplicates and score; best first (order=newest: by date)"""
+    if not await approval_pipeline.ensure_loaded():
+        return await proxy_to_frontend("admin/servers/pending", request)
+    if order not in ("score", "newest"):
+        return JSONResponse({"error": "order must be score or newest"}, status_code=400)
+    fields = parse_fields(request.query_params.get("fields"), "admin/servers/pending")
+    if fields is not None and "validation" not in fields:
+        fields = tuple(sorted(fields + ("validation",)))
+    body, media_type = encode(project(approval_pipeline.queue(order), fields),
+                              negotiate(request.headers.get("accept")))
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+@app.post("/api/admin/servers/{server_id}/validate")
+async def validate_pending_server(server_id: str):
+    """Re-run the approval checks of a pending server now"""
+    if not await approval_pipeline.ensure_loaded():
+        return JSONResponse({"error": "Approval pipeline is not available"}, status_code=503)
+    server = approval_pipeline.pending.get(server_id)
+    if server is None:
+        return JSONResponse({"error": "Pending server not found"}, status_code=404)
+    await approval_pipeline.validate(server)
+    return approval_pipeline.enrich(server)
+
+
+@app.get("/api/admin/tickets")
+async def get_admin_tickets(request: Request, status: str = None, priority: str = None, order: str = "newest",
+                            limit: int = None, offset: int = 0):
+    """Tickets from the queue indexes; status/priority filters, order=newest|queue, limit/offset pages"""
+    if not await ticket_queue.ensure_loaded():
+        return await proxy_to_frontend("admin/tickets", request)
+    fields = parse_fields(request.query_params.get("fields"), "admin/tickets")
+    fmt = negotiate(request.headers.get("accept"))
+    if status is None and priority is None and order == "newest" and limit is None and not offset:
+        body, media_type = ticket_queue.listing(fields, fmt)
+        return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+    if status is not None and status not in STATES:
+        return JSONResponse({"error": f"status must be one of {', '.join(STATES)}"}, status_code=400)
+    if priority is not None and priority not in PRIORITIES:
+        return JSONResponse({"error": f"priority must be one of {', '.join(PRIORITIES)}"}, status_code=400)
+    if order not in ORDERS:
+        return JSONResponse({"error": f"order must be one of {', '.join(ORDERS)}"}, status_code=400)
+    total, rows = ticket_queue.view(status, priority, None, order, max(0, offset),
+                                    None if limit is None else max(0, limit))
+    body, media_type = encode(project(rows, fields), fmt)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept", "X-Total-Count": str(total)})
+
+
+@app.get("/api/admin/tickets/counters")
+async def get_ticket_counters(request: Request):
+    """Queue sizes, tickets awaiting an answer and SLA breaches"""
+    if not await ticket_queue.ensure_loaded():
+        return JSONResponse({"error": "Ticket queue is not available"}, status_code=503)
+    return ticket_queue.counters()
+
+
+@app.get("/api/tickets/my")
+async def get_my_tickets(request: Request, status: str = None, limit: int = None, offset: int = 0):
+    """The signed-in user's tickets, newest first"""
+    if not await ticket_queue.ensure_loaded():
+        return await proxy_to_frontend("tickets/my", request)
+    user = await session_resolver.user(request)
+    if user is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    if status is not None and status not in STATES:
+        return JSONResponse({"error": f"status must be one of {', '.join(STATES)}"}, status_code=400)
+    total, rows = ticket_queue.view(status, None, user["id"], "newest", max(0, offset),
+                                    None if limit is None else max(0, limit))
+    return JSONResponse(rows, headers={"X-Total-Count": str(total)})
+
+
+@app.get("/api/tickets/my/counters")
+async def get_my_ticket_counters(request: Request):
+    """The signed-in user's ticket counts; unread = answered by support, awaiting the user"""
+    if not await ticket_queue.ensure_loaded():
+        return JSONResponse({"error": "Ticket queue is not available"}, status_code=503)
+    user = await session_resolver.user(request)
+    if user is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return ticket_queue.user_counters(user["id"])
+
+
+@app.get("/api/tickets")
+async def get_user_tickets(request: Request, userId: str = None):
+    """A user's tickets, newest first"""
+    if not userId or not await ticket_queue.ensure_loaded():
+        return await proxy_to_frontend("tickets", request)
+    return ticket_queue.view(user_id=userId)[1]
+
+
+@app.get("/api/admin/stats")
+async def get_admin_stats(request: Request):
+    """Dashboard totals plus hourly/daily new-row series, from memory"""
+    if not await admin_stats.ensure_loaded():
+        return await proxy_to_frontend("admin/stats", request)
+    return admin_stats.snapshot()
+
+
+@app.get("/api/admin/banners/stats")
+async def banner_stats():
+    """Views, clicks and click-through rate per banner"""
+    if not supabase.configured:
+        return JSONResponse({"error": "Database is not configured"}, status_code=503)
+    try:
+        banners = await supabase.select("banners", {
+            "select": "id,serverName,position,isActive,viewCount,clickCount", "order": "createdAt.desc",
+        })
+    except SupabaseError as e:
+        log.error("banner_stats_error", str(e))
+        return JSONResponse({"error": "Failed to fetch banners"}, status_code=500)
+    return [click_through(banner, counter_buffer) for banner in banners]
+
+
+async def review_access(request: Request, hosting_id: str, review_id: str):
+    """"admin" or "author" for a caller who may change the review, else the error response"""
+    if ADMIN_TOKEN and check_admin(request) is None:
+        return "admin"
+    user = await session_resolver.user(request)
+    if user is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    try:
+        reviews = await supabase.select("hosting_reviews", {
+            "id": f"eq.{review_id}", "hosting_id": f"eq.{hosting_id}", "select": "user_id",
+        })
+        users = await supabase.select("users", {"id": f"eq.{user['id']}", "select": "role"})
+    except SupabaseError as e:
+        log.error("review_access_error", str(e), review=review_id)
+        return JSONResponse({"error": "Failed to check review access"}, status_code=500)
+    if not reviews:
+        return JSONResponse({"error": "Review not found"}, status_code=404)
+    if users and users[0].get("role") == "admin":
+        return "admin"
+    if reviews[0].get("user_id") == user["id"]:
+        return "author"
+    return JSONResponse({"error": "Forbidden"}, status_code=403)
+
+
+@app.patch("/api/hostings/{hosting_id}/reviews/{review_id}")
+async def update_hosting_review(hosting_id: str, review_id: str, request: Request):
+    """Edit a review (ratings, text or approval) and apply the delta; authors or admins only"""
+    access = await review_access(request, hosting_id, review_id)
+    if isinstance(access, Response):
+        return access
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    for column in ("performance_rating", "support_rating", "price_value_rating"):
+        value = body.get(column)
+        # bool is an int subclass; true is not a rating of 1
+        if column in body and not (type(value) is int and 1 <= value <= 5):
+            return JSONResponse({"error": "Ratings must be between 1 and 5"}, status_code=400)
+    allowed = {"performance_rating", "support_rating", "price_value_rating", "title", "comment"}
+    if access == "admin":
+        allowed |= {"is_approved", "is_verified"}
+    elif any(key in body for key in ("is_approved", "is_verified")):
+        return JSONResponse({"error": "Only admins can approve or verify reviews"}, status_code=403)
+    values = {key: value for key, value in body.items() if key in allowed}
+    values["updated_at"] = datetime.now(timezone.utc).isoformat()
+    try:
+        rows = await supabase.update(
+            "hosting_reviews",
+            {"id": f"eq.{review_id}", "hosting_id": f"eq.{hosting_id}"},
+            values,
+            returning=True,
+        )
+    except SupabaseError as e:
+        log.error("review_update_error", str(e), review=review_id)
+        return JSONResponse({"error": "Failed to update review"}, status_code=500)
+    if not rows:
+        return JSONResponse({"error": "Review not found"}, status_code=404)
+    hosting_ratings.apply_review(rows[0])
+    return rows[0]
+
+
+@app.delete("/api/hostings/{hosting_id}/reviews/{review_id}")
+async def delete_hosting_review(hosting_id: str, review_id: str, request: Request):
+    """Delete a review and apply the delta; authors or admins only"""
+    access = await review_access(request, hosting_id, review_id)
+    if isinstance(access, Response):
+        return access
+    try:
+        rows = await supabase.delete(
+            "hosting_reviews",
+            {"id": f"eq.{review_id}", "hosting_id": f"eq.{hosting_id}"},
+            returning=True,
+        )
+    except SupabaseError as e:
+        log.error("review_delete_error", str(e), review=review_id)
+        return JSONResponse({"error": "Failed to delete review"}, status_code=500)
+    if not rows:
+        return JSONResponse({"error": "Review not found"}, status_code=404)
+    hosting_ratings.delete_review(review_id)
+    return {"success": True, "message": "Review deleted successfully"}
+
+
+def after_bulk(entity: str):
+    invalidate_tag(entity)
+    if entity == "tickets" and ticket_queue.loaded:
+        # Bulk closes and deletes do not pass through the write hooks
+        background_tasks.append(asyncio.create_task(ticket_queue.reconcile()))
+    if entity == "servers" and approval_pipeline.loaded:
+        background_tasks.append(asyncio.create_task(approval_pipeline.rescan()))
+
+
+@app.post("/api/admin/bulk/{entity}")
+async def bulk_admin(entity: str, request: Request):
+    """Apply actions to many servers, tickets or users; streams NDJSON per-item results"""
+    denied = check_admin(request)
+    if denied is not None:
+        return denied
+    try:
+        operations = parse_operations(entity, await request.json())
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not supabase.configured:
+        return JSONResponse({"error": "Database is not configured"}, status_code=503)
+    return StreamingResponse(
+        ndjson_lines(run_bulk(supabase, entity, operations), lambda: after_bulk(entity)),
+        media_type="application/x-ndjson",
+    )
+
+
+def forward_headers(request: Request) -> dict:
+    """Request headers minus hop-by-hop ones"""
+    headers = {}
+    for key, value in request.headers.items():
+        if key.lower() not in ['host', 'content-length', 'transfer-encoding', 'connection']:
+            headers[key] = value
+    return headers
+
+
+async def fetch_frontend(method: str, path: str, query: str = "", headers: dict = None,
+                         body: bytes = None) -> httpx.Response:
+    """Make a request to the Next.js frontend"""
+    global frontend_client
+    target_url = f"{FRONTEND_URL}/api/{path}"
+    if query:
+        target_url += f"?{query}"
+    if frontend_client is None:
+        frontend_client = httpx.AsyncClient(
+            timeout=30.0, limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        )
+    timing = upstream_time.get()
+    started = time.perf_counter()
+    try:
+        return await frontend_client.request(
+            method=method,
+            url=target_url,
+            headers=headers,
+            content=body,
+        )
+    finally:
+        if timing is not None:
+            timing[0] += time.perf_counter() - started
+
+
+async def serve_list(endpoint: str, request: Request):
+    """List endpoint with `fields=` projection, msgpack/JSON negotiation and caching"""
+    tag, ttl = LIST_ENDPOINTS[endpoint]
+    fields = parse_fields(request.query_params.get("fields"), endpoint)
+    fmt = negotiate(request.headers.get("accept"))
+    query = urlencode([(k, v) for k, v in request.query_params.multi_items() if k != "fields"])
+    key = ("list", endpoint, query, fields, fmt)
+    sync_shared_invalidations(tag)
+    cached = response_cache.get(key)
+    if cached is None and shared_cache is not None:
+        value = shared_cache.get(key)
+        if value is not None:
+            media_type, _, body = value.partition(b"\n")
+            cached = (body, media_type.decode())
+            response_cache.put(key, cached, ttl, size=len(body), tags=[tag])
+            count("shared_cache_hits")
+    if cached is None and disk_cache is not None:
+        value = await disk_cache.get(key)
+        if value is not None:
+            media_type, _, body = value.partition(b"\n")
+            cached = (body, media_type.decode())
+            response_cache.put(key, cached, ttl, size=len(body), tags=[tag])
+            if shared_cache is not None:
+                shared_cache.put(key, value, ttl, tag)
+            count("disk_cache_hits")
+    if cached is None:
+        count("list_cache_misses")
+        generation = shared_cache.generation(tag) if shared_cache is not None else None
+        fetched_at = time.time()
+        rows_key = ("rows", endpoint, query)
+        rows = response_cache.get(rows_key)
+        if rows is None:
+            try:
+                response = await fetch_frontend("GET", endpoint, query, forward_headers(request))
+            except Exception as e:
+                log.error("proxy_error", str(e), p=f"/api/{endpoint}")
+                count("upstream_errors")
+                return JSONResponse({"error": f"Proxy error: {e}"}, status_code=500)
+            rows = decode_json(response.content) if response.status_code == 200 else None
+            if not isinstance(rows, list):
+                return Response(
+                    content=response.content,
+                    status_code=response.status_code,
+                    media_type=response.headers.get("content-type", "application/json")
+                )
+            response_cache.put(rows_key, rows, ttl, size=len(response.content), tags=[tag])
+        cached = encode(project(rows, fields), fmt)
+        response_cache.put(key, cached, ttl, size=len(cached[0]), tags=[tag])
+        value = cached[1].encode() + b"\n" + cached[0]
+        if shared_cache is not None:
+            shared_cache.put(key, value, ttl, tag, generation)
+        if disk_cache is not None:
+            disk_cache.put(key, value, ttl, tag, fetched_at)
+    else:
+        count("list_cache_hits")
+    body, media_type = cached
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def make_list_route(endpoint: str):
+    async def list_route(request: Request):
+        return await serve_list(endpoint, request)
+    return list_route
+
+
+for list_endpoint in LIST_ENDPOINTS:
+    app.add_api_route(f"/api/{list_endpoint}", make_list_route(list_endpoint), methods=["GET"])
+
 
 @app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
 async def proxy_to_frontend(path: str, request: Request):
     """Proxy all /api/* requests to Next.js frontend"""
+    count("requests")
     try:
-        # Build target URL
-        target_url = f"{FRONTEND_URL}/api/{path}"
-        
-        # Get query params
-        if request.query_params:
-            target_url += f"?{request.query_params}"
-        
         # Get request body for POST/PUT/PATCH
         body = None
         if request.method in ["POST", "PUT", "PATCH"]:
             body = await request.body()
         
-        # Get headers (filter out hop-by-hop headers)
-        headers = {}
-        for key, value in request.headers.items():
-            if key.lower() not in ['host', 'content-length', 'transfer-encoding', 'connection']:
-                headers[key] = value
-        
         # Make request to frontend
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                content=body,
-            )
+        response = await fetch_frontend(
+            request.method, path, str(request.query_params), forward_headers(request), body
+        )
+        
+        record_write(path, request.method, response.status_code, response.content, request.query_params)
         
         # Return response
         return Response(
@@ -55,7 +1122,8 @@ async def proxy_to_frontend(path: str, request: Request):
             media_type=response.headers.get("content-type", "application/json")
         )
     except Exception as e:
-        print(f"Proxy error: {e}")
+        log.error("proxy_error", str(e), m=request.method, p=f"/api/{path}")
+        count("upstream_errors")
         return Response(
             content=f'{{"error": "Proxy error: {str(e)}"}}',
             status_code=500,
@@ -65,3 +1133,163 @@ async def proxy_to_frontend(path: str, request: Request):
 @app.get("/")
 async def root():
     return {"message": "Backend proxy is running"}
+
+
+def check_admin(request: Request):
+    """None when the request carries the admin token, else the error response"""
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    supplied = request.headers.get("x-admin-token") or \
+        request.headers.get("authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return None
+
+
+@app.post("/debug/profile")
+async def start_profile(request: Request, requests: int = 50, duration: float = 30.0,
+                        interval_ms: float = 5.0, sample_rate: float = 1.0, path: str = "/api/"):
+    """Profile the next `requests` matching requests handled by this worker"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    try:
+        session = request_profiler.start(
+            max_requests=requests, duration=duration, interval=interval_ms / 1000,
+            sample_rate=sample_rate, path_prefix=path,
+        )
+    except RuntimeError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return {"pid": os.getpid(), **session.report()}
+
+
+@app.get("/debug/profile")
+async def get_profile(request: Request, format: str = "json"):
+    """Current or last session: JSON summary, or collapsed stacks with format=collapsed"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    session = request_profiler.session
+    if session is None:
+        return JSONResponse({"error": "No profiling session"}, status_code=404)
+    if format == "collapsed":
+        return PlainTextResponse(session.collapsed())
+    return {"pid": os.getpid(), **session.report()}
+
+
+@app.delete("/debug/profile")
+async def stop_profile(request: Request):
+    """Stop the running session early"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    session = request_profiler.stop()
+    if session is None:
+        return JSONResponse({"error": "No profiling session"}, status_code=404)
+    return {"pid": os.getpid(), **session.report()}
+
+
+@app.get("/debug/memory")
+async def get_memory(request: Request):
+    """RSS, live blocks, gc counts, per-subsystem bytes and tracemalloc state for this worker"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    return {"pid": os.getpid(), **memory_tracker.report()}
+
+
+@app.post("/debug/memory/tracemalloc")
+async def start_tracemalloc(request: Request, frames: int = 1):
+    """Start tracing allocations, keeping `frames` frames per traceback"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    memory_tracker.start_tracing(frames)
+    return {"pid": os.getpid(), **memory_tracker.totals()}
+
+
+@app.delete("/debug/memory/tracemalloc")
+async def stop_tracemalloc(request: Request):
+    """Stop tracing and drop the stored snapshots"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    memory_tracker.stop_tracing()
+    return {"pid": os.getpid(), **memory_tracker.totals()}
+
+
+@app.post("/debug/memory/snapshots")
+async def take_memory_snapshot(request: Request, label: str = None, group: str = "lineno", limit: int = 25):
+    """Store a tracemalloc snapshot under `label` and return its top allocation sites"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    if group not in GROUPINGS:
+        return JSONResponse({"error": f"group must be one of {', '.join(GROUPINGS)}"}, status_code=400)
+    try:
+        label, snapshot = memory_tracker.take_snapshot(label)
+    except RuntimeError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return {"pid": os.getpid(), "label": label, **memory_tracker.top(snapshot, group, limit)}
+
+
+@app.get("/debug/memory/diff")
+async def diff_memory_snapshots(request: Request, base: str, target: str = None, group: str = "lineno",
+                                limit: int = 25):
+    """Allocation growth from snapshot `base` to `target` (default: a fresh snapshot)"""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    if group not in GROUPINGS:
+        return JSONResponse({"error": f"group must be one of {', '.join(GROUPINGS)}"}, status_code=400)
+    base_snapshot = memory_tracker.get_snapshot(base)
+    if base_snapshot is None:
+        return JSONResponse({"error": f"No snapshot {base!r}"}, status_code=404)
+    if target is None:
+        try:
+            target, target_snapshot = memory_tracker.take_snapshot()
+        except RuntimeError as e:
+            return JSONResponse({"error": str(e)}, status_code=409)
+    else:
+        target_snapshot = memory_tracker.get_snapshot(target)
+        if target_snapshot is None:
+            return JSONResponse({"error": f"No snapshot {target!r}"}, status_code=404)
+    return {"pid": os.getpid(), "base": base, "target": target,
+            **memory_tracker.diff(base_snapshot, target_snapshot, group, limit)}
+
+
+@app.get("/stats")
+async def stats():
+    """Cache and request counters (summed over workers when running under serve.py)"""
+    result = {
+        "pid": os.getpid(),
+        "responseCache": {
+            "entries": len(response_cache.entries),
+            "bytes": response_cache.bytes,
+            "hits": response_cache.hits,
+            "misses": response_cache.misses,
+        },
+    }
+    result["log"] = log.stats()
+    result["blogStats"] = blog_stats.stats()
+    result["adminStats"] = admin_stats.stats()
+    result["topVoters"] = top_voters.stats()
+    result["hostingRatings"] = hosting_ratings.stats()
+    result["bannerSchedule"] = banner_schedule.stats()
+    result["ticketQueue"] = ticket_queue.stats()
+    result["approvalPipeline"] = approval_pipeline.stats()
+    result["dns"] = dns_cache.stats()
+    result["icons"] = icon_store.stats()
+    result["settingsSnapshot"] = settings_snapshot.stats()
+    result["settingsFile"] = settings_file.stats()
+    result["viewCounters"] = counter_buffer.stats()
+    result["activityLog"] = activity_log.stats()
+    result["sessions"] = session_resolver.stats()
+    if admission is not None:
+        result["admission"] = admission.stats()
+    if shared_cache is not None:
+        result["workers"] = shared_cache.workers
+        result["counters"] = shared_cache.counter_totals()
+    if disk_cache is not None:
+        result["diskCache"] = await disk_cache.stats()
+    return result
@@ -0,0 +1,113 @@
+"""Resolve the Supabase user behind a request, with a short-lived cache.
+
+The access token comes from `Authorization: Bearer ...` or from the
+supabase-js session cookie (`sb-<project>-auth-token`, possibly split into
+`.0`, `.1`... chunks and possibly `base64-` encoded). It is checked once
+against Supabase Auth (`GET /auth/v1/user`); the answer is cached per token
+for `ttl` seconds, so a burst of requests from one session costs one lookup.
+"""
+
+import base64
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import httpx
+
+from event_log import log
+
+
+def _chunk_index(name: str) -> int:
+    suffix = name.rsplit(".", 1)[-1]
+    return int(suffix) if suffix.isdigit() else -1
+
+
+def _cookie_session(cookies: Dict[str, str]) -> Optional[str]:
+    names = sorted(name for name in cookies if name.startswith("sb-") and "-auth-token" in name)
+    if not names:
+        return None
+    base = names[0].split(".", 1)[0]
+    if base in cookies:
+        raw = cookies[base]
+    else:
+        chunks = sorted((name for name in names if name.startswith(base + ".")), key=_chunk_index)
+        raw = "".join(cookies[name] for name in chunks)
+    if raw.startswith("base64-"):
+        # @supabase/ssr writes base64url; accept the standard alphabet too
+        encoded = raw[7:].replace("+", "-").replace("/", "_")
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode("utf-8", "replace")
+    try:
+        session = json.loads(raw)
+    except ValueError:
+        return None
+    if isinstance(session, list):
+        return session[0] if session and isinstance(session[0], str) else None
+    if isinstance(session, dict):
+        return session.get("access_token")
+    return None
+
+
+def access_token(headers, cookies: Dict[str, str]) -> Optional[str]:
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:].strip() or None
+    try:
+        return _cookie_session(cookies)
+    except (ValueError, UnicodeError):
+        return None
+
+
+class SessionResolver:
+    def __init__(self, url: Optional[str], key: Optional[str], ttl: float = 60.0, max_entries: int = 10_000):
+        self.url = url.rstrip("/") if url else None
+        self.key = key
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _lookup(self, token: str) -> Optional[Dict]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        self.lookups += 1
+        response = await self._client.get(
+            f"{self.url}/auth/v1/user", headers={"apikey": self.key, "Authorization": f"Bearer {token}"}
+        )
+        if response.status_code in (401, 403):
+            return None
+        response.raise_for_status()
+        user = response.json()
+        return user if isinstance(user, dict) and user.get("id") else None
+
+    async def user(self, request) -> Optional[Dict]:
+        """The authenticated user (Supabase `/auth/v1/user` object), or None."""
+        token = access_token(request.headers, request.cookies)
+        if not token or not self.url or not self.key:
+            return None
+        now = time.monotonic()
+        cached = self.cache.get(token)
+        if cached is not None and cached[0] > now:
+            self.cache.move_to_end(token)
+            self.hits += 1
+            return cached[1]
+        try:
+            user = await self._lookup(token)
+        except (httpx.HTTPError, ValueError) as e:
+            log.error("session_lookup_error", str(e))
+            return None
+        self.cache[token] = (now + self.ttl, user)
+        self.cache.move_to_end(token)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return user
+
+    def stats(self) -> Dict:
+        return {"cached": len(self.cache), "lookups": self.lookups, "hits": self.hits}
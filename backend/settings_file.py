@@ -0,0 +1,338 @@
+"""File-backed theme settings (`data/settings.json`), owned by the backend.
+
+The admin theme page and `theme-test` read and write a JSON file next to the
+frontend. The Next.js routes stat, read and parse it on every request, and a
+write (`writeFileSync` in place) can be observed half-done by a concurrent
+reader. Here the file is read once into an immutable snapshot holding the
+parsed settings, the encoded body and a version (a hash of the file bytes),
+and requests are answered from memory.
+
+The file is watched with inotify (directory watch, since a rename replaces
+the inode), with a slower stat poll as a safety net and as the only
+mechanism where inotify is unavailable; edits made by hand or by another
+worker are picked up and swapped in with one assignment. A file that does
+not parse keeps the previous snapshot.
+
+Writes take an exclusive `flock` on a sidecar lock file so that workers
+serialise, re-read the file under the lock, and are rejected with
+`SettingsConflict` when the caller's version (the ETag it read) is no
+longer current. The new file is written to a temporary name, fsynced and
+renamed over the old one, then the directory is fsynced.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import fcntl
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from event_log import log
+
+DEFAULT_SETTINGS = {
+    "id": "main",
+    "sitename": "Minecraft Server List",
+    "sitetagline": "En İyi Minecraft Sunucuları",
+    "logourl": "",
+    "faviconurl": "",
+    "primarycolor": "#22c55e",
+    "secondarycolor": "#eab308",
+    "accentcolor": "#3b82f6",
+    "footertext": "© 2025 Minecraft Server List",
+    "googleanalyticsid": "",
+    "googleadsclientid": "",
+    "analyticsenabled": False,
+    "adsenabled": False,
+    "adslots": {},
+    "socialmedia": {
+        "discord": "",
+        "twitter": "",
+        "facebook": "",
+        "instagram": "",
+        "youtube": "",
+        "tiktok": "",
+    },
+}
+
+# Request body key -> stored key; falsy values keep the current setting
+TEXT_FIELDS = {
+    "siteName": "sitename",
+    "siteTagline": "sitetagline",
+    "logoUrl": "logourl",
+    "faviconUrl": "faviconurl",
+    "primaryColor": "primarycolor",
+    "secondaryColor": "secondarycolor",
+    "accentColor": "accentcolor",
+    "footerText": "footertext",
+    "googleAnalyticsId": "googleanalyticsid",
+    "googleAdsClientId": "googleadsclientid",
+    "adSlots": "adslots",
+    "socialMedia": "socialmedia",
+}
+# Booleans, applied whenever present
+FLAG_FIELDS = {
+    "analyticsEnabled": "analyticsenabled",
+    "adsEnabled": "adsenabled",
+}
+
+# Version of the defaults served while the file does not exist
+MISSING_VERSION = "0" * 32
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class SettingsConflict(Exception):
+    """The settings changed since the version the writer read."""
+
+    def __init__(self, snapshot: "SettingsFileSnapshot"):
+        super().__init__(f"settings are at version {snapshot.version}")
+        self.snapshot = snapshot
+
+
+@dataclass(frozen=True)
+class SettingsFileSnapshot:
+    version: str
+    settings: Mapping
+    body: bytes
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+def file_version(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def make_snapshot(raw: Optional[bytes]) -> SettingsFileSnapshot:
+    """Snapshot of the file bytes (None = missing file); raises ValueError if it is not a JSON object."""
+    if raw is None:
+        settings, version = DEFAULT_SETTINGS, MISSING_VERSION
+    else:
+        settings = json.loads(raw.decode("utf-8"))
+        if not isinstance(settings, dict):
+            raise ValueError("settings file does not hold a JSON object")
+        version = file_version(raw)
+    body = json.dumps(settings, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return SettingsFileSnapshot(version, MappingProxyType(settings), body)
+
+
+def merge_settings(current: Mapping, changes: Dict) -> Dict:
+    """The PUT semantics of the old Next.js route."""
+    merged = dict(current)
+    for key, column in TEXT_FIELDS.items():
+        if changes.get(key):
+            merged[column] = changes[key]
+    for key, column in FLAG_FIELDS.items():
+        if key in changes:
+            merged[column] = changes[key]
+    return merged
+
+
+class _Inotify:
+    """Just enough of inotify(7) through libc to wake on changes in one directory."""
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def names(self):
+        """Names of the entries touched since the last call."""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SettingsFile:
+    def __init__(self, path, poll_interval: float = 30.0, debounce: float = 0.05):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.snapshot: Optional[SettingsFileSnapshot] = None
+        self.watching = "off"
+        self.swaps = 0
+        self.writes = 0
+        self.conflicts = 0
+        self.parse_errors = 0
+        # (inode, size, mtime) of the file the snapshot was read from
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._load_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+
+    # Loading
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _read(self) -> Tuple[Optional[bytes], Optional[Tuple[int, int, int]]]:
+        # Stat first: a change racing the read then shows up as a new signature next time
+        signature = self._stat()
+        try:
+            return self.path.read_bytes(), signature
+        except FileNotFoundError:
+            return None, None
+
+    def _install(self, snapshot: SettingsFileSnapshot, signature):
+        self._signature = signature
+        if self.snapshot is None or self.snapshot.version != snapshot.version:
+            self.snapshot = snapshot
+            self.swaps += 1
+
+    async def reload(self):
+        """Re-read the file; a file that does not parse leaves the current snapshot in place."""
+        raw, signature = await asyncio.to_thread(self._read)
+        try:
+            snapshot = make_snapshot(raw)
+        except ValueError as e:
+            self.parse_errors += 1
+            self._signature = signature
+            log.error("settings_file_parse_error", str(e), path=str(self.path))
+            if self.snapshot is None:
+                self.snapshot = make_snapshot(None)
+            return
+        self._install(snapshot, signature)
+
+    async def ensure_loaded(self) -> SettingsFileSnapshot:
+        if self.snapshot is None:
+            async with self._load_lock:
+                if self.snapshot is None:
+                    await self.reload()
+        return self.snapshot
+
+    def _open_watch(self) -> Optional[_Inotify]:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            return _Inotify(self.path.parent)
+        except (OSError, AttributeError) as e:
+            # AttributeError: libc without inotify (not Linux)
+            log.error("settings_file_watch_error", str(e), path=str(self.path))
+            return None
+
+    async def run_watcher(self):
+        """Reload on inotify events for the file, and whenever a stat poll sees it changed."""
+        await self.ensure_loaded()
+        loop = asyncio.get_running_loop()
+        watch = self._open_watch()
+        if watch is not None:
+            loop.add_reader(watch.fd, self._on_events, watch)
+            self.watching = "inotify"
+        else:
+            self.watching = "poll"
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    # Editors write in several steps; let them finish
+                    await asyncio.sleep(self.debounce)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    if await asyncio.to_thread(self._stat) != self._signature:
+                        await self.reload()
+                except OSError as e:
+                    log.error("settings_file_reload_error", str(e), path=str(self.path))
+        finally:
+            if watch is not None:
+                loop.remove_reader(watch.fd)
+                watch.close()
+
+    def _on_events(self, watch: _Inotify):
+        if self.path.name in watch.names():
+            self._wake.set()
+
+    # Writes
+
+    def _write(self, changes: Dict, expected: Optional[str]) -> Tuple[SettingsFileSnapshot, Tuple]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                return self._write_locked(changes, expected)
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _write_locked(self, changes: Dict, expected: Optional[str]) -> Tuple[SettingsFileSnapshot, Tuple]:
+        # The file, not our snapshot, is the truth: another worker may have written it
+        raw, signature = self._read()
+        try:
+            current = make_snapshot(raw)
+        except ValueError:
+            current = make_snapshot(None)
+        if expected is not None and expected != current.version:
+            raise SettingsConflict(current)
+        raw = json.dumps(merge_settings(current.settings, changes), ensure_ascii=False, indent=2).encode("utf-8")
+        temp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(temp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        directory = os.open(self.path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        return make_snapshot(raw), self._stat()
+
+    async def update(self, changes: Dict, expected: Optional[str] = None) -> SettingsFileSnapshot:
+        """Apply a PUT body; `expected` is the version the client read (None = unconditional)."""
+        async with self._write_lock:
+            try:
+                snapshot, signature = await asyncio.to_thread(self._write, changes, expected)
+            except SettingsConflict:
+                self.conflicts += 1
+                raise
+            self.writes += 1
+            self._install(snapshot, signature)
+            return snapshot
+
+    def stats(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            "loaded": snapshot is not None,
+            "version": snapshot.version if snapshot is not None else None,
+            "watching": self.watching,
+            "swaps": self.swaps,
+            "writes": self.writes,
+            "conflicts": self.conflicts,
+            "parseErrors": self.parse_errors,
+        }
@@ -0,0 +1,178 @@
+"""Versioned in-memory snapshot of site settings, theme and published pages.
+
+`/api/settings/public` is read on nearly every page, yet the underlying
+`site_settings` row (which also holds the theme columns) and the published
+`custom_pages` metadata change a few times a month. The backend fetches those
+responses from the frontend once, keeps them in an immutable snapshot with a
+strong ETag per entry and swaps the whole snapshot in one assignment when an
+admin write passes through the proxy or the slow refresh timer fires.
+
+Under serve.py the write passes through one worker only, so `invalidate()`
+also bumps a tag generation in the shared-memory arena. Every worker compares
+that generation before serving and, when another worker has bumped it,
+refreshes before answering instead of waiting for its own timer.
+
+A refresh that fails after a write is retried with a short exponential
+backoff until one succeeds, rather than leaving the pre-write settings in
+place until the slow timer fires.
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+import httpx
+
+from event_log import log
+
+# Shared-memory tag bumped on every settings write
+SHARED_TAG = "settings-snapshot"
+
+# Cached frontend paths (relative to /api), keyed by path plus query string
+SNAPSHOT_SOURCES = (
+    "settings/public",
+    "admin/settings",
+    "pages",
+    "pages?footer=true",
+)
+
+
+@dataclass(frozen=True)
+class SnapshotEntry:
+    body: bytes
+    etag: str
+    media_type: str
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    version: int
+    entries: Mapping[str, SnapshotEntry]
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class SettingsSnapshot:
+    def __init__(self, frontend_url: str, refresh_interval: float = 600.0, shared=None,
+                 retry_delay: float = 1.0, max_retry_delay: float = 30.0):
+        self.frontend_url = frontend_url
+        self.refresh_interval = refresh_interval
+        self.shared = shared
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.snapshot: Optional[ConfigSnapshot] = None
+        self.remote_invalidations = 0
+        self.refresh_errors = 0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._stale = False
+        # A write not yet reflected in the snapshot; failed refreshes are retried while set
+        self._write_pending = False
+        self._retries = 0
+        self._retry: Optional[asyncio.TimerHandle] = None
+        # Shared generation last acted on, and the refresh started for it
+        self._generation = shared.generation(SHARED_TAG) if shared is not None else None
+        self._syncing: Optional[asyncio.Task] = None
+
+    def get(self, key: str) -> Optional[SnapshotEntry]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        return snapshot.entries.get(key)
+
+    async def _fetch_all(self) -> dict:
+        entries = {}
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for key in SNAPSHOT_SOURCES:
+                response = await client.get(f"{self.frontend_url}/api/{key}")
+                if response.status_code != 200:
+                    raise RuntimeError(f"{key} answered {response.status_code}")
+                entries[key] = SnapshotEntry(
+                    body=response.content,
+                    etag=make_etag(response.content),
+                    media_type=response.headers.get("content-type", "application/json"),
+                )
+        return entries
+
+    async def _refresh(self):
+        while True:
+            self._stale = False
+            write_pending = self._write_pending
+            try:
+                entries = await self._fetch_all()
+            except Exception as e:
+                self.refresh_errors += 1
+                log.error("settings_snapshot_refresh_error", str(e), retry=self._write_pending)
+                if self._write_pending:
+                    self._retry_later()
+                return
+            if write_pending:
+                # A write made during the fetch has set _stale and is picked up below
+                self._write_pending = False
+                self._retries = 0
+            current = self.snapshot
+            if current is None or dict(current.entries) != entries:
+                version = current.version + 1 if current else 1
+                self.snapshot = ConfigSnapshot(version, MappingProxyType(entries))
+            # A write landed while we were fetching; fetch again so it is not lost.
+            if not self._stale:
+                return
+
+    def _schedule(self) -> asyncio.Task:
+        """Start a refresh; concurrent requests coalesce into one."""
+        if self._refreshing is not None and not self._refreshing.done():
+            self._stale = True
+        else:
+            if self._retry is not None:
+                self._retry.cancel()
+                self._retry = None
+            self._refreshing = asyncio.create_task(self._refresh())
+        return self._refreshing
+
+    def _retry_later(self):
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** self._retries)
+        self._retries += 1
+        self._retry = asyncio.get_running_loop().call_later(delay, self._schedule)
+
+    def invalidate(self):
+        """Refresh here and, when shared, make every other worker refresh before serving."""
+        if self.shared is not None:
+            self.shared.invalidate(SHARED_TAG)
+            self._generation = self.shared.generation(SHARED_TAG)
+        self._write_pending = True
+        # Requests on this worker wait for it too, so the admin who saved sees the write
+        self._syncing = self._schedule()
+
+    async def current(self, key: str) -> Optional[SnapshotEntry]:
+        """Like get(), but first catches up with a write made through another worker."""
+        if self.shared is not None:
+            generation = self.shared.generation(SHARED_TAG)
+            if generation != self._generation:
+                self._generation = generation
+                self.remote_invalidations += 1
+                self._write_pending = True
+                self._syncing = self._schedule()
+        if self._syncing is not None and not self._syncing.done():
+            # shield: a client going away must not cancel the refresh for everyone else
+            await asyncio.shield(self._syncing)
+        return self.get(key)
+
+    async def refresh(self):
+        await self._schedule()
+
+    async def run_refresher(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version if snapshot is not None else None,
+            "remoteInvalidations": self.remote_invalidations,
+            "refreshErrors": self.refresh_errors,
+            "writePending": self._write_pending,
+        }
@@ -0,0 +1,188 @@
+"""Shared-memory response cache and counters for multi-worker serving.
+
+All workers map the same file (normally under /dev/shm). The arena holds:
+
+* a header describing the layout,
+* tag generations, bumped to invalidate every entry carrying a tag,
+* one counter row per worker, so each worker only ever writes its own row
+  and readers sum the column,
+* fixed-size cache slots, two candidate slots per key.
+
+Readers never lock: each slot carries a sequence number that writers make odd
+while they write (a seqlock), plus a CRC of the value, and a reader that sees
+an odd or changed sequence, or a CRC mismatch, treats the read as a miss.
+Writers serialise per slot with an fcntl byte-range lock on the file.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Hashable, Optional, Sequence
+
+MAGIC = b"MCSHMC01"
+HEADER = struct.Struct("<8sIIIII")  # magic, slots, slot size, workers, counters, tags
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QQdIIII")  # seq, key hash, expires, tag, tag gen, length, crc
+SEQ = struct.Struct("<Q")
+U64 = struct.Struct("<Q")
+TAG_SLOTS = 64
+
+COUNTER_NAMES = (
+    "requests",
+    "list_cache_hits",
+    "list_cache_misses",
+    "shared_cache_hits",
+    "disk_cache_hits",
+    "upstream_errors",
+    "requests_shed",
+    # Gauges, overwritten by each worker (see memory_debug.py)
+    "allocated_blocks",
+    "rss_bytes",
+    "gc_collections",
+)
+
+
+def key_hash(key: Hashable) -> int:
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def tag_index(tag: str) -> int:
+    return zlib.crc32(tag.encode("utf-8")) % TAG_SLOTS
+
+
+class SharedCache:
+    def __init__(self, path: str, worker_id: int = 0):
+        self.path = path
+        self.worker_id = worker_id
+        self.fd = os.open(path, os.O_RDWR)
+        size = os.fstat(self.fd).st_size
+        self.map = mmap.mmap(self.fd, size)
+        magic, self.slots, self.slot_size, self.workers, self.counters, tags = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or tags != TAG_SLOTS:
+            raise ValueError(f"{path} is not a shared cache arena")
+        self.tags_offset = HEADER_SIZE
+        self.counters_offset = self.tags_offset + TAG_SLOTS * 8
+        self.slots_offset = self.counters_offset + self.workers * self.counters * 8
+        self.max_value = self.slot_size - SLOT_HEADER.size
+        self.counter_index: Dict[str, int] = {name: i for i, name in enumerate(COUNTER_NAMES)}
+
+    @classmethod
+    def create(cls, path: str, slots: int = 4096, slot_size: int = 64 * 1024, workers: int = 1):
+        counters = len(COUNTER_NAMES)
+        size = HEADER_SIZE + TAG_SLOTS * 8 + workers * counters * 8 + slots * slot_size
+        with open(path, "wb") as f:
+            f.truncate(size)
+            f.write(HEADER.pack(MAGIC, slots, slot_size, workers, counters, TAG_SLOTS))
+        return cls(path)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    # Cache slots
+
+    def _slot_offsets(self, hashed: int) -> Sequence[int]:
+        first = hashed % self.slots
+        second = (hashed >> 32) % self.slots
+        return (self.slots_offset + first * self.slot_size,
+                self.slots_offset + second * self.slot_size)
+
+    def _tag_generation(self, index: int) -> int:
+        return U64.unpack_from(self.map, self.tags_offset + index * 8)[0]
+
+    def _read_slot(self, offset: int, hashed: int) -> Optional[bytes]:
+        seq, slot_hash, expires, tag, generation, length, crc = SLOT_HEADER.unpack_from(self.map, offset)
+        if seq & 1 or slot_hash != hashed or length > self.max_value:
+            return None
+        start = offset + SLOT_HEADER.size
+        value = self.map[start:start + length]
+        if SEQ.unpack_from(self.map, offset)[0] != seq:
+            return None
+        if zlib.crc32(value) != crc or expires <= time.time():
+            return None
+        if generation != self._tag_generation(tag):
+            return None
+        return value
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        hashed = key_hash(key)
+        for offset in self._slot_offsets(hashed):
+            value = self._read_slot(offset, hashed)
+            if value is not None:
+                return value
+        return None
+
+    def generation(self, tag: str) -> int:
+        return self._tag_generation(tag_index(tag))
+
+    def put(self, key: Hashable, value: bytes, ttl: float, tag: str = "",
+            generation: Optional[int] = None) -> bool:
+        """Store a value; returns False when it does not fit in a slot.
+
+        Pass the tag `generation` read before fetching the value so a write
+        racing with an invalidation is never served.
+        """
+        if len(value) > self.max_value:
+            return False
+        hashed = key_hash(key)
+        offsets = self._slot_offsets(hashed)
+        # Prefer the slot already holding this key, then the one expiring first.
+        candidates = []
+        for offset in offsets:
+            _, slot_hash, expires, *_ = SLOT_HEADER.unpack_from(self.map, offset)
+            candidates.append((slot_hash != hashed, expires, offset))
+        offset = min(candidates)[2]
+        index = tag_index(tag)
+        if generation is None:
+            generation = self._tag_generation(index)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, self.slot_size, offset)
+        try:
+            seq = SEQ.unpack_from(self.map, offset)[0]
+            SEQ.pack_into(self.map, offset, seq + 1)
+            start = offset + SLOT_HEADER.size
+            self.map[start:start + len(value)] = value
+            SLOT_HEADER.pack_into(
+                self.map, offset, seq + 1, hashed, time.time() + ttl, index,
+                generation, len(value), zlib.crc32(value),
+            )
+            SEQ.pack_into(self.map, offset, seq + 2)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, self.slot_size, offset)
+        return True
+
+    def invalidate(self, tag: str):
+        offset = self.tags_offset + tag_index(tag) * 8
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 8, offset)
+        try:
+            U64.pack_into(self.map, offset, U64.unpack_from(self.map, offset)[0] + 1)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 8, offset)
+
+    def tag_generations(self) -> Sequence[int]:
+        return [self._tag_generation(i) for i in range(TAG_SLOTS)]
+
+    # Counters
+
+    def add(self, name: str, amount: int = 1):
+        """Bump this worker's counter; only this worker writes its row."""
+        offset = self.counters_offset + (self.worker_id * self.counters + self.counter_index[name]) * 8
+        U64.pack_into(self.map, offset, U64.unpack_from(self.map, offset)[0] + amount)
+
+    def set(self, name: str, value: int):
+        """Overwrite this worker's value, for gauges summed like counters."""
+        offset = self.counters_offset + (self.worker_id * self.counters + self.counter_index[name]) * 8
+        U64.pack_into(self.map, offset, value)
+
+    def counter_totals(self) -> Dict[str, int]:
+        totals = {}
+        for name, index in self.counter_index.items():
+            totals[name] = sum(
+                U64.unpack_from(self.map, self.counters_offset + (worker * self.counters + index) * 8)[0]
+                for worker in range(self.workers)
+            )
+        return totals
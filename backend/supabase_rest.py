@@ -0,0 +1,154 @@
+"""Minimal async PostgREST client for the Supabase project behind the frontend.
+
+The Next.js routes talk to Supabase through supabase-js; the backend only needs
+plain table reads and a few bulk writes, so this wraps the REST endpoint with
+httpx instead of pulling in another SDK.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / ".env")
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = (
+    os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    or os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+)
+
+
+class SupabaseError(Exception):
+    """Raised when PostgREST answers with a non-2xx status."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Supabase error {status_code}: {message}")
+        self.status_code = status_code
+
+
+def quote_value(value: Any) -> str:
+    """Quote a value for use inside a PostgREST `in.(...)` list."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+class SupabaseRest:
+    def __init__(self, url: Optional[str] = SUPABASE_URL, key: Optional[str] = SUPABASE_KEY,
+                 timeout: float = 30.0):
+        self.url = url.rstrip("/") if url else None
+        self.key = key
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url and self.key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.url}/rest/v1",
+                timeout=self.timeout,
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                },
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, str]] = None,
+                      json: Any = None, headers: Optional[Dict[str, str]] = None) -> Any:
+        if not self.configured:
+            raise SupabaseError(0, "Supabase is not configured")
+        response = await self._get_client().request(
+            method, path, params=params, json=json, headers=headers
+        )
+        if response.status_code >= 400:
+            raise SupabaseError(response.status_code, response.text)
+        if not response.content:
+            return None
+        return response.json()
+
+    async def select(self, table: str, params: Optional[Dict[str, str]] = None) -> List[Dict]:
+        return await self.request("GET", f"/{table}", params=params) or []
+
+    async def count(self, table: str, params: Optional[Dict[str, str]] = None) -> int:
+        """Exact row count via `Prefer: count=exact` without fetching rows."""
+        if not self.configured:
+            raise SupabaseError(0, "Supabase is not configured")
+        query = dict(params or {})
+        query.setdefault("select", "id")
+        response = await self._get_client().request(
+            "HEAD", f"/{table}", params=query, headers={"Prefer": "count=exact"}
+        )
+        if response.status_code >= 400:
+            raise SupabaseError(response.status_code, response.text)
+        content_range = response.headers.get("content-range", "*/0")
+        total = content_range.rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else 0
+
+    async def iter_rows(self, table: str, select: str = "*", filters: Optional[Dict[str, str]] = None,
+                        key: str = "id", page_size: int = 1000) -> AsyncIterator[Dict]:
+        """Stream a table in keyset-paginated pages ordered by `key`.
+
+        Unlike offset pagination every page is an index range scan, so the
+        cost per page stays flat however deep into the table we are.
+        """
+        async for rows in self.iter_pages(table, select, filters, key, page_size):
+            for row in rows:
+                yield row
+
+    async def iter_pages(self, table: str, select: str = "*", filters: Optional[Dict[str, str]] = None,
+                         key: str = "id", page_size: int = 1000, after: Any = None) -> AsyncIterator[List[Dict]]:
+        """The pages behind `iter_rows`, starting after key value `after` when given."""
+        last = after
+        while True:
+            params = dict(filters or {})
+            params["select"] = select
+            params["order"] = f"{key}.asc"
+            params["limit"] = str(page_size)
+            if last is not None:
+                params[key] = f"gt.{last}"
+            rows = await self.select(table, params)
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1][key]
+
+    async def insert(self, table: str, rows: List[Dict], upsert: bool = False,
+                     returning: bool = False) -> List[Dict]:
+        prefer = ["return=representation" if returning else "return=minimal"]
+        if upsert:
+            prefer.append("resolution=merge-duplicates")
+        return await self.request(
+            "POST", f"/{table}", json=rows, headers={"Prefer": ",".join(prefer)}
+        ) or []
+
+    async def update(self, table: str, filters: Dict[str, str], values: Dict,
+                     returning: bool = False) -> List[Dict]:
+        prefer = "return=representation" if returning else "return=minimal"
+        return await self.request(
+            "PATCH", f"/{table}", params=filters, json=values, headers={"Prefer": prefer}
+        ) or []
+
+    async def delete(self, table: str, filters: Dict[str, str], returning: bool = False) -> List[Dict]:
+        prefer = "return=representation" if returning else "return=minimal"
+        return await self.request(
+            "DELETE", f"/{table}", params=filters, headers={"Prefer": prefer}
+        ) or []
+
+    async def rpc(self, function: str, args: Optional[Dict] = None) -> Any:
+        return await self.request("POST", f"/rpc/{function}", json=args or {})
+
+
+supabase = SupabaseRest()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Streaming export and import of Supabase tables.
+
+    python table_dump.py export --out dump/ --tables servers votes
+    python table_dump.py import --from dump/ --target "$SUPABASE_URL" --api-key "$SERVICE_KEY"
+
+Export walks each table in keyset order (`id=gt.<last>`, see
+SupabaseRest.iter_pages), fetching the next page while the current one is
+encoded. Each page becomes one gzip member appended to `<table>.<format>.gz`.
+Two formats are written:
+
+* `ndjson`: one JSON object per row;
+* `columns`: one JSON line per page holding `{"columns": [...], "values":
+  [[column values], ...]}`, column-major like a Parquet row group, so
+  repetitive columns compress far better.
+
+After every page the file is fsynced and `checkpoint.json` records the byte
+offset, row count and last key. An interrupted export resumes by cutting the
+file back to the offset and continuing after that key. `manifest.json` is
+written last.
+
+Import reads the files in manifest order and streams the rows. It upserts
+them in batches (`resolution=merge-duplicates`) with `--concurrency` batches
+in flight, and `import-checkpoint.json` records the rows below which every
+batch has committed. Upserts are idempotent, so re-sending a few batches
+after a resume is harmless.
+
+Rows go in through PostgREST, so the target's triggers run and the restore
+is not byte-for-byte. The vote and review insert triggers add every
+imported row to the servers.voteCount and hosting rating totals the dump
+already carried, so after those tables an import resets the totals from
+the rows (RECOUNTS). The updatedAt triggers fire on rows that
+already existed in the target and on every server that received votes;
+those rows come back with the import time, not the dumped one.
+
+Memory stays bounded by a couple of pages on export and `concurrency + 1`
+batches on import, whatever the table size. Progress and rows/s go to stderr.
+"""
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from serialization import decode_json
+from supabase_rest import SUPABASE_KEY, SUPABASE_URL, SupabaseRest
+
+# Parents before children, so an import never trips a foreign key
+DEFAULT_TABLES = ("users", "servers", "votes", "blog_categories", "blog_posts", "blog_replies")
+FORMATS = ("ndjson", "columns")
+CHECKPOINT = "checkpoint.json"
+IMPORT_CHECKPOINT = "import-checkpoint.json"
+MANIFEST = "manifest.json"
+# Child table -> RPC that resets the totals its insert trigger keeps on the
+# parent rows (supabase_stats_backend.sql, supabase_hosting_ratings_backend.sql)
+RECOUNTS = {"votes": "recount_server_votes", "hosting_reviews": "recount_hosting_ratings"}
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_page(rows: List[Dict], fmt: str) -> bytes:
+    if fmt == "columns":
+        columns = list(dict.fromkeys(itertools.chain.from_iterable(rows)))
+        values = [[row.get(column) for row in rows] for column in columns]
+        text = dumps({"columns": columns, "values": values}) + "\n"
+    else:
+        text = "".join(dumps(row) + "\n" for row in rows)
+    return gzip.compress(text.encode("utf-8"), compresslevel=6)
+
+
+def read_rows(path: str, fmt: str) -> Iterator[Dict]:
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if fmt == "columns":
+                page = decode_json(line)
+                columns = page["columns"]
+                for values in zip(*page["values"]):
+                    yield dict(zip(columns, values))
+            else:
+                yield decode_json(line)
+
+
+def load_json(path: str, default: Any) -> Any:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def save_json(path: str, value: Any):
+    """Write-then-rename, so a crash leaves the old or the new file, never half of one."""
+    temp = f"{path}.tmp"
+    with open(temp, "w") as f:
+        json.dump(value, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+class Progress:
+    def __init__(self, interval: float = 2.0):
+        self.started = time.monotonic()
+        self.interval = interval
+        self.last_report = self.started
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, table: str, rows: int, table_rows: int, size: int = 0, force: bool = False):
+        self.rows += rows
+        self.bytes += size
+        now = time.monotonic()
+        if force or now - self.last_report >= self.interval:
+            self.last_report = now
+            rate = self.rows / max(now - self.started, 1e-9)
+            print(f"  {table}: {table_rows:,} rows  (total {self.rows:,}, {rate:,.0f} rows/s{self._size()})",
+                  file=sys.stderr)
+
+    def _size(self) -> str:
+        return f", {self.bytes / 1e6:,.1f} MB" if self.bytes else ""
+
+    def summary(self, verb: str):
+        elapsed = time.monotonic() - self.started
+        print(f"{verb} {self.rows:,} rows in {elapsed:.1f}s "
+              f"({self.rows / max(elapsed, 1e-9):,.0f} rows/s{self._size()})", file=sys.stderr)
+
+
+async def prefetched(pages):
+    """Yield from an async iterator while its next item is already being fetched."""
+    iterator = pages.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
+    while True:
+        try:
+            page = await pending
+        except StopAsyncIteration:
+            return
+        pending = asyncio.ensure_future(iterator.__anext__())
+        yield page
+
+
+async def export_table(db: SupabaseRest, table: str, out_dir: str, fmt: str, key: str, page_size: int,
+                       state: Dict, save: Callable[[], None], progress: Progress):
+    entry = state.setdefault(table, {"rows": 0, "bytes": 0, "last": None, "done": False})
+    if entry["done"]:
+        return
+    path = os.path.join(out_dir, f"{table}.{fmt}.gz")
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        # Drop whatever an interrupted run wrote past the last checkpoint
+        f.truncate(entry["bytes"])
+        f.seek(entry["bytes"])
+        async for page in prefetched(db.iter_pages(table, key=key, page_size=page_size, after=entry["last"])):
+            data = encode_page(page, fmt)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            entry.update(rows=entry["rows"] + len(page), bytes=f.tell(), last=page[-1][key])
+            save()
+            progress.add(table, len(page), entry["rows"], len(data))
+    entry["done"] = True
+    save()
+    progress.add(table, 0, entry["rows"], force=True)
+
+
+async def export_tables(db: SupabaseRest, tables: List[str], out_dir: str, fmt: str, key: str,
+                        page_size: int, restart: bool = False) -> Dict:
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = os.path.join(out_dir, CHECKPOINT)
+    state = {} if restart else load_json(checkpoint_path, {})
+    if state and (state.get("format") != fmt or state.get("key") != key):
+        raise SystemExit(f"{checkpoint_path} is from a {state.get('format')} export keyed on "
+                         f"{state.get('key')}; pass --restart to start over")
+    state.update(format=fmt, key=key)
+    tables_state = state.setdefault("tables", {})
+    progress = Progress()
+    for table in tables:
+        await export_table(db, table, out_dir, fmt, key, page_size, tables_state,
+                           lambda: save_json(checkpoint_path, state), progress)
+    manifest = {
+        "format": fmt,
+        "key": key,
+        "tables": [{"name": table, "file": f"{table}.{fmt}.gz", "rows": tables_state[table]["rows"]}
+                   for table in tables],
+    }
+    save_json(os.path.join(out_dir, MANIFEST), manifest)
+    progress.summary("Exported")
+    return manifest
+
+
+async def import_table(db: SupabaseRest, table: str, path: str, fmt: str, batch: int, concurrency: int,
+                       state: Dict, save: Callable[[], None], progress: Progress):
+    committed = state.get(table, 0)
+    rows = itertools.islice(read_rows(path, fmt), committed, None)
+    pending = set()
+    finished = set()
+    next_start = committed
+
+    def advance(start: int, count: int):
+        # Only move the checkpoint past a contiguous run of committed batches
+        nonlocal committed
+        finished.add((start, count))
+        while True:
+            done = next((item for item in finished if item[0] == committed), None)
+            if done is None:
+                break
+            finished.discard(done)
+            committed += done[1]
+        state[table] = committed
+        save()
+        progress.add(table, count, committed)
+
+    async def upsert(start: int, chunk: List[Dict]):
+        await db.insert(table, chunk, upsert=True)
+        advance(start, len(chunk))
+
+    for chunk in iter(lambda: list(itertools.islice(rows, batch)), []):
+        pending.add(asyncio.create_task(upsert(next_start, chunk)))
+        next_start += len(chunk)
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    if pending:
+        await asyncio.gather(*pending)
+    progress.add(table, 0, committed, force=True)
+
+
+async def import_tables(db: SupabaseRest, in_dir: str, tables: Optional[List[str]], batch: int,
+                        concurrency: int, restart: bool = False):
+    manifest = load_json(os.path.join(in_dir, MANIFEST), None)
+    if manifest is None:
+        raise SystemExit(f"No {MANIFEST} in {in_dir}; was the export finished?")
+    checkpoint_path = os.path.join(in_dir, IMPORT_CHECKPOINT)
+    state = {} if restart else load_json(checkpoint_path, {})
+    progress = Progress()
+    for entry in manifest["tables"]:
+        if tables and entry["name"] not in tables:
+            continue
+        if state.get(entry["name"], 0) >= entry["rows"]:
+            continue
+        await import_table(db, entry["name"], os.path.join(in_dir, entry["file"]), manifest["format"],
+                           batch, concurrency, state, lambda: save_json(checkpoint_path, state), progress)
+    for entry in manifest["tables"]:
+        if entry["name"] in RECOUNTS and (not tables or entry["name"] in tables):
+            # Also after a resume that found the table done: the recount may not have run
+            await db.rpc(RECOUNTS[entry["name"]])
+    progress.summary("Imported")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="dump tables to a directory")
+    export.add_argument("--out", required=True, help="output directory")
+    export.add_argument("--tables", nargs="+", default=list(DEFAULT_TABLES))
+    export.add_argument("--format", choices=FORMATS, default="ndjson")
+    export.add_argument("--key", default="id", help="unique, indexed column to paginate on")
+    export.add_argument("--page-size", type=int, default=5000)
+
+    load = commands.add_parser("import", help="upsert a dump into a database")
+    load.add_argument("--from", dest="source", required=True, help="directory written by export")
+    load.add_argument("--tables", nargs="+", help="subset of the dumped tables")
+    load.add_argument("--batch", type=int, default=1000)
+    load.add_argument("--concurrency", type=int, default=4)
+
+    for command in (export, load):
+        command.add_argument("--target", default=None,
+                             help="PostgREST base URL (default: SUPABASE_URL from backend/.env)")
+        command.add_argument("--api-key", default=None, help="API key (default: the service role key)")
+        command.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    args = parser.parse_args(argv)
+
+    db = SupabaseRest(args.target or SUPABASE_URL, args.api_key or SUPABASE_KEY, timeout=120.0)
+    if not db.configured:
+        raise SystemExit("No database configured: pass --target/--api-key or set SUPABASE_URL")
+
+    async def run():
+        try:
+            if args.command == "export":
+                await export_tables(db, args.tables, args.out, args.format, args.key, args.page_size,
+                                    args.restart)
+            else:
+                await import_tables(db, args.source, args.tables, args.batch, args.concurrency, args.restart)
+        finally:
+            await db.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
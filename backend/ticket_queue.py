@@ -0,0 +1,403 @@
+"""Support tickets indexed in memory by queue state, priority and age.
+
+`GET /api/admin/tickets` in Next.js returns every ticket ever filed,
+sorted by `createdAt`, on each load of the support page, and every user's
+"my tickets" page queries and sorts again. Here each ticket sits in a few
+sorted indexes:
+
+* per queue state, by (priority, waiting since): the work queue, most
+  urgent first and then the longest waiting;
+* per queue state and overall, by creation time: the "newest" listing;
+* per user, by creation time.
+
+A ticket's queue state is `closed` when its status is, `pending` when
+support answered last (or an admin set status `pending`) and the user owes
+a reply, and `open` otherwise. Paginated and filtered views are slices of
+an index, and the unread and SLA counters are bisects into the open queue.
+
+Creates, replies, closes and deletes passing through the proxy are applied
+as incremental updates. `refresh()` picks up rows changed elsewhere (the
+`updatedAt` trigger moves on every update) every `refresh_interval`, and a
+full `reconcile()` every `interval` also catches deletes that bypassed the
+proxy.
+"""
+
+import asyncio
+import bisect
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from admin_stats import parse_time
+from event_log import log
+from serialization import encode, project
+
+STATES = ("open", "pending", "closed")
+ALL = "*"
+# tickets.priority, most urgent first; unknown values rank as "normal"
+PRIORITIES = ("urgent", "high", "normal", "low")
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+# Hours an open ticket may wait for a support answer, per priority
+SLA_HOURS = {"urgent": 4, "high": 24, "normal": 72, "low": 168}
+ORDERS = ("newest", "queue")
+
+
+def epoch(timestamp: Optional[str]) -> float:
+    return parse_time(timestamp).timestamp()
+
+
+def iso(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+class SortedIndex:
+    """Sorted list of unique tuple keys, the ticket id last."""
+
+    __slots__ = ("keys",)
+
+    def __init__(self):
+        self.keys: List[Tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: Tuple):
+        if not self.keys or self.keys[-1] < key:
+            self.keys.append(key)
+        else:
+            bisect.insort(self.keys, key)
+
+    def remove(self, key: Tuple):
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+
+    def span(self, low: Tuple, high: Tuple) -> Tuple[int, int]:
+        """Positions of the keys in [low, high)."""
+        return bisect.bisect_left(self.keys, low), bisect.bisect_left(self.keys, high)
+
+
+def page(segments: Iterable[Tuple[List[Tuple], int, int, bool]], offset: int,
+         limit: Optional[int]) -> Tuple[int, List[Tuple]]:
+    """Total and the requested slice of keys over consecutive index ranges (keys, start, end, reverse)."""
+    segments = list(segments)
+    total = sum(end - start for _, start, end, _ in segments)
+    remaining = total if limit is None else limit
+    selected: List[Tuple] = []
+    for keys, start, end, reverse in segments:
+        size = end - start
+        if offset >= size:
+            offset -= size
+            continue
+        if remaining <= 0:
+            break
+        take = min(size - offset, remaining)
+        if reverse:
+            selected.extend(reversed(keys[end - offset - take:end - offset]))
+        else:
+            selected.extend(keys[start + offset:start + offset + take])
+        remaining -= take
+        offset = 0
+    return total, selected
+
+
+def index_keys(ticket: Dict, last_reply: Optional[Tuple[bool, float]]) -> Tuple[str, Tuple, Tuple]:
+    """Queue state, work-queue key and creation key of a ticket."""
+    ticket_id = ticket["id"]
+    created = epoch(ticket.get("createdAt"))
+    status = ticket.get("status") or "open"
+    if status == "closed":
+        state, since = "closed", epoch(ticket.get("updatedAt") or ticket.get("createdAt"))
+    elif status == "pending" or (last_reply is not None and last_reply[0]):
+        state = "pending"
+        since = last_reply[1] if last_reply is not None else epoch(ticket.get("updatedAt"))
+    else:
+        # Waiting since the user's last message
+        state, since = "open", last_reply[1] if last_reply is not None else created
+    rank = PRIORITY_RANK.get(ticket.get("priority"), PRIORITY_RANK["normal"])
+    return state, (rank, since, ticket_id), (created, ticket_id)
+
+
+class QueueState:
+    def __init__(self):
+        self.tickets: Dict[str, Dict] = {}
+        # ticket id -> (reply from support, reply time) of its latest reply
+        self.last_reply: Dict[str, Tuple[bool, float]] = {}
+        # ticket id -> (state, queue key, creation key) it is indexed under
+        self.entries: Dict[str, Tuple[str, Tuple, Tuple]] = {}
+        self.queues: Dict[str, SortedIndex] = {state: SortedIndex() for state in STATES}
+        self.recent: Dict[str, SortedIndex] = {state: SortedIndex() for state in STATES + (ALL,)}
+        self.users: Dict[str, SortedIndex] = {}
+        # user id -> {state: count}
+        self.user_states: Dict[str, Dict[str, int]] = {}
+
+    def _unindex(self, ticket_id: str):
+        entry = self.entries.pop(ticket_id, None)
+        if entry is None:
+            return
+        state, queue_key, created_key = entry
+        self.queues[state].remove(queue_key)
+        self.recent[state].remove(created_key)
+        self.recent[ALL].remove(created_key)
+        user_id = self.tickets[ticket_id].get("userId")
+        user_index = self.users.get(user_id)
+        if user_index is not None:
+            user_index.remove(created_key)
+            counts = self.user_states[user_id]
+            counts[state] -= 1
+            if not user_index:
+                del self.users[user_id]
+                del self.user_states[user_id]
+
+    def _index(self, ticket: Dict):
+        entry = index_keys(ticket, self.last_reply.get(ticket["id"]))
+        state, queue_key, created_key = entry
+        self.entries[ticket["id"]] = entry
+        self.queues[state].add(queue_key)
+        self.recent[state].add(created_key)
+        self.recent[ALL].add(created_key)
+        user_id = ticket.get("userId")
+        self.users.setdefault(user_id, SortedIndex()).add(created_key)
+        counts = self.user_states.setdefault(user_id, dict.fromkeys(STATES, 0))
+        counts[state] += 1
+
+    def put(self, ticket: Dict):
+        ticket_id = ticket["id"]
+        previous = self.tickets.get(ticket_id)
+        if previous is not None:
+            self._unindex(ticket_id)
+            ticket = {**previous, **ticket}
+        self.tickets[ticket_id] = ticket
+        self._index(ticket)
+
+    def remove(self, ticket_id: str):
+        if ticket_id in self.tickets:
+            self._unindex(ticket_id)
+            del self.tickets[ticket_id]
+        self.last_reply.pop(ticket_id, None)
+
+    def reply(self, reply: Dict):
+        ticket_id = reply.get("ticketId")
+        moment = epoch(reply.get("createdAt"))
+        latest = self.last_reply.get(ticket_id)
+        if latest is not None and latest[1] > moment:
+            return
+        self.last_reply[ticket_id] = (bool(reply.get("isAdmin")), moment)
+        if ticket_id in self.tickets:
+            self._unindex(ticket_id)
+            self._index(self.tickets[ticket_id])
+
+
+class TicketQueue:
+    def __init__(self, db=None, interval: float = 600.0, refresh_interval: float = 15.0):
+        self.db = db
+        self.interval = interval
+        self.refresh_interval = refresh_interval
+        self.state = QueueState()
+        self.loaded = False
+        self.reconciles = 0
+        self.refreshes = 0
+        self.last_drift = 0
+        # Latest updatedAt / reply createdAt seen by a scan, where the next refresh starts
+        self.tickets_seen: Optional[str] = None
+        self.replies_seen: Optional[str] = None
+        self._load_lock = asyncio.Lock()
+        # (fields, format) -> encoded full newest-first listing
+        self._bodies: Dict[Tuple, Tuple[bytes, str]] = {}
+        # Writes seen while a scan is running, replayed onto its result
+        self._pending: Optional[List[Tuple[str, object]]] = None
+
+    async def ensure_loaded(self) -> bool:
+        if self.loaded:
+            return True
+        if self.db is None or not self.db.configured:
+            return False
+        async with self._load_lock:
+            if not self.loaded:
+                await self._reconcile()
+        return self.loaded
+
+    async def _scan(self, state: QueueState, tickets_since: Optional[str],
+                    replies_since: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Apply ticket and reply rows newer than the watermarks to `state`; returns the new watermarks."""
+        tickets_seen, replies_seen = tickets_since, replies_since
+        filters = {"updatedAt": f"gte.{tickets_since}"} if tickets_since else None
+        async for row in self.db.iter_rows("tickets", filters=filters, page_size=5000):
+            state.put(row)
+            if row.get("updatedAt") and (tickets_seen is None or epoch(row["updatedAt"]) > epoch(tickets_seen)):
+                tickets_seen = row["updatedAt"]
+        filters = {"createdAt": f"gte.{replies_since}"} if replies_since else None
+        async for row in self.db.iter_rows("ticket_replies", select="id,ticketId,isAdmin,createdAt",
+                                           filters=filters, page_size=5000):
+            state.reply(row)
+            if row.get("createdAt") and (replies_seen is None or epoch(row["createdAt"]) > epoch(replies_seen)):
+                replies_seen = row["createdAt"]
+        return tickets_seen, replies_seen
+
+    async def reconcile(self):
+        """Reload every ticket and swap the result in."""
+        async with self._load_lock:
+            await self._reconcile()
+
+    async def _reconcile(self):
+        state = QueueState()
+        self._pending = []
+        try:
+            watermarks = await self._scan(state, None, None)
+        except Exception as e:
+            log.error("ticket_queue_reconcile_error", str(e))
+            return
+        finally:
+            pending, self._pending = self._pending, None
+        for operation, argument in pending:
+            self._apply(state, operation, argument)
+        if self.loaded:
+            self.last_drift = len(set(state.tickets) ^ set(self.state.tickets))
+        self.state = state
+        self.tickets_seen, self.replies_seen = watermarks
+        self._bodies = {}
+        self.loaded = True
+        self.reconciles += 1
+
+    async def refresh(self):
+        """Apply tickets updated and replies written since the last scan."""
+        async with self._load_lock:
+            try:
+                watermarks = await self._scan(self.state, self.tickets_seen, self.replies_seen)
+            except Exception as e:
+                log.error("ticket_queue_refresh_error", str(e))
+                return
+            self.tickets_seen, self.replies_seen = watermarks
+            self._bodies = {}
+            self.refreshes += 1
+
+    async def run_reconciler(self):
+        last_full = time.monotonic()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if not self.loaded:
+                continue
+            if time.monotonic() - last_full >= self.interval:
+                await self.reconcile()
+                last_full = time.monotonic()
+            else:
+                await self.refresh()
+
+    # Write events
+
+    @staticmethod
+    def _apply(state: QueueState, operation: str, argument):
+        if operation == "ticket":
+            state.put(argument)
+        elif operation == "reply":
+            state.reply(argument)
+        elif operation == "delete":
+            state.remove(argument)
+
+    def _record(self, operation: str, argument):
+        if self._pending is not None:
+            self._pending.append((operation, argument))
+        if self.loaded:
+            self._apply(self.state, operation, argument)
+            self._bodies = {}
+
+    def apply_ticket(self, ticket: Dict):
+        """Apply a created or updated ticket row."""
+        if ticket.get("id"):
+            self._record("ticket", ticket)
+
+    def apply_reply(self, reply: Dict):
+        if reply.get("ticketId"):
+            self._record("reply", {"createdAt": datetime.now(timezone.utc).isoformat(), **reply})
+
+    def delete_ticket(self, ticket_id: str):
+        self._record("delete", ticket_id)
+
+    # Reads
+
+    def _rows(self, keys: List[Tuple]) -> List[Dict]:
+        tickets = self.state.tickets
+        return [tickets[key[-1]] for key in keys]
+
+    def view(self, status: Optional[str] = None, priority: Optional[str] = None, user_id: Optional[str] = None,
+             order: str = "newest", offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[Dict]]:
+        """Total matching tickets and one page of them."""
+        state = self.state
+        if user_id is not None or (priority is not None and order == "newest"):
+            # Small (one user) or filtered lists: walk the creation index
+            index = state.users.get(user_id) if user_id is not None else state.recent[status or ALL]
+            keys = [
+                key for key in reversed(index.keys if index is not None else [])
+                if (status is None or state.entries[key[-1]][0] == status)
+                and (priority is None or state.entries[key[-1]][1][0] == PRIORITY_RANK[priority])
+            ]
+            end = None if limit is None else offset + limit
+            if order == "queue":
+                # Same order as the segments below: by queue state, then within each queue
+                keys.sort(key=lambda key: (STATES.index(state.entries[key[-1]][0]), state.entries[key[-1]][1]))
+            return len(keys), self._rows(keys[offset:end])
+        if order == "newest":
+            keys = state.recent[status or ALL].keys
+            total, selected = page([(keys, 0, len(keys), True)], offset, limit)
+            return total, self._rows(selected)
+        segments = []
+        for name in ([status] if status else STATES):
+            queue = state.queues[name]
+            if priority is not None:
+                rank = PRIORITY_RANK[priority]
+                start, end = queue.span((rank,), (rank + 1,))
+            else:
+                start, end = 0, len(queue)
+            segments.append((queue.keys, start, end, False))
+        total, selected = page(segments, offset, limit)
+        return total, self._rows(selected)
+
+    def listing(self, fields: Optional[Tuple[str, ...]], fmt: str) -> Tuple[bytes, str]:
+        """Every ticket newest first, encoded; what the Next.js route returns, rebuilt only after a change."""
+        key = (fields, fmt)
+        cached = self._bodies.get(key)
+        if cached is None:
+            cached = self._bodies[key] = encode(project(self.view()[1], fields), fmt)
+        return cached
+
+    def counters(self) -> Dict:
+        """Queue sizes, tickets awaiting support per priority and SLA breaches."""
+        state = self.state
+        now = time.time()
+        queue = state.queues["open"]
+        waiting, breached = {}, {}
+        oldest: Optional[float] = None
+        for priority in PRIORITIES:
+            rank = PRIORITY_RANK[priority]
+            start, end = queue.span((rank,), (rank + 1,))
+            waiting[priority] = end - start
+            _, overdue = queue.span((rank,), (rank, now - SLA_HOURS[priority] * 3600))
+            breached[priority] = overdue - start
+            if end > start and (oldest is None or queue.keys[start][1] < oldest):
+                oldest = queue.keys[start][1]
+        return {
+            **{name: len(state.queues[name]) for name in STATES},
+            "total": len(state.tickets),
+            "unread": len(queue),
+            "byPriority": waiting,
+            "sla": {
+                "hours": SLA_HOURS,
+                "breached": breached,
+                "breachedTotal": sum(breached.values()),
+                "oldestWaitingSince": iso(oldest) if oldest is not None else None,
+            },
+        }
+
+    def user_counters(self, user_id: str) -> Dict:
+        counts = self.state.user_states.get(user_id) or dict.fromkeys(STATES, 0)
+        return {**counts, "total": sum(counts.values()), "unread": counts["pending"]}
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "tickets": len(self.state.tickets),
+            "users": len(self.state.users),
+            "reconciles": self.reconciles,
+            "refreshes": self.refreshes,
+            "lastDrift": self.last_drift,
+        }
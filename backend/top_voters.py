@@ -0,0 +1,357 @@
+"""Incremental per-server top-voter rankings.
+
+The `monthly_top_voters` view re-aggregates the whole month of votes for a
+server on every request. Here each server keeps:
+
+* exact per-username counters for the current (UTC) month, reset on rollover,
+* a Space-Saving summary plus a Count-Min sketch for all-time heavy hitters,
+
+and both keep their top-N list up to date on every vote, so a query is a copy
+of a short list no matter how many votes the server has.
+
+Only servers whose rankings are being read are kept: at most `max_servers`,
+least recently read first out, and none idle for longer than `idle_ttl`.
+Each worker only sees the votes it proxies, so a server's state is reseeded
+in the background once it is `max_age` old (the old state keeps answering
+meanwhile), which also brings in votes cast through other workers or directly
+against the frontend. A seed does not read the server's votes: the
+`server_voter_counts()` GROUP BY (supabase_stats_backend.sql) returns the
+counts of the largest `SEED_ROWS` voters up to a couple of minutes ago, and
+only the votes since then are fetched row by row.
+"""
+
+import asyncio
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from event_log import log
+
+TOP_N = 10
+# Voters per ranking a seed loads; matches the Space-Saving capacity
+SEED_ROWS = 256
+SEED_OVERLAP = timedelta(minutes=2)
+
+
+def month_key(timestamp: Optional[str] = None) -> str:
+    """`YYYY-MM` (UTC) for an ISO timestamp, or for now."""
+    if timestamp:
+        moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        moment = moment.astimezone(timezone.utc)
+    else:
+        moment = datetime.now(timezone.utc)
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+class TopList:
+    """Top-N keys by count, maintained for counters that only ever increase."""
+
+    def __init__(self, size: int = TOP_N):
+        self.size = size
+        self.keys: List[str] = []
+
+    def clear(self):
+        self.keys = []
+
+    def discard(self, key: str):
+        if key in self.keys:
+            self.keys.remove(key)
+
+    def update(self, key: str, counts: Dict[str, int]):
+        keys = self.keys
+        if key not in keys:
+            if len(keys) >= self.size:
+                if counts[key] <= counts.get(keys[-1], 0):
+                    return
+                keys.pop()
+            keys.append(key)
+        # Bubble the key up; the list is at most `size` long.
+        index = keys.index(key)
+        while index > 0 and counts.get(keys[index - 1], 0) < counts[key]:
+            keys[index - 1], keys[index] = keys[index], keys[index - 1]
+            index -= 1
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        # depth rows of width uint32 counters in one flat array (16 KB by default)
+        self.cells = array("I", bytes(4 * width * depth))
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth).digest()
+        for row in range(self.depth):
+            chunk = digest[row * 8:(row + 1) * 8]
+            yield row * self.width + int.from_bytes(chunk, "little") % self.width
+
+    def add(self, key: str, amount: int = 1):
+        for index in self._indexes(key):
+            self.cells[index] += amount
+
+    def estimate(self, key: str) -> int:
+        return min(self.cells[index] for index in self._indexes(key))
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters with O(1) unit increments.
+
+    Counters are grouped in buckets by count; since every update adds exactly
+    one, the minimum bucket can be tracked without a heap.
+    """
+
+    def __init__(self, capacity: int = 256, top_size: int = TOP_N):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.buckets: Dict[int, Set[str]] = {}
+        self.min_count = 0
+        self.top = TopList(top_size)
+
+    def _move(self, key: str, old: int, new: int):
+        if old:
+            bucket = self.buckets[old]
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[old]
+        self.buckets.setdefault(new, set()).add(key)
+
+    def load(self, counts: Dict[str, int]):
+        """Start from exact counts, keeping the largest `capacity` of them.
+
+        Keys left out count no more than the smallest kept one, so a
+        newcomer inheriting that count as its error still bounds it.
+        """
+        kept = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:self.capacity]
+        self.counts = dict(kept)
+        self.errors = {key: 0 for key, _ in kept}
+        self.buckets = {}
+        for key, count in kept:
+            self.buckets.setdefault(count, set()).add(key)
+        self.min_count = kept[-1][1] if kept else 0
+        self.top.clear()
+        for key, _ in kept[:self.top.size]:
+            self.top.keys.append(key)
+
+    def add(self, key: str):
+        counts = self.counts
+        if key in counts:
+            old = counts[key]
+        elif len(counts) < self.capacity:
+            old = 0
+            self.errors[key] = 0
+        else:
+            # Take over one of the smallest counters; the newcomer inherits
+            # its count as the error bound.
+            old = self.min_count
+            victim = self.buckets[old].pop()
+            del counts[victim]
+            del self.errors[victim]
+            self.top.discard(victim)
+            self.errors[key] = old
+            self.buckets[old].add(key)
+        counts[key] = old + 1
+        self._move(key, old, old + 1)
+        if old == 0:
+            self.min_count = 1
+        elif old == self.min_count and old not in self.buckets:
+            self.min_count = old + 1
+        self.top.update(key, counts)
+
+
+class ServerTopVoters:
+    def __init__(self, server_id: str, month: Optional[str] = None):
+        self.server_id = server_id
+        self.month = month or month_key()
+        self.monthly: Dict[str, int] = {}
+        self.last_vote: Dict[str, str] = {}
+        self.monthly_top = TopList()
+        self.all_time = SpaceSaving()
+        self.sketch = CountMinSketch()
+        # time.monotonic() of the scan this state was seeded from, and of its last read
+        self.seeded_at = time.monotonic()
+        self.last_used = self.seeded_at
+
+    def rollover(self, month: str):
+        if month != self.month:
+            self.month = month
+            self.monthly = {}
+            self.last_vote = {}
+            self.monthly_top.clear()
+
+    def add_vote(self, username: str, created_at: Optional[str] = None):
+        vote_month = month_key(created_at)
+        self.all_time.add(username)
+        self.sketch.add(username)
+        if vote_month < self.month:
+            return
+        self.rollover(vote_month)
+        self.monthly[username] = self.monthly.get(username, 0) + 1
+        timestamp = created_at or datetime.now(timezone.utc).isoformat()
+        if timestamp > self.last_vote.get(username, ""):
+            self.last_vote[username] = timestamp
+        self.monthly_top.update(username, self.monthly)
+
+    def load_counts(self, rows: List[Dict]):
+        """Seed from `server_voter_counts()` rows of this month."""
+        self.all_time.load({row["minecraftUsername"]: row["allTime"] for row in rows if row.get("allTime")})
+        for row in rows:
+            if row.get("allTime"):
+                self.sketch.add(row["minecraftUsername"], row["allTime"])
+            if row.get("monthly"):
+                self.monthly[row["minecraftUsername"]] = row["monthly"]
+                self.last_vote[row["minecraftUsername"]] = row.get("lastVoteAt")
+        ranked = sorted(self.monthly, key=self.monthly.get, reverse=True)
+        self.monthly_top.keys = ranked[:self.monthly_top.size]
+
+    def top_monthly(self, limit: int = TOP_N) -> List[Dict]:
+        self.rollover(month_key())
+        return [
+            {
+                "serverId": self.server_id,
+                "minecraftUsername": username,
+                "voteCount": self.monthly[username],
+                "lastVoteAt": self.last_vote.get(username),
+            }
+            for username in self.monthly_top.keys[:limit]
+        ]
+
+    def top_all_time(self, limit: int = TOP_N) -> List[Dict]:
+        results = []
+        for username in self.all_time.top.keys[:limit]:
+            # Both structures over-estimate, so the smaller one is tighter.
+            count = min(self.all_time.counts[username], self.sketch.estimate(username))
+            results.append({
+                "serverId": self.server_id,
+                "minecraftUsername": username,
+                "voteCount": count,
+                "maxError": self.all_time.errors[username],
+            })
+        return results
+
+
+class TopVoterIndex:
+    """Top-voter state for recently read servers, seeded lazily from the votes table."""
+
+    def __init__(self, db=None, max_servers: int = 2000, max_age: float = 600.0, idle_ttl: float = 3600.0):
+        self.db = db
+        self.max_servers = max_servers
+        self.max_age = max_age
+        self.idle_ttl = idle_ttl
+        # Least recently read first
+        self.servers: "OrderedDict[str, ServerTopVoters]" = OrderedDict()
+        self.seeds = 0
+        self.evictions = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._pending: Dict[str, List[Dict]] = {}
+
+    def record_vote(self, vote: Dict):
+        server_id = vote.get("serverId")
+        username = vote.get("minecraftUsername")
+        if not server_id or not username:
+            return
+        if server_id in self._pending:
+            # Seeding in progress: replayed once the scan finishes.
+            self._pending[server_id].append(vote)
+        state = self.servers.get(server_id)
+        if state is not None:
+            state.add_vote(username, vote.get("createdAt"))
+
+    def _evict(self, now: float):
+        servers = self.servers
+        while servers:
+            server_id, state = next(iter(servers.items()))
+            if len(servers) <= self.max_servers and now - state.last_used <= self.idle_ttl:
+                return
+            del servers[server_id]
+            self.evictions += 1
+
+    async def get(self, server_id: str) -> Optional[ServerTopVoters]:
+        """Return warm state for a server, seeding it on first use.
+
+        Returns None when the votes table is unreachable so the caller can
+        fall back to the upstream view.
+        """
+        now = time.monotonic()
+        state = self.servers.get(server_id)
+        if state is not None:
+            state.last_used = now
+            self.servers.move_to_end(server_id)
+            if now - state.seeded_at > self.max_age and server_id not in self._loading:
+                # Reseed in the background; this state answers until it is done
+                self._loading[server_id] = asyncio.ensure_future(self._load(server_id))
+            self._evict(now)
+            return state
+        if self.db is None or not self.db.configured:
+            return None
+        future = self._loading.get(server_id)
+        if future is None:
+            future = self._loading[server_id] = asyncio.ensure_future(self._load(server_id))
+        return await asyncio.shield(future)
+
+    async def _load(self, server_id: str) -> Optional[ServerTopVoters]:
+        self._pending[server_id] = []
+        try:
+            try:
+                state, recent_ids = await self._seed(server_id)
+            except Exception as e:
+                log.error("top_voters_seed_error", str(e), server=server_id)
+                current = self.servers.get(server_id)
+                if current is not None:
+                    # Keep serving the old state; try again after another max_age
+                    current.seeded_at = time.monotonic()
+                return current
+            pending = self._pending.get(server_id, [])
+            for vote in pending:
+                if vote.get("id") not in recent_ids:
+                    state.add_vote(vote["minecraftUsername"], vote.get("createdAt"))
+            previous = self.servers.get(server_id)
+            if previous is not None:
+                state.last_used = previous.last_used
+            self.servers[server_id] = state
+            self.servers.move_to_end(server_id)
+            self.seeds += 1
+            self._evict(time.monotonic())
+            return state
+        finally:
+            self._pending.pop(server_id, None)
+            self._loading.pop(server_id, None)
+
+    async def _seed(self, server_id: str):
+        state = ServerTopVoters(server_id)
+        # Counts up to the cutoff come aggregated; the votes after it are read
+        # one by one so that ones racing with the seed, which are also
+        # replayed from the pending list, can be told apart by id.
+        cutoff = (datetime.now(timezone.utc) - SEED_OVERLAP).isoformat()
+        rows = await self.db.rpc("server_voter_counts", {
+            "server": server_id,
+            "month_start": f"{state.month}-01T00:00:00+00:00",
+            "before": cutoff,
+            "row_limit": SEED_ROWS,
+        })
+        state.load_counts(rows or [])
+        recent_ids: Set[str] = set()
+        async for row in self.db.iter_rows(
+            "votes",
+            select="id,minecraftUsername,createdAt",
+            filters={"serverId": f"eq.{server_id}", "createdAt": f"gte.{cutoff}"},
+        ):
+            if not row.get("minecraftUsername"):
+                continue
+            state.add_vote(row["minecraftUsername"], row.get("createdAt"))
+            recent_ids.add(row["id"])
+        return state, recent_ids
+
+    def stats(self) -> Dict:
+        return {
+            "servers": len(self.servers),
+            "maxServers": self.max_servers,
+            "seeds": self.seeds,
+            "evictions": self.evictions,
+            "loading": len(self._loading),
+        }
@@ -0,0 +1,171 @@
+"""Sampled traffic capture for the proxy, in a compact binary log.
+
+Enabled by setting BACKEND_CAPTURE_PATH. The request path only packs one
+small record into an in-memory buffer; a background task appends the buffer
+to the log file. The log is a magic header followed by records of:
+
+    u64 arrival (us since the Unix epoch)
+    u32 total latency (us)   u32 upstream latency (us)
+    u32 request body bytes   u32 response body bytes  u16 status   u8 method
+    u16 path len             u16 query len            path bytes   query bytes
+
+Arrivals are wall-clock times, so the per-worker logs written under serve.py
+can be merged on them and keep the concurrency seen across workers. Version
+1 logs (`MCTRACE1`, u32 gap since the previous record instead of the
+arrival) are still read, with arrivals counted from 0.
+
+By default only the query *shape* is stored (parameter names, values
+dropped); BACKEND_CAPTURE_QUERY=full keeps values so replays hit the same
+cache keys. `replay.py` reads the log back.
+"""
+
+import asyncio
+import os
+import random
+import struct
+import time
+from typing import Iterator, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from event_log import log
+
+MAGIC = b"MCTRACE2"
+RECORD = struct.Struct("<QIIIIHBHH")
+MAGIC_V1 = b"MCTRACE1"
+RECORD_V1 = struct.Struct("<IIIIIHBHH")
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD")
+U32_MAX = 0xFFFFFFFF
+
+
+class CapturedRequest(NamedTuple):
+    arrival: float
+    latency: float
+    upstream_latency: float
+    request_bytes: int
+    response_bytes: int
+    status: int
+    method: str
+    path: str
+    query: str
+
+
+def query_shape(query: str) -> str:
+    """`a=1&b=2` -> `a=&b=` (names kept in order, values dropped)."""
+    return urlencode([(key, "") for key, _ in parse_qsl(query, keep_blank_values=True)])
+
+
+def _clamp(value: int) -> int:
+    return max(0, min(U32_MAX, value))
+
+
+class TrafficRecorder:
+    def __init__(self, path: str, sample_rate: float = 1.0, full_query: bool = False,
+                 max_buffer: int = 1024 * 1024):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.full_query = full_query
+        self.max_buffer = max_buffer
+        self.buffer = bytearray()
+        self.recorded = 0
+        self.dropped = 0
+        # Turns the monotonic arrival times the middleware measures into wall-clock ones
+        self._clock_offset = time.time() - time.monotonic()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                # An older format; appending to it would corrupt both
+                os.replace(path, f"{path}.old")
+                log.info("traffic_capture_rotated", path=path, moved_to=f"{path}.old")
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+
+    @classmethod
+    def from_env(cls) -> Optional["TrafficRecorder"]:
+        path = os.environ.get("BACKEND_CAPTURE_PATH")
+        if not path:
+            return None
+        if os.environ.get("BACKEND_WORKER_ID"):
+            # One log per worker under serve.py; replay.py merges them.
+            path = f"{path}.{os.environ['BACKEND_WORKER_ID']}"
+        return cls(
+            path,
+            sample_rate=float(os.environ.get("BACKEND_CAPTURE_SAMPLE", "1.0")),
+            full_query=os.environ.get("BACKEND_CAPTURE_QUERY") == "full",
+        )
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, arrival: float, method: str, path: str, query: str, request_bytes: int,
+               latency: float, upstream_latency: float, status: int, response_bytes: int):
+        """Append one record; `arrival` is a time.monotonic() value."""
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        wall_us = max(0, int((arrival + self._clock_offset) * 1_000_000))
+        path_bytes = path.encode("utf-8")[:0xFFFF]
+        query_bytes = (query if self.full_query else query_shape(query)).encode("utf-8")[:0xFFFF]
+        method_code = METHODS.index(method) if method in METHODS else 0
+        # One append per record, so a detach never splits a record
+        self.buffer += b"".join((
+            RECORD.pack(
+                wall_us, _clamp(int(latency * 1_000_000)), _clamp(int(upstream_latency * 1_000_000)),
+                _clamp(request_bytes),
+                _clamp(response_bytes), status & 0xFFFF, method_code, len(path_bytes), len(query_bytes),
+            ),
+            path_bytes,
+            query_bytes,
+        ))
+        self.recorded += 1
+
+    def detach(self) -> bytes:
+        """Take the buffered records; call on the event loop thread, like record()."""
+        if not self.buffer:
+            return b""
+        data, self.buffer = bytes(self.buffer), bytearray()
+        return data
+
+    def _write(self, data: bytes):
+        if data:
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def flush(self):
+        self._write(self.detach())
+
+    async def run_flusher(self, interval: float = 1.0):
+        while True:
+            await asyncio.sleep(interval)
+            # The buffer is swapped here; only the detached bytes go to the thread
+            data = self.detach()
+            try:
+                await asyncio.to_thread(self._write, data)
+            except OSError as e:
+                log.error("traffic_capture_write_error", str(e), path=self.path)
+
+
+def read_log(path: str) -> Iterator[CapturedRequest]:
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic not in (MAGIC, MAGIC_V1):
+            raise ValueError(f"{path} is not a traffic capture log")
+        record = RECORD if magic == MAGIC else RECORD_V1
+        arrival = 0
+        while True:
+            header = f.read(record.size)
+            if len(header) < record.size:
+                return
+            time_us, latency, upstream, request_bytes, response_bytes, status, method, path_len, query_len = \
+                record.unpack(header)
+            # Version 1 stored the gap since the previous record
+            arrival = time_us if magic == MAGIC else arrival + time_us
+            path_bytes = f.read(path_len)
+            query_bytes = f.read(query_len)
+            yield CapturedRequest(
+                arrival / 1_000_000, latency / 1_000_000, upstream / 1_000_000, request_bytes,
+                response_bytes, status,
+                METHODS[method] if method < len(METHODS) else "GET",
+                path_bytes.decode("utf-8", "replace"), query_bytes.decode("utf-8", "replace"),
+            )
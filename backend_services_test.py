@@ -0,0 +1,1487 @@
+#!/usr/bin/env python3
+"""
+Backend Services Test Suite for Minecraft Server List Application
+Exercises the in-memory services in backend/ directly (caches, indexes,
+buffers), without going through HTTP. Everything runs in-process against
+backend/fake_dns.py and backend/fake_upstream.py, so no network is needed;
+--offline is accepted like the other suites.
+"""
+
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import httpx
+import msgpack
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import banner_schedule
+import bulk_admin
+import fake_dns
+import replay
+import seed_dataset
+import table_dump
+from activity_log import ActivityLog
+from admin_stats import ENTITIES, AdminStats, hour_key
+from admission import AdmissionController, AdmissionMiddleware, PriorityClass, classify
+from approval_pipeline import SCORE_WEIGHTS, SHARED_NAME_POINTS, DuplicateIndex, score, split_address
+from banner_schedule import BannerSchedule, IntervalIndex, weighted_order
+from bulk_admin import BulkError, parse_operations, run_bulk
+from counter_buffer import CounterBuffer, CounterError, parse_events
+from disk_cache import DiskCache, disk_key
+from dns_cache import A, SRV, DnsCache, DnsError
+from fake_upstream import FAKE_ICON, running
+from hosting_ratings import HostingRatings
+from icon_store import DATA_URL_PREFIX, IconStore, decode_icon, icon_hash
+from settings_file import MISSING_VERSION, SettingsConflict, SettingsFile, file_version
+from serialization import FIELD_PRESETS, encode, negotiate, parse_fields, project
+from settings_snapshot import SettingsSnapshot
+from shm_cache import SEQ, SLOT_HEADER, SharedCache, key_hash
+from supabase_rest import SupabaseRest, quote_value
+from ticket_queue import ORDERS, PRIORITIES, PRIORITY_RANK, STATES, TicketQueue, page
+from top_voters import CountMinSketch, SpaceSaving, TopVoterIndex, month_key
+from traffic_capture import MAGIC, MAGIC_V1, RECORD_V1, TrafficRecorder, query_shape, read_log
+
+
+class BackendServicesTester:
+    def __init__(self):
+        self.test_results = []
+
+    def log_test(self, test_name: str, success: bool, message: str, details: Optional[Dict] = None):
+        """Log test results"""
+        result = {
+            'test': test_name,
+            'success': success,
+            'message': message,
+            'details': details or {}
+        }
+        self.test_results.append(result)
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+        if details:
+            print(f"   Details: {details}")
+
+    def check(self, test_name: str, condition: bool, message: str, details: Optional[Dict] = None):
+        """Log a PASS with `message`, or a FAIL carrying `details`"""
+        self.log_test(test_name, condition, message if condition else f"Expected: {message}",
+                      None if condition else details)
+
+    # DNS cache (dns_cache.py against fake_dns.py)
+
+    def test_dns_cache(self):
+        print("\n🌐 Testing DNS cache")
+        zone = fake_dns.Zone(ttl=300, negative_ttl=60)
+        zone.add("play.example.com", "A", "10.0.0.1")
+        zone.add("_minecraft._tcp.example.com", "SRV", "0 5 25570 play.example.com")
+        zone.add("slow.example.com", "A", "10.0.0.2")
+        for i in range(60):
+            zone.add("big.example.com", "A", f"10.1.0.{i}")
+        zone.failing.add("broken.example.com")
+
+        with fake_dns.running(zone) as nameserver:
+            async def scenario():
+                cache = DnsCache([nameserver], timeout=1.0, attempts=1)
+
+                first = await cache.lookup("play.example.com")
+                second = await cache.lookup("PLAY.example.com.")
+                self.check("DNS Positive Caching",
+                           first == second == ["10.0.0.1"] and zone.queries[("play.example.com", A)] == 1,
+                           "second lookup answered from the cache",
+                           {"answers": [first, second], "queries": zone.queries[("play.example.com", A)]})
+
+                missing = [await cache.lookup("missing.example.com") for _ in range(2)]
+                self.check("DNS Negative Caching",
+                           missing == [[], []] and zone.queries[("missing.example.com", A)] == 1
+                           and cache.negative_hits == 1,
+                           "NXDOMAIN cached for the SOA minimum",
+                           {"queries": zone.queries[("missing.example.com", A)], "stats": cache.stats()})
+
+                target = await cache.resolve_minecraft("example.com")
+                self.check("DNS SRV Resolution", target == ("play.example.com", 25570, ["10.0.0.1"]),
+                           "_minecraft._tcp SRV gives host, port and addresses", {"target": target})
+
+                zone.delay = 0.2
+                results = await asyncio.gather(*(cache.lookup("slow.example.com") for _ in range(5)))
+                zone.delay = 0.0
+                self.check("DNS In-Flight Deduplication",
+                           all(result == ["10.0.0.2"] for result in results)
+                           and zone.queries[("slow.example.com", A)] == 1 and cache.joined == 4,
+                           "five concurrent lookups share one query",
+                           {"queries": zone.queries[("slow.example.com", A)], "joined": cache.joined})
+
+                big = await cache.lookup("big.example.com")
+                self.check("DNS Truncation Retry Over TCP", len(big) == 60,
+                           "truncated UDP answer retried over TCP", {"records": len(big)})
+
+                errors = []
+                for _ in range(2):
+                    try:
+                        await cache.lookup("broken.example.com")
+                    except DnsError as e:
+                        errors.append(str(e))
+                self.check("DNS Failure Caching",
+                           len(errors) == 2 and zone.queries[("broken.example.com", A)] == 1,
+                           "SERVFAIL raised and cached for error_ttl",
+                           {"errors": errors, "queries": zone.queries[("broken.example.com", A)]})
+
+                no_srv = await cache.lookup("_minecraft._tcp.play.example.com", SRV)
+                self.check("DNS NODATA", no_srv == [], "missing SRV gives an empty answer", {"answer": no_srv})
+
+            asyncio.run(scenario())
+
+    # Ticket queue (ticket_queue.py)
+
+    def test_ticket_page(self):
+        print("\n🎫 Testing ticket index paging")
+        forward = [(i, f"a{i}") for i in range(5)]
+        backward = [(i, f"b{i}") for i in range(6)]
+        # Segments: a[1:4] ascending, then b[0:6] descending
+        segments = [(forward, 1, 4, False), (backward, 0, 6, True)]
+        flat = forward[1:4] + list(reversed(backward))
+        failures = []
+        for offset in range(0, 11):
+            for limit in (None, 0, 1, 2, 4, 20):
+                total, selected = page(segments, offset, limit)
+                expected = flat[offset:] if limit is None else flat[offset:offset + limit]
+                if total != len(flat) or selected != expected:
+                    failures.append({"offset": offset, "limit": limit, "got": selected, "expected": expected})
+        self.check("Ticket Page Slices", not failures,
+                   "every offset/limit slice matches slicing the concatenated segments",
+                   {"failures": failures[:3]})
+
+    def make_ticket_queue(self) -> TicketQueue:
+        rng = random.Random(7)
+        queue = TicketQueue()
+        queue.loaded = True
+        for i in range(40):
+            queue.apply_ticket({
+                "id": f"ticket_{i:02d}",
+                "userId": f"user_{i % 4}",
+                "priority": rng.choice(PRIORITIES + ("unknown",)),
+                "status": rng.choice(["open", "open", "pending", "closed"]),
+                "createdAt": f"2026-01-01T00:{i:02d}:00+00:00",
+                "updatedAt": f"2026-01-02T00:{i:02d}:00+00:00",
+            })
+        return queue
+
+    def expected_view(self, queue: TicketQueue, status, priority, user_id, order):
+        entries = queue.state.entries
+        ids = [
+            ticket_id for ticket_id, ticket in queue.state.tickets.items()
+            if (status is None or entries[ticket_id][0] == status)
+            and (priority is None or entries[ticket_id][1][0] == PRIORITY_RANK[priority])
+            and (user_id is None or ticket["userId"] == user_id)
+        ]
+        if order == "newest":
+            ids.sort(key=lambda ticket_id: entries[ticket_id][2], reverse=True)
+        else:
+            ids.sort(key=lambda ticket_id: (STATES.index(entries[ticket_id][0]), entries[ticket_id][1]))
+        return ids
+
+    def test_ticket_view(self):
+        print("\n🎫 Testing ticket views")
+        queue = self.make_ticket_queue()
+        failures = []
+        for status in (None,) + STATES:
+            for priority in (None,) + PRIORITIES:
+                for user_id in (None, "user_1"):
+                    for order in ORDERS:
+                        expected = self.expected_view(queue, status, priority, user_id, order)
+                        for offset, limit in ((0, None), (0, 5), (3, 4), (len(expected), 5)):
+                            total, rows = queue.view(status, priority, user_id, order, offset, limit)
+                            end = None if limit is None else offset + limit
+                            if total != len(expected) or [row["id"] for row in rows] != expected[offset:end]:
+                                failures.append((status, priority, user_id, order, offset, limit))
+        self.check("Ticket View Filters And Orders", not failures,
+                   "every status/priority/user/order view matches a sorted scan",
+                   {"failures": failures[:5]})
+
+        ticket = next(ticket for ticket in queue.state.tickets.values() if ticket["status"] == "open")
+        ticket_id = ticket["id"]
+        before = queue.counters()["unread"]
+        queue.apply_reply({"ticketId": ticket_id, "isAdmin": True, "createdAt": "2026-01-03T00:00:00+00:00"})
+        answered = queue.state.entries[ticket_id][0]
+        queue.apply_reply({"ticketId": ticket_id, "isAdmin": False, "createdAt": "2026-01-04T00:00:00+00:00"})
+        reopened = queue.state.entries[ticket_id]
+        self.check("Ticket Reply States",
+                   answered == "pending" and reopened[0] == "open"
+                   and reopened[1][1] == 1767484800.0 and queue.counters()["unread"] == before,
+                   "support reply moves a ticket to pending, the user's answer back to open",
+                   {"answered": answered, "reopened": reopened})
+
+        queue.delete_ticket(ticket_id)
+        total, _ = queue.view()
+        user_total = queue.user_counters(ticket["userId"])["total"]
+        self.check("Ticket Delete", total == 39 and ticket_id not in queue.state.entries
+                   and user_total == len(self.expected_view(queue, None, None, ticket["userId"], "newest")),
+                   "a deleted ticket leaves every index", {"total": total, "userTotal": user_total})
+
+    # Banner schedule (banner_schedule.py)
+
+    def make_banners(self, count: int = 30):
+        rng = random.Random(11)
+        first = date(2026, 3, 1)
+        banners = []
+        for i in range(count):
+            start = first + timedelta(days=rng.randrange(60))
+            end = start + timedelta(days=rng.randrange(0, 20))
+            banners.append({
+                "id": f"banner_{i:02d}",
+                "position": rng.choice(["top", "sidebar"]),
+                "startDate": start.isoformat(),
+                "endDate": end.isoformat(),
+                "createdAt": f"2026-02-{1 + i % 28:02d}T00:00:{i:02d}+00:00",
+                "isActive": True,
+                "weight": 1,
+            })
+        return banners
+
+    def test_interval_index(self):
+        print("\n🖼️  Testing banner interval index")
+        banners = self.make_banners()
+        index = IntervalIndex(banners)
+        days = [(date(2026, 2, 20) + timedelta(days=offset)).isoformat() for offset in range(110)]
+        wrong_sets, wrong_boundaries = [], []
+        for day in days:
+            active, following = index.lookup(day)
+            expected = [banner["id"] for banner in banners if banner["startDate"] <= day <= banner["endDate"]]
+            if [banner["id"] for banner in active] != expected:
+                wrong_sets.append(day)
+            later = [boundary for boundary in index.boundaries if boundary > day]
+            if following != (later[0] if later else None):
+                wrong_boundaries.append(day)
+            # Nothing may change before the reported boundary
+            elif following is not None:
+                before = (date.fromisoformat(following) - timedelta(days=1)).isoformat()
+                if index.lookup(before)[0] != active:
+                    wrong_boundaries.append(day)
+        self.check("Interval Index Active Sets", not wrong_sets,
+                   "each day's banners match a scan, in input order", {"days": wrong_sets[:5]})
+        self.check("Interval Index Boundaries", not wrong_boundaries,
+                   "the next boundary is where the active set can next change", {"days": wrong_boundaries[:5]})
+
+        single = IntervalIndex([{"id": "one", "startDate": "2026-05-10", "endDate": "2026-05-10"}])
+        self.check("Interval Index Single Day",
+                   single.lookup("2026-05-09") == ([], "2026-05-10")
+                   and [b["id"] for b in single.lookup("2026-05-10")[0]] == ["one"]
+                   and single.lookup("2026-05-11") == ([], None),
+                   "a one-day campaign is active on exactly that day",
+                   {"lookups": [single.lookup(day) for day in ("2026-05-09", "2026-05-10", "2026-05-11")]})
+
+    def test_banner_schedule(self):
+        print("\n🖼️  Testing banner schedule")
+        banners = self.make_banners()
+        banners.append({**banners[0], "id": "banner_inactive", "isActive": False})
+        banners.append({**banners[0], "id": "banner_backwards", "startDate": "2026-04-10",
+                        "endDate": "2026-04-01"})
+        unschedulable = {"banner_inactive", "banner_backwards"}
+        schedule = BannerSchedule()
+        schedule.banners = {banner["id"]: banner for banner in banners}
+        schedule._rebuild()
+        schedule.loaded = True
+
+        real_today = banner_schedule.today
+        wrong, swaps = [], []
+        try:
+            for offset in range(0, 100):
+                day = (date(2026, 2, 25) + timedelta(days=offset)).isoformat()
+                banner_schedule.today = lambda day=day: day
+                before = schedule.swaps
+                served = [banner["id"] for banner in json.loads(schedule.active("top"))]
+                expected = sorted(
+                    (banner for banner in banners
+                     if banner["position"] == "top" and banner["id"] not in unschedulable
+                     and banner["startDate"] <= day <= banner["endDate"]),
+                    key=lambda banner: banner["createdAt"], reverse=True)
+                if served != [banner["id"] for banner in expected]:
+                    wrong.append(day)
+                swaps.append(schedule.swaps - before)
+                # Same day again: served from the snapshot
+                schedule.active("top")
+                if schedule.swaps - before != swaps[-1]:
+                    wrong.append(f"{day} (re-read swapped)")
+        finally:
+            banner_schedule.today = real_today
+        boundaries = schedule.indexes["top"].boundaries
+        self.check("Banner Schedule Active By Day", not wrong,
+                   "served banners match the schedule, newest first, skipping inactive and reversed ones",
+                   {"days": wrong[:5]})
+        self.check("Banner Schedule Swaps At Boundaries", sum(swaps) <= len(boundaries) + 1,
+                   "the snapshot is rebuilt only when a boundary is crossed",
+                   {"swaps": sum(swaps), "boundaries": len(boundaries)})
+
+        schedule.delete_banner(banners[0]["id"])
+        self.check("Banner Schedule Delete",
+                   all(banner["id"] != banners[0]["id"]
+                       for segment in schedule.indexes["*"].segments for banner in segment),
+                   "a deleted banner leaves every segment")
+
+        rng = random.Random(3)
+        heavy, light = {"id": "heavy", "weight": 3}, {"id": "light", "weight": 1}
+        firsts = sum(weighted_order([light, heavy], rng)[0]["id"] == "heavy" for _ in range(4000))
+        self.check("Banner Weighted Rotation", abs(firsts / 4000 - 0.75) < 0.03,
+                   "a banner comes first in proportion to its weight", {"heavyFirst": firsts / 4000})
+
+    # View/click counters (counter_buffer.py against fake_upstream.py)
+
+    def test_counter_buffer(self):
+        print("\n🔢 Testing counter buffer")
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                fake = httpx.AsyncClient(base_url=url)
+                try:
+                    post = (await db.select("blog_posts", {"limit": "1"}))[0]
+                    banner = (await db.select("banners", {"limit": "1"}))[0]
+
+                    async def totals():
+                        post_row = (await db.select("blog_posts", {"id": f"eq.{post['id']}"}))[0]
+                        banner_row = (await db.select("banners", {"id": f"eq.{banner['id']}"}))[0]
+                        return post_row["viewCount"], banner_row["viewCount"], banner_row["clickCount"]
+
+                    start = await totals()
+                    buffer = CounterBuffer(db)
+                    for _ in range(5):
+                        buffer.add("post_view", post["id"])
+                    for _ in range(3):
+                        buffer.add("banner_view", banner["id"])
+                    buffer.add("banner_click", banner["id"], 2)
+                    await buffer.flush()
+                    after = await totals()
+                    self.check("Counter Flush",
+                               after == (start[0] + 5, start[1] + 3, start[2] + 2) and not buffer.pending
+                               and buffer.unflushed("post_view", post["id"]) == 0,
+                               "summed deltas applied in one call per table",
+                               {"before": start, "after": after, "pending": buffer.pending})
+
+                    # Only the banner function fails: post views land, banner deltas wait for the next round
+                    await fake.put("/__fake/profile", json={"error_rate": 1.0, "error_status": 503,
+                                                            "paths": "/rpc/increment_banner_counters"})
+                    buffer.add("post_view", post["id"], 4)
+                    buffer.add("banner_view", banner["id"], 6)
+                    await buffer.flush()
+                    failed = await totals()
+                    self.check("Counter Flush Failure Keeps Deltas",
+                               failed == (after[0] + 4, after[1], after[2]) and buffer.flush_errors == 1
+                               and buffer.pending == {("banner_view", banner["id"]): 6},
+                               "the failed function's deltas are put back, the other's are applied",
+                               {"totals": failed, "pending": buffer.pending})
+
+                    buffer.add("banner_view", banner["id"], 1)
+                    await fake.put("/__fake/profile", json={})
+                    await buffer.flush()
+                    retried = await totals()
+                    self.check("Counter Flush Retry",
+                               retried == (after[0] + 4, after[1] + 7, after[2]) and not buffer.pending
+                               and buffer.flushed == 5 + 3 + 2 + 4 + 7,
+                               "retried deltas merged with new ones and applied exactly once",
+                               {"totals": retried, "flushed": buffer.flushed})
+
+                    capped = CounterBuffer(db, max_keys=2)
+                    for item in ("a", "b", "c"):
+                        capped.add("banner_view", item)
+                    capped.add("banner_view", "a")
+                    self.check("Counter Key Cap", len(capped.pending) == 2 and capped.dropped == 1
+                               and capped.pending[("banner_view", "a")] == 2,
+                               "new keys beyond max_keys are dropped, known keys still count",
+                               {"pending": capped.pending, "dropped": capped.dropped})
+                finally:
+                    await fake.aclose()
+                    await db.close()
+
+            asyncio.run(scenario())
+
+        rejected = []
+        for body in (None, {"events": []}, {"events": [{"counter": "nope", "id": "x"}]},
+                     {"events": [{"counter": "post_view", "id": ""}]},
+                     {"events": [{"counter": "post_view", "id": "x"}] * 501}):
+            try:
+                parse_events(body)
+            except CounterError:
+                rejected.append(True)
+        parsed = parse_events({"events": [{"counter": "banner_click", "id": "banner_1"}]})
+        self.check("Counter Event Validation", len(rejected) == 5 and parsed == [("banner_click", "banner_1")],
+                   "malformed bodies are rejected, valid events parsed", {"rejected": len(rejected)})
+
+    # Theme settings file (settings_file.py)
+
+    def test_settings_file(self):
+        print("\n🎨 Testing settings file")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data", "settings.json")
+
+            async def scenario():
+                first = SettingsFile(path, poll_interval=0.5, debounce=0.01)
+                second = SettingsFile(path, poll_interval=0.5, debounce=0.01)
+                initial = await first.ensure_loaded()
+                self.check("Settings File Defaults", initial.version == MISSING_VERSION
+                           and initial.settings["sitename"] == "Minecraft Server List",
+                           "a missing file serves the defaults", {"version": initial.version})
+
+                written = await first.update({"siteName": "Block Party", "adsEnabled": True, "logoUrl": ""},
+                                             expected=MISSING_VERSION)
+                with open(path, "rb") as f:
+                    raw = f.read()
+                self.check("Settings File Write",
+                           written.version == file_version(raw) and written.settings["sitename"] == "Block Party"
+                           and written.settings["adsenabled"] is True and written.settings["logourl"] == ""
+                           and first.snapshot is written,
+                           "the merged settings are written and become the snapshot",
+                           {"version": written.version, "settings": dict(written.settings)})
+
+                # Another worker writes on top of the version it read
+                other = await second.ensure_loaded()
+                await second.update({"primaryColor": "#ff0000"}, expected=other.version)
+                conflict = None
+                try:
+                    await first.update({"siteName": "Lost Update"}, expected=written.version)
+                except SettingsConflict as e:
+                    conflict = e.snapshot
+                with open(path, "rb") as f:
+                    current = f.read()
+                self.check("Settings File Conflict",
+                           conflict is not None and conflict.version == file_version(current)
+                           and conflict.settings["primarycolor"] == "#ff0000"
+                           and b"Lost Update" not in current and first.conflicts == 1,
+                           "a write based on a superseded version is refused with the current one",
+                           {"conflict": conflict.version if conflict else None})
+
+                unconditional = await first.update({"siteName": "Forced"})
+                self.check("Settings File Unconditional Write",
+                           unconditional.settings["sitename"] == "Forced"
+                           and unconditional.settings["primarycolor"] == "#ff0000",
+                           "a write without a version applies on top of the file's current content")
+
+                watcher = asyncio.create_task(second.run_watcher())
+                try:
+                    await asyncio.sleep(0.1)
+                    with open(path, "w") as f:
+                        f.write('{"sitename": "Edited By Hand"}')
+                    for _ in range(40):
+                        await asyncio.sleep(0.05)
+                        if second.snapshot.settings.get("sitename") == "Edited By Hand":
+                            break
+                    self.check("Settings File Watch", second.snapshot.settings.get("sitename") == "Edited By Hand",
+                               "an edit made outside the backend is picked up",
+                               {"watching": second.watching, "snapshot": dict(second.snapshot.settings)})
+
+                    kept = second.snapshot
+                    with open(path, "w") as f:
+                        f.write('{"sitename": ')
+                    for _ in range(40):
+                        await asyncio.sleep(0.05)
+                        if second.parse_errors:
+                            break
+                    self.check("Settings File Parse Error", second.parse_errors >= 1 and second.snapshot is kept,
+                               "a file that does not parse keeps the previous snapshot",
+                               {"parseErrors": second.parse_errors})
+                finally:
+                    watcher.cancel()
+                    try:
+                        await watcher
+                    except asyncio.CancelledError:
+                        pass
+
+            asyncio.run(scenario())
+
+    # Server icons (icon_store.py against fake_upstream.py)
+
+    def test_icon_store(self):
+        print("\n🧱 Testing icon store")
+        png = decode_icon(FAKE_ICON)
+        other_png = png + b"\x00"
+        other_icon = DATA_URL_PREFIX + base64.b64encode(other_png).decode()
+        invalid = [
+            decode_icon(None),
+            decode_icon("data:image/gif;base64,R0lGODlh"),
+            decode_icon(DATA_URL_PREFIX + "not base64!"),
+            decode_icon(DATA_URL_PREFIX + base64.b64encode(b"GIF89a").decode()),
+            decode_icon(DATA_URL_PREFIX + base64.b64encode(png + b"\x00" * 70_000).decode()),
+        ]
+        self.check("Icon Decode", png is not None and png.startswith(b"\x89PNG") and invalid == [None] * 5,
+                   "PNG data URLs decode; other types, bad base64, non-PNG and oversized ones do not",
+                   {"invalid": [value is None for value in invalid]})
+
+        with tempfile.TemporaryDirectory() as directory, running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    store = IconStore(directory, db, max_memory_bytes=len(png) + len(other_png) - 1)
+                    first = await store.put(FAKE_ICON)
+                    again = await store.put(FAKE_ICON)
+                    rejected = await store.put("data:image/png;base64,AAAA")
+                    path = store.path(first)
+                    self.check("Icon Store Deduplication",
+                               first == again == icon_hash(png) and path.read_bytes() == png
+                               and store.stored == 1 and store.deduplicated == 1
+                               and rejected is None and store.rejected == 1,
+                               "an icon is stored once under its hash",
+                               {"stats": store.stats()})
+
+                    second = await store.put(other_icon)
+                    served = [await store.get(first), await store.get(first), await store.get(second)]
+                    self.check("Icon Store Reads",
+                               served == [png, png, other_png] and store.hits == 1
+                               and await store.get("../../etc/passwd") is None
+                               and await store.get("0" * 32) is None
+                               and store.memory_bytes <= store.max_memory_bytes,
+                               "stored icons are served, hot ones from a byte-bounded memory LRU",
+                               {"stats": store.stats()})
+
+                    server = (await db.select("servers", {"limit": "1", "select": "id,iconHash"}))[0]
+
+                    async def row_hash():
+                        return (await db.select("servers", {"id": f"eq.{server['id']}", "select": "iconHash"}))[0][
+                            "iconHash"]
+
+                    await store.assign(server["id"], first)
+                    await store.assign(server["id"], first)
+                    self.check("Icon Assign Writes Changes Only",
+                               await row_hash() == first and store.row_reads == 1 and store.row_writes == 1,
+                               "the row is read once and written only because the hash changed",
+                               {"stats": store.stats()})
+
+                    fresh = IconStore(directory, db, max_assigned=1)
+                    await fresh.assign(server["id"], first)
+                    await fresh.assign(server["id"], second)
+                    self.check("Icon Assign Reads Before Writing",
+                               fresh.row_reads == 1 and fresh.row_writes == 1 and await row_hash() == second,
+                               "a worker without the assignment reads the row instead of rewriting it",
+                               {"stats": fresh.stats()})
+
+                    await fresh.assign("server_that_does_not_exist", first)
+                    neighbour = (await db.select("servers", {"id": f"neq.{server['id']}", "limit": "1"}))[0]
+                    await fresh.assign(neighbour["id"], neighbour.get("iconHash"))
+                    self.check("Icon Assign Bounded",
+                               list(fresh.assigned) == [neighbour["id"]] and fresh.row_writes == 1,
+                               "missing rows are not remembered and assignments stay within max_assigned",
+                               {"assigned": list(fresh.assigned), "stats": fresh.stats()})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+    # Bulk moderation (bulk_admin.py against fake_upstream.py, route via server.py)
+
+    @contextlib.contextmanager
+    def server_client(self, url: str):
+        """server.py wired to the fake upstream, with a TestClient whose startup and shutdown run per use"""
+        os.environ.setdefault("BACKEND_L2_CACHE", "off")
+        os.environ.setdefault("BACKEND_LOG_PATH", os.devnull)
+        import supabase_rest
+        supabase_rest.supabase.url, supabase_rest.supabase.key = url, "service-role-key"
+        import server
+        from starlette.testclient import TestClient
+        server.FRONTEND_URL = url
+        server.session_resolver.url, server.session_resolver.key = url, "service-role-key"
+        server.session_resolver.cache.clear()
+        try:
+            with TestClient(server.app) as client:
+                yield server, client
+        finally:
+            server.frontend_client = None
+            server.background_tasks.clear()
+
+    def test_bulk_admin(self):
+        print("\n📦 Testing bulk moderation")
+        errors = []
+        for entity, body in (("widgets", {"action": "delete", "ids": ["a"]}),
+                             ("users", {"action": "role", "ids": ["a"], "role": "owner"}),
+                             ("tickets", {"action": "close", "ids": []}),
+                             ("tickets", {"operations": [{"action": "close", "ids": ["a"] * 2}] * 2
+                                          + [{"action": "close", "ids": [str(i) for i in range(10_000)]}]})):
+            try:
+                parse_operations(entity, body)
+            except BulkError as e:
+                errors.append(str(e))
+        operations = parse_operations("tickets", {"action": "close", "ids": ["a", "b", "a"]})
+        self.check("Bulk Parse", len(errors) == 4 and operations[0].ids == ["a", "b"],
+                   "unknown entities, bad options, empty and oversized lists are rejected; ids are deduplicated",
+                   {"errors": errors, "ids": operations[0].ids})
+
+        ids = [f"server_{1_700_000_000_000 + i}_{i:09x}" for i in range(bulk_admin.CHUNK_SIZE)]
+        query = str(httpx.URL("http://db/rest/v1/servers",
+                              params={"id": f"in.({','.join(quote_value(i) for i in ids)})", "select": "id"}))
+        self.check("Bulk Chunk URL Length", len(query) < 4096,
+                   "a full chunk of ids fits in a 4 KiB request line",
+                   {"length": len(query), "chunk_size": bulk_admin.CHUNK_SIZE})
+
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    tickets = [row["id"] for row in await db.select("tickets", {"select": "id", "limit": "3"})]
+                    ids = tickets + ["ticket_missing_1", "ticket_missing_2"]
+                    batches = [batch async for batch in run_bulk(
+                        db, "tickets", parse_operations("tickets", {"action": "close", "ids": ids}), chunk_size=2)]
+                    results = {row["id"]: row["status"] for batch in batches[:-1] for row in batch}
+                    summary = batches[-1][0]
+                    closed = await db.select("tickets", {"id": f"in.({','.join(tickets)})", "select": "status"})
+                    self.check("Bulk Chunked Results",
+                               len(batches) == 4 and results == {i: "ok" if i in tickets else "not_found" for i in ids}
+                               and summary["ok"] == len(tickets) and summary["not_found"] == 2
+                               and all(row["status"] == "closed" for row in closed),
+                               "five ids run as three chunks with one result per id and a summary",
+                               {"batches": batches, "closed": closed})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+            body = {"action": "role", "ids": ["user_missing"], "role": "admin"}
+            with self.server_client(url) as (server, client):
+                previous = server.ADMIN_TOKEN
+                try:
+                    server.ADMIN_TOKEN = None
+                    unconfigured = client.post("/api/admin/bulk/users", json=body).status_code
+                    server.ADMIN_TOKEN = "bulk-token"
+                    anonymous = client.post("/api/admin/bulk/users", json=body).status_code
+                    wrong = client.post("/api/admin/bulk/users", json=body,
+                                        headers={"x-admin-token": "guess"}).status_code
+                    allowed = client.post("/api/admin/bulk/users", json=body,
+                                          headers={"authorization": "Bearer bulk-token"})
+                finally:
+                    server.ADMIN_TOKEN = previous
+            lines = [json.loads(line) for line in allowed.text.splitlines()]
+            self.check("Bulk Requires Admin Token",
+                       (unconfigured, anonymous, wrong, allowed.status_code) == (404, 403, 403, 200)
+                       and lines[0]["status"] == "not_found" and lines[-1].get("done"),
+                       "bulk actions run only for callers with the admin token",
+                       {"statuses": [unconfigured, anonymous, wrong, allowed.status_code], "lines": lines})
+
+    # Synthetic dataset (seed_dataset.py, REST load into fake_upstream.py)
+
+    def test_seed_dataset(self):
+        print("\n🌱 Testing dataset generator")
+        config = seed_dataset.Config(seed=7, months=2, users=60, servers=25, votes=600, posts=10,
+                                     hostings=3, reviews=20, activity=50)
+        counts = seed_dataset.zipf_counts(600, 25, 1.1, random.Random(1))
+        self.check("Seed Zipf Split", sum(counts) == 600 and counts[0] == max(counts),
+                   "vote totals split exactly, the top rank taking the most",
+                   {"counts": counts})
+
+        scripts = []
+        for _ in range(2):
+            out = io.StringIO()
+            seed_dataset.write_copy(seed_dataset.Dataset(config).tables(), out, lambda table, rows: None)
+            scripts.append(out.getvalue())
+        self.check("Seed Deterministic COPY Script",
+                   scripts[0] == scripts[1] and "session_replication_role = replica" in scripts[0],
+                   "the same seed produces the same script, loaded with the row triggers off",
+                   {"lengths": [len(script) for script in scripts]})
+
+        dataset = seed_dataset.Dataset(config)
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    await seed_dataset.load_rest(dataset.tables(), url, "service-role-key", batch=100,
+                                                 concurrency=2, progress=lambda table, rows: None)
+                    expected = dict(zip(dataset.server_ids, dataset.vote_counts))
+                    servers = await db.select("servers", {"id": f"in.({','.join(expected)})",
+                                                          "select": "id,voteCount"})
+                    stored = {row["id"]: row["voteCount"] for row in servers}
+                    voted = {}
+                    for vote in await db.select("votes", {"serverId": f"in.({','.join(expected)})",
+                                                          "select": "serverId"}):
+                        voted[vote["serverId"]] = voted.get(vote["serverId"], 0) + 1
+                    self.check("Seed REST Vote Counts",
+                               stored == expected and all(voted.get(i, 0) == n for i, n in expected.items()),
+                               "over REST the trigger-counted votes are recounted, not doubled",
+                               {"stored": sum(stored.values()), "expected": sum(expected.values())})
+
+                    top = max(expected, key=expected.get)
+                    await db.insert("votes", [{"id": "vote_seed_check", "serverId": top,
+                                               "minecraftUsername": "seed_check"}])
+                    await db.insert("votes", [{"id": "vote_seed_check", "serverId": top,
+                                               "minecraftUsername": "seed_check"}], upsert=True)
+                    after = (await db.select("servers", {"id": f"eq.{top}", "select": "voteCount"}))[0]
+                    self.check("Fake Vote Trigger", after["voteCount"] == expected[top] + 1,
+                               "a REST vote insert bumps voteCount once; the upsert replay does not",
+                               {"before": expected[top], "after": after["voteCount"]})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+    # Dump and restore (table_dump.py against fake_upstream.py)
+
+    def test_table_dump(self):
+        print("\n💾 Testing table dump and restore")
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    servers = [row["id"] for row in await db.select("servers", {"select": "id"})]
+                    await db.insert("votes", [{"id": f"vote_dump_{i:03d}", "serverId": servers[i % 3],
+                                               "minecraftUsername": f"voter_{i}"} for i in range(23)])
+                    # The fixture's voteCounts are random; make them agree with the votes like the trigger would
+                    await db.rpc("recount_server_votes")
+                    tables = ["servers", "votes"]
+                    before = {table: sorted(await db.select(table, {}), key=lambda row: row["id"])
+                              for table in tables}
+                    for fmt in table_dump.FORMATS:
+                        with tempfile.TemporaryDirectory() as directory:
+                            await table_dump.export_tables(db, tables, directory, fmt, "id", page_size=7)
+                            # Children cascade with their servers
+                            await db.delete("servers", {"id": "neq.none"})
+                            emptied = await db.count("votes")
+                            await table_dump.import_tables(db, directory, None, batch=5, concurrency=3)
+                            after = {table: sorted(await db.select(table, {}), key=lambda row: row["id"])
+                                     for table in tables}
+                            checkpoint = table_dump.load_json(
+                                os.path.join(directory, table_dump.IMPORT_CHECKPOINT), {})
+                        self.check(f"Dump Round Trip ({fmt})",
+                                   emptied == 0 and after == before
+                                   and checkpoint == {table: len(before[table]) for table in tables},
+                                   "an export restored into emptied tables gives back the same rows and voteCounts",
+                                   {"rows": {table: [len(before[table]), len(after[table])] for table in tables},
+                                    "checkpoint": checkpoint})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+    # Hosting ratings (hosting_ratings.py against fake_upstream.py, review routes via server.py)
+
+    def test_hosting_ratings(self):
+        print("\n⭐ Testing hosting ratings")
+
+        def review(review_id, hosting_id, user_id, ratings, approved=True):
+            return {"id": review_id, "hosting_id": hosting_id, "user_id": user_id, "comment": "ok",
+                    "performance_rating": ratings[0], "support_rating": ratings[1],
+                    "price_value_rating": ratings[2], "is_approved": approved,
+                    "created_at": f"2025-02-0{review_id[-1]}T00:00:00+00:00"}
+
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    await db.insert("hosting_reviews", [
+                        review("review_1", "hosting_1", "user_1", (5, 4, 3)),
+                        review("review_2", "hosting_1", "user_2", (3, 3, 3)),
+                        review("review_3", "hosting_2", "user_3", (1, 1, 1), approved=False),
+                    ])
+                    await db.update("hostings", {"id": "eq.hosting_3"}, {"min_price": None})
+                    ratings = HostingRatings(db)
+                    await ratings.ensure_loaded()
+                    first = dict(ratings.hostings["hosting_1"])
+                    self.check("Ratings Aggregates",
+                               (first["avg_performance"], first["avg_support"], first["avg_price_value"],
+                                first["avg_overall"], first["review_count"], first["sum_performance"])
+                               == (4.0, 3.5, 3.0, 3.5, 2, 8)
+                               and ratings.hostings["hosting_2"]["review_count"] == 0,
+                               "averages, counts and sums come from the approved reviews only",
+                               {"hosting_1": first, "hosting_2": ratings.hostings["hosting_2"]})
+
+                    ratings.apply_review(review("review_2", "hosting_1", "user_2", (5, 5, 5)))
+                    edited = dict(ratings.hostings["hosting_1"])
+                    ratings.apply_review(review("review_2", "hosting_1", "user_2", (5, 5, 5), approved=False))
+                    ratings.delete_review("review_1")
+                    emptied = ratings.hostings["hosting_1"]
+                    self.check("Ratings Deltas",
+                               edited["avg_performance"] == 5.0 and edited["avg_overall"] == 4.5
+                               and emptied["review_count"] == 0 and emptied["avg_overall"] == 0
+                               and ratings.distribution("hosting_1")["distribution"]["performance"]["5"] == 0,
+                               "edits, unapprovals and deletes move the aggregates by their own delta",
+                               {"edited": edited, "emptied": emptied})
+
+                    by_price = [row["id"] for row in ratings.list_hostings("min_price")]
+                    self.check("Ratings Order NULLs First", by_price == ["hosting_3", "hosting_2", "hosting_1"],
+                               "descending like Postgres ORDER BY ... DESC, which puts NULLs first",
+                               {"order": by_price})
+
+                    reconcile = asyncio.create_task(ratings.reconcile())
+                    await asyncio.sleep(0)
+                    ratings.apply_review(review("review_4", "hosting_3", "user_4", (4, 4, 4)))
+                    await reconcile
+                    self.check("Ratings Reconcile Replays Writes",
+                               ratings.reconciles == 2 and ratings.hostings["hosting_3"]["review_count"] == 1
+                               and ratings.hostings["hosting_1"]["review_count"] == 2,
+                               "a write seen during the rescan survives the swap; the rescan restores the tables' view",
+                               {"stats": ratings.stats(), "hosting_3": ratings.hostings["hosting_3"]})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+            with self.server_client(url) as (server, client):
+                path = "/api/hostings/hosting_2/reviews/review_3"
+
+                def as_user(user_id):
+                    return {"authorization": f"Bearer {user_id}"}
+
+                statuses = [
+                    client.patch(path, json={"comment": "edited"}).status_code,
+                    client.patch(path, json={"comment": "edited"}, headers=as_user("user_5")).status_code,
+                    client.patch(path, json={"comment": "edited"}, headers=as_user("user_3")).status_code,
+                    client.patch(path, json={"is_approved": True}, headers=as_user("user_3")).status_code,
+                    client.patch(path, json={"is_approved": True}, headers=as_user("user_admin")).status_code,
+                    client.delete(path, headers=as_user("user_5")).status_code,
+                    client.delete(path, headers=as_user("user_3")).status_code,
+                    client.delete(path, headers=as_user("user_3")).status_code,
+                ]
+                self.check("Review Routes Require Author Or Admin",
+                           statuses == [401, 403, 200, 403, 200, 403, 200, 404],
+                           "only the author edits or deletes a review, and only admins approve it",
+                           {"statuses": statuses})
+
+    # Settings snapshot (settings_snapshot.py against fake_upstream.py, two workers over shm_cache.py)
+
+    def test_settings_snapshot(self):
+        print("\n🗂️  Testing settings snapshot")
+        with tempfile.TemporaryDirectory() as directory, running() as url:
+            path = os.path.join(directory, "arena")
+            SharedCache.create(path, slots=16, slot_size=4096, workers=2).close()
+            arenas = [SharedCache(path, worker) for worker in range(2)]
+
+            async def scenario():
+                async with httpx.AsyncClient(base_url=url) as client:
+                    async def save(name):
+                        await client.put("/api/admin/settings", json={"sitename": name})
+
+                    async def served(snapshot):
+                        return json.loads((await snapshot.current("settings/public")).body)["sitename"]
+
+                    first, second = (SettingsSnapshot(url, shared=arena, retry_delay=0.05) for arena in arenas)
+                    await first.refresh()
+                    await second.refresh()
+
+                    await save("Saved Once")
+                    first.invalidate()
+                    here = await served(first)
+                    there = await served(second)
+                    self.check("Snapshot Invalidation",
+                               here == there == "Saved Once" and first.snapshot.version == 2
+                               and second.remote_invalidations == 1 and first.remote_invalidations == 0,
+                               "the writing worker and the other worker both serve the write on their next read",
+                               {"served": [here, there], "first": first.stats(), "second": second.stats()})
+
+                    await save("Saved Twice")
+                    await client.put("/__fake/profile", json={"error_rate": 1.0, "paths": "^/api/settings"})
+                    first.invalidate()
+                    during = await served(first)
+                    failed = first.stats()
+                    await client.put("/__fake/profile", json={})
+                    for _ in range(100):
+                        if not first.stats()["writePending"]:
+                            break
+                        await asyncio.sleep(0.02)
+                    after = await served(first)
+                    self.check("Snapshot Retries Failed Refresh",
+                               during == "Saved Once" and failed["refreshErrors"] >= 1 and failed["writePending"]
+                               and after == "Saved Twice" and not first.stats()["writePending"],
+                               "a refresh that fails after a write is retried until the write is served",
+                               {"during": during, "after": after, "failed": failed, "stats": first.stats()})
+
+            try:
+                asyncio.run(scenario())
+            finally:
+                for arena in arenas:
+                    arena.close()
+
+    # Traffic capture and replay (traffic_capture.py, replay.py against fake_upstream.py)
+
+    def test_traffic_capture(self):
+        print("\n🎞️  Testing traffic capture and replay")
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"capture.bin.{worker}") for worker in range(2)]
+            workers = [TrafficRecorder(path) for path in paths]
+            base = time.monotonic()
+
+            def record(worker, offset, path, query="", latency=0.01):
+                workers[worker].record(base + offset, "GET", path, query, 0, latency, latency / 2, 200, 10)
+
+            # Worker 0's first request is slow, so it is written after the one that arrived later
+            record(0, 0.3, "/api/servers", "page=2")
+            record(0, 0.0, "/api/servers/server_1700000000000_abc123xyz/status", latency=0.4)
+            record(1, 0.1, "/api/servers", "page=1&limit=20")
+            record(1, 0.2, "/api/hostings")
+            for worker in workers:
+                worker.flush()
+
+            schedule = replay.merged_schedule(paths)
+            order = [(round(offset, 3), captured.path) for offset, captured in schedule]
+            self.check("Capture Merge On Arrival",
+                       order == [(0.0, "/api/servers/server_1700000000000_abc123xyz/status"),
+                                 (0.1, "/api/servers"), (0.2, "/api/hostings"), (0.3, "/api/servers")]
+                       and abs(schedule[0][1].arrival - time.time()) < 60,
+                       "per-worker logs interleave by wall-clock arrival, not by write order",
+                       {"order": order})
+            self.check("Capture Query Shape",
+                       [captured.query for _, captured in schedule if captured.query] == ["page=&limit=", "page="]
+                       and query_shape("a=1&a=2&b=") == "a=&a=&b="
+                       and replay.route_shape(schedule[0][1].path) == "/api/servers/:id/status",
+                       "only parameter names are stored by default and ids collapse in route shapes",
+                       {"queries": [captured.query for _, captured in schedule]})
+
+            legacy = os.path.join(directory, "legacy.bin")
+            with open(legacy, "wb") as f:
+                f.write(MAGIC_V1)
+                for gap in (0, 250_000, 500_000):
+                    path = b"/api/servers"
+                    f.write(RECORD_V1.pack(gap, 1000, 500, 0, 10, 200, 0, len(path), 0) + path)
+            arrivals = [captured.arrival for captured in read_log(legacy)]
+            TrafficRecorder(legacy)
+            with open(legacy, "rb") as f:
+                header = f.read()
+            self.check("Capture Reads Version 1",
+                       arrivals == [0.0, 0.25, 0.75] and os.path.exists(legacy + ".old")
+                       and header == MAGIC,
+                       "gap-based logs still replay, and a recorder moves them aside instead of appending",
+                       {"arrivals": arrivals, "header": header})
+
+            with running() as url:
+                results, duration = asyncio.run(replay.replay(schedule, url, rate=20, include_writes=False,
+                                                              concurrency=4))
+            counts = {shape: len(entry["replayed"]) for shape, entry in results.items()}
+            self.check("Replay Against Target",
+                       counts == {"/api/servers": 2, "/api/hostings": 1, "/api/servers/:id/status": 1}
+                       and duration >= 0.3 / 20,
+                       "every captured read is re-issued on its schedule",
+                       {"counts": counts, "duration": duration})
+
+    # Activity feed (activity_log.py against fake_upstream.py, two workers over shm_cache.py)
+
+    def test_activity_log(self):
+        print("\n📝 Testing activity log")
+        with tempfile.TemporaryDirectory() as directory, running() as url:
+            path = os.path.join(directory, "arena")
+            SharedCache.create(path, slots=16, slot_size=4096, workers=2).close()
+            arenas = [SharedCache(path, worker) for worker in range(2)]
+
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    here, there = (ActivityLog(db, batch_size=3, per_user=5, shared=arena) for arena in arenas)
+                    self.check("Activity Empty Feed", await there.recent("user_1", 5) == [],
+                               "a user without activity gets an empty feed", {"stats": there.stats()})
+
+                    for i in range(4):
+                        here.record("user_1", "vote", f"Voted {i}")
+                    here.record("user_2", "login", "Logged in")
+                    queued = [event["description"] for event in await here.recent("user_1", 3)]
+                    self.check("Activity Ring Merges Queue",
+                               queued == ["Voted 3", "Voted 2", "Voted 1"] and here.written == 0,
+                               "events still queued are served newest first from the ring",
+                               {"feed": queued, "stats": here.stats()})
+
+                    async with httpx.AsyncClient(base_url=url) as client:
+                        await client.put("/__fake/profile", json={"error_rate": 1.0, "paths": "user_activity"})
+                        await here.flush()
+                        failed = here.stats()
+                        await client.put("/__fake/profile", json={})
+                    await here.flush()
+                    rows = await db.select("user_activity", {"userId": "eq.user_1"})
+                    self.check("Activity Batched Flush",
+                               failed["writeErrors"] == 1 and failed["queued"] == 5
+                               and here.written == 5 and here.batches == 2 and len(rows) == 4,
+                               "a failed batch stays queued; the retry writes five events in two batches",
+                               {"failed": failed, "stats": here.stats()})
+
+                    seeds = here.seeds
+                    remote = [event["description"] for event in await there.recent("user_1", 5)]
+                    local = [event["description"] for event in await here.recent("user_1", 5)]
+                    self.check("Activity Cross-Worker Reseed",
+                               remote == local == ["Voted 3", "Voted 2", "Voted 1", "Voted 0"]
+                               and there.remote_reseeds == 1 and here.seeds == seeds,
+                               "another worker re-seeds after a flush; the writing worker keeps its ring",
+                               {"remote": remote, "local": local, "there": there.stats(), "here": here.stats()})
+                finally:
+                    await db.close()
+
+            try:
+                asyncio.run(scenario())
+            finally:
+                for arena in arenas:
+                    arena.close()
+
+    # Top voters (top_voters.py against fake_upstream.py)
+
+    def test_top_voters(self):
+        print("\n🏆 Testing top voters")
+        random.seed(26)
+        stream = [f"heavy_{i}" for i in range(3) for _ in range(40 - 10 * i)]
+        stream += [f"light_{i}" for i in range(200)]
+        random.shuffle(stream)
+        truth = {key: stream.count(key) for key in set(stream)}
+        summary, sketch = SpaceSaving(capacity=16, top_size=3), CountMinSketch(width=64, depth=4)
+        for key in stream:
+            summary.add(key)
+            sketch.add(key)
+        bounded = all(truth[key] <= count <= truth[key] + summary.errors[key]
+                      for key, count in summary.counts.items())
+        over = all(sketch.estimate(key) >= count for key, count in truth.items())
+        self.check("Top Voters Space-Saving",
+                   summary.top.keys == ["heavy_0", "heavy_1", "heavy_2"] and bounded and over
+                   and len(summary.counts) == 16,
+                   "heavy hitters rank first within their error bounds; Count-Min never under-counts",
+                   {"top": summary.top.keys, "bounded": bounded, "over": over})
+
+        summary = SpaceSaving(capacity=2, top_size=2)
+        summary.load({"a": 5, "b": 3, "c": 2})
+        summary.add("d")
+        self.check("Top Voters Space-Saving Load",
+                   summary.counts == {"a": 5, "d": 4} and summary.errors == {"a": 0, "d": 3}
+                   and summary.top.keys == ["a", "d"],
+                   "a load keeps the largest counts exactly; a newcomer inherits the smallest as its error",
+                   {"counts": summary.counts, "errors": summary.errors})
+
+        now = datetime.now(timezone.utc)
+        this_month = f"{month_key()}-01T00:00:00+00:00"
+        last_year = (now - timedelta(days=400)).isoformat()
+        votes = [("steve", last_year)] * 5 + [("alex", this_month)] * 3 + [("steve", this_month)] * 2
+        votes += [("notch", (now - timedelta(seconds=30)).isoformat())]
+
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                selects = []
+                select = db.select
+
+                async def recording_select(table, params):
+                    selects.append((table, dict(params)))
+                    return await select(table, params)
+
+                db.select = recording_select
+                try:
+                    await db.insert("votes", [
+                        {"id": f"vote_{i}", "serverId": "server_1", "minecraftUsername": username,
+                         "voterIp": f"10.0.0.{i}", "createdAt": created_at}
+                        for i, (username, created_at) in enumerate(votes)
+                    ])
+                    index = TopVoterIndex(db)
+                    state = await index.get("server_1")
+                    monthly = [(row["minecraftUsername"], row["voteCount"]) for row in state.top_monthly()]
+                    all_time = [(row["minecraftUsername"], row["voteCount"]) for row in state.top_all_time()]
+                    scans = [params for table, params in selects if table == "votes"]
+                    self.check("Top Voters Seed",
+                               monthly == [("alex", 3), ("steve", 2), ("notch", 1)]
+                               and all_time == [("steve", 7), ("alex", 3), ("notch", 1)]
+                               and all(params.get("createdAt", "").startswith("gte.") for params in scans),
+                               "counts come from the GROUP BY; only the last minutes of votes are read",
+                               {"monthly": monthly, "allTime": all_time, "scans": scans})
+
+                    for i in range(3):
+                        vote = {"id": f"vote_new_{i}", "serverId": "server_1", "minecraftUsername": "notch",
+                                "voterIp": f"10.0.1.{i}", "createdAt": datetime.now(timezone.utc).isoformat()}
+                        await db.insert("votes", [vote])
+                        index.record_vote(vote)
+                    recorded = [(row["minecraftUsername"], row["voteCount"]) for row in state.top_monthly()]
+                    index.max_age = 0
+                    await index.get("server_1")
+                    await asyncio.gather(*index._loading.values())
+                    index.max_age = 600
+                    state = await index.get("server_1")
+                    reseeded = [(row["minecraftUsername"], row["voteCount"]) for row in state.top_monthly()]
+                    self.check("Top Voters Record And Reseed",
+                               recorded[0] == reseeded[0] == ("notch", 4) and index.seeds == 2,
+                               "proxied votes count at once; a stale server is reseeded without counting them twice",
+                               {"recorded": recorded, "reseeded": reseeded, "stats": index.stats()})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+    # List projection and encodings (serialization.py, through server.py against fake_upstream.py)
+
+    def test_serialization(self):
+        print("\n🧾 Testing list projection")
+        preset = parse_fields("list", "servers")
+        self.check("Fields Parsing",
+                   preset == tuple(sorted(FIELD_PRESETS["servers"]["list"]))
+                   and parse_fields(" name, id,,name ", "servers") == ("id", "name")
+                   and parse_fields("", "servers") is None and parse_fields(" , ", "servers") is None,
+                   "presets expand, explicit lists are trimmed, deduplicated and sorted, empty means all",
+                   {"preset": preset})
+
+        rows = [{"id": "a", "name": "A", "votifierKey": "secret"}, {"id": "b", "description": "long"}]
+        self.check("Projection",
+                   project(rows, ("id", "name")) == [{"id": "a", "name": "A"}, {"id": "b"}]
+                   and project(iter(rows), None) == rows,
+                   "only the asked fields are kept, missing ones are skipped; no fields keeps the rows",
+                   {"projected": project(rows, ("id", "name"))})
+
+        packed, media_type = encode(rows, negotiate("application/x-msgpack, */*"))
+        body, json_type = encode(rows, negotiate("application/json"))
+        self.check("Encoding Negotiation",
+                   media_type == "application/msgpack" and msgpack.unpackb(packed) == rows
+                   and json_type == "application/json" and json.loads(body) == rows
+                   and negotiate(None) == "json",
+                   "msgpack when accepted, compact JSON otherwise",
+                   {"media_type": media_type, "json_type": json_type})
+
+        with running() as url, self.server_client(url) as (server, client):
+            full = client.get("/api/servers").json()
+            listed = client.get("/api/servers", params={"fields": "list"}).json()
+            picked = client.get("/api/servers", params={"fields": "name,id"},
+                                headers={"accept": "application/msgpack"})
+            self.check("List Route Projection",
+                       full and len(listed) == len(full)
+                       and all(set(row) <= set(preset) for row in listed)
+                       and any(set(row) - set(preset) for row in full)
+                       and picked.headers["content-type"] == "application/msgpack"
+                       and msgpack.unpackb(picked.content) == [{"id": row["id"], "name": row["name"]} for row in full],
+                       "the route projects to the preset or listed fields and honours Accept",
+                       {"listed": listed[:1], "picked": picked.headers.get("content-type")})
+
+    # Shared-memory cache (shm_cache.py, two workers over one arena)
+
+    def test_shm_cache(self):
+        print("\n🧠 Testing shared-memory cache")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "arena")
+            SharedCache.create(path, slots=8, slot_size=256, workers=2).close()
+            one, two = SharedCache(path, 0), SharedCache(path, 1)
+            try:
+                stored = one.put(("list", "servers"), b"[1,2,3]", 60, "servers")
+                too_big = one.put("big", b"x" * 256, 60)
+                self.check("Shm Put Get Across Workers",
+                           stored and two.get(("list", "servers")) == b"[1,2,3]" and not too_big
+                           and two.get("big") is None and two.get("missing") is None,
+                           "a value written by one worker is read by another; oversized values are refused",
+                           {"stored": stored, "too_big": too_big})
+
+                hashed = key_hash(("list", "servers"))
+                offset = next(offset for offset in one._slot_offsets(hashed)
+                              if SLOT_HEADER.unpack_from(one.map, offset)[1] == hashed)
+                seq = SEQ.unpack_from(one.map, offset)[0]
+                SEQ.pack_into(one.map, offset, seq + 1)
+                torn = two.get(("list", "servers"))
+                SEQ.pack_into(one.map, offset, seq)
+                start = offset + SLOT_HEADER.size
+                one.map[start:start + 1] = b"{"
+                corrupt = two.get(("list", "servers"))
+                one.map[start:start + 1] = b"["
+                self.check("Shm Seqlock And CRC",
+                           seq % 2 == 0 and torn is None and corrupt is None
+                           and two.get(("list", "servers")) == b"[1,2,3]",
+                           "a slot mid-write (odd sequence) or failing its CRC reads as a miss",
+                           {"seq": seq, "torn": torn, "corrupt": corrupt})
+
+                stale = one.generation("servers")
+                two.invalidate("servers")
+                invalidated = one.get(("list", "servers"))
+                one.put(("list", "servers"), b"[1]", 60, "servers", stale)
+                raced = two.get(("list", "servers"))
+                one.put(("list", "servers"), b"[1]", 60, "servers")
+                one.put("short", b"gone", -1)
+                self.check("Shm Tag Invalidation",
+                           invalidated is None and raced is None and two.get(("list", "servers")) == b"[1]"
+                           and one.generation("servers") == stale + 1 and two.get("short") is None,
+                           "a tag bump hides its entries, writes fetched before the bump stay hidden, expired ones miss",
+                           {"generation": one.generation("servers")})
+
+                one.add("requests", 2)
+                two.add("requests", 3)
+                one.set("rss_bytes", 10)
+                one.set("rss_bytes", 7)
+                totals = two.counter_totals()
+                self.check("Shm Counters",
+                           totals["requests"] == 5 and totals["rss_bytes"] == 7,
+                           "per-worker counter rows sum across workers; gauges are overwritten",
+                           {"totals": totals})
+            finally:
+                one.close()
+                two.close()
+
+    # Disk cache (disk_cache.py on a temporary SQLite file)
+
+    def test_disk_cache(self):
+        print("\n💾 Testing disk cache")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache", "responses.sqlite3")
+
+            async def scenario():
+                cache = DiskCache(path)
+                try:
+                    cache.put(("list", "servers"), b"servers", 60, "servers")
+                    cache.put("expired", b"old", -1)
+                    before_invalidation = time.time()
+                    cache.put("tickets", b"tickets", 60, "tickets")
+                    await cache.compact()
+                finally:
+                    cache.close()
+
+                cache = DiskCache(path, max_bytes=350)
+                try:
+                    reopened = await cache.get(("list", "servers"))
+                    expired = await cache.get("expired")
+                    cache.invalidate("tickets")
+                    cache.put("tickets", b"raced", 60, "tickets", created_at=before_invalidation)
+                    raced = await cache.get("tickets")
+                    cache.put("tickets", b"fresh", 60, "tickets")
+                    fresh = await cache.get("tickets")
+                    self.check("Disk Cache Persistence And Invalidation",
+                               reopened == b"servers" and expired is None and raced is None and fresh == b"fresh",
+                               "entries survive a reopen; expired and pre-invalidation writes miss",
+                               {"reopened": reopened, "expired": expired, "raced": raced, "fresh": fresh})
+
+                    cache.put("corrupt", b"value", 60)
+                    await cache.compact()
+                    with contextlib.closing(sqlite3.connect(path)) as db, db:
+                        db.execute("UPDATE entries SET value = ? WHERE key = ?", (b"VALUE", disk_key("corrupt")))
+                    corrupt = await cache.get("corrupt")
+                    self.check("Disk Cache Checksum",
+                               corrupt is None and cache.corrupt == 1 and await cache.get("corrupt") is None,
+                               "a value failing its checksum is dropped and counted",
+                               {"stats": await cache.stats()})
+
+                    for name in "abcde":
+                        cache.put(name, name.encode() * 100, 60)
+                        await asyncio.sleep(0.01)
+                    await cache.compact()
+                    kept = [name for name in "abcde" if await cache.get(name) is not None]
+                    stats = await cache.stats()
+                    self.check("Disk Cache LRU Compaction",
+                               kept == ["c", "d", "e"] and stats["bytes"] <= 350,
+                               "compaction evicts least recently used entries down to the budget",
+                               {"kept": kept, "stats": stats})
+                finally:
+                    cache.close()
+
+            asyncio.run(scenario())
+
+    # Admission control (admission.py)
+
+    def test_admission(self):
+        print("\n🚦 Testing admission control")
+
+        def scope(method="GET", path="/api/servers", **headers):
+            return {"type": "http", "method": method, "path": path,
+                    "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]}
+
+        browser = "Mozilla/5.0 (X11; Linux x86_64)"
+        classes = [
+            classify(scope("POST", "/api/servers/server_1/vote", user_agent="curl/8.0")),
+            classify(scope(cookie="theme=dark; sb-project-auth-token=abc", user_agent="curl/8.0")),
+            classify(scope(x_admin_token="secret"), b"secret"),
+            classify(scope(authorization="Bearer guess", user_agent=browser), b"secret"),
+            classify(scope("POST", "/api/counters", user_agent=browser)),
+            classify(scope(user_agent="Googlebot/2.1")),
+            classify(scope()),
+        ]
+        self.check("Admission Classes", classes == [0, 1, 1, 2, 2, 3, 3],
+                   "writes are critical, sessions and the admin token authenticated, beacons anonymous, "
+                   "crawlers and agentless clients bots", {"classes": classes})
+
+        async def scenario():
+            controller = AdmissionController(limit=1, classes=(
+                PriorityClass("critical", max_queue=4, target=1.0, max_wait=1.0, retry_after=1),
+                PriorityClass("authenticated", max_queue=4, target=1.0, max_wait=1.0, retry_after=2),
+                PriorityClass("anonymous", max_queue=1, target=1.0, max_wait=1.0, retry_after=5),
+                PriorityClass("bot", max_queue=4, target=0.01, max_wait=0.01, retry_after=30),
+            ))
+            order = []
+
+            async def request(index):
+                if await controller.acquire(index):
+                    order.append(index)
+                    await asyncio.sleep(0.01)
+                    controller.release()
+                    return True
+                return False
+
+            holder = await controller.acquire(2)
+            anonymous = asyncio.create_task(request(2))
+            await asyncio.sleep(0)
+            full = await request(2)
+            timed_out = await request(3)
+            critical = asyncio.create_task(request(0))
+            await asyncio.sleep(0)
+            controller.release()
+            admitted = await asyncio.gather(anonymous, critical)
+            stats = controller.stats()
+            self.check("Admission Priority And Shedding",
+                       holder and admitted == [True, True] and order == [0, 2] and not full and not timed_out
+                       and stats["inFlight"] == 0 and stats["classes"]["anonymous"]["shedFull"] == 1
+                       and stats["classes"]["bot"]["shedTimeout"] == 1,
+                       "a freed slot goes to the highest class waiting; full queues shed at once, "
+                       "waiters past their deadline after it",
+                       {"order": order, "stats": stats})
+
+            async def app(scope, receive, send):
+                await asyncio.sleep(0.05)
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+                await send({"type": "http.response.body", "body": b"ok"})
+
+            shed = []
+            middleware = AdmissionMiddleware(app, AdmissionController(limit=1, classes=(
+                PriorityClass("critical", max_queue=0, target=0, max_wait=0, retry_after=7),)),
+                on_shed=shed.append)
+            responses = [[], []]
+
+            async def call(sent):
+                async def send(message):
+                    sent.append(message)
+                await middleware(scope("POST"), None, send)
+
+            await asyncio.gather(call(responses[0]), call(responses[1]))
+            statuses = [sent[0]["status"] for sent in responses]
+            retry_after = dict(responses[1][0]["headers"]).get(b"retry-after")
+            self.check("Admission Middleware Sheds With 503",
+                       statuses == [200, 503] and retry_after == b"7" and shed == [0],
+                       "a shed request gets a 503 with its class's Retry-After without reaching the app",
+                       {"statuses": statuses, "retry_after": retry_after})
+
+        asyncio.run(scenario())
+
+    # Admin dashboard counters (admin_stats.py against fake_upstream.py)
+
+    def test_admin_stats(self):
+        print("\n📊 Testing admin stats")
+        with running() as url:
+            async def scenario():
+                db = SupabaseRest(url, "service-role-key")
+                try:
+                    await db.insert("tickets", [{"id": "ticket_new", "userId": "user_2",
+                                                 "subject": "New", "description": "Opened this hour"}])
+                    counts = {name: await db.count(table) for name, table in ENTITIES.items()}
+                    stats = AdminStats(db)
+                    loaded = await stats.ensure_loaded()
+                    totals = {name: counters.total for name, counters in stats.entities.items()}
+                    hour = hour_key(datetime.now(timezone.utc))
+                    created = stats.entities["tickets"].hourly.get(hour, 0)
+                    self.check("Admin Stats Load",
+                               loaded and totals == counts and created == 1,
+                               "totals are exact counts; the hourly series comes from the GROUP BY",
+                               {"totals": totals, "counts": counts, "hourly": created})
+
+                    stats.record("tickets", 1, datetime.now(timezone.utc).isoformat())
+                    bumped = (stats.entities["tickets"].total, stats.entities["tickets"].hourly.get(hour))
+                    stats.record("tickets", -1)
+                    self.check("Admin Stats Record",
+                               bumped == (counts["tickets"] + 1, created + 1)
+                               and stats.entities["tickets"].total == counts["tickets"],
+                               "creates bump the total and their hour, deletes only the total",
+                               {"bumped": bumped})
+
+                    reconcile = asyncio.create_task(stats.reconcile())
+                    while stats._pending is None:
+                        await asyncio.sleep(0)
+                    stats.record("servers", 1, datetime.now(timezone.utc).isoformat())
+                    await reconcile
+                    replayed = stats.entities["servers"].total
+                    await db.insert("tickets", [{"id": "ticket_direct", "userId": "user_1",
+                                                 "subject": "Direct", "description": "Written around the proxy"}])
+                    await stats.reconcile()
+                    self.check("Admin Stats Reconcile Replays Writes",
+                               replayed == counts["servers"] + 1 and stats.reconciles == 3
+                               and stats.last_drift["tickets"] == 1 and stats.last_drift["servers"] == -1
+                               and stats.entities["tickets"].total == counts["tickets"] + 1,
+                               "a write seen while counting survives the swap; the next recount settles drift",
+                               {"replayed": replayed, "stats": stats.stats()})
+                finally:
+                    await db.close()
+
+            asyncio.run(scenario())
+
+    # Approval pre-checks: duplicate index and scoring (approval_pipeline.py)
+
+    def test_approval_scoring(self):
+        print("\n🛂 Testing approval duplicates and scoring")
+        index = DuplicateIndex()
+        index.put({"id": "a", "name": "Craft-Land TR", "ip": "Play.Example.com.", "port": 25565,
+                   "approvalStatus": "approved"})
+        index.put({"id": "b", "name": "craftland tr", "ip": "other.example.com", "port": None})
+        index.put({"id": "c", "name": "Elsewhere", "ip": "play.example.com:25565", "port": 19132})
+        index.put({"id": "d", "name": "Elsewhere", "ip": "play.example.com", "port": 25566})
+        before = index.matches("a")
+        index.put({"id": "c", "name": "Moved", "ip": "moved.example.com", "port": 25565})
+        index.remove("b")
+        after = index.matches("a")
+        self.check("Approval Duplicate Index",
+                   split_address("Play.Example.com:25570", 25565) == ("play.example.com", 25570)
+                   and [row["id"] for row in before["address"]] == ["c"]
+                   and [row["id"] for row in before["name"]] == ["b"]
+                   and after == {"address": [], "name": []} and index.matches("d")["name"] == []
+                   and index.matches("missing") == {"address": [], "name": []},
+                   "addresses and names match after normalizing; re-puts and removes leave no stale entries",
+                   {"before": before, "after": after})
+
+        none = {"address": [], "name": []}
+        server = {"shortDescription": "A friendly survival server", "website": "https://example.com",
+                  "bannerUrl": "https://example.com/banner.png"}
+        report = {"ping": {"online": True}, "votifier": {"configured": True, "reachable": True, "v2": True},
+                  "banner": {"ok": True, "standardSize": True}}
+        failing = {"ping": {"online": False}, "votifier": {"configured": True, "reachable": True},
+                   "banner": {"ok": False}}
+        scores = [
+            score(server, report, none),
+            score(server, None, none),
+            score({}, failing, {"address": [{"id": "x"}], "name": [{"id": "x"}]}),
+            score(server, None, {"address": [], "name": [{"id": "x"}]}),
+        ]
+        self.check("Approval Score",
+                   scores == [
+                       (sum(SCORE_WEIGHTS.values()), []),
+                       (SCORE_WEIGHTS["unique"] + SCORE_WEIGHTS["details"], []),
+                       (0, ["duplicate_address", "short_description", "offline", "votifier_key_invalid"]),
+                       (SHARED_NAME_POINTS + SCORE_WEIGHTS["details"], ["duplicate_name"]),
+                   ],
+                   "a clean, reachable server scores 100; duplicates and failed checks cost points and add flags",
+                   {"scores": scores})
+
+    def run_all_tests(self):
+        """Run all backend service tests"""
+        print("🚀 Starting Backend Services Tests")
+        print("=" * 60)
+
+        for test in (self.test_dns_cache, self.test_ticket_page, self.test_ticket_view,
+                     self.test_interval_index, self.test_banner_schedule, self.test_counter_buffer,
+                     self.test_settings_file, self.test_icon_store, self.test_bulk_admin,
+                     self.test_seed_dataset, self.test_table_dump, self.test_hosting_ratings,
+                     self.test_settings_snapshot, self.test_traffic_capture, self.test_activity_log,
+                     self.test_top_voters, self.test_serialization,
+                     self.test_shm_cache, self.test_disk_cache,
+                     self.test_admission, self.test_admin_stats,
+                     self.test_approval_scoring):
+            try:
+                test()
+            except Exception as e:
+                self.log_test(test.__name__, False, f"Raised {type(e).__name__}: {e}")
+
+        # Summary
+        print("\n" + "=" * 60)
+        print("📊 BACKEND SERVICES TEST SUMMARY")
+        print("=" * 60)
+
+        total = len(self.test_results)
+        passed = sum(1 for result in self.test_results if result['success'])
+
+        print(f"Total Tests: {total}")
+        print(f"Passed: {passed}")
+        print(f"Failed: {total - passed}")
+        print(f"Success Rate: {(passed/total)*100:.1f}%")
+
+        failed_tests = [result for result in self.test_results if not result['success']]
+        if failed_tests:
+            print("\n❌ FAILED TESTS:")
+            for test in failed_tests:
+                print(f"  - {test['test']}: {test['message']}")
+        else:
+            print("\n🎉 ALL BACKEND SERVICE TESTS PASSED!")
+
+        return passed == total
+
+
+def run():
+    tester = BackendServicesTester()
+    return tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    # In-process already; --offline is accepted for symmetry with the HTTP suites
+    success = run()
+    sys.exit(0 if success else 1)
@@ -6,11 +6,13 @@ Tests blog category and post endpoints using Supabase backend
 
 import requests
 import json
+import os
 import sys
 from typing import Dict, Any, Optional
 
 # Configuration
-BASE_URL = "http://localhost:3000"
+# API_BASE_URL overrides the target; --offline runs against backend/fake_upstream.py
+BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:3000")
 API_BASE = f"{BASE_URL}/api"
 
 class BlogAPITester:
@@ -445,7 +447,17 @@ class BlogAPITester:
         
         return passed == total
 
-if __name__ == "__main__":
+def run():
     tester = BlogAPITester()
-    success = tester.run_all_tests()
+    return tester.run_all_tests()
+
+if __name__ == "__main__":
+    if "--offline" in sys.argv:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        from fake_upstream import running
+        with running() as url:
+            BASE_URL, API_BASE = url, f"{url}/api"
+            success = run()
+    else:
+        success = run()
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -1,6 +1,6 @@
 'use client'
 
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Card } from '@/components/ui/card'
 import { Input } from '@/components/ui/input'
 import { Button } from '@/components/ui/button'
@@ -13,6 +13,8 @@ import { Palette, Image, Type, Hash, MessageSquare, Save } from 'lucide-react'
 export default function ThemeSettingsPage() {
   const [loading, setLoading] = useState(true)
   const [saving, setSaving] = useState(false)
+  // Version of the settings file we loaded; saves are rejected if it changed since
+  const versionRef = useRef(null)
   const [settings, setSettings] = useState({
     siteName: 'Minecraft Server List',
     siteTagline: 'En İyi Minecraft Sunucuları',
@@ -40,6 +42,7 @@ export default function ThemeSettingsPage() {
     try {
       const response = await fetch('/api/admin/settings-file')
       if (response.ok) {
+        versionRef.current = response.headers.get('ETag')
         const data = await response.json()
         setSettings(prev => ({
           ...prev,
@@ -59,12 +62,19 @@ export default function ThemeSettingsPage() {
     try {
       const response = await fetch('/api/admin/settings-file', {
         method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
+        headers: {
+          'Content-Type': 'application/json',
+          ...(versionRef.current ? { 'If-Match': versionRef.current } : {})
+        },
         body: JSON.stringify(settings)
       })
 
       if (response.ok) {
+        versionRef.current = response.headers.get('ETag')
         toast.success('✅ Tema ayarları kaydedildi! Sayfayı yenileyin.')
+      } else if (response.status === 412) {
+        toast.error('Ayarlar başka bir oturumda değiştirildi, güncel ayarlar yüklendi')
+        await fetchSettings()
       } else {
         toast.error('Ayarlar kaydedilirken hata oluştu')
       }
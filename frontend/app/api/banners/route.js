@@ -42,6 +42,7 @@ export async function POST(request) {
       endDate: body.endDate,
       isActive: body.isActive !== undefined ? body.isActive : true
     }
+    if (body.weight !== undefined) bannerData.weight = body.weight
     
     const { data, error } = await supabaseAdmin
       .from('banners')
@@ -81,6 +82,7 @@ export async function PATCH(request) {
     if (body.startDate !== undefined) updateData.startDate = body.startDate
     if (body.endDate !== undefined) updateData.endDate = body.endDate
     if (body.isActive !== undefined) updateData.isActive = body.isActive
+    if (body.weight !== undefined) updateData.weight = body.weight
     
     const { data, error } = await supabaseAdmin
       .from('banners')
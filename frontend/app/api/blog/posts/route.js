@@ -21,12 +21,7 @@ export async function GET(request) {
         return NextResponse.json({ error: 'Post not found' }, { status: 404 })
       }
       
-      // Increment view count
-      await supabaseAdmin
-        .from('blog_posts')
-        .update({ viewCount: (post.viewCount || 0) + 1 })
-        .eq('id', post.id)
-      
+      // Views are counted by the backend proxy (buffered, flushed in batches), not written per read
       // Get post replies
       const { data: replies } = await supabaseAdmin
         .from('blog_replies')
@@ -36,7 +31,7 @@ export async function GET(request) {
       
       return NextResponse.json({
         ...post,
-        viewCount: (post.viewCount || 0) + 1,
+        viewCount: post.viewCount || 0,
         replies: replies || []
       })
     }
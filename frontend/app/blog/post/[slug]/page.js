@@ -5,6 +5,7 @@ import { Card } from '@/components/ui/card'
 import { Badge } from '@/components/ui/badge'
 import ReactMarkdown from 'react-markdown'
 import StructuredData from '@/components/blog/StructuredData'
+import ViewBeacon from '@/components/blog/ViewBeacon'
 import { RenderWithHashtags, extractHashtags, HashtagBadges } from '@/components/blog/HashtagUtils'
 import { supabaseAdmin } from '@/lib/supabase'
 import { notFound } from 'next/navigation'
@@ -116,11 +117,7 @@ async function getPost(slug) {
       return null
     }
 
-    // Increment view count
-    await supabaseAdmin
-      .from('blog_posts')
-      .update({ viewCount: (post.viewCount || 0) + 1 })
-      .eq('id', post.id)
+    // The view itself is reported by <ViewBeacon> and buffered by the backend
 
     // Get post replies
     const { data: replies } = await supabaseAdmin
@@ -226,6 +223,7 @@ export default async function PostDetailPage({ params }) {
     <>
       <StructuredData data={articleData} />
       <StructuredData data={breadcrumbData} />
+      <ViewBeacon postId={post.id} />
 
       <div className="min-h-screen bg-gradient-to-b from-[#0a0a0a] via-[#0f0f0f] to-[#0a0a0a]">
         {/* Header */}
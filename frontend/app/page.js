@@ -178,18 +178,32 @@ export default function HomePage() {
 
   const fetchBanners = async () => {
     try {
-      const response = await fetch('/api/banners/active')
+      // rotate=1: the backend orders each position's banners by weighted lottery
+      const response = await fetch('/api/banners/active?rotate=1')
       if (response.ok) {
         const data = await response.json()
         setTopBanners(data.filter(b => b.position === 'top'))
         setBottomBanners(data.filter(b => b.position === 'bottom'))
         setBetweenServersBanners(data.filter(b => b.position === 'between_servers'))
         setSidebarBanners(data.filter(b => b.position === 'sidebar'))
+        // Impressions of the banners actually rendered: first top/bottom, every sidebar and in-list one
+        trackBanners('banner_view', [
+          ...data.filter(b => b.position === 'top').slice(0, 1),
+          ...data.filter(b => b.position === 'bottom').slice(0, 1),
+          ...data.filter(b => b.position === 'sidebar' || b.position === 'between_servers'),
+        ])
       }
     } catch (error) {
       console.error('Error fetching banners:', error)
     }
   }
+
+  // Views and clicks are buffered by the backend and flushed in batches
+  const trackBanners = (counter, banners) => {
+    if (banners.length === 0 || typeof navigator === 'undefined' || !navigator.sendBeacon) return
+    const events = banners.map(banner => ({ counter, id: banner.id }))
+    navigator.sendBeacon('/api/counters', new Blob([JSON.stringify({ events })], { type: 'application/json' }))
+  }
   
   const filteredServers = servers.filter(server => {
     const matchesSearch = server.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
@@ -350,7 +364,8 @@ export default function HomePage() {
         <div className="container mx-auto px-4">
           <div className="flex justify-center">
             {topBanners.length > 0 ? (
-              <a href={topBanners[0].linkUrl || '#'} target="_blank" rel="noopener noreferrer" className="block">
+              <a href={topBanners[0].linkUrl || '#'} target="_blank" rel="noopener noreferrer" className="block"
+                onClick={() => trackBanners('banner_click', [topBanners[0]])}>
                 <img 
                   src={topBanners[0].imageUrl} 
                   alt={topBanners[0].serverName}
@@ -723,6 +738,7 @@ export default function HomePage() {
                             target="_blank" 
                             rel="noopener noreferrer" 
                             className="block"
+                            onClick={() => trackBanners('banner_click', [betweenServersBanners[Math.floor(index / 5) % betweenServersBanners.length]])}
                           >
                             <img
                               src={betweenServersBanners[Math.floor(index / 5) % betweenServersBanners.length].imageUrl}
@@ -824,6 +840,7 @@ export default function HomePage() {
                         target="_blank" 
                         rel="noopener noreferrer" 
                         className="block mb-4"
+                        onClick={() => trackBanners('banner_click', [banner])}
                       >
                         <img
                           src={banner.imageUrl}
@@ -1005,7 +1022,8 @@ export default function HomePage() {
         <div className="container mx-auto px-4">
           <div className="flex justify-center">
             {bottomBanners.length > 0 ? (
-              <a href={bottomBanners[0].linkUrl || '#'} target="_blank" rel="noopener noreferrer" className="block">
+              <a href={bottomBanners[0].linkUrl || '#'} target="_blank" rel="noopener noreferrer" className="block"
+                onClick={() => trackBanners('banner_click', [bottomBanners[0]])}>
                 <img 
                   src={bottomBanners[0].imageUrl} 
                   alt={bottomBanners[0].serverName}
@@ -0,0 +1,14 @@
+'use client'
+
+import { useEffect } from 'react'
+
+// Reports one view of a post; the backend buffers it and flushes counts in batches
+export default function ViewBeacon({ postId }) {
+  useEffect(() => {
+    if (!postId || !navigator.sendBeacon) return
+    const body = JSON.stringify({ events: [{ counter: 'post_view', id: postId }] })
+    navigator.sendBeacon('/api/counters', new Blob([body], { type: 'application/json' }))
+  }, [postId])
+
+  return null
+}
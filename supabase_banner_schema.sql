@@ -14,6 +14,7 @@ CREATE TABLE IF NOT EXISTS banners (
   "isActive" BOOLEAN DEFAULT true,
   "clickCount" INTEGER DEFAULT 0,
   "viewCount" INTEGER DEFAULT 0,
+  weight INTEGER DEFAULT 1 CHECK (weight > 0),
   "createdAt" TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
   "updatedAt" TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -22,6 +23,9 @@ CREATE TABLE IF NOT EXISTS banners (
 CREATE INDEX IF NOT EXISTS idx_banners_active ON banners("isActive", "startDate", "endDate");
 CREATE INDEX IF NOT EXISTS idx_banners_position ON banners(position);
 
+-- Rotation weight among banners sharing a position (existing installs)
+ALTER TABLE banners ADD COLUMN IF NOT EXISTS weight INTEGER DEFAULT 1 CHECK (weight > 0);
+
 -- Enable RLS
 ALTER TABLE banners ENABLE ROW LEVEL SECURITY;
 
@@ -0,0 +1,28 @@
+-- View and click counters are buffered by the Python backend (backend/counter_buffer.py)
+-- Every few seconds each worker sends its summed deltas through these functions,
+-- one atomic "col = col + delta" UPDATE per table, instead of a write per read.
+-- Deltas are JSON objects of id -> increment, e.g. {"post_123": 4, "post_456": 1}.
+
+CREATE OR REPLACE FUNCTION increment_blog_post_views(deltas JSONB)
+RETURNS void
+LANGUAGE sql
+AS $$
+  UPDATE blog_posts p
+  SET "viewCount" = COALESCE(p."viewCount", 0) + d.value::int
+  FROM jsonb_each_text(deltas) d
+  WHERE p.id = d.key;
+$$;
+
+CREATE OR REPLACE FUNCTION increment_banner_counters(views JSONB, clicks JSONB)
+RETURNS void
+LANGUAGE sql
+AS $$
+  UPDATE banners b
+  SET "viewCount" = COALESCE(b."viewCount", 0) + COALESCE((views ->> b.id)::int, 0),
+      "clickCount" = COALESCE(b."clickCount", 0) + COALESCE((clicks ->> b.id)::int, 0)
+  WHERE b.id IN (SELECT jsonb_object_keys(views) UNION SELECT jsonb_object_keys(clicks));
+$$;
+
+-- Only the backend's service role may call them
+REVOKE EXECUTE ON FUNCTION increment_blog_post_views(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION increment_banner_counters(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
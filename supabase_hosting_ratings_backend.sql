@@ -0,0 +1,126 @@
+-- Hosting ratings served by the Python backend (backend/hosting_ratings.py)
+-- The backend keeps its own incremental aggregates for reads, but the stored
+-- averages on hostings stay owned by this trigger: reviews can be written
+-- without going through the backend, and several backend workers must not
+-- write their own (possibly divergent) averages over each other.
+-- This replaces update_hosting_ratings() with an incremental version: each
+-- hosting keeps the running sum of every rating next to review_count, a
+-- review write adds or subtracts its own ratings and the averages are
+-- divided out of the sums, so no write reads the hosting's other reviews.
+-- Run this after supabase_hosting_schema.sql.
+
+ALTER TABLE hostings ADD COLUMN IF NOT EXISTS sum_performance BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE hostings ADD COLUMN IF NOT EXISTS sum_support BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE hostings ADD COLUMN IF NOT EXISTS sum_price_value BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION update_hosting_ratings()
+RETURNS TRIGGER AS $$
+DECLARE
+    change RECORD;
+BEGIN
+    -- Edits that leave the ratings, approval and hosting alone (helpful
+    -- votes, text) do not touch the hosting row
+    IF TG_OP = 'UPDATE'
+        AND OLD.hosting_id = NEW.hosting_id
+        AND OLD.is_approved IS NOT DISTINCT FROM NEW.is_approved
+        AND OLD.performance_rating = NEW.performance_rating
+        AND OLD.support_rating = NEW.support_rating
+        AND OLD.price_value_rating = NEW.price_value_rating THEN
+        RETURN NEW;
+    END IF;
+    -- Take the old row out of its hosting's sums, put the new one in
+    FOR change IN
+        SELECT -1 AS sign, OLD.hosting_id AS hosting_id, OLD.performance_rating AS performance,
+               OLD.support_rating AS support, OLD.price_value_rating AS price_value
+        WHERE TG_OP <> 'INSERT' AND OLD.is_approved
+        UNION ALL
+        SELECT 1, NEW.hosting_id, NEW.performance_rating, NEW.support_rating, NEW.price_value_rating
+        WHERE TG_OP <> 'DELETE' AND NEW.is_approved
+    LOOP
+        -- The right-hand sides see the row before this update
+        UPDATE hostings SET
+            sum_performance = sum_performance + change.sign * change.performance,
+            sum_support = sum_support + change.sign * change.support,
+            sum_price_value = sum_price_value + change.sign * change.price_value,
+            review_count = review_count + change.sign,
+            avg_performance = CASE WHEN review_count + change.sign > 0
+                THEN ROUND((sum_performance + change.sign * change.performance)::NUMERIC
+                           / (review_count + change.sign), 2)
+                ELSE 0 END,
+            avg_support = CASE WHEN review_count + change.sign > 0
+                THEN ROUND((sum_support + change.sign * change.support)::NUMERIC
+                           / (review_count + change.sign), 2)
+                ELSE 0 END,
+            avg_price_value = CASE WHEN review_count + change.sign > 0
+                THEN ROUND((sum_price_value + change.sign * change.price_value)::NUMERIC
+                           / (review_count + change.sign), 2)
+                ELSE 0 END,
+            avg_overall = CASE WHEN review_count + change.sign > 0
+                THEN ROUND((sum_performance + sum_support + sum_price_value
+                            + change.sign * (change.performance + change.support + change.price_value))::NUMERIC
+                           / (3 * (review_count + change.sign)), 2)
+                ELSE 0 END,
+            updated_at = NOW()
+        WHERE id = change.hosting_id;
+    END LOOP;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_hosting_ratings ON hosting_reviews;
+CREATE TRIGGER trigger_update_hosting_ratings
+    AFTER INSERT OR UPDATE OR DELETE ON hosting_reviews
+    FOR EACH ROW
+    EXECUTE FUNCTION update_hosting_ratings();
+
+-- The old full pass needed this; the recount below still uses it
+CREATE INDEX IF NOT EXISTS idx_hosting_reviews_approved
+    ON hosting_reviews(hosting_id) WHERE is_approved = true;
+
+-- Full recount of the sums, counts and averages from the approved reviews.
+-- Run once below to bring existing rows in line, and after bulk loads that
+-- replay reviews with the trigger on (seed_dataset.py --target,
+-- table_dump.py import), which would otherwise add them to the sums the
+-- loaded hostings already carry. Returns the number of hostings recounted.
+CREATE OR REPLACE FUNCTION recount_hosting_ratings()
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+  WITH recounted AS (
+    UPDATE hostings h SET
+        sum_performance = r.sum_performance,
+        sum_support = r.sum_support,
+        sum_price_value = r.sum_price_value,
+        review_count = r.review_count,
+        avg_performance = CASE WHEN r.review_count > 0
+            THEN ROUND(r.sum_performance::NUMERIC / r.review_count, 2) ELSE 0 END,
+        avg_support = CASE WHEN r.review_count > 0
+            THEN ROUND(r.sum_support::NUMERIC / r.review_count, 2) ELSE 0 END,
+        avg_price_value = CASE WHEN r.review_count > 0
+            THEN ROUND(r.sum_price_value::NUMERIC / r.review_count, 2) ELSE 0 END,
+        avg_overall = CASE WHEN r.review_count > 0
+            THEN ROUND((r.sum_performance + r.sum_support + r.sum_price_value)::NUMERIC / (3 * r.review_count), 2)
+            ELSE 0 END,
+        updated_at = NOW()
+    FROM (
+        SELECT
+            hostings.id,
+            COALESCE(SUM(performance_rating), 0) AS sum_performance,
+            COALESCE(SUM(support_rating), 0) AS sum_support,
+            COALESCE(SUM(price_value_rating), 0) AS sum_price_value,
+            COUNT(hosting_reviews.id) AS review_count
+        FROM hostings
+        LEFT JOIN hosting_reviews
+            ON hosting_reviews.hosting_id = hostings.id AND hosting_reviews.is_approved = true
+        GROUP BY hostings.id
+    ) r
+    WHERE h.id = r.id
+    RETURNING 1
+  )
+  SELECT COUNT(*) FROM recounted;
+$$;
+
+SELECT recount_hosting_ratings();
+
+-- Only the backend's service role may call it
+REVOKE EXECUTE ON FUNCTION recount_hosting_ratings() FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,12 @@
+-- Add iconHash column to servers table
+-- Run this in Supabase SQL Editor
+
+-- Server favicons are stored by the backend as content-addressed PNGs
+-- (served from /api/icons/<iconHash>); rows only keep the 32-character hash.
+ALTER TABLE servers
+ADD COLUMN IF NOT EXISTS "iconHash" TEXT;
+
+-- Optional: reject anything that is not a hash
+-- ALTER TABLE servers
+-- ADD CONSTRAINT check_icon_hash
+-- CHECK ("iconHash" IS NULL OR "iconHash" ~ '^[0-9a-f]{32}$');
@@ -0,0 +1,104 @@
+-- Recounts for the backend's in-memory stats services
+-- Each service periodically settles its incrementally kept counters against
+-- the tables. These functions do the counting in the database with one
+-- GROUP BY and return one row per group, so a recount transfers a handful of
+-- rows instead of every row of the counted tables.
+
+-- Blog category counters (backend/blog_stats.py): topics, replies and the last
+-- post or reply time of each category
+CREATE OR REPLACE FUNCTION blog_category_counts()
+RETURNS TABLE ("categoryId" TEXT, topics BIGINT, replies BIGINT, "lastActivityAt" TIMESTAMPTZ)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT p."categoryId",
+         COUNT(*),
+         COALESCE(SUM(r.replies), 0)::BIGINT,
+         MAX(GREATEST(p."createdAt", r.last_reply))
+  FROM blog_posts p
+  LEFT JOIN (
+    SELECT "postId", COUNT(*) AS replies, MAX("createdAt") AS last_reply
+    FROM blog_replies
+    GROUP BY "postId"
+  ) r ON r."postId" = p.id
+  GROUP BY p."categoryId";
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_blog_replies_post ON blog_replies("postId");
+
+-- Admin dashboard series (backend/admin_stats.py): rows created per UTC hour
+-- since `since` in each counted table; the daily series is summed from these
+CREATE OR REPLACE FUNCTION admin_created_counts(since TIMESTAMPTZ)
+RETURNS TABLE (entity TEXT, hour TIMESTAMPTZ, count BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT entity, date_trunc('hour', "createdAt" AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS hour, COUNT(*)
+  FROM (
+    SELECT 'servers' AS entity, "createdAt" FROM servers WHERE "createdAt" >= since
+    UNION ALL SELECT 'users', "createdAt" FROM users WHERE "createdAt" >= since
+    UNION ALL SELECT 'tickets', "createdAt" FROM tickets WHERE "createdAt" >= since
+    UNION ALL SELECT 'posts', "createdAt" FROM blog_posts WHERE "createdAt" >= since
+    UNION ALL SELECT 'votes', "createdAt" FROM votes WHERE "createdAt" >= since
+  ) created
+  GROUP BY 1, 2;
+$$;
+
+-- So each branch is a range scan of the window rather than of the table
+CREATE INDEX IF NOT EXISTS idx_servers_created ON servers("createdAt");
+CREATE INDEX IF NOT EXISTS idx_users_created ON users("createdAt");
+CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets("createdAt" DESC);
+CREATE INDEX IF NOT EXISTS idx_blog_posts_created ON blog_posts("createdAt");
+CREATE INDEX IF NOT EXISTS idx_votes_created ON votes("createdAt" DESC);
+
+-- Top voters of one server (backend/top_voters.py): per-username vote counts,
+-- all-time and since `month_start`, over the votes cast before `before`.
+-- Only the `row_limit` largest of each are returned, which is all the ranking
+-- keeps, so a reseed transfers at most 2 * row_limit rows however many votes
+-- the server has.
+CREATE OR REPLACE FUNCTION server_voter_counts(server TEXT, month_start TIMESTAMPTZ, before TIMESTAMPTZ, row_limit INT)
+RETURNS TABLE ("minecraftUsername" TEXT, "allTime" BIGINT, monthly BIGINT, "lastVoteAt" TIMESTAMPTZ)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH counts AS (
+    SELECT v."minecraftUsername",
+           COUNT(*) AS all_time,
+           COUNT(*) FILTER (WHERE v."createdAt" >= month_start) AS monthly,
+           MAX(v."createdAt") FILTER (WHERE v."createdAt" >= month_start) AS last_vote
+    FROM votes v
+    WHERE v."serverId" = server AND v."createdAt" < before AND v."minecraftUsername" IS NOT NULL
+    GROUP BY v."minecraftUsername"
+  )
+  SELECT * FROM (SELECT * FROM counts ORDER BY all_time DESC LIMIT row_limit) top_all_time
+  UNION
+  SELECT * FROM (SELECT * FROM counts WHERE monthly > 0 ORDER BY monthly DESC LIMIT row_limit) top_monthly;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_votes_server_month ON votes("serverId", "createdAt");
+
+-- Vote counts (servers."voteCount"), reset from the votes rows. The insert
+-- trigger keeps the column current one vote at a time; bulk loads that replay
+-- votes with the trigger on (seed_dataset.py --target, table_dump.py import)
+-- run this once afterwards so votes already in the stored count are not added
+-- a second time. Returns the number of servers whose count changed.
+CREATE OR REPLACE FUNCTION recount_server_votes()
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+  WITH changed AS (
+    UPDATE servers s SET "voteCount" = COALESCE(v.votes, 0)
+    FROM servers base
+    LEFT JOIN (SELECT "serverId", COUNT(*) AS votes FROM votes GROUP BY "serverId") v
+      ON v."serverId" = base.id
+    WHERE s.id = base.id AND s."voteCount" IS DISTINCT FROM COALESCE(v.votes, 0)
+    RETURNING 1
+  )
+  SELECT COUNT(*) FROM changed;
+$$;
+
+-- Only the backend's service role may call them
+REVOKE EXECUTE ON FUNCTION blog_category_counts() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION admin_created_counts(TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION server_voter_counts(TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION recount_server_votes() FROM PUBLIC, anon, authenticated;
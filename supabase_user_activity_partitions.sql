@@ -0,0 +1,119 @@
+-- ============================================
+-- user_activity, partitioned by month
+-- ============================================
+-- Activity is now written in batches by the Python backend (backend/activity_log.py),
+-- which also serves each user's recent feed from memory. This turns the table into
+-- monthly range partitions on "createdAt" so retention is a DROP of whole
+-- partitions instead of a DELETE scan, and replaces the three single-column
+-- indexes with the one the feed query uses.
+-- Run once after supabase_profile_schema_v2.sql; the backend then calls
+-- maintain_user_activity_partitions() every few hours.
+
+BEGIN;
+
+ALTER TABLE user_activity RENAME TO user_activity_unpartitioned;
+
+CREATE TABLE user_activity (
+  id TEXT NOT NULL,
+  "userId" TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  "activityType" TEXT NOT NULL CHECK ("activityType" IN ('vote', 'server_add', 'profile_update', 'ticket', 'login', 'server_delete')),
+  description TEXT NOT NULL,
+  "createdAt" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, "createdAt")
+) PARTITION BY RANGE ("createdAt");
+
+-- Only rows outside every monthly partition (clock skew) land here
+CREATE TABLE user_activity_default PARTITION OF user_activity DEFAULT;
+
+CREATE INDEX idx_user_activity_user_created ON user_activity("userId", "createdAt" DESC);
+
+-- Creates the partitions for this month and the next `months_ahead`, drops
+-- monthly partitions that ended more than `retain_months` months ago, and
+-- deletes rows past the same cutoff from the (normally tiny) default partition.
+CREATE OR REPLACE FUNCTION maintain_user_activity_partitions(retain_months INTEGER DEFAULT 12, months_ahead INTEGER DEFAULT 2)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  month_start DATE;
+  partition_name TEXT;
+  cutoff DATE := date_trunc('month', NOW() - make_interval(months => retain_months))::date;
+  old_partition RECORD;
+BEGIN
+  FOR i IN 0..months_ahead LOOP
+    month_start := (date_trunc('month', NOW()) + make_interval(months => i))::date;
+    partition_name := 'user_activity_' || to_char(month_start, 'YYYY_MM');
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF user_activity FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, (month_start + INTERVAL '1 month')::date
+      );
+    END IF;
+  END LOOP;
+
+  FOR old_partition IN
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    WHERE parent.relname = 'user_activity'
+      AND child.relname ~ '^user_activity_\d{4}_\d{2}$'
+      AND to_date(substring(child.relname FROM '\d{4}_\d{2}$'), 'YYYY_MM') + INTERVAL '1 month' <= cutoff
+  LOOP
+    EXECUTE format('DROP TABLE %I', old_partition.relname);
+  END LOOP;
+
+  DELETE FROM user_activity_default WHERE "createdAt" < cutoff;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION maintain_user_activity_partitions(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+
+SELECT maintain_user_activity_partitions();
+
+-- Monthly partitions for the existing history too, so it is dropped by month
+-- like new rows instead of piling up in the default partition
+DO $$
+DECLARE
+  month_start DATE;
+  partition_name TEXT;
+BEGIN
+  FOR month_start IN
+    SELECT DISTINCT date_trunc('month', "createdAt")::date
+    FROM user_activity_unpartitioned
+    WHERE "createdAt" IS NOT NULL
+  LOOP
+    partition_name := 'user_activity_' || to_char(month_start, 'YYYY_MM');
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF user_activity FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, (month_start + INTERVAL '1 month')::date
+      );
+    END IF;
+  END LOOP;
+END;
+$$;
+
+INSERT INTO user_activity (id, "userId", "activityType", description, "createdAt")
+SELECT id, "userId", "activityType", description, COALESCE("createdAt", NOW())
+FROM user_activity_unpartitioned;
+
+-- History older than the retention window goes now rather than at the first maintenance run
+SELECT maintain_user_activity_partitions();
+
+DROP TABLE user_activity_unpartitioned;
+
+ALTER TABLE user_activity ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own activity" ON user_activity
+  FOR SELECT USING (auth.uid()::text = "userId");
+
+CREATE POLICY "System can insert activity" ON user_activity
+  FOR INSERT WITH CHECK (true);
+
+CREATE POLICY "Admin can view all activity" ON user_activity
+  FOR SELECT USING (
+    EXISTS (SELECT 1 FROM users WHERE users.id = auth.uid()::text AND users.role = 'admin')
+  );
+
+COMMIT;